@@ -597,6 +597,26 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'carbon.tasks.batch_submit_monthly_summaries',
         'schedule': crontab(hour=2, minute=0, day_of_month=1),  # 2:00 AM UTC on 1st of each month
     },
+    'refresh-scan-daily-stats': {
+        'task': 'history.tasks.refresh_scan_daily_stats',
+        'schedule': crontab(minute='*/15'),
+        'kwargs': {'days': 2},
+    },
+    'refresh-scan-daily-stats-nightly': {
+        'task': 'history.tasks.refresh_scan_daily_stats',
+        'schedule': crontab(hour=4, minute=0),  # Late reviews on older scans
+        'kwargs': {'days': 35},
+    },
+    'rollup-iot-readings': {
+        'task': 'carbon.tasks.rollup_iot_readings',
+        'schedule': crontab(minute='*/5'),  # Rollups read readings from the last 15 minutes
+        'options': {'queue': 'carbon'},
+    },
+    'prune-carbon-ledger': {
+        'task': 'carbon.tasks.prune_carbon_ledger',
+        'schedule': crontab(hour=3, minute=30),
+        'options': {'queue': 'carbon'},
+    },
 }
 
 
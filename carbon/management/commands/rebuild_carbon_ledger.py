@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from carbon.services.carbon_ledger import carbon_ledger
+
+
+class Command(BaseCommand):
+    help = 'Recompute the offset/emission ledger from all carbon entries (e.g. after bulk edits that bypass signals)'
+
+    def handle(self, *args, **options):
+        buckets = carbon_ledger.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt carbon ledger: {buckets} buckets'))
@@ -182,6 +182,17 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.SUCCESS(f"\n✅ Update completed successfully!")
             )
+            self._queue_event_result_recalculation()
+
+    def _queue_event_result_recalculation(self):
+        """Recalculate stored event carbon results computed with older factors in the background"""
+        from carbon.tasks import recalculate_outdated_event_carbon
+
+        try:
+            recalculate_outdated_event_carbon.apply_async(queue='carbon')
+            self.stdout.write("🔁 Queued recalculation of outdated event carbon results")
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"Could not queue event carbon recalculation: {e}"))
 
     def _process_batch(self, batch: List[CarbonEntry], correction_factors: Dict[str, float], 
                       dry_run: bool, verbose: bool) -> Dict[str, Any]:
@@ -0,0 +1,63 @@
+# Generated by Django 4.1.4 on 2026-10-16 19:34
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0012_streamline_establishment_operations'),
+        ('history', '0016_consumer_models'),
+        ('carbon', '0023_update_corrected_emission_factors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductionCarbonSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('production', 'Production Entries'), ('establishment', 'Establishment Entries (Year Fallback)')], default='production', max_length=20)),
+                ('year', models.PositiveIntegerField()),
+                ('crop_type', models.CharField(blank=True, max_length=100)),
+                ('total_emissions', models.FloatField(default=0.0)),
+                ('total_offsets', models.FloatField(default=0.0)),
+                ('net_footprint', models.FloatField(default=0.0)),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('carbon_score', models.IntegerField(default=50, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('industry_percentile', models.IntegerField(default=50)),
+                ('industry_average', models.FloatField(default=0.0)),
+                ('benchmark_source', models.CharField(default='industry_average', max_length=150)),
+                ('usda_verified', models.BooleanField(default=False)),
+                ('verification_date', models.DateField(blank=True, null=True)),
+                ('emissions_by_source', models.JSONField(default=dict)),
+                ('emissions_by_category', models.JSONField(default=dict)),
+                ('offsets_by_action', models.JSONField(default=dict)),
+                ('blockchain_verification', models.JSONField(blank=True, default=dict)),
+                ('is_stale', models.BooleanField(default=False)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('benchmark', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='production_snapshots', to='carbon.carbonbenchmark')),
+                ('establishment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='production_snapshots', to='company.establishment')),
+                ('production', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='carbon_snapshot', to='history.history')),
+            ],
+            options={
+                'db_table': 'carbon_production_snapshot',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='productioncarbonsnapshot',
+            index=models.Index(fields=['establishment', 'year', 'scope'], name='carbon_prod_establi_f9a98e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productioncarbonsnapshot',
+            index=models.Index(fields=['year', 'crop_type'], name='carbon_prod_year_881580_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productioncarbonsnapshot',
+            index=models.Index(fields=['is_stale'], name='carbon_prod_is_stal_c15ba4_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.1.4 on 2026-10-16 19:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history', '0017_event_timeline_indexes'),
+        ('carbon', '0024_production_carbon_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventCarbonResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_model', models.CharField(help_text='History event model name, e.g. ChemicalEvent', max_length=50)),
+                ('event_id', models.PositiveIntegerField()),
+                ('input_hash', models.CharField(max_length=64)),
+                ('factors_version', models.CharField(max_length=20)),
+                ('result', models.JSONField(default=dict)),
+                ('calculated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('production', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='event_carbon_results', to='history.history')),
+            ],
+            options={
+                'db_table': 'carbon_event_result',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='eventcarbonresult',
+            index=models.Index(fields=['factors_version'], name='carbon_event_factors_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='eventcarbonresult',
+            constraint=models.UniqueConstraint(fields=('event_model', 'event_id'), name='unique_event_carbon_result'),
+        ),
+    ]
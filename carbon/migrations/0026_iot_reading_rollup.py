@@ -0,0 +1,42 @@
+# Generated by Django 4.1.4 on 2026-10-16 20:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carbon', '0025_event_carbon_result'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IoTReadingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('metric', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.FloatField(default=0.0)),
+                ('minimum', models.FloatField(blank=True, null=True)),
+                ('maximum', models.FloatField(blank=True, null=True)),
+                ('last_value', models.FloatField(blank=True, null=True)),
+                ('last_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='carbon.iotdevice')),
+            ],
+            options={
+                'db_table': 'carbon_iot_reading_rollup',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='iotreadingrollup',
+            index=models.Index(fields=['resolution', 'bucket_start'], name='carbon_iot_rollup_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='iotreadingrollup',
+            constraint=models.UniqueConstraint(fields=('device', 'resolution', 'bucket_start', 'metric'), name='unique_iot_reading_rollup'),
+        ),
+    ]
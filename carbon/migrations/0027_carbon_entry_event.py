@@ -0,0 +1,54 @@
+# Generated by Django 4.1.4 on 2026-10-16 21:05
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+
+
+# USDACalculationAudit.event_type -> history event model
+AUDIT_EVENT_MODELS = {
+    'chemical_event': 'ChemicalEvent',
+    'production_event': 'ProductionEvent',
+    'equipment_event': 'EquipmentEvent',
+    'soil_management': 'SoilManagementEvent',
+    'weather_event': 'WeatherEvent',
+    'pest_management': 'PestManagementEvent',
+    'business_event': 'GeneralEvent',
+}
+
+
+def link_entries_to_events(apps, schema_editor):
+    """Backfill the event link of existing entries from their calculation audit records."""
+    CarbonEntry = apps.get_model('carbon', 'CarbonEntry')
+    USDACalculationAudit = apps.get_model('carbon', 'USDACalculationAudit')
+
+    for event_type, event_model in AUDIT_EVENT_MODELS.items():
+        audits = USDACalculationAudit.objects.filter(carbon_entry=OuterRef('pk'), event_type=event_type).order_by('id')
+        CarbonEntry.objects.filter(event_id__isnull=True).filter(Exists(audits)).update(
+            event_model=event_model,
+            event_id=Subquery(audits.values('event_id')[:1]),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carbon', '0026_iot_reading_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carbonentry',
+            name='event_model',
+            field=models.CharField(blank=True, help_text='History event model name, e.g. ChemicalEvent', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='carbonentry',
+            name='event_id',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='carbonentry',
+            index=models.Index(fields=['event_model', 'event_id'], name='carbon_entry_event_idx'),
+        ),
+        migrations.RunPython(link_entries_to_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.4 on 2026-10-16 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carbon', '0027_carbon_entry_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iotdevice',
+            name='api_sync_cursor',
+            field=models.DateTimeField(blank=True, help_text='End of the last data window fetched from the API', null=True),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.1.4 on 2026-10-17 00:20
+
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncHour, TruncMonth
+from django.utils import timezone
+
+
+def build_ledger(apps, schema_editor):
+    """Backfill ledger buckets from existing carbon entries (see CarbonLedgerService.rebuild)."""
+    CarbonEntry = apps.get_model('carbon', 'CarbonEntry')
+    CarbonLedger = apps.get_model('carbon', 'CarbonLedger')
+
+    recent = CarbonEntry.objects.filter(created_at__gte=timezone.now() - timedelta(hours=48))
+    buckets = [
+        ('establishment', 'establishment_id', 'month', TruncMonth, CarbonEntry.objects.all()),
+        ('user', 'created_by_id', 'month', TruncMonth, CarbonEntry.objects.all()),
+        ('user', 'created_by_id', 'hour', TruncHour, recent),
+    ]
+    rows = []
+    for scope, field, resolution, trunc, entries in buckets:
+        totals = (
+            entries.filter(**{f'{field}__isnull': False})
+            .values(field, bucket=trunc('created_at', tzinfo=dt_timezone.utc))
+            .annotate(
+                emission_total=Sum('amount', filter=Q(type='emission')),
+                offset_total=Sum('amount', filter=Q(type='offset')),
+                self_reported_offset_total=Sum('amount', filter=Q(type='offset', verification_level='self_reported')),
+                offset_count=Count('id', filter=Q(type='offset')),
+            )
+            .order_by()
+        )
+        rows.extend(
+            CarbonLedger(
+                scope=scope,
+                scope_id=row[field],
+                resolution=resolution,
+                bucket_start=row['bucket'],
+                emission_total=row['emission_total'] or 0,
+                offset_total=row['offset_total'] or 0,
+                self_reported_offset_total=row['self_reported_offset_total'] or 0,
+                offset_count=row['offset_count'] or 0,
+            )
+            for row in totals
+        )
+    CarbonLedger.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carbon', '0028_iotdevice_api_sync_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarbonLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('establishment', 'Establishment'), ('user', 'User')], max_length=20)),
+                ('scope_id', models.PositiveIntegerField()),
+                ('resolution', models.CharField(choices=[('month', 'Month'), ('hour', 'Hour')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('emission_total', models.FloatField(default=0.0)),
+                ('offset_total', models.FloatField(default=0.0)),
+                ('self_reported_offset_total', models.FloatField(default=0.0)),
+                ('offset_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'carbon_ledger',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='carbonledger',
+            index=models.Index(fields=['resolution', 'bucket_start'], name='carbon_ledger_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='carbonledger',
+            constraint=models.UniqueConstraint(fields=('scope', 'scope_id', 'resolution', 'bucket_start'), name='unique_carbon_ledger_bucket'),
+        ),
+        migrations.RunPython(build_ledger, migrations.RunPython.noop),
+    ]
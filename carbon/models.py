@@ -368,6 +368,9 @@ class CarbonEntry(models.Model):
     timestamp = models.DateTimeField(default=timezone.now)
     description = models.TextField(blank=True)
     iot_device_id = models.CharField(max_length=100, blank=True, help_text='ID of IoT device if automated entry')
+    # History event the entry was calculated from
+    event_model = models.CharField(max_length=50, blank=True, help_text='History event model name, e.g. ChemicalEvent')
+    event_id = models.PositiveIntegerField(null=True, blank=True)
     usda_verified = models.BooleanField(default=False)
     # New fields for better verification tracking
     usda_factors_based = models.BooleanField(default=False, help_text='Whether calculations use USDA emission factors')
@@ -434,7 +437,8 @@ class CarbonEntry(models.Model):
             models.Index(fields=['verification_level']),
             models.Index(fields=['audit_status']),
             models.Index(fields=['additionality_verified']),
-            models.Index(fields=['registry_verification_id'])
+            models.Index(fields=['registry_verification_id']),
+            models.Index(fields=['event_model', 'event_id'], name='carbon_entry_event_idx'),
         ]
 
     def save(self, *args, **kwargs):
@@ -800,6 +804,7 @@ class IoTDevice(models.Model):
     # John Deere API Integration
     john_deere_machine_id = models.CharField(max_length=100, null=True, blank=True, help_text="John Deere machine ID for API integration")
     last_api_sync = models.DateTimeField(null=True, blank=True, help_text="Last successful API synchronization")
+    api_sync_cursor = models.DateTimeField(null=True, blank=True, help_text="End of the last data window fetched from the API")
     api_connection_status = models.CharField(max_length=20, default='disconnected', choices=[
         ('connected', 'Connected'),
         ('disconnected', 'Disconnected'),
@@ -891,6 +896,103 @@ class IoTDataPoint(models.Model):
         self.save(update_fields=['processed', 'carbon_entry'])
 
 
+class IoTReadingRollup(models.Model):
+    """
+    Per-device aggregate of numeric IoT readings over a minute, hour or day.
+
+    One row per device, resolution, bucket and metric, where ``metric`` is the dotted
+    path of a numeric value in ``IoTDataPoint.data`` (e.g. ``fuel_consumption.fuel_used``)
+    and the ``readings`` metric counts the data points themselves. Kept up to date by
+    carbon/services/iot_rollups.py and retained longer than the raw data points.
+    """
+
+    RESOLUTION_CHOICES = [
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    device = models.ForeignKey(IoTDevice, on_delete=models.CASCADE, related_name='rollups')
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    metric = models.CharField(max_length=100)
+
+    count = models.PositiveIntegerField(default=0)
+    total = models.FloatField(default=0.0)
+    minimum = models.FloatField(null=True, blank=True)
+    maximum = models.FloatField(null=True, blank=True)
+    last_value = models.FloatField(null=True, blank=True)
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'carbon_iot_reading_rollup'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['device', 'resolution', 'bucket_start', 'metric'], name='unique_iot_reading_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket_start'], name='carbon_iot_rollup_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} {self.metric} {self.resolution} @ {self.bucket_start}"
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+
+class CarbonLedger(models.Model):
+    """
+    Running offset and emission totals of an establishment or user per month or hour.
+
+    One row per scope, bucket resolution and bucket start, where buckets follow
+    ``CarbonEntry.created_at``. Month buckets are kept for establishments and
+    users, hour buckets (for rolling 24-hour counts) only for users and only
+    for recent hours. Maintained on every CarbonEntry write by
+    carbon/services/carbon_ledger.py and read by the verification anti-gaming checks.
+    """
+
+    SCOPE_CHOICES = [
+        ('establishment', 'Establishment'),
+        ('user', 'User'),
+    ]
+
+    RESOLUTION_CHOICES = [
+        ('month', 'Month'),
+        ('hour', 'Hour'),
+    ]
+
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES)
+    scope_id = models.PositiveIntegerField()
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+
+    emission_total = models.FloatField(default=0.0)
+    offset_total = models.FloatField(default=0.0)
+    self_reported_offset_total = models.FloatField(default=0.0)
+    offset_count = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'carbon_ledger'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['scope', 'scope_id', 'resolution', 'bucket_start'], name='unique_carbon_ledger_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket_start'], name='carbon_ledger_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.scope_id} {self.resolution} @ {self.bucket_start}"
+
+
 class AutomationRule(models.Model):
     """Model for defining automation rules based on IoT data."""
     
@@ -1291,3 +1393,91 @@ class VerificationAudit(models.Model):
     
     def __str__(self):
         return f"Audit {self.carbon_entry} - {self.result}"
+
+
+class ProductionCarbonSnapshot(models.Model):
+    """
+    Materialized carbon metrics for a production, read by the public QR endpoints.
+
+    Rebuilt in the background whenever the production's carbon entries, events or
+    the benchmarks it was scored against change (see carbon/signals.py).
+    """
+
+    SCOPE_CHOICES = [
+        ('production', 'Production Entries'),
+        ('establishment', 'Establishment Entries (Year Fallback)'),
+    ]
+
+    production = models.OneToOneField('history.History', on_delete=models.CASCADE, related_name='carbon_snapshot')
+    establishment = models.ForeignKey('company.Establishment', on_delete=models.CASCADE, null=True, blank=True, related_name='production_snapshots')
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES, default='production')
+    year = models.PositiveIntegerField()
+    crop_type = models.CharField(max_length=100, blank=True)
+
+    # Carbon totals
+    total_emissions = models.FloatField(default=0.0)
+    total_offsets = models.FloatField(default=0.0)
+    net_footprint = models.FloatField(default=0.0)
+    entry_count = models.PositiveIntegerField(default=0)
+
+    # Scoring against benchmarks
+    carbon_score = models.IntegerField(default=50, validators=[MinValueValidator(0), MaxValueValidator(100)])
+    industry_percentile = models.IntegerField(default=50)
+    industry_average = models.FloatField(default=0.0)
+    benchmark = models.ForeignKey(CarbonBenchmark, on_delete=models.SET_NULL, null=True, blank=True, related_name='production_snapshots')
+    benchmark_source = models.CharField(max_length=150, default='industry_average')
+    usda_verified = models.BooleanField(default=False)
+    verification_date = models.DateField(null=True, blank=True)
+
+    # Breakdowns
+    emissions_by_source = models.JSONField(default=dict)
+    emissions_by_category = models.JSONField(default=dict)
+    offsets_by_action = models.JSONField(default=dict)
+    blockchain_verification = models.JSONField(default=dict, blank=True)
+
+    # Freshness tracking
+    is_stale = models.BooleanField(default=False)
+    computed_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'carbon_production_snapshot'
+        indexes = [
+            models.Index(fields=['establishment', 'year', 'scope']),
+            models.Index(fields=['year', 'crop_type']),
+            models.Index(fields=['is_stale']),
+        ]
+
+    def __str__(self):
+        return f"Carbon snapshot for production {self.production_id} ({self.carbon_score})"
+
+
+class EventCarbonResult(models.Model):
+    """
+    Stored carbon calculation for a single history event.
+
+    Keyed by event model and id. ``input_hash`` and ``factors_version`` record what
+    the result was computed from, so readers can tell when it is out of date and
+    queue a background recalculation (see carbon/services/event_carbon_results.py).
+    """
+
+    event_model = models.CharField(max_length=50, help_text='History event model name, e.g. ChemicalEvent')
+    event_id = models.PositiveIntegerField()
+    production = models.ForeignKey(History, on_delete=models.CASCADE, null=True, blank=True, related_name='event_carbon_results')
+    input_hash = models.CharField(max_length=64)
+    factors_version = models.CharField(max_length=20)
+    result = models.JSONField(default=dict)
+    calculated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'carbon_event_result'
+        constraints = [
+            models.UniqueConstraint(fields=['event_model', 'event_id'], name='unique_event_carbon_result'),
+        ]
+        indexes = [
+            models.Index(fields=['factors_version'], name='carbon_event_factors_idx'),
+        ]
+
+    def __str__(self):
+        return f"Carbon result for {self.event_model} {self.event_id} ({self.factors_version})"
@@ -0,0 +1,237 @@
+"""
+Batch verification of carbon offsets.
+
+``VerificationService.verify_offset_entry`` looks up what its checks need
+entry by entry: ledger totals, regional practice counts, recent identical
+offsets, methodology templates and registry lookups. For a set of entries
+``BatchVerificationContext`` loads all of that up front, with one grouped query
+per kind of data and one registry lookup per distinct registry ID (run
+concurrently). The rules then run in memory, and ``BatchVerificationEngine``
+persists what they decide with ``bulk_update``, one chunk of entries at a time.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from common.concurrency import bounded_map
+from company.models import Establishment
+from ..models import CarbonEntry
+from .carbon_ledger import carbon_ledger
+from .production_snapshot import production_snapshot_service
+from .verification_service import VerificationContext, VerificationService
+
+logger = logging.getLogger(__name__)
+
+# (entry, result, error): a result, or the exception raised verifying the entry
+Outcome = Tuple[CarbonEntry, Optional[Dict[str, Any]], Optional[Exception]]
+
+
+class BatchVerificationContext(VerificationContext):
+    """
+    Verification data for a set of entries, loaded once. Questions about
+    anything outside the set fall back to per-entry queries.
+    """
+
+    # Concurrent registry API requests
+    REGISTRY_CONCURRENCY = getattr(settings, 'REGISTRY_VERIFICATION_CONCURRENCY', 4)
+
+    def __init__(self, service: VerificationService, entries: List[CarbonEntry]):
+        super().__init__(service)
+        # Entries a check updated, to be saved together by the engine
+        self.changed: List[CarbonEntry] = []
+        self._methodology_templates: Dict[str, Dict[str, Any]] = {}
+        self._load(entries)
+
+    def similar_offsets(self, state: Optional[str], description_prefix: str) -> int:
+        if state not in self._state_descriptions:
+            return super().similar_offsets(state, description_prefix)
+        # In memory, like the database's case-insensitive containment match
+        prefix = description_prefix.lower()
+        return sum(
+            count for description, count in self._state_descriptions[state]
+            if description is not None and prefix in description
+        )
+
+    def establishments_in_state(self, state: Optional[str]) -> int:
+        if state not in self._state_descriptions:
+            return super().establishments_in_state(state)
+        return self._establishment_counts.get(state, 0)
+
+    def identical_recent_offsets(self, carbon_entry) -> int:
+        if carbon_entry.created_by_id not in self._recent_offset_users:
+            return super().identical_recent_offsets(carbon_entry)
+        return self._recent_offsets.get(
+            (carbon_entry.created_by_id, carbon_entry.amount, carbon_entry.description), 0
+        )
+
+    def methodology_template(self, source_name: str) -> Dict[str, Any]:
+        if source_name not in self._methodology_templates:
+            self._methodology_templates[source_name] = super().methodology_template(source_name)
+        return self._methodology_templates[source_name]
+
+    def registry_result(self, carbon_entry) -> Dict[str, Any]:
+        if carbon_entry.registry_verification_id not in self._registry_results:
+            return super().registry_result(carbon_entry)
+        return dict(self._registry_results[carbon_entry.registry_verification_id])
+
+    def entry_changed(self, carbon_entry):
+        self.changed.append(carbon_entry)
+
+    def _load(self, entries: List[CarbonEntry]):
+        establishment_ids = {entry.establishment_id for entry in entries if entry.establishment_id}
+        user_ids = {entry.created_by_id for entry in entries}
+        states = {entry.establishment.state for entry in entries if entry.establishment_id}
+
+        self._establishment_totals = carbon_ledger.establishment_totals_many(establishment_ids, self.now)
+        self._user_totals = carbon_ledger.user_totals_many({user_id for user_id in user_ids if user_id}, self.now)
+
+        # Common practice: offset descriptions and establishment counts per state
+        self._state_descriptions = {state: [] for state in states}
+        if states:
+            rows = (
+                CarbonEntry.objects.filter(self._in('establishment__state', states), type='offset')
+                .values('establishment__state', 'description')
+                .annotate(count=Count('id'))
+                .order_by()
+            )
+            for row in rows:
+                description = row['description'].lower() if row['description'] is not None else None
+                self._state_descriptions[row['establishment__state']].append((description, row['count']))
+        self._establishment_counts = dict(
+            Establishment.objects.filter(self._in('state', states))
+            .values('state')
+            .annotate(count=Count('id'))
+            .values_list('state', 'count')
+            .order_by()
+        ) if states else {}
+
+        # Identical offsets per user over the last 24 hours
+        self._recent_offset_users = user_ids
+        self._recent_offsets = defaultdict(int)
+        if user_ids:
+            rows = (
+                CarbonEntry.objects.filter(
+                    self._in('created_by_id', user_ids), type='offset', created_at__gte=self.now - timedelta(days=1)
+                )
+                .values('created_by_id', 'amount', 'description')
+                .annotate(count=Count('id'))
+                .order_by()
+            )
+            for row in rows:
+                self._recent_offsets[(row['created_by_id'], row['amount'], row['description'])] += row['count']
+
+        # One registry lookup per distinct registry ID
+        representatives = {}
+        for entry in entries:
+            if entry.verification_level == 'certified_project' and entry.registry_verification_id:
+                representatives.setdefault(entry.registry_verification_id, entry)
+        self._registry_results = dict(zip(
+            representatives,
+            bounded_map(
+                self.service._verify_with_third_party_registry, representatives.values(), self.REGISTRY_CONCURRENCY
+            )
+        ))
+
+    @staticmethod
+    def _in(field: str, values: Iterable) -> Q:
+        """``field`` in ``values``, where ``None`` matches NULL as it does in a plain filter."""
+        values = set(values)
+        condition = Q(**{f'{field}__in': [value for value in values if value is not None]})
+        if None in values:
+            condition |= Q(**{f'{field}__isnull': True})
+        return condition
+
+
+class BatchVerificationEngine:
+    """
+    Verifies many offset entries against one preloaded context and saves the
+    outcomes with bulk updates.
+    """
+
+    # Entries verified and written per context
+    CHUNK_SIZE = 500
+
+    # Fields ``process_pending`` sets from a verification
+    PENDING_FIELDS = ['trust_score', 'effective_amount', 'audit_status']
+
+    def __init__(self, service: Optional[VerificationService] = None):
+        self.service = service or VerificationService()
+
+    def verify(self, entries: Iterable[CarbonEntry]) -> List[Outcome]:
+        """
+        Verify ``entries`` (ideally with ``establishment`` and ``source`` selected)
+        and save the registry URLs found along the way. Outcomes are in order.
+        """
+        entries = list(entries)
+        if not entries:
+            return []
+
+        context = BatchVerificationContext(self.service, entries)
+        outcomes = []
+        for entry in entries:
+            try:
+                outcomes.append((entry, self.service.verify_offset_entry(entry, context), None))
+            except Exception as e:
+                logger.error(f"Error verifying carbon entry {entry.id}: {e}")
+                outcomes.append((entry, None, e))
+
+        self.save(context.changed, ['third_party_verification_url'])
+        return outcomes
+
+    def pending(self):
+        """Self-reported offsets awaiting verification."""
+        return CarbonEntry.objects.filter(
+            type='offset',
+            verification_level='self_reported',
+            audit_status='pending'
+        )
+
+    def process_pending(self) -> Dict[str, int]:
+        """
+        Verify every pending offset, ``CHUNK_SIZE`` at a time, marking each passed
+        or failed and saving its trust score and effective amount.
+        """
+        queryset = self.pending().select_related('establishment', 'source').order_by('id')
+        stats = {'processed': 0, 'failed': 0, 'chunks': 0}
+
+        last_id = 0
+        while True:
+            chunk = list(queryset.filter(id__gt=last_id)[:self.CHUNK_SIZE])
+            if not chunk:
+                break
+
+            verified = []
+            for entry, result, error in self.verify(chunk):
+                if error is not None:
+                    stats['failed'] += 1
+                    continue
+                entry.audit_status = 'passed' if result['approved'] else 'failed'
+                entry.trust_score = result['trust_score']
+                entry.effective_amount = self.service.calculate_effective_amount(entry)
+                verified.append(entry)
+
+            self.save(verified, self.PENDING_FIELDS)
+            stats['processed'] += len(verified)
+            stats['chunks'] += 1
+            last_id = chunk[-1].id
+
+            if len(chunk) < self.CHUNK_SIZE:
+                break
+
+        logger.info(f"Processed {stats['processed']} pending verifications ({stats['failed']} failed)")
+        return stats
+
+    def save(self, entries: List[CarbonEntry], fields: List[str]):
+        """Write ``fields`` of ``entries`` with one ``bulk_update``."""
+        if not entries:
+            return
+        with transaction.atomic():
+            CarbonEntry.objects.bulk_update(entries, fields, batch_size=self.CHUNK_SIZE)
+        # bulk_update skips post_save. These fields don't feed the ledger, but cached responses show them.
+        production_snapshot_service.invalidate_for_entries(entries)
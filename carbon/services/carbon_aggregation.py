@@ -0,0 +1,114 @@
+"""
+Single-pass grouped aggregation of CarbonEntry rows.
+
+The public QR endpoints, the dashboard summary and the establishment summary all
+need the same numbers: emission/offset totals, emissions per source and per
+source category, and trust-weighted offsets per action. Instead of looping over
+entries in Python, everything is computed from one GROUP BY query over
+(type, source) and folded into dictionaries here.
+"""
+
+from typing import Any, Dict, Iterable, Optional
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+
+
+def _empty_summary() -> Dict[str, Any]:
+    return {
+        'total_emissions': 0.0,           # Sum of co2e_amount for emissions
+        'total_emission_amount': 0.0,     # Sum of raw amount for emissions
+        'total_offsets': 0.0,             # Trust-weighted (effective_amount) offsets
+        'total_offset_amount': 0.0,       # Raw offset amount before trust discounts
+        'net_footprint': 0.0,
+        'emission_count': 0,
+        'offset_count': 0,
+        'entry_count': 0,
+        'emissions_by_source': {},
+        'emissions_by_category': {},
+        'offsets_by_action': {},
+    }
+
+
+def _fold_row(summary: Dict[str, Any], row: Dict[str, Any]):
+    count = row['entry_count'] or 0
+    summary['entry_count'] += count
+
+    if row['type'] == 'emission':
+        co2e = float(row['co2e_total'] or 0)
+        summary['total_emissions'] += co2e
+        summary['total_emission_amount'] += float(row['amount_total'] or 0)
+        summary['emission_count'] += count
+
+        source_name = row['source__name'] or 'Unknown'
+        category = row['source__category'] or 'Other'
+        summary['emissions_by_source'][source_name] = summary['emissions_by_source'].get(source_name, 0) + co2e
+        summary['emissions_by_category'][category] = summary['emissions_by_category'].get(category, 0) + co2e
+
+    elif row['type'] == 'offset':
+        summary['total_offsets'] += float(row['effective_total'] or 0)
+        summary['total_offset_amount'] += float(row['amount_total'] or 0)
+        summary['offset_count'] += count
+
+        action_name = row['source__name'] or 'Unknown Offset'
+        summary['offsets_by_action'][action_name] = (
+            summary['offsets_by_action'].get(action_name, 0) + float(row['weighted_total'] or 0)
+        )
+
+
+def _grouped_rows(queryset, group_fields: Iterable[str] = ()):
+    return (
+        queryset
+        .order_by()
+        .values(*group_fields, 'type', 'source__name', 'source__category')
+        .annotate(
+            co2e_total=Sum('co2e_amount'),
+            amount_total=Sum('amount'),
+            effective_total=Sum('effective_amount'),
+            # Offsets without a computed effective_amount count at full co2e
+            weighted_total=Sum(Coalesce(F('effective_amount'), F('co2e_amount'))),
+            entry_count=Count('id'),
+        )
+    )
+
+
+def summarize_carbon_entries(queryset) -> Dict[str, Any]:
+    """
+    Aggregate a CarbonEntry queryset into totals and breakdowns with one query.
+    """
+    summary = _empty_summary()
+    for row in _grouped_rows(queryset):
+        _fold_row(summary, row)
+
+    summary['net_footprint'] = summary['total_emissions'] - summary['total_offsets']
+    return summary
+
+
+def summarize_carbon_entries_by(queryset, field: str) -> Dict[Optional[Any], Dict[str, Any]]:
+    """
+    Same as ``summarize_carbon_entries`` but keyed by ``field`` (e.g. ``production_id``),
+    still using a single grouped query.
+    """
+    summaries: Dict[Optional[Any], Dict[str, Any]] = {}
+    for row in _grouped_rows(queryset, (field,)):
+        summary = summaries.setdefault(row[field], _empty_summary())
+        _fold_row(summary, row)
+
+    for summary in summaries.values():
+        summary['net_footprint'] = summary['total_emissions'] - summary['total_offsets']
+    return summaries
+
+
+def combine_carbon_summaries(summaries: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge several summaries (e.g. per production) into one without re-querying."""
+    combined = _empty_summary()
+    for summary in summaries:
+        for key in ('total_emissions', 'total_emission_amount', 'total_offsets', 'total_offset_amount',
+                    'emission_count', 'offset_count', 'entry_count'):
+            combined[key] += summary[key]
+        for key in ('emissions_by_source', 'emissions_by_category', 'offsets_by_action'):
+            for name, value in summary[key].items():
+                combined[key][name] = combined[key].get(name, 0) + value
+
+    combined['net_footprint'] = combined['total_emissions'] - combined['total_offsets']
+    return combined
@@ -6,12 +6,15 @@ Avoids complex farm management features to stay focused on carbon transparency m
 """
 
 from decimal import Decimal
-from django.db.models import Sum, Avg, Q
+from django.db.models import Avg, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 
 from carbon.models import CarbonEntry
+from carbon.services.carbon_aggregation import (
+    summarize_carbon_entries, summarize_carbon_entries_by, combine_carbon_summaries
+)
 from history.models import History  # Production is actually History model
 from product.models import Parcel
 
@@ -141,36 +144,11 @@ class CarbonCostInsights:
     def calculate_carbon_credit_potential(self, production: History) -> Dict[str, Any]:
         """Simple carbon credit revenue estimation"""
         try:
-            # Get total carbon sequestered from production
-            carbon_entries = CarbonEntry.objects.filter(
-                production=production,
-                entry_type='sequestration'
+            # Trust-weighted offsets for this production, from a single grouped query
+            carbon_summary = summarize_carbon_entries(
+                CarbonEntry.objects.filter(production=production)
             )
-            
-            total_sequestered = carbon_entries.aggregate(
-                total=Sum('co2_equivalent')
-            )['total'] or Decimal('0')
-            
-            # Convert to tons (assuming co2_equivalent is in kg)
-            tons_sequestered = total_sequestered / Decimal('1000')
-            
-            potential_revenue = tons_sequestered * self.carbon_credit_rate
-            
-            return {
-                'tons_sequestered': float(tons_sequestered),
-                'market_rate_per_ton': float(self.carbon_credit_rate),
-                'potential_revenue': float(potential_revenue),
-                'confidence': 'medium',
-                'verification_needed': tons_sequestered > 0,
-                'next_steps': [
-                    'Complete carbon verification process',
-                    'Register with carbon credit marketplace',
-                    'Maintain detailed carbon tracking records'
-                ] if tons_sequestered > 0 else [
-                    'Continue carbon tracking to build credit potential',
-                    'Focus on carbon sequestration activities'
-                ]
-            }
+            return self._credit_potential_from_summary(carbon_summary)
             
         except Exception as e:
             return {
@@ -179,6 +157,31 @@ class CarbonCostInsights:
                 'potential_revenue': 0
             }
     
+    def _credit_potential_from_summary(self, carbon_summary: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the credit potential payload from an aggregated carbon summary"""
+        total_sequestered = Decimal(str(carbon_summary['total_offsets']))
+        
+        # Convert to tons (offsets are stored in kg CO2e)
+        tons_sequestered = total_sequestered / Decimal('1000')
+        
+        potential_revenue = tons_sequestered * self.carbon_credit_rate
+        
+        return {
+            'tons_sequestered': float(tons_sequestered),
+            'market_rate_per_ton': float(self.carbon_credit_rate),
+            'potential_revenue': float(potential_revenue),
+            'confidence': 'medium',
+            'verification_needed': tons_sequestered > 0,
+            'next_steps': [
+                'Complete carbon verification process',
+                'Register with carbon credit marketplace',
+                'Maintain detailed carbon tracking records'
+            ] if tons_sequestered > 0 else [
+                'Continue carbon tracking to build credit potential',
+                'Focus on carbon sequestration activities'
+            ]
+        }
+    
     def get_carbon_efficiency_tips(self, production: History) -> List[Dict[str, Any]]:
         """Get efficiency tips focused only on carbon-heavy activities"""
         tips = []
@@ -352,27 +355,36 @@ class CarbonCostInsights:
             from company.models import Establishment
             establishment = Establishment.objects.get(id=establishment_id)
             
-            # Get all productions for this establishment
-            productions = History.objects.filter(
+            production_count = History.objects.filter(
                 parcel__establishment=establishment
-            )
+            ).count()
+            
+            # One grouped query for every production's carbon entries
+            entries = CarbonEntry.objects.filter(production__parcel__establishment=establishment)
+            summaries = summarize_carbon_entries_by(entries, 'production_id')
             
             total_carbon_potential = Decimal('0')
             total_sequestered = Decimal('0')
             
-            for production in productions:
-                carbon_data = self.calculate_carbon_credit_potential(production)
-                if 'potential_revenue' in carbon_data:
-                    total_carbon_potential += Decimal(str(carbon_data['potential_revenue']))
-                if 'tons_sequestered' in carbon_data:
-                    total_sequestered += Decimal(str(carbon_data['tons_sequestered']))
+            for carbon_summary in summaries.values():
+                carbon_data = self._credit_potential_from_summary(carbon_summary)
+                total_carbon_potential += Decimal(str(carbon_data['potential_revenue']))
+                total_sequestered += Decimal(str(carbon_data['tons_sequestered']))
+            
+            establishment_totals = combine_carbon_summaries(summaries.values())
             
             return {
                 'establishment_name': establishment.name,
-                'total_productions': productions.count(),
+                'total_productions': production_count,
                 'total_carbon_sequestered_tons': float(total_sequestered),
                 'total_carbon_credit_potential': float(total_carbon_potential),
-                'average_per_production': float(total_carbon_potential / productions.count()) if productions.count() > 0 else 0,
+                'average_per_production': float(total_carbon_potential / production_count) if production_count > 0 else 0,
+                'total_emissions': establishment_totals['total_emissions'],
+                'total_offsets': establishment_totals['total_offsets'],
+                'net_footprint': establishment_totals['net_footprint'],
+                'emissions_by_source': establishment_totals['emissions_by_source'],
+                'emissions_by_category': establishment_totals['emissions_by_category'],
+                'offsets_by_action': establishment_totals['offsets_by_action'],
                 'summary_date': timezone.now().isoformat()
             }
             
@@ -0,0 +1,258 @@
+"""
+Running offset and emission totals for the verification anti-gaming checks.
+
+The checks in carbon/services/verification_service.py used to aggregate every
+carbon entry of an establishment or user for each offset verified.
+``CarbonLedger`` keeps those totals in month buckets per establishment and
+user, plus hour buckets per user for rolling 24-hour submission counts. Every
+CarbonEntry save or delete moves the entry's contribution between buckets with
+F() updates in the writing transaction (see carbon/signals.py), and bulk
+writers call ``record_entries``. A verification then reads a few indexed
+bucket rows per scope.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncHour, TruncMonth
+from django.utils import timezone
+
+from ..models import CarbonEntry, CarbonLedger
+
+logger = logging.getLogger(__name__)
+
+# (scope, scope_id, resolution, bucket_start)
+BucketKey = Tuple[str, int, str, datetime]
+
+
+class CarbonLedgerService:
+    """
+    Maintains and reads ``CarbonLedger`` buckets.
+    """
+
+    # Entry fields that decide its ledger contribution
+    ENTRY_FIELDS = ('type', 'amount', 'verification_level', 'establishment_id', 'created_by_id', 'created_at')
+
+    TOTAL_FIELDS = ('emission_total', 'offset_total', 'self_reported_offset_total', 'offset_count')
+
+    # Hour buckets only serve the rolling 24-hour window
+    HOUR_RETENTION = timedelta(hours=48)
+    RECENT_WINDOW = timedelta(hours=24)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def state(self, entry: CarbonEntry) -> Dict[str, Any]:
+        """The ledger-relevant fields of an entry instance."""
+        return {field: getattr(entry, field) for field in self.ENTRY_FIELDS}
+
+    def stored_state(self, entry: CarbonEntry) -> Optional[Dict[str, Any]]:
+        """The ledger-relevant fields of an entry as currently stored, before it is saved again."""
+        if entry._state.adding or entry.pk is None:
+            return None
+        return CarbonEntry.objects.filter(pk=entry.pk).values(*self.ENTRY_FIELDS).first()
+
+    def record_change(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Move an entry's contribution from its ``before`` state to its ``after`` state."""
+        deltas = defaultdict(lambda: defaultdict(float))
+        self._add(deltas, before, -1)
+        self._add(deltas, after, 1)
+        self._apply(deltas)
+
+    def record_changes(self, changes: Iterable[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]):
+        """``record_change`` for many ``(before, after)`` pairs, e.g. after a ``bulk_update``."""
+        deltas = defaultdict(lambda: defaultdict(float))
+        for before, after in changes:
+            self._add(deltas, before, -1)
+            self._add(deltas, after, 1)
+        self._apply(deltas)
+
+    def record_entries(self, entries: Iterable[CarbonEntry]):
+        """Add newly created entries, e.g. after a ``bulk_create`` (which skips signals)."""
+        deltas = defaultdict(lambda: defaultdict(float))
+        for entry in entries:
+            self._add(deltas, self.state(entry), 1)
+        self._apply(deltas)
+
+    def rebuild(self) -> int:
+        """Recompute every bucket from the carbon entries. Returns the number of buckets."""
+        now = timezone.now()
+        rows = (
+            self._aggregate('establishment', 'establishment_id', 'month', CarbonEntry.objects.all())
+            + self._aggregate('user', 'created_by_id', 'month', CarbonEntry.objects.all())
+            + self._aggregate(
+                'user', 'created_by_id', 'hour', CarbonEntry.objects.filter(created_at__gte=now - self.HOUR_RETENTION)
+            )
+        )
+        with transaction.atomic():
+            CarbonLedger.objects.all().delete()
+            CarbonLedger.objects.bulk_create(rows, batch_size=1000)
+        logger.info(f"Rebuilt carbon ledger: {len(rows)} buckets")
+        return len(rows)
+
+    def prune(self) -> int:
+        """Delete hour buckets past ``HOUR_RETENTION``."""
+        deleted, _ = CarbonLedger.objects.filter(
+            resolution='hour', bucket_start__lt=timezone.now() - self.HOUR_RETENTION
+        ).delete()
+        return deleted
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def establishment_totals(self, establishment_id: int, now: Optional[datetime] = None) -> Dict[str, float]:
+        """
+        An establishment's all-time emissions and offsets, offsets this year, and
+        self-reported offsets this month and year. One query.
+        """
+        return self.establishment_totals_many([establishment_id], now)[establishment_id]
+
+    def establishment_totals_many(self, establishment_ids: Iterable[int],
+                                  now: Optional[datetime] = None) -> Dict[int, Dict[str, float]]:
+        """``establishment_totals`` for many establishments, keyed by id. One query."""
+        now = now or timezone.now()
+        month_start, year_start = self.month_start(now), self.year_start(now)
+        rows = CarbonLedger.objects.filter(
+            scope='establishment', scope_id__in=set(establishment_ids), resolution='month'
+        ).values('scope_id').annotate(
+            emissions=Sum('emission_total'),
+            offsets=Sum('offset_total'),
+            year_offsets=Sum('offset_total', filter=Q(bucket_start__gte=year_start)),
+            year_self_reported=Sum('self_reported_offset_total', filter=Q(bucket_start__gte=year_start)),
+            month_self_reported=Sum('self_reported_offset_total', filter=Q(bucket_start__gte=month_start)),
+        ).order_by()
+        return self._by_scope_id(
+            establishment_ids, rows, ('emissions', 'offsets', 'year_offsets', 'year_self_reported', 'month_self_reported')
+        )
+
+    def user_totals(self, user_id: int, now: Optional[datetime] = None) -> Dict[str, float]:
+        """
+        A user's self-reported offsets this month and year, and the number of offsets
+        they submitted in the last 24 hours (counted in whole hours, so up to 25). One query.
+        """
+        return self.user_totals_many([user_id], now)[user_id]
+
+    def user_totals_many(self, user_ids: Iterable[int], now: Optional[datetime] = None) -> Dict[int, Dict[str, float]]:
+        """``user_totals`` for many users, keyed by id. One query."""
+        now = now or timezone.now()
+        month_start, year_start = self.month_start(now), self.year_start(now)
+        rows = CarbonLedger.objects.filter(scope='user', scope_id__in=set(user_ids)).values('scope_id').annotate(
+            year_self_reported=Sum(
+                'self_reported_offset_total', filter=Q(resolution='month', bucket_start__gte=year_start)
+            ),
+            month_self_reported=Sum(
+                'self_reported_offset_total', filter=Q(resolution='month', bucket_start__gte=month_start)
+            ),
+            recent_offsets=Sum(
+                'offset_count', filter=Q(resolution='hour', bucket_start__gte=self.hour_start(now - self.RECENT_WINDOW))
+            ),
+        ).order_by()
+        return self._by_scope_id(user_ids, rows, ('year_self_reported', 'month_self_reported', 'recent_offsets'))
+
+    @staticmethod
+    def _by_scope_id(scope_ids: Iterable[int], rows, keys: Tuple[str, ...]) -> Dict[int, Dict[str, float]]:
+        """Aggregate rows keyed by scope id, with zeros for scopes without buckets."""
+        totals = {scope_id: dict.fromkeys(keys, 0) for scope_id in scope_ids}
+        for row in rows:
+            totals[row['scope_id']] = {key: row[key] or 0 for key in keys}
+        return totals
+
+    # ------------------------------------------------------------------
+    # Buckets
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def month_start(moment: datetime) -> datetime:
+        return moment.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def year_start(moment: datetime) -> datetime:
+        return moment.astimezone(dt_timezone.utc).replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def hour_start(moment: datetime) -> datetime:
+        return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+    def _add(self, deltas, state: Optional[Dict[str, Any]], sign: int):
+        if not state or state['created_at'] is None:
+            return
+
+        amount = state['amount'] or 0
+        is_offset = state['type'] == 'offset'
+        values = {
+            'emission_total': amount if state['type'] == 'emission' else 0,
+            'offset_total': amount if is_offset else 0,
+            'self_reported_offset_total': amount if is_offset and state['verification_level'] == 'self_reported' else 0,
+            'offset_count': 1 if is_offset else 0,
+        }
+
+        created_at = state['created_at']
+        keys: List[BucketKey] = []
+        if state['establishment_id']:
+            keys.append(('establishment', state['establishment_id'], 'month', self.month_start(created_at)))
+        if state['created_by_id']:
+            keys.append(('user', state['created_by_id'], 'month', self.month_start(created_at)))
+            if created_at >= timezone.now() - self.HOUR_RETENTION:
+                keys.append(('user', state['created_by_id'], 'hour', self.hour_start(created_at)))
+
+        for key in keys:
+            for field, value in values.items():
+                deltas[key][field] += sign * value
+
+    def _apply(self, deltas: Dict[BucketKey, Dict[str, float]]):
+        """Add ``deltas`` to their buckets with F() updates, creating missing buckets."""
+        with transaction.atomic():
+            for (scope, scope_id, resolution, bucket_start), values in deltas.items():
+                values = {field: value for field, value in values.items() if value}
+                if not values:
+                    continue
+                if 'offset_count' in values:
+                    values['offset_count'] = int(values['offset_count'])
+
+                bucket = CarbonLedger.objects.filter(
+                    scope=scope, scope_id=scope_id, resolution=resolution, bucket_start=bucket_start
+                )
+                increments = {field: F(field) + value for field, value in values.items()}
+                if bucket.update(**increments, updated_at=timezone.now()):
+                    continue
+                try:
+                    with transaction.atomic():
+                        CarbonLedger.objects.create(
+                            scope=scope, scope_id=scope_id, resolution=resolution, bucket_start=bucket_start, **values
+                        )
+                except IntegrityError:
+                    # Created concurrently by another writer
+                    bucket.update(**increments, updated_at=timezone.now())
+
+    def _aggregate(self, scope: str, field: str, resolution: str, entries) -> List[CarbonLedger]:
+        trunc = TruncMonth if resolution == 'month' else TruncHour
+        rows = (
+            entries.filter(**{f'{field}__isnull': False})
+            .values(field, bucket=trunc('created_at', tzinfo=dt_timezone.utc))
+            .annotate(
+                emission_total=Sum('amount', filter=Q(type='emission')),
+                offset_total=Sum('amount', filter=Q(type='offset')),
+                self_reported_offset_total=Sum('amount', filter=Q(type='offset', verification_level='self_reported')),
+                offset_count=Count('id', filter=Q(type='offset')),
+            )
+            .order_by()
+        )
+        return [
+            CarbonLedger(
+                scope=scope,
+                scope_id=row[field],
+                resolution=resolution,
+                bucket_start=row['bucket'],
+                **{total: row[total] or 0 for total in self.TOTAL_FIELDS},
+            )
+            for row in rows
+        ]
+
+
+carbon_ledger = CarbonLedgerService()
@@ -9,14 +9,58 @@ Version: 2.0.0
 Last Updated: 2024-12
 """
 
+import hashlib
+import json
 import logging
-from typing import Dict, Any, Optional, List
+import math
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Any, Optional, List, Mapping, Tuple
 from datetime import datetime
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
 
+def _freeze(value):
+    """Recursively wrap factor tables so a shared snapshot cannot be mutated"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    """Plain, caller-owned copy of a frozen snapshot entry"""
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+@dataclass(frozen=True)
+class EmissionFactorSnapshot:
+    """
+    Immutable view of the emission factor tables, built once per process and
+    shared across threads. ``version`` combines the registry version with a hash
+    of the factor values, so every calculation can be traced to the exact factors used.
+    The tables are class constants, so the version only changes with a deploy.
+    """
+    version: str
+    built_at: str
+    fertilizer: Mapping[str, Mapping[str, Any]]
+    fuel: Mapping[str, Mapping[str, Any]]
+    electricity: Mapping[str, Mapping[str, Any]]
+    water: Mapping[str, Mapping[str, Any]]
+    regional: Mapping[str, Mapping[str, Any]]
+    state_regions: Mapping[str, str]
+    simple: Mapping[str, float]
+
+
 class EmissionFactorsRegistry:
     """
     Centralized registry for all emission factors used in carbon calculations.
@@ -30,6 +74,47 @@ class EmissionFactorsRegistry:
     VERSION = "3.1.0"
     LAST_UPDATED = "2025-06-29"
     DATA_SOURCE = "USDA Agricultural Research Service - Corrected Research Findings with Organic Compliance"
+
+    # Annual precipitation estimates (mm) for US states
+    # In production, this would integrate with NOAA/weather APIs
+    STATE_ANNUAL_PRECIPITATION = {
+        'CA': 500,   # California - generally dry
+        'FL': 1300,  # Florida - wet subtropical
+        'TX': 750,   # Texas - variable, moderate average
+        'WA': 1200,  # Washington - wet Pacific Northwest
+        'AZ': 300,   # Arizona - very dry
+        'OR': 1100,  # Oregon - wet Pacific Northwest
+        'NV': 250,   # Nevada - very dry
+        'ID': 450,   # Idaho - semi-arid
+        'MT': 400,   # Montana - semi-arid
+        'ND': 450,   # North Dakota - semi-arid
+        'KS': 650,   # Kansas - moderate
+        'NE': 600,   # Nebraska - moderate
+        'IA': 850,   # Iowa - moderate to wet
+        'IL': 950,   # Illinois - moderate to wet
+        'IN': 1000,  # Indiana - moderate to wet
+        'OH': 1050,  # Ohio - moderate to wet
+        'NY': 1100,  # New York - moderate to wet
+        'VT': 1200,  # Vermont - wet
+        'ME': 1150,  # Maine - wet
+        'GA': 1250,  # Georgia - wet subtropical
+        'AL': 1400,  # Alabama - wet subtropical
+        'LA': 1500,  # Louisiana - very wet
+        'MS': 1350,  # Mississippi - wet
+        'TN': 1200,  # Tennessee - wet
+        'KY': 1150,  # Kentucky - moderate to wet
+        'WV': 1100,  # West Virginia - moderate to wet
+        'VA': 1000,  # Virginia - moderate
+        'NC': 1200,  # North Carolina - wet
+        'SC': 1250,  # South Carolina - wet
+    }
+
+    # Climate lookups are bucketed into lat/lng tiles of this size (degrees)
+    CLIMATE_TILE_DEGREES = 0.25
+
+    # Process-wide factor snapshot
+    _snapshot = None
+    _snapshot_lock = threading.Lock()
     
     # USDA Fertilizer Emission Factors (kg CO2e per kg nutrient)
     # Source: USDA-ARS Corrected Research Findings, 2025
@@ -420,6 +505,66 @@ class EmissionFactorsRegistry:
         }
     }
 
+    @classmethod
+    def snapshot(cls) -> EmissionFactorSnapshot:
+        """
+        Current factor snapshot, built on first use and reused for the life of
+        the process. Factors only change with a deploy, which starts new processes.
+        """
+        snapshot = cls._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        with cls._snapshot_lock:
+            if cls._snapshot is None:
+                cls._snapshot = cls._build_snapshot()
+                logger.info(f"Built emission factor snapshot {cls._snapshot.version}")
+            return cls._snapshot
+
+    @classmethod
+    def _build_snapshot(cls) -> EmissionFactorSnapshot:
+        tables = {
+            'fertilizer': cls.FERTILIZER_FACTORS,
+            'fuel': cls.FUEL_FACTORS,
+            'electricity': cls.ELECTRICITY_FACTORS,
+            'water': cls.WATER_FACTORS,
+            'regional': cls.REGIONAL_FACTORS,
+        }
+        digest = hashlib.sha256(json.dumps(tables, sort_keys=True, default=str).encode()).hexdigest()[:8]
+
+        def stamped(factors, category):
+            return {
+                name: {**data, 'category': category, 'version': cls.VERSION}
+                for name, data in factors.items()
+            }
+
+        simple = {}
+        simple.update({nutrient: data['value'] for nutrient, data in cls.FERTILIZER_FACTORS.items()})
+        simple.update({fuel: data['value'] for fuel, data in cls.FUEL_FACTORS.items()})
+        simple.update({f'electricity_{source}': data['value'] for source, data in cls.ELECTRICITY_FACTORS.items()})
+        simple.update({f'water_{use_type}': data['value'] for use_type, data in cls.WATER_FACTORS.items()})
+
+        state_regions = {
+            state: region_name
+            for region_name, region_data in cls.REGIONAL_FACTORS.items()
+            for state in region_data.get('states', [])
+        }
+
+        return EmissionFactorSnapshot(
+            version=f"{cls.VERSION}+{digest}",
+            built_at=datetime.now().isoformat(),
+            fertilizer=_freeze(stamped(cls.FERTILIZER_FACTORS, 'fertilizer')),
+            fuel=_freeze(stamped(cls.FUEL_FACTORS, 'fuel')),
+            electricity=_freeze(stamped(cls.ELECTRICITY_FACTORS, 'electricity')),
+            water=_freeze(stamped(cls.WATER_FACTORS, 'water')),
+            regional=_freeze({
+                name: {**data, 'region_name': name, 'category': 'regional_adjustment', 'version': cls.VERSION}
+                for name, data in cls.REGIONAL_FACTORS.items()
+            }),
+            state_regions=MappingProxyType(state_regions),
+            simple=MappingProxyType(simple),
+        )
+
     @classmethod
     def get_fertilizer_factor(cls, nutrient: str) -> Dict[str, Any]:
         """
@@ -434,16 +579,15 @@ class EmissionFactorsRegistry:
         Raises:
             ValueError: If nutrient type is not supported
         """
-        if nutrient not in cls.FERTILIZER_FACTORS:
+        factors = cls.snapshot().fertilizer
+        if nutrient not in factors:
             raise ValueError(f"Unsupported nutrient type: {nutrient}. "
-                           f"Supported types: {list(cls.FERTILIZER_FACTORS.keys())}")
+                           f"Supported types: {list(factors.keys())}")
         
-        factor_data = cls.FERTILIZER_FACTORS[nutrient].copy()
-        factor_data['category'] = 'fertilizer'
-        factor_data['version'] = cls.VERSION
+        factor_data = _thaw(factors[nutrient])
         factor_data['accessed_at'] = datetime.now().isoformat()
         
-        logger.info(f"Retrieved USDA fertilizer factor for {nutrient}: {factor_data['value']} {factor_data['unit']}")
+        logger.debug(f"Retrieved USDA fertilizer factor for {nutrient}: {factor_data['value']} {factor_data['unit']}")
         return factor_data
 
     @classmethod
@@ -460,16 +604,15 @@ class EmissionFactorsRegistry:
         Raises:
             ValueError: If fuel type is not supported
         """
-        if fuel_type not in cls.FUEL_FACTORS:
+        factors = cls.snapshot().fuel
+        if fuel_type not in factors:
             raise ValueError(f"Unsupported fuel type: {fuel_type}. "
-                           f"Supported types: {list(cls.FUEL_FACTORS.keys())}")
+                           f"Supported types: {list(factors.keys())}")
         
-        factor_data = cls.FUEL_FACTORS[fuel_type].copy()
-        factor_data['category'] = 'fuel'
-        factor_data['version'] = cls.VERSION
+        factor_data = _thaw(factors[fuel_type])
         factor_data['accessed_at'] = datetime.now().isoformat()
         
-        logger.info(f"Retrieved USDA fuel factor for {fuel_type}: {factor_data['value']} {factor_data['unit']}")
+        logger.debug(f"Retrieved USDA fuel factor for {fuel_type}: {factor_data['value']} {factor_data['unit']}")
         return factor_data
 
     @classmethod
@@ -486,16 +629,15 @@ class EmissionFactorsRegistry:
         Raises:
             ValueError: If electricity source is not supported
         """
-        if source not in cls.ELECTRICITY_FACTORS:
+        factors = cls.snapshot().electricity
+        if source not in factors:
             raise ValueError(f"Unsupported electricity source: {source}. "
-                           f"Supported sources: {list(cls.ELECTRICITY_FACTORS.keys())}")
+                           f"Supported sources: {list(factors.keys())}")
         
-        factor_data = cls.ELECTRICITY_FACTORS[source].copy()
-        factor_data['category'] = 'electricity'
-        factor_data['version'] = cls.VERSION
+        factor_data = _thaw(factors[source])
         factor_data['accessed_at'] = datetime.now().isoformat()
         
-        logger.info(f"Retrieved electricity factor for {source}: {factor_data['value']} {factor_data['unit']}")
+        logger.debug(f"Retrieved electricity factor for {source}: {factor_data['value']} {factor_data['unit']}")
         return factor_data
 
     @classmethod
@@ -526,16 +668,14 @@ class EmissionFactorsRegistry:
             Dict containing regional adjustment factors or default values
         """
         # Find which region the state belongs to
-        for region_name, region_data in cls.REGIONAL_FACTORS.items():
-            if state_code.upper() in region_data.get('states', []):
-                factor_data = region_data.copy()
-                factor_data['region_name'] = region_name
-                factor_data['category'] = 'regional_adjustment'
-                factor_data['version'] = cls.VERSION
-                factor_data['accessed_at'] = datetime.now().isoformat()
-                
-                logger.info(f"Retrieved regional factors for {state_code} ({region_name})")
-                return factor_data
+        snapshot = cls.snapshot()
+        region_name = snapshot.state_regions.get(state_code.upper())
+        if region_name:
+            factor_data = _thaw(snapshot.regional[region_name])
+            factor_data['accessed_at'] = datetime.now().isoformat()
+            
+            logger.debug(f"Retrieved regional factors for {state_code} ({region_name})")
+            return factor_data
         
         # Return default values if state not found
         default_factors = {
@@ -653,16 +793,15 @@ class EmissionFactorsRegistry:
         Raises:
             ValueError: If water use type is not supported
         """
-        if use_type not in cls.WATER_FACTORS:
+        factors = cls.snapshot().water
+        if use_type not in factors:
             raise ValueError(f"Unsupported water use type: {use_type}. "
-                           f"Supported types: {list(cls.WATER_FACTORS.keys())}")
+                           f"Supported types: {list(factors.keys())}")
         
-        factor_data = cls.WATER_FACTORS[use_type].copy()
-        factor_data['category'] = 'water'
-        factor_data['version'] = cls.VERSION
+        factor_data = _thaw(factors[use_type])
         factor_data['accessed_at'] = datetime.now().isoformat()
         
-        logger.info(f"Retrieved water factor for {use_type}: {factor_data['value']} {factor_data['unit']}")
+        logger.debug(f"Retrieved water factor for {use_type}: {factor_data['value']} {factor_data['unit']}")
         return factor_data
 
     @classmethod
@@ -673,26 +812,7 @@ class EmissionFactorsRegistry:
         Returns:
             Dict with factor names as keys and emission values as floats
         """
-        factors = {}
-        
-        # Add fertilizer factors
-        for nutrient, data in cls.FERTILIZER_FACTORS.items():
-            factors[nutrient] = data['value']
-        
-        # Add fuel factors
-        for fuel, data in cls.FUEL_FACTORS.items():
-            factors[fuel] = data['value']
-        
-        # Add electricity factors
-        for source, data in cls.ELECTRICITY_FACTORS.items():
-            factors[f'electricity_{source}'] = data['value']
-        
-        # Add water factors
-        for use_type, data in cls.WATER_FACTORS.items():
-            factors[f'water_{use_type}'] = data['value']
-        
-        logger.info(f"Retrieved {len(factors)} emission factors for backward compatibility")
-        return factors
+        return dict(cls.snapshot().simple)
 
     @classmethod
     def validate_factor_consistency(cls) -> Dict[str, Any]:
@@ -768,6 +888,7 @@ class EmissionFactorsRegistry:
         """
         return {
             'version': cls.VERSION,
+            'snapshot_version': cls.snapshot().version,
             'last_updated': cls.LAST_UPDATED,
             'data_source': cls.DATA_SOURCE,
             'factor_categories': ['fertilizer', 'fuel', 'electricity', 'water'],
@@ -831,6 +952,15 @@ class EmissionFactorsRegistry:
         Returns:
             Dict containing adjusted factor value, metadata, and adjustments applied
         """
+        factor_data = _thaw(_adjusted_fertilizer_factor(
+            cls.snapshot().version, nutrient, annual_precipitation, application_method
+        ))
+        factor_data['accessed_at'] = datetime.now().isoformat()
+        return factor_data
+
+    @classmethod
+    def _compute_climate_adjusted_fertilizer_factor(cls, nutrient: str, annual_precipitation: float,
+                                                    application_method: str) -> Dict[str, Any]:
         # Get base factor
         base_factor = cls.get_fertilizer_factor(nutrient)
         base_value = base_factor['value']
@@ -878,7 +1008,7 @@ class EmissionFactorsRegistry:
             }
         })
         
-        logger.info(f"Climate-adjusted {nutrient} factor: {base_value} → {final_value} "
+        logger.debug(f"Climate-adjusted {nutrient} factor: {base_value} → {final_value} "
                    f"(climate: {climate_zone}, method: {application_method})")
         
         return result
@@ -897,44 +1027,32 @@ class EmissionFactorsRegistry:
         Returns:
             float: Estimated annual precipitation in mm
         """
-        # Simplified regional precipitation estimates for US states
-        # In production, this would integrate with NOAA/weather APIs
-        regional_precipitation = {
-            'CA': 500,   # California - generally dry
-            'FL': 1300,  # Florida - wet subtropical
-            'TX': 750,   # Texas - variable, moderate average
-            'WA': 1200,  # Washington - wet Pacific Northwest
-            'AZ': 300,   # Arizona - very dry
-            'OR': 1100,  # Oregon - wet Pacific Northwest
-            'NV': 250,   # Nevada - very dry
-            'ID': 450,   # Idaho - semi-arid
-            'MT': 400,   # Montana - semi-arid
-            'ND': 450,   # North Dakota - semi-arid
-            'KS': 650,   # Kansas - moderate
-            'NE': 600,   # Nebraska - moderate
-            'IA': 850,   # Iowa - moderate to wet
-            'IL': 950,   # Illinois - moderate to wet
-            'IN': 1000,  # Indiana - moderate to wet
-            'OH': 1050,  # Ohio - moderate to wet
-            'NY': 1100,  # New York - moderate to wet
-            'VT': 1200,  # Vermont - wet
-            'ME': 1150,  # Maine - wet
-            'GA': 1250,  # Georgia - wet subtropical
-            'AL': 1400,  # Alabama - wet subtropical
-            'LA': 1500,  # Louisiana - very wet
-            'MS': 1350,  # Mississippi - wet
-            'TN': 1200,  # Tennessee - wet
-            'KY': 1150,  # Kentucky - moderate to wet
-            'WV': 1100,  # West Virginia - moderate to wet
-            'VA': 1000,  # Virginia - moderate
-            'NC': 1200,  # North Carolina - wet
-            'SC': 1250,  # South Carolina - wet
-        }
-        
-        if state and state.upper() in regional_precipitation:
-            precipitation = regional_precipitation[state.upper()]
-            logger.info(f"Using regional precipitation estimate for {state}: {precipitation}mm")
-            return precipitation
+        return cls.get_climate_profile(latitude, longitude, state)[0]
+
+    @classmethod
+    def climate_tile(cls, latitude: float, longitude: float) -> Tuple[int, int]:
+        """
+        Grid tile containing a location. Tiles are indexed by their upper edge so
+        latitude bands on tile boundaries resolve exactly as for the raw coordinates.
+        """
+        return (
+            math.ceil(float(latitude) / cls.CLIMATE_TILE_DEGREES),
+            math.ceil(float(longitude) / cls.CLIMATE_TILE_DEGREES),
+        )
+
+    @classmethod
+    def get_climate_profile(cls, latitude: float, longitude: float, state: str = None) -> Tuple[float, str]:
+        """
+        ``(annual_precipitation_mm, climate_zone)`` for a location, resolved once per
+        grid tile and state and then served from an in-process LRU cache.
+        """
+        tile_lat, tile_lng = cls.climate_tile(latitude, longitude)
+        return _tile_climate_profile(tile_lat, tile_lng, state.upper() if state else None)
+
+    @classmethod
+    def _estimate_precipitation(cls, latitude: float, state: Optional[str]) -> float:
+        if state and state in cls.STATE_ANNUAL_PRECIPITATION:
+            return cls.STATE_ANNUAL_PRECIPITATION[state]
         
         # Latitude-based fallback estimation
         if latitude > 45:  # Northern states
@@ -1124,6 +1242,22 @@ class EmissionFactorsRegistry:
         logger.info(f"Emission factor usage: {audit_entry}")
 
 
+@lru_cache(maxsize=16384)
+def _tile_climate_profile(tile_lat: int, tile_lng: int, state: Optional[str]) -> Tuple[float, str]:
+    latitude = tile_lat * EmissionFactorsRegistry.CLIMATE_TILE_DEGREES
+    precipitation = EmissionFactorsRegistry._estimate_precipitation(latitude, state)
+    return precipitation, EmissionFactorsRegistry.determine_climate_zone(precipitation)
+
+
+@lru_cache(maxsize=1024)
+def _adjusted_fertilizer_factor(factors_version: str, nutrient: str, annual_precipitation: float,
+                                application_method: str):
+    # Keyed by snapshot version so a changed factor table never serves old factors
+    return _freeze(EmissionFactorsRegistry._compute_climate_adjusted_fertilizer_factor(
+        nutrient, annual_precipitation, application_method
+    ))
+
+
 # Convenience instance for easy importing
 emission_factors = EmissionFactorsRegistry()
 
@@ -1,6 +1,9 @@
+from contextlib import contextmanager
 from decimal import Decimal
+from functools import lru_cache
+from django.db import transaction
 from django.utils import timezone
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterable, Tuple
 from ..models import CarbonEntry, CarbonSource, USDAComplianceRecord, RegionalEmissionFactor, USDACalculationAudit
 from .enhanced_usda_factors import EnhancedUSDAFactors, USDAValidationResult
 from .emission_factors import emission_factors
@@ -10,6 +13,13 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=4096)
+def _numbers_in(text: str) -> tuple:
+    """Numeric tokens in a free-text field (volumes, areas, NPK strings repeat a lot)"""
+    import re
+    return tuple(float(number) for number in re.findall(r'\d+(?:\.\d+)?', text))
+
+
 class EventCarbonCalculator:
     """
     Service for calculating carbon impact from agricultural events.
@@ -20,11 +30,12 @@ class EventCarbonCalculator:
     # USDA Emission Factors (kg CO2e per unit) - Now sourced from centralized registry
     @property
     def USDA_FERTILIZER_FACTORS(self):
-        """Get USDA fertilizer factors from centralized registry (legacy compatibility)"""
+        """USDA fertilizer factors from this calculator's factor snapshot (legacy compatibility)"""
+        factors = self.factors.simple
         return {
-            'nitrogen': emission_factors.get_fertilizer_factor('nitrogen')['value'],
-            'phosphorus': emission_factors.get_fertilizer_factor('phosphorus')['value'],
-            'potassium': emission_factors.get_fertilizer_factor('potassium')['value'],
+            'nitrogen': factors['nitrogen'],
+            'phosphorus': factors['phosphorus'],
+            'potassium': factors['potassium'],
         }
     
     def _get_climate_aware_fertilizer_factors(self, event, application_method: str = 'broadcast') -> Dict[str, float]:
@@ -37,16 +48,19 @@ class EventCarbonCalculator:
             latitude, longitude, state = self._get_farm_coordinates(event)
             
             # Get enhanced factors with climate and application method adjustments
-            enhanced_factors = emission_factors.get_enhanced_fertilizer_factors(
-                nutrients=['nitrogen', 'phosphorus', 'potassium'],
-                latitude=latitude,
-                longitude=longitude,
-                state=state,
-                application_methods={
-                    'nitrogen': application_method,
-                    'phosphorus': application_method,
-                    'potassium': application_method
-                }
+            enhanced_factors = self._shared_lookup(
+                ('climate_factors', latitude, longitude, state, application_method),
+                lambda: emission_factors.get_enhanced_fertilizer_factors(
+                    nutrients=['nitrogen', 'phosphorus', 'potassium'],
+                    latitude=latitude,
+                    longitude=longitude,
+                    state=state,
+                    application_methods={
+                        'nitrogen': application_method,
+                        'phosphorus': application_method,
+                        'potassium': application_method
+                    }
+                )
             )
             
             # Extract values for calculation
@@ -80,11 +94,12 @@ class EventCarbonCalculator:
 
     @property
     def FUEL_EMISSION_FACTORS(self):
-        """Get fuel emission factors from centralized registry"""
+        """Fuel emission factors from this calculator's factor snapshot"""
+        factors = self.factors.simple
         return {
-            'diesel': emission_factors.get_fuel_factor('diesel')['value'],
-            'gasoline': emission_factors.get_fuel_factor('gasoline')['value'],
-            'natural_gas': emission_factors.get_fuel_factor('natural_gas')['value'],
+            'diesel': factors['diesel'],
+            'gasoline': factors['gasoline'],
+            'natural_gas': factors['natural_gas'],
         }
 
     APPLICATION_EFFICIENCY = {
@@ -159,18 +174,80 @@ class EventCarbonCalculator:
         'default': 0.75
     }
 
+    # Calculation method per history event model (general events are handled by the pipeline)
+    EVENT_MODEL_METHODS = {
+        'ChemicalEvent': 'calculate_chemical_event_impact',
+        'ProductionEvent': 'calculate_production_event_impact',
+        'WeatherEvent': 'calculate_weather_event_impact',
+        'EquipmentEvent': 'calculate_equipment_event_impact',
+        'SoilManagementEvent': 'calculate_soil_management_event_impact',
+        'PestManagementEvent': 'calculate_pest_management_event_impact',
+    }
+
+    # Entry fields a recalculation of its event refreshes
+    RECALCULATED_ENTRY_FIELDS = (
+        'type', 'source', 'amount', 'co2e_amount', 'year', 'description',
+        'usda_factors_based', 'verification_status', 'data_source',
+    )
+
     def __init__(self):
         self.current_year = timezone.now().year
         self.enhanced_usda = EnhancedUSDAFactors()
+        self._lookup_memo = None
+
+        # Every calculation made by this instance uses (and is stamped with) one factor snapshot
+        self.factors = emission_factors.snapshot()
         
         # Log initialization with centralized factors
-        logger.info(f"EventCarbonCalculator initialized with standardized USDA factors v{emission_factors.VERSION}")
+        logger.info(f"EventCarbonCalculator initialized with standardized USDA factors v{self.factors.version}")
         logger.info(f"Nitrogen factor: {self.USDA_FERTILIZER_FACTORS['nitrogen']} kg CO2e per kg N (USDA-verified)")
 
+    @contextmanager
+    def shared_lookups(self):
+        """
+        Resolve location-dependent factors (climate-adjusted fertilizer factors,
+        regional USDA factors and metadata) once per location for every event
+        calculated inside the block.
+        """
+        if self._lookup_memo is not None:
+            # Already sharing further up the stack
+            yield
+            return
+
+        self._lookup_memo = {}
+        try:
+            yield
+        finally:
+            self._lookup_memo = None
+
+    def _shared_lookup(self, key: tuple, compute):
+        if self._lookup_memo is None:
+            return compute()
+        if key not in self._lookup_memo:
+            self._lookup_memo[key] = compute()
+        return self._lookup_memo[key]
+
+    def calculate_with_shared_lookups(self, events: Iterable[Any]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Calculate carbon impact for many events, sharing location lookups.
+
+        Each event still goes through its per-event calculation method one at
+        a time; only the location-dependent factor lookups are memoized across
+        the batch (see ``shared_lookups``), so an establishment's factors are
+        resolved once rather than once per event. Returns results in input
+        order; ``None`` for event types without a calculator (e.g. GeneralEvent).
+        """
+        results: List[Optional[Dict[str, Any]]] = []
+        with self.shared_lookups():
+            for event in events:
+                method_name = self.EVENT_MODEL_METHODS.get(type(event).__name__)
+                results.append(getattr(self, method_name)(event) if method_name else None)
+        return results
+
     def _get_usda_emission_factors(self) -> Dict[str, float]:
         """Get base USDA emission factors for compatibility"""
         # Use centralized factors to ensure consistency
-        factors = emission_factors.get_all_factors_simple()
+        factors = self.factors.simple
         return {
             'nitrogen': factors['nitrogen'],
             'phosphorus': factors['phosphorus'],
@@ -228,19 +305,25 @@ class EventCarbonCalculator:
     def _get_real_time_usda_factors(self, crop_type: str, state: str) -> Dict[str, float]:
         """NEW METHOD: Get real-time USDA emission factors"""
         try:
-            # Try to get real-time factors first
-            real_time_factors = self.enhanced_usda.get_real_time_emission_factors(crop_type, state)
-            if real_time_factors:
-                logger.info(f"Using real-time USDA factors for {crop_type} in {state}")
-                return real_time_factors
-            
-            # Fallback to regional factors
-            return self.enhanced_usda.get_regional_factors(crop_type, state)
+            return self._shared_lookup(
+                ('regional_factors', crop_type, state),
+                lambda: self._fetch_usda_factors(crop_type, state)
+            )
             
         except Exception as e:
             logger.error(f"Error getting real-time USDA factors: {e}")
             return self._get_usda_emission_factors()
 
+    def _fetch_usda_factors(self, crop_type: str, state: str) -> Dict[str, float]:
+        # Try to get real-time factors first
+        real_time_factors = self.enhanced_usda.get_real_time_emission_factors(crop_type, state)
+        if real_time_factors:
+            logger.info(f"Using real-time USDA factors for {crop_type} in {state}")
+            return real_time_factors
+        
+        # Fallback to regional factors
+        return self.enhanced_usda.get_regional_factors(crop_type, state)
+
     def _calculate_confidence_score(self, event, calculation_data: Dict) -> float:
         """NEW METHOD: Calculate confidence score for carbon calculation"""
         try:
@@ -277,6 +360,18 @@ class EventCarbonCalculator:
     def _create_usda_compliance_record(self, carbon_entry: CarbonEntry, event, 
                                      calculation_data: Dict, confidence_score: float) -> None:
         """NEW METHOD: Create USDA compliance record"""
+        record = self._build_usda_compliance_record(carbon_entry, event, calculation_data)
+        if record is None:
+            return
+        try:
+            record.save()
+            logger.info(f"Created USDA compliance record for carbon entry {carbon_entry.id}")
+        except Exception as e:
+            logger.error(f"Error creating USDA compliance record: {e}")
+
+    def _build_usda_compliance_record(self, carbon_entry: CarbonEntry, event,
+                                      calculation_data: Dict) -> Optional[USDAComplianceRecord]:
+        """Unsaved USDA compliance record for a carbon entry, or None if validation fails"""
         try:
             state, county = self._get_establishment_location(event)
             
@@ -317,8 +412,7 @@ class EventCarbonCalculator:
                 'method': calculation_data.get('method', 'standard')
             })
             
-            # Create compliance record
-            USDAComplianceRecord.objects.create(
+            record = USDAComplianceRecord(
                 carbon_entry=carbon_entry,
                 establishment=getattr(event, 'history', None) and getattr(event.history, 'parcel', None) and getattr(event.history.parcel, 'establishment', None),
                 production=getattr(event, 'history', None),
@@ -333,15 +427,33 @@ class EventCarbonCalculator:
                 regional_factors_used=state in self.enhanced_usda.regional_adjustments,
                 validated_by=getattr(event, 'created_by', None)
             )
-            
-            logger.info(f"Created USDA compliance record for carbon entry {carbon_entry.id}")
+            # Set by save(), which bulk_create skips
+            if record.confidence_score >= 0.9:
+                record.confidence_level = 'high'
+            elif record.confidence_score >= 0.7:
+                record.confidence_level = 'medium'
+            else:
+                record.confidence_level = 'low'
+            return record
             
         except Exception as e:
             logger.error(f"Error creating USDA compliance record: {e}")
+            return None
 
     def _create_calculation_audit(self, event, carbon_entry: CarbonEntry, 
                                 calculation_data: Dict, calculation_time_ms: int) -> None:
         """NEW METHOD: Create calculation audit record"""
+        audit = self._build_calculation_audit(event, carbon_entry, calculation_data, calculation_time_ms)
+        if audit is None:
+            return
+        try:
+            audit.save()
+        except Exception as e:
+            logger.error(f"Error creating calculation audit: {e}")
+
+    def _build_calculation_audit(self, event, carbon_entry: CarbonEntry,
+                                 calculation_data: Dict, calculation_time_ms: int) -> Optional[USDACalculationAudit]:
+        """Unsaved calculation audit record for a carbon entry"""
         try:
             event_type_mapping = {
                 'ChemicalEvent': 'chemical_event',
@@ -356,7 +468,7 @@ class EventCarbonCalculator:
             event_type = event_type_mapping.get(event.__class__.__name__, 'business_event')
             state, county = self._get_establishment_location(event)
             
-            USDACalculationAudit.objects.create(
+            return USDACalculationAudit(
                 event_type=event_type,
                 event_id=event.id,
                 carbon_entry=carbon_entry,
@@ -376,6 +488,7 @@ class EventCarbonCalculator:
             
         except Exception as e:
             logger.error(f"Error creating calculation audit: {e}")
+            return None
 
     def _add_enhanced_usda_metadata(self, result: Dict[str, Any], event, crop_name: str = "default") -> Dict[str, Any]:
         """Add enhanced USDA metadata to calculation results"""
@@ -385,11 +498,15 @@ class EventCarbonCalculator:
             state, county = self._get_establishment_location(event)
             
             # Get enhanced metadata
-            metadata = self.enhanced_usda.get_enhanced_calculation_metadata(crop_name, state)
+            metadata = self._shared_lookup(
+                ('usda_metadata', crop_name, state),
+                lambda: self.enhanced_usda.get_enhanced_calculation_metadata(crop_name, state)
+            )
             
             # Calculate confidence score
             confidence_score = self._calculate_confidence_score(event, result)
             result['confidence_score'] = confidence_score
+            result['factors_version'] = self.factors.version
             
             # Add to result
             result.update({
@@ -442,7 +559,8 @@ class EventCarbonCalculator:
                 'verification_status': 'factors_verified',
                 'data_source': 'USDA Agricultural Research Service',
                 'confidence_level': 'medium',
-                'confidence_score': 0.5
+                'confidence_score': 0.5,
+                'factors_version': self.factors.version
             })
             return result
 
@@ -981,28 +1099,9 @@ class EventCarbonCalculator:
         try:
             from ..models import CarbonEntry
             
-            # Get or create carbon source
-            carbon_source = self._get_or_create_carbon_source(event)
-            
-            # Get establishment_id through the parcel relationship
-            establishment_id = None
-            if hasattr(event, 'history') and event.history:
-                if hasattr(event.history, 'parcel') and event.history.parcel:
-                    establishment_id = event.history.parcel.establishment.id
-            
             # Create carbon entry
             carbon_entry = CarbonEntry.objects.create(
-                establishment_id=establishment_id,
-                production_id=getattr(event.history, 'id', None) if hasattr(event, 'history') else None,
-                type='emission' if calculation_result.get('co2e', 0) > 0 else 'sequestration',
-                source=carbon_source,
-                amount=abs(calculation_result.get('co2e', 0)),
-                year=event.date.year if hasattr(event, 'date') else timezone.now().year,
-                description=f"Auto-calculated from {event.type} event: {calculation_result.get('calculation_method', 'unknown')}",
-                usda_factors_based=calculation_result.get('usda_factors_based', False),
-                verification_status=calculation_result.get('verification_status', 'estimated'),
-                data_source=calculation_result.get('data_source', 'Unknown'),
-                created_by=getattr(event, 'created_by', None) if hasattr(event, 'created_by') else None
+                **self._carbon_entry_fields(event, calculation_result, self._get_or_create_carbon_source(event))
             )
             
             # Create USDA compliance record
@@ -1028,6 +1127,112 @@ class EventCarbonCalculator:
             logger.error(f"Error creating carbon entry from event: {e}")
             return None
 
+    def create_carbon_entries_from_events(self, calculated: List[Tuple[Any, Dict[str, Any]]]) -> List['CarbonEntry']:
+        """
+        Bulk counterpart of ``create_carbon_entry_from_event`` for ``(event, result)``
+        pairs: the entries, their USDA compliance records and calculation audits are
+        written with one ``bulk_create`` each. Like any bulk write this skips
+        CarbonEntry signals, so callers update the ledger and snapshots.
+        """
+        if not calculated:
+            return []
+
+        sources = {}
+        entries = []
+        compliance_records = []
+        audits = []
+        for event, result in calculated:
+            source_key = getattr(event, 'type', None)
+            if source_key not in sources:
+                sources[source_key] = self._get_or_create_carbon_source(event)
+
+            entry = CarbonEntry(**self._carbon_entry_fields(event, result, sources[source_key]))
+            # Set by CarbonEntry.save(), which bulk_create skips
+            entry.effective_amount = entry.amount if entry.type == 'emission' else None
+
+            record = self._build_usda_compliance_record(entry, event, result)
+            if record is not None:
+                entry.usda_verified = record.is_usda_verified
+                compliance_records.append(record)
+            audit = self._build_calculation_audit(event, entry, result, result.get('calculation_time_ms', 0))
+            if audit is not None:
+                audits.append(audit)
+            entries.append(entry)
+
+        with transaction.atomic():
+            CarbonEntry.objects.bulk_create(entries)
+            # Related rows pick up the entry ids assigned above
+            USDAComplianceRecord.objects.bulk_create(compliance_records)
+            USDACalculationAudit.objects.bulk_create(audits)
+
+        logger.info(f"Created {len(entries)} carbon entries with USDA compliance tracking")
+        return entries
+
+    def update_carbon_entries_from_events(self, updates: List[Tuple['CarbonEntry', Any, Dict[str, Any]]]) -> List['CarbonEntry']:
+        """
+        Refresh ``(entry, event, result)`` entries from a recalculation with one
+        ``bulk_update``, and audit the new calculation. Skips CarbonEntry signals
+        like ``create_carbon_entries_from_events``.
+        """
+        if not updates:
+            return []
+
+        now = timezone.now()
+        sources = {}
+        entries = []
+        audits = []
+        for entry, event, result in updates:
+            source_key = getattr(event, 'type', None)
+            if source_key not in sources:
+                sources[source_key] = self._get_or_create_carbon_source(event)
+
+            fields = self._carbon_entry_fields(event, result, sources[source_key])
+            for field in self.RECALCULATED_ENTRY_FIELDS:
+                setattr(entry, field, fields[field])
+            # Set by CarbonEntry.save(), which bulk_update skips
+            if entry.type == 'emission':
+                entry.effective_amount = entry.amount
+            entry.updated_at = now
+
+            audit = self._build_calculation_audit(event, entry, result, result.get('calculation_time_ms', 0))
+            if audit is not None:
+                audits.append(audit)
+            entries.append(entry)
+
+        with transaction.atomic():
+            CarbonEntry.objects.bulk_update(
+                entries, [*self.RECALCULATED_ENTRY_FIELDS, 'effective_amount', 'updated_at']
+            )
+            USDACalculationAudit.objects.bulk_create(audits)
+
+        logger.info(f"Updated {len(entries)} carbon entries from recalculated events")
+        return entries
+
+    def _carbon_entry_fields(self, event, calculation_result: Dict[str, Any], carbon_source) -> Dict[str, Any]:
+        """CarbonEntry field values for an event and its carbon calculation result"""
+        # Get establishment_id through the parcel relationship
+        establishment_id = None
+        if hasattr(event, 'history') and event.history:
+            if hasattr(event.history, 'parcel') and event.history.parcel:
+                establishment_id = event.history.parcel.establishment.id
+
+        return {
+            'establishment_id': establishment_id,
+            'production_id': getattr(event.history, 'id', None) if hasattr(event, 'history') else None,
+            'type': 'emission' if calculation_result.get('co2e', 0) > 0 else 'sequestration',
+            'source': carbon_source,
+            'amount': abs(calculation_result.get('co2e', 0)),
+            'co2e_amount': abs(calculation_result.get('co2e', 0)),
+            'year': event.date.year if hasattr(event, 'date') else timezone.now().year,
+            'description': f"Auto-calculated from {event.type} event: {calculation_result.get('calculation_method', 'unknown')}",
+            'event_model': event.__class__.__name__,
+            'event_id': event.id,
+            'usda_factors_based': calculation_result.get('usda_factors_based', False),
+            'verification_status': calculation_result.get('verification_status', 'estimated'),
+            'data_source': calculation_result.get('data_source', 'Unknown'),
+            'created_by': getattr(event, 'created_by', None) if hasattr(event, 'created_by') else None,
+        }
+
     # Helper methods
     def _parse_npk_content(self, concentration_str: str) -> Dict[str, float]:
         """Parse NPK values from concentration string like '10-10-10' or '20-5-10'"""
@@ -1043,8 +1248,7 @@ class EventCarbonCalculator:
                     }
             
             # Try to extract percentage from text
-            import re
-            numbers = re.findall(r'\d+(?:\.\d+)?', concentration_str)
+            numbers = _numbers_in(concentration_str)
             if len(numbers) >= 3:
                 return {
                     'N': float(numbers[0]),
@@ -1061,14 +1265,12 @@ class EventCarbonCalculator:
     def _extract_numeric_value(self, text: str, default: float = 0.0) -> float:
         """Extract first numeric value from text with intelligent fallbacks for 'Unknown' values"""
         try:
-            import re
-            
             # Handle "Unknown" values with intelligent defaults
             if text.lower() in ['unknown', 'n/a', 'na', '', 'none', 'null']:
                 return default
             
-            numbers = re.findall(r'\d+(?:\.\d+)?', text)
-            return float(numbers[0]) if numbers else default
+            numbers = _numbers_in(text)
+            return numbers[0] if numbers else default
         except:
             return default
 
@@ -0,0 +1,296 @@
+"""
+Deferred, batched carbon calculation for history events.
+
+Saving an event used to run the full EventCarbonCalculator (USDA lookups,
+compliance record and audit writes, plus an extra ``extra_data`` update) inside
+the request. Event saves now only queue a reference; a Celery worker calculates
+many events per batch with one shared calculator, writes the batch's new carbon
+entries (with their compliance and audit records) in bulk and upserts the
+results into the event carbon result store (carbon/services/event_carbon_results.py).
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.apps import apps
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+class EventCarbonPipeline:
+    """
+    Queues event carbon calculations and processes them in batches.
+    """
+
+    # Max events handed to a single worker task
+    BATCH_SIZE = 200
+
+    # General events only produce an entry when they mention carbon-heavy activity
+    GENERAL_IMPACT_KEYWORDS = ['fuel', 'energy', 'transport', 'machinery', 'equipment']
+
+    def __init__(self):
+        self._local = threading.local()
+
+    # ------------------------------------------------------------------
+    # Producer side (called from history/signals.py)
+    # ------------------------------------------------------------------
+
+    def queue(self, event):
+        """
+        Queue a carbon calculation for an event once the current transaction commits.
+        Inside ``batch()`` the reference is held and dispatched with the rest.
+        """
+        ref = [type(event).__name__, event.id]
+
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            pending.append(ref)
+            return
+
+        transaction.on_commit(lambda: self._dispatch_edited([ref]))
+
+    @contextmanager
+    def batch(self):
+        """
+        Collect every event queued inside the block and dispatch them together,
+        e.g. when a production is created from a template with dozens of events.
+        """
+        if getattr(self._local, 'pending', None) is not None:
+            # Already batching further up the stack
+            yield
+            return
+
+        self._local.pending = []
+        try:
+            yield
+            refs = self._local.pending
+        finally:
+            self._local.pending = None
+
+        if refs:
+            transaction.on_commit(lambda: self._dispatch_edited(refs))
+
+    def dispatch(self, refs: List[List[Any]], inline: bool = True):
+        """
+        Hand references to Celery in chunks. If the broker is unavailable they are
+        calculated inline, or with ``inline=False`` (read paths) logged and skipped.
+        """
+        from ..tasks import calculate_event_carbon_batch
+
+        for start in range(0, len(refs), self.BATCH_SIZE):
+            chunk = refs[start:start + self.BATCH_SIZE]
+            try:
+                calculate_event_carbon_batch.apply_async(args=[chunk], queue='carbon')
+            except Exception as e:
+                if not inline:
+                    logger.warning(f"Could not enqueue event carbon batch ({len(chunk)} events), skipping: {e}")
+                    continue
+                logger.warning(f"Could not enqueue event carbon batch ({len(chunk)} events), calculating inline: {e}")
+                self.process_batch(chunk)
+
+    def _dispatch_edited(self, refs: List[List[Any]]):
+        """Dispatch saved events, marking them queued so reads don't queue them again."""
+        from .event_carbon_results import event_carbon_results
+
+        self.dispatch(event_carbon_results.claim_pending(refs, force=True))
+
+    # ------------------------------------------------------------------
+    # Consumer side (called from carbon.tasks.calculate_event_carbon_batch)
+    # ------------------------------------------------------------------
+
+    def process_batch(self, refs: List[List[Any]]) -> Dict[str, int]:
+        """
+        Calculate carbon impact for a batch of ``[model_name, event_id]`` references.
+        """
+        from .event_carbon_calculator import EventCarbonCalculator
+
+        stats = {'processed': 0, 'entries_created': 0, 'entries_updated': 0, 'entries_deleted': 0, 'failed': 0, 'missing': 0}
+
+        ids_by_model = defaultdict(set)
+        for model_name, event_id in refs:
+            ids_by_model[model_name].add(event_id)
+
+        # One calculator for the whole batch; location and factor lookups are
+        # resolved once per establishment across every event type
+        calculator = EventCarbonCalculator()
+
+        with calculator.shared_lookups():
+            for model_name, event_ids in ids_by_model.items():
+                try:
+                    model = apps.get_model('history', model_name)
+                except LookupError:
+                    logger.error(f"Unknown event model {model_name} in carbon batch")
+                    stats['failed'] += len(event_ids)
+                    continue
+
+                events = list(
+                    model.objects.filter(id__in=event_ids).select_related(
+                        'history__parcel__establishment',
+                        'history__product',
+                        'history__crop_type',
+                    )
+                )
+                stats['missing'] += len(event_ids) - len(events)
+
+                try:
+                    raw_results = calculator.calculate_with_shared_lookups(events)
+                except Exception as e:
+                    stats['failed'] += len(events)
+                    logger.error(f"Error calculating carbon for {len(events)} {model_name} events: {e}")
+                    continue
+
+                applied = []
+                for event, raw_result in zip(events, raw_results):
+                    try:
+                        applied.append((event, *self._apply_rules(model_name, event, raw_result)))
+                    except Exception as e:
+                        stats['failed'] += 1
+                        logger.error(f"Error calculating carbon for {model_name} {event.id}: {e}")
+
+                if applied:
+                    self._store(model_name, model, calculator, applied, stats)
+
+        logger.info(
+            f"Event carbon batch done: {stats['processed']} processed, "
+            f"{stats['entries_created']} entries created, {stats['entries_updated']} updated, "
+            f"{stats['entries_deleted']} deleted, {stats['failed']} failed"
+        )
+        return stats
+
+    def _store(self, model_name: str, model, calculator, applied: List[Tuple[Any, Dict[str, Any], bool]],
+               stats: Dict[str, int]):
+        """
+        Write the carbon entries and stored results of one event type's
+        ``(event, result, create_entry)`` triples.
+
+        The events' rows are locked first, so runs that calculated the same event
+        concurrently (two quick edits, or an edit racing a stale read) take turns:
+        the later one sees the stored result the earlier one wrote and leaves the
+        entry alone instead of creating a second one.
+        """
+        from .event_carbon_results import event_carbon_results
+
+        with transaction.atomic():
+            locked_ids = set(
+                model.objects.select_for_update()
+                .filter(id__in=[event.id for event, _, _ in applied])
+                .order_by('id')
+                .values_list('id', flat=True)
+            )
+            # Deleted while being calculated
+            stats['missing'] += len(applied) - len(locked_ids)
+            applied = [item for item in applied if item[0].id in locked_ids]
+
+            # Entries are created on first calculation and refreshed whenever the
+            # event's inputs or the emission factors change
+            stored_inputs = event_carbon_results.stored_inputs(model_name, locked_ids)
+            linked_entries = event_carbon_results.latest_entries([event for event, _, _ in applied])
+
+            calculated = []
+            new_entries = []
+            updated_entries = []
+            obsolete_entries = []
+            for event, result, create_entry in applied:
+                if stored_inputs.get(event.id) != event_carbon_results.inputs_of(event, result):
+                    entry = linked_entries.get((model_name, event.id))
+                    if entry is None:
+                        if create_entry:
+                            new_entries.append((event, result))
+                    elif create_entry:
+                        updated_entries.append((entry, event, result))
+                    else:
+                        # The edited event no longer has a carbon impact
+                        obsolete_entries.append(entry)
+                calculated.append((event, result))
+            stats['processed'] += len(calculated)
+
+            try:
+                entry_stats = self._write_entries(calculator, new_entries, updated_entries, obsolete_entries)
+            except Exception as e:
+                logger.error(f"Error writing carbon entries for {model_name} events: {e}")
+                # Leave them without a fresh stored result so they are calculated again
+                failed_ids = (
+                    {event.id for event, _ in new_entries}
+                    | {event.id for _, event, _ in updated_entries}
+                    | {entry.event_id for entry in obsolete_entries}
+                )
+                calculated = [(event, result) for event, result in calculated if event.id not in failed_ids]
+                stats['processed'] -= len(failed_ids)
+                stats['failed'] += len(failed_ids)
+            else:
+                for key, value in entry_stats.items():
+                    stats[key] += value
+
+            # One upsert per event type; the event rows themselves are not touched
+            event_carbon_results.save_many(calculated)
+
+    def _write_entries(self, calculator, new_entries, updated_entries, obsolete_entries) -> Dict[str, int]:
+        """
+        Create, refresh and delete the carbon entries of a batch's events. Bulk writes
+        skip CarbonEntry signals, so the ledger and snapshots are updated here, once.
+        """
+        from ..models import CarbonEntry
+        from .carbon_ledger import carbon_ledger
+        from .production_snapshot import production_snapshot_service
+
+        with transaction.atomic():
+            created = calculator.create_carbon_entries_from_events(new_entries)
+            before = [carbon_ledger.state(entry) for entry, _, _ in updated_entries]
+            updated = calculator.update_carbon_entries_from_events(updated_entries)
+
+            carbon_ledger.record_entries(created)
+            carbon_ledger.record_changes(zip(before, [carbon_ledger.state(entry) for entry in updated]))
+
+            # A plain delete, so its signals update the ledger and snapshots
+            if obsolete_entries:
+                CarbonEntry.objects.filter(id__in=[entry.id for entry in obsolete_entries]).delete()
+
+        if created or updated:
+            production_snapshot_service.invalidate_for_entries([*created, *updated])
+
+        return {
+            'entries_created': len(created),
+            'entries_updated': len(updated),
+            'entries_deleted': len(obsolete_entries),
+        }
+
+    def _apply_rules(self, model_name: str, event, result: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Return ``(calculation_result, create_carbon_entry)`` for an event given the
+        calculator's raw result (``None`` for general events).
+        """
+        if model_name == 'GeneralEvent':
+            return self._general_event_result(event)
+
+        co2e = result.get('co2e', 0)
+
+        if model_name in ('ChemicalEvent', 'ProductionEvent', 'WeatherEvent'):
+            return result, co2e > 0
+        if model_name == 'PestManagementEvent':
+            # Only create carbon entries for significant impacts
+            return result, abs(co2e) > 0.05
+        return result, True
+
+    def _general_event_result(self, event) -> Tuple[Dict[str, Any], bool]:
+        # General events have minimal standard carbon impact
+        result = {
+            'co2e': 0.1,
+            'efficiency_score': 50.0,
+            'usda_factors_based': False,
+            'verification_status': 'estimated',
+            'calculation_method': 'general_event_standard',
+            'data_source': 'Industry Standards',
+            'recommendations': [],
+            'event_type': 'general',
+            'timestamp': event.date.isoformat() if event.date else None
+        }
+
+        combined_text = f"{event.name or ''} {event.observation or ''}".lower()
+        return result, any(keyword in combined_text for keyword in self.GENERAL_IMPACT_KEYWORDS)
+
+
+event_carbon_pipeline = EventCarbonPipeline()
@@ -0,0 +1,262 @@
+"""
+Persistent per-event carbon calculation results.
+
+Every calculated event gets an ``EventCarbonResult`` row keyed by event model and
+id, stamped with a hash of the event fields the calculation read and with the
+emission-factor version it used. Serializers read these rows (one query per page
+of events) instead of recalculating inline; rows that are missing or out of date
+are recalculated in the background through the event carbon pipeline.
+"""
+
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import CarbonEntry, EventCarbonResult
+from .emission_factors import EmissionFactorsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class EventCarbonResultStore:
+    """
+    Reads and writes ``EventCarbonResult`` rows, and looks up the carbon entries
+    linked to events.
+    """
+
+    # Event fields that do not feed the carbon calculation
+    EXCLUDED_INPUT_FIELDS = {'id', 'extra_data', 'album', 'created_by'}
+
+    # Avoid re-queueing the same stale event on every read while a worker is on it
+    REQUEUE_DEBOUNCE_SECONDS = 300
+
+    # References per dispatch when sweeping rows computed with older factors
+    SWEEP_BATCH_SIZE = 1000
+
+    @staticmethod
+    def factors_version() -> str:
+        return EmissionFactorsRegistry.snapshot().version
+
+    @staticmethod
+    def event_key(event) -> Tuple[str, int]:
+        return type(event).__name__, event.id
+
+    def input_hash(self, event) -> str:
+        """Hash of the event fields the calculators read."""
+        inputs = {
+            field.attname: getattr(event, field.attname)
+            for field in event._meta.concrete_fields
+            if field.name not in self.EXCLUDED_INPUT_FIELDS
+        }
+        payload = json.dumps(inputs, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get_many(self, events: Iterable[Any]) -> Dict[Tuple[str, int], Dict[str, Any]]:
+        """
+        Stored results for ``events`` keyed by ``(model_name, event_id)``, from one query.
+
+        Events without a result, or whose inputs or factor version changed since it was
+        calculated, are queued for background recalculation. Out-of-date results are
+        still returned, flagged with ``'stale': True``.
+        """
+        events = [event for event in events if event is not None and event.id]
+        query = self._events_query(events)
+        if query is None:
+            return {}
+
+        rows = {
+            (row.event_model, row.event_id): row
+            for row in EventCarbonResult.objects.filter(query)
+        }
+
+        version = self.factors_version()
+        results = {}
+        outdated = []
+        for event in events:
+            key = self.event_key(event)
+            row = rows.get(key)
+            if row is None:
+                outdated.append(event)
+                continue
+
+            if row.factors_version != version or row.input_hash != self.input_hash(event):
+                outdated.append(event)
+                results[key] = {**row.result, 'stale': True}
+            else:
+                results[key] = row.result
+
+        if outdated:
+            self.schedule_recalculation(outdated)
+
+        return results
+
+    def get(self, event) -> Optional[Dict[str, Any]]:
+        return self.get_many([event]).get(self.event_key(event))
+
+    def latest_entries(self, events: Iterable[Any]) -> Dict[Tuple[str, int], CarbonEntry]:
+        """
+        Most recent ``CarbonEntry`` created from each of ``events``, keyed by
+        ``(model_name, event_id)``, from one query on the entry's event link.
+        """
+        query = self._events_query(events)
+        if query is None:
+            return {}
+
+        entries = {}
+        for entry in CarbonEntry.objects.filter(query).order_by('event_model', 'event_id', '-created_at'):
+            entries.setdefault((entry.event_model, entry.event_id), entry)
+        return entries
+
+    def stored_inputs(self, model_name: str, event_ids: Iterable[int]) -> Dict[int, Tuple[str, str]]:
+        """``(input_hash, factors_version)`` of the stored result of each ``model_name`` event."""
+        return {
+            event_id: (input_hash, factors_version)
+            for event_id, input_hash, factors_version in EventCarbonResult.objects.filter(
+                event_model=model_name, event_id__in=event_ids
+            ).values_list('event_id', 'input_hash', 'factors_version')
+        }
+
+    def inputs_of(self, event, result: Dict[str, Any]) -> Tuple[str, str]:
+        """``(input_hash, factors_version)`` a result calculated now for ``event`` is stored with."""
+        return self.input_hash(event), result.get('factors_version') or self.factors_version()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def save_many(self, calculated: List[Tuple[Any, Dict[str, Any]]]):
+        """Upsert ``(event, result)`` pairs in one statement."""
+        if not calculated:
+            return
+
+        now = timezone.now()
+        rows = []
+        for event, result in calculated:
+            input_hash, factors_version = self.inputs_of(event, result)
+            rows.append(EventCarbonResult(
+                event_model=type(event).__name__,
+                event_id=event.id,
+                production_id=event.history_id,
+                input_hash=input_hash,
+                factors_version=factors_version,
+                result=result,
+                calculated_at=now,
+            ))
+        EventCarbonResult.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['event_model', 'event_id'],
+            update_fields=['production', 'input_hash', 'factors_version', 'result', 'calculated_at'],
+        )
+
+        for event, _ in calculated:
+            cache.delete(self._pending_key(*self.event_key(event)))
+
+    def delete_for(self, event):
+        model_name, event_id = self.event_key(event)
+        EventCarbonResult.objects.filter(event_model=model_name, event_id=event_id).delete()
+
+    # ------------------------------------------------------------------
+    # Background recalculation
+    # ------------------------------------------------------------------
+
+    def schedule_recalculation(self, events: Iterable[Any]):
+        """
+        Queue events for the batched carbon worker, skipping ones already queued.
+        Called from reads, so it never calculates inline: if the broker is down the
+        events are left for a later read or the next edit.
+        """
+        from .event_carbon_pipeline import event_carbon_pipeline
+
+        refs = self.claim_pending([list(self.event_key(event)) for event in events])
+        if refs:
+            try:
+                event_carbon_pipeline.dispatch(refs, inline=False)
+            except Exception as e:
+                logger.warning(f"Could not queue carbon recalculation for {len(refs)} events: {e}")
+
+    def claim_pending(self, refs: List[List[Any]], force: bool = False) -> List[List[Any]]:
+        """
+        Mark ``[model_name, event_id]`` references as queued and return the ones to
+        dispatch: those not queued already, or all of them with ``force`` (an edited
+        event must be recalculated even while an older version of it is queued).
+        """
+        claimed = []
+        for model_name, event_id in refs:
+            key = self._pending_key(model_name, event_id)
+            try:
+                if force:
+                    cache.set(key, True, self.REQUEUE_DEBOUNCE_SECONDS)
+                    added = True
+                else:
+                    added = cache.add(key, True, self.REQUEUE_DEBOUNCE_SECONDS)
+            except Exception as e:
+                logger.warning(f"Could not mark {model_name} {event_id} as queued for carbon recalculation: {e}")
+                added = None
+            # False: already queued. None: the cache is down (errors are swallowed
+            # into None), so dispatch rather than leave the result missing or stale.
+            if added is not False:
+                claimed.append([model_name, event_id])
+        return claimed
+
+    def recalculate_outdated(self) -> int:
+        """
+        Queue every stored result computed with an older emission-factor version.
+        Run after emission factors change (see carbon.tasks.recalculate_outdated_event_carbon).
+        """
+        from .event_carbon_pipeline import event_carbon_pipeline
+
+        outdated = (
+            EventCarbonResult.objects.exclude(factors_version=self.factors_version())
+            .values_list('event_model', 'event_id')
+            .order_by('id')
+        )
+
+        queued = 0
+        refs = []
+        for model_name, event_id in outdated.iterator(chunk_size=self.SWEEP_BATCH_SIZE):
+            refs.append([model_name, event_id])
+            if len(refs) >= self.SWEEP_BATCH_SIZE:
+                event_carbon_pipeline.dispatch(refs)
+                queued += len(refs)
+                refs = []
+
+        if refs:
+            event_carbon_pipeline.dispatch(refs)
+            queued += len(refs)
+
+        logger.info(f"Queued {queued} event carbon results for recalculation (factors {self.factors_version()})")
+        return queued
+
+    def _events_query(self, events: Iterable[Any]) -> Optional[Q]:
+        """``Q`` matching rows whose ``event_model``/``event_id`` pair is one of ``events``."""
+        ids_by_model = defaultdict(set)
+        for event in events:
+            if event is not None and event.id:
+                model_name, event_id = self.event_key(event)
+                ids_by_model[model_name].add(event_id)
+
+        if not ids_by_model:
+            return None
+
+        query = Q()
+        for model_name, event_ids in ids_by_model.items():
+            query |= Q(event_model=model_name, event_id__in=event_ids)
+        return query
+
+    @staticmethod
+    def _pending_key(model_name: str, event_id: int) -> str:
+        return f"event_carbon_pending_{model_name}_{event_id}"
+
+
+event_carbon_results = EventCarbonResultStore()
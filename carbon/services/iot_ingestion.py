@@ -0,0 +1,219 @@
+"""
+Chunked ingestion of pending IoT data points.
+
+Pending readings are processed per device in keyset-paginated chunks: each chunk
+is loaded with its rows locked, scored in memory, and its carbon entries are
+written with one ``bulk_create`` and the data points with one ``bulk_update``,
+all in a single transaction. The 15-minute coordinator task fans devices out
+across Celery workers; overlapping runs for one device skip each other's rows.
+"""
+
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import CarbonEntry, IoTDataPoint
+from .carbon_ledger import carbon_ledger
+
+logger = logging.getLogger(__name__)
+
+
+class IoTIngestionPipeline:
+    """
+    Turns pending ``IoTDataPoint`` rows into processed points and carbon entries.
+    """
+
+    # Data points loaded, scored and written per transaction
+    CHUNK_SIZE = 1000
+
+    # Only recent readings are processed automatically
+    PENDING_WINDOW = timedelta(hours=24)
+
+    # Confidence thresholds (see carbon.tasks.calculate_data_point_confidence)
+    AUTO_APPROVE_CONFIDENCE = 0.9
+    MANUAL_REVIEW_CONFIDENCE = 0.7
+
+    def pending_queryset(self, since=None):
+        since = since or timezone.now() - self.PENDING_WINDOW
+        return IoTDataPoint.objects.filter(processed=False, timestamp__gte=since)
+
+    def pending_device_ids(self, since=None) -> List[int]:
+        """Devices with pending readings, from one DISTINCT query."""
+        return list(
+            self.pending_queryset(since)
+            .order_by()
+            .values_list('device_id', flat=True)
+            .distinct()
+        )
+
+    def dispatch(self, since=None) -> Dict[str, Any]:
+        """Fan pending devices out to ``process_iot_device_data`` workers."""
+        from ..tasks import process_iot_device_data
+
+        since = since or timezone.now() - self.PENDING_WINDOW
+        device_ids = self.pending_device_ids(since)
+
+        inline_stats = self._empty_stats()
+        for device_id in device_ids:
+            try:
+                process_iot_device_data.apply_async(args=[device_id, since.isoformat()], queue='carbon')
+            except Exception as e:
+                logger.warning(f"Could not enqueue IoT processing for device {device_id}, processing inline: {e}")
+                self._merge(inline_stats, self.process_device(device_id, since))
+
+        return {'devices': len(device_ids), **inline_stats}
+
+    def process_device(self, device_id: int, since=None) -> Dict[str, Any]:
+        """
+        Process every pending reading of one device, ``CHUNK_SIZE`` rows at a time.
+        Medium-confidence readings stay unprocessed for manual review; the id
+        cursor moves past them so they are not reloaded.
+
+        Each chunk is locked while it is processed. A second run for the same
+        device (a re-dispatched task, or the next coordinator tick) skips the
+        locked rows instead of creating their carbon entries again.
+        """
+        queryset = (
+            self.pending_queryset(since)
+            .filter(device_id=device_id)
+            .select_related('device__establishment')
+            .select_for_update(skip_locked=True, of=('self',))
+            .order_by('id')
+        )
+
+        stats = self._empty_stats()
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                chunk = list(queryset.filter(id__gt=last_id)[:self.CHUNK_SIZE])
+                if not chunk:
+                    break
+                chunk_stats = self.process_chunk(chunk)
+
+            self._merge(stats, chunk_stats)
+            last_id = chunk[-1].id
+
+            if len(chunk) < self.CHUNK_SIZE:
+                break
+
+        logger.info(
+            f"IoT device {device_id}: {stats['processed_count']} points in {stats['chunks']} chunks, "
+            f"{stats['auto_approved_count']} entries, {stats['manual_approval_count']} pending review "
+            f"({stats['rows_per_second']:.0f} rows/s)"
+        )
+        return stats
+
+    def process_chunk(self, data_points: List[IoTDataPoint]) -> Dict[str, Any]:
+        """Score a chunk in memory and persist it with bulk writes in one transaction."""
+        from ..tasks import calculate_data_point_confidence, should_create_carbon_entry
+
+        started = time.monotonic()
+        stats = self._empty_stats()
+
+        updated = []
+        entry_points = []
+        entries = []
+        for data_point in data_points:
+            try:
+                confidence = calculate_data_point_confidence(data_point)
+
+                if confidence > self.AUTO_APPROVE_CONFIDENCE:
+                    # High confidence - auto-approve and create carbon entry if applicable
+                    if should_create_carbon_entry(data_point):
+                        entry = self.build_carbon_entry(data_point)
+                        if entry:
+                            entries.append(entry)
+                            entry_points.append(data_point)
+                    data_point.processed = True
+                    updated.append(data_point)
+
+                elif confidence > self.MANUAL_REVIEW_CONFIDENCE:
+                    # Medium confidence - stays unprocessed for manual review
+                    stats['manual_approval_count'] += 1
+
+                else:
+                    # Low confidence - mark as processed but flag for review
+                    data_point.processed = True
+                    data_point.anomaly_detected = True
+                    updated.append(data_point)
+
+                stats['processed_count'] += 1
+
+            except Exception as e:
+                logger.error(f"Error processing data point {data_point.id}: {e}")
+
+        with transaction.atomic():
+            if entries:
+                CarbonEntry.objects.bulk_create(entries, batch_size=self.CHUNK_SIZE)
+                carbon_ledger.record_entries(entries)
+                for data_point, entry in zip(entry_points, entries):
+                    data_point.carbon_entry = entry
+                stats['auto_approved_count'] = len(entries)
+
+            if updated:
+                IoTDataPoint.objects.bulk_update(
+                    updated, ['processed', 'anomaly_detected', 'carbon_entry'], batch_size=self.CHUNK_SIZE
+                )
+
+        if entries:
+            # bulk_create skips post_save, so invalidate affected carbon snapshots once per chunk
+            from .production_snapshot import production_snapshot_service
+            production_snapshot_service.invalidate_for_entries(entries)
+
+        elapsed = time.monotonic() - started
+        stats['chunks'] = 1
+        stats['elapsed_seconds'] = elapsed
+        stats['rows_per_second'] = len(data_points) / elapsed if elapsed > 0 else 0.0
+        logger.debug(f"IoT chunk: {len(data_points)} points, {len(entries)} entries in {elapsed * 1000:.0f} ms")
+        return stats
+
+    def build_carbon_entry(self, data_point: IoTDataPoint) -> Optional[CarbonEntry]:
+        """Unsaved carbon entry for a fuel consumption reading, mirroring create_carbon_entry_from_data_point."""
+        fuel_data = (data_point.data or {}).get('fuel_consumption')
+        if not fuel_data:
+            return None
+
+        fuel_amount = fuel_data.get('fuel_used', 0)
+        if not fuel_amount or fuel_amount <= 0:
+            return None
+
+        # Calculate CO2e emissions (diesel: ~2.7 kg CO2e per liter)
+        co2e_amount = fuel_amount * 2.7
+        return CarbonEntry(
+            establishment=data_point.device.establishment,
+            type='emission',
+            amount=co2e_amount,
+            co2e_amount=co2e_amount,
+            # bulk_create bypasses CarbonEntry.save(), which sets this for emissions
+            effective_amount=co2e_amount,
+            year=timezone.now().year,
+            description=f"Automated fuel consumption entry from {data_point.device.name}",
+            iot_device_id=data_point.device.device_id,
+            timestamp=data_point.timestamp
+        )
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {
+            'processed_count': 0,
+            'auto_approved_count': 0,
+            'manual_approval_count': 0,
+            'chunks': 0,
+            'elapsed_seconds': 0.0,
+            'rows_per_second': 0.0,
+        }
+
+    @staticmethod
+    def _merge(total: Dict[str, Any], chunk: Dict[str, Any]):
+        for key in ('processed_count', 'auto_approved_count', 'manual_approval_count', 'chunks', 'elapsed_seconds'):
+            total[key] += chunk.get(key, 0)
+        total['rows_per_second'] = (
+            total['processed_count'] / total['elapsed_seconds'] if total['elapsed_seconds'] > 0 else 0.0
+        )
+
+
+iot_ingestion_pipeline = IoTIngestionPipeline()
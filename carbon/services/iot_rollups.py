@@ -0,0 +1,292 @@
+"""
+Minute/hour/day rollups of IoT readings.
+
+Raw ``IoTDataPoint`` rows keep each reading as a JSON document, which is expensive
+to scan for dashboards and rules. Every numeric value in a reading is folded into
+``IoTReadingRollup`` rows (count, sum, min, max, last value) per device and bucket:
+minute and hour buckets are rebuilt from the raw readings of each hour that
+received new data, and day buckets from the hour buckets. Rollups are retained
+longer than raw readings, so history survives ``cleanup_old_iot_data``.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from ..models import IoTDataPoint, IoTReadingRollup
+
+logger = logging.getLogger(__name__)
+
+
+class _Accumulator:
+    __slots__ = ('count', 'total', 'minimum', 'maximum', 'last_value', 'last_timestamp')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.last_value = None
+        self.last_timestamp = None
+
+    def add(self, value: float, timestamp: datetime):
+        self.merge(1, value, value, value, value, timestamp)
+
+    def merge(self, count, total, minimum, maximum, last_value, last_timestamp):
+        self.count += count
+        self.total += total
+        if minimum is not None and (self.minimum is None or minimum < self.minimum):
+            self.minimum = minimum
+        if maximum is not None and (self.maximum is None or maximum > self.maximum):
+            self.maximum = maximum
+        if last_timestamp is not None and (self.last_timestamp is None or last_timestamp >= self.last_timestamp):
+            self.last_value = last_value
+            self.last_timestamp = last_timestamp
+
+
+class IoTRollupService:
+    """
+    Builds and queries ``IoTReadingRollup`` rows.
+    """
+
+    # Metric counting the data points themselves
+    READINGS_METRIC = 'readings'
+
+    RESOLUTIONS = ('minute', 'hour', 'day')
+
+    # How long each resolution is kept; day rollups are kept indefinitely
+    RETENTION = {
+        'minute': timedelta(days=7),
+        'hour': timedelta(days=400),
+    }
+
+    # Raw readings fetched per query while rebuilding
+    CHUNK_SIZE = 2000
+
+    # Nested reading keys deeper than this are ignored
+    MAX_METRIC_DEPTH = 3
+
+    # Readings this recent may not be rolled up yet; counts read them raw
+    ROLLUP_LAG = timedelta(minutes=15)
+
+    @staticmethod
+    def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+        timestamp = timestamp.astimezone(dt_timezone.utc)
+        if resolution == 'minute':
+            return timestamp.replace(second=0, microsecond=0)
+        if resolution == 'hour':
+            return timestamp.replace(minute=0, second=0, microsecond=0)
+        if resolution == 'day':
+            return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+        raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+    def numeric_metrics(self, data: Any, prefix: str = '', depth: int = 0) -> Dict[str, float]:
+        """Numeric values of a reading keyed by dotted path, e.g. ``fuel_consumption.fuel_used``."""
+        metrics = {}
+        if not isinstance(data, dict) or depth >= self.MAX_METRIC_DEPTH:
+            return metrics
+
+        for key, value in data.items():
+            path = f"{prefix}{key}"
+            if isinstance(value, bool):
+                continue
+            if isinstance(value, (int, float)):
+                metrics[path[:100]] = float(value)
+            elif isinstance(value, dict):
+                metrics.update(self.numeric_metrics(value, f"{path}.", depth + 1))
+        return metrics
+
+    # ------------------------------------------------------------------
+    # Building rollups
+    # ------------------------------------------------------------------
+
+    def refresh(self, since: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Rebuild rollups for every device hour that received readings since ``since``
+        (by arrival time, so late readings with old timestamps are picked up too).
+        """
+        since = since or timezone.now() - self.ROLLUP_LAG
+
+        touched = set()
+        for device_id, timestamp in (
+            IoTDataPoint.objects.filter(created_at__gte=since)
+            .order_by()
+            .values_list('device_id', 'timestamp')
+            .iterator(chunk_size=self.CHUNK_SIZE)
+        ):
+            touched.add((device_id, self.bucket_start(timestamp, 'hour')))
+
+        return self.rebuild_hours(touched)
+
+    def rebuild_hours(self, device_hours: Iterable[Tuple[int, datetime]]) -> Dict[str, int]:
+        """Rebuild minute and hour rollups of the given ``(device_id, hour_start)`` pairs, then their days."""
+        hours_by_device = defaultdict(set)
+        for device_id, hour_start in device_hours:
+            hours_by_device[device_id].add(hour_start)
+
+        stats = {'devices': len(hours_by_device), 'hours': 0, 'rows': 0}
+        for device_id, hours in hours_by_device.items():
+            try:
+                stats['rows'] += self._rebuild_device(device_id, hours)
+                stats['hours'] += len(hours)
+            except Exception as e:
+                logger.error(f"Error rolling up IoT readings for device {device_id}: {e}")
+
+        logger.info(f"IoT rollups refreshed: {stats['hours']} hours across {stats['devices']} devices")
+        return stats
+
+    def _rebuild_device(self, device_id: int, hours: Set[datetime]) -> int:
+        buckets = defaultdict(_Accumulator)
+
+        readings = (
+            IoTDataPoint.objects.filter(
+                device_id=device_id,
+                timestamp__gte=min(hours),
+                timestamp__lt=max(hours) + timedelta(hours=1),
+            )
+            .order_by()
+            .values_list('timestamp', 'data')
+        )
+        for timestamp, data in readings.iterator(chunk_size=self.CHUNK_SIZE):
+            hour_start = self.bucket_start(timestamp, 'hour')
+            if hour_start not in hours:
+                continue
+
+            minute_start = self.bucket_start(timestamp, 'minute')
+            metrics = self.numeric_metrics(data)
+            metrics[self.READINGS_METRIC] = 1.0
+            for metric, value in metrics.items():
+                buckets[('minute', minute_start, metric)].add(value, timestamp)
+                buckets[('hour', hour_start, metric)].add(value, timestamp)
+
+        written = self._upsert(device_id, buckets)
+
+        days = {self.bucket_start(hour_start, 'day') for hour_start in hours}
+        written += self._upsert(device_id, self._day_buckets(device_id, days))
+        return written
+
+    def _day_buckets(self, device_id: int, days: Set[datetime]) -> Dict[Tuple[str, datetime, str], _Accumulator]:
+        buckets = defaultdict(_Accumulator)
+        hour_rows = IoTReadingRollup.objects.filter(
+            device_id=device_id,
+            resolution='hour',
+            bucket_start__gte=min(days),
+            bucket_start__lt=max(days) + timedelta(days=1),
+        ).values_list('bucket_start', 'metric', 'count', 'total', 'minimum', 'maximum', 'last_value', 'last_timestamp')
+
+        for bucket_start, metric, *values in hour_rows:
+            day_start = self.bucket_start(bucket_start, 'day')
+            if day_start in days:
+                buckets[('day', day_start, metric)].merge(*values)
+        return buckets
+
+    def _upsert(self, device_id: int, buckets: Dict[Tuple[str, datetime, str], _Accumulator]) -> int:
+        if not buckets:
+            return 0
+
+        rows = [
+            IoTReadingRollup(
+                device_id=device_id,
+                resolution=resolution,
+                bucket_start=bucket_start,
+                metric=metric,
+                count=acc.count,
+                total=acc.total,
+                minimum=acc.minimum,
+                maximum=acc.maximum,
+                last_value=acc.last_value,
+                last_timestamp=acc.last_timestamp,
+            )
+            for (resolution, bucket_start, metric), acc in buckets.items()
+        ]
+        IoTReadingRollup.objects.bulk_create(
+            rows,
+            batch_size=self.CHUNK_SIZE,
+            update_conflicts=True,
+            unique_fields=['device', 'resolution', 'bucket_start', 'metric'],
+            update_fields=['count', 'total', 'minimum', 'maximum', 'last_value', 'last_timestamp', 'updated_at'],
+        )
+        return len(rows)
+
+    def prune(self) -> Dict[str, int]:
+        """Delete rollups past their resolution's retention."""
+        now = timezone.now()
+        deleted = {}
+        for resolution, retention in self.RETENTION.items():
+            deleted[resolution], _ = IoTReadingRollup.objects.filter(
+                resolution=resolution, bucket_start__lt=now - retention
+            ).delete()
+        return deleted
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def series(self, device_id: int, metric: str, resolution: str = 'hour',
+               since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Rollup buckets for one device metric, oldest first."""
+        if resolution not in self.RESOLUTIONS:
+            raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+        rows = IoTReadingRollup.objects.filter(device_id=device_id, resolution=resolution, metric=metric)
+        if since:
+            rows = rows.filter(bucket_start__gte=self.bucket_start(since, resolution))
+        if until:
+            rows = rows.filter(bucket_start__lt=until)
+
+        return [
+            {
+                'bucket_start': row.bucket_start.isoformat(),
+                'count': row.count,
+                'total': row.total,
+                'average': row.average,
+                'minimum': row.minimum,
+                'maximum': row.maximum,
+                'last_value': row.last_value,
+            }
+            for row in rows.order_by('bucket_start')
+        ]
+
+    def reading_counts(self, device_ids: Iterable[int], since: datetime) -> Dict[int, int]:
+        """
+        Number of readings per device since ``since``, from hour rollups plus a raw
+        count of the last, possibly not yet rolled up, hours. Two queries in total.
+        """
+        device_ids = list(device_ids)
+        if not device_ids:
+            return {}
+
+        raw_since = max(self.bucket_start(timezone.now() - self.ROLLUP_LAG, 'hour'), since)
+        counts = defaultdict(int)
+
+        rolled_up = (
+            IoTReadingRollup.objects.filter(
+                device_id__in=device_ids,
+                resolution='hour',
+                metric=self.READINGS_METRIC,
+                bucket_start__gte=self.bucket_start(since, 'hour'),
+                bucket_start__lt=raw_since,
+            )
+            .values('device_id')
+            .annotate(readings=Sum('count'))
+        )
+        for row in rolled_up:
+            counts[row['device_id']] += row['readings']
+
+        recent = (
+            IoTDataPoint.objects.filter(device_id__in=device_ids, timestamp__gte=raw_since)
+            .order_by()
+            .values('device_id')
+            .annotate(readings=Count('id'))
+        )
+        for row in recent:
+            counts[row['device_id']] += row['readings']
+
+        return dict(counts)
+
+
+iot_rollups = IoTRollupService()
@@ -0,0 +1,383 @@
+"""
+Batched ingestion of IoT webhook readings.
+
+The single-reading webhooks cost several round-trips per reading (source
+lookup, entry, audit log). The batch endpoints take a JSON array of readings
+(or an object with a ``readings`` array) or NDJSON, validate the whole batch up
+front with one establishment and one device query, and write it with
+``bulk_create`` in a single transaction: readings from registered devices are
+stored as processed ``IoTDataPoint`` rows, fuel readings become carbon entries,
+and every entry or weather reading gets its audit log. Carbon sources are
+resolved from a process-wide cache.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from company.models import Establishment
+from ..models import CarbonAuditLog, CarbonEntry, CarbonSource, IoTDataPoint, IoTDevice
+from .carbon_ledger import carbon_ledger
+
+logger = logging.getLogger(__name__)
+
+# Diesel: 2.7 kg CO2e per liter
+DIESEL_KG_CO2E_PER_LITER = 2.7
+
+
+def weather_recommendations(temperature: float, humidity: float, wind_speed: float) -> List[Dict[str, Any]]:
+    """Weather alerts and suggested actions for one station reading."""
+    recommendations = []
+
+    # High temperature alert (>35°C)
+    if temperature > 35:
+        recommendations.append({
+            'type': 'weather_alert',
+            'priority': 'high',
+            'message': f'High temperature alert: {temperature}°C - Consider crop protection measures',
+            'suggested_actions': [
+                'Increase irrigation frequency',
+                'Apply shade cloth if available',
+                'Monitor plant stress indicators'
+            ]
+        })
+
+    # High wind alert (>25 km/h)
+    if wind_speed > 25:
+        recommendations.append({
+            'type': 'weather_alert',
+            'priority': 'medium',
+            'message': f'High wind alert: {wind_speed} km/h - Avoid chemical applications',
+            'suggested_actions': [
+                'Postpone spraying operations',
+                'Secure loose equipment',
+                'Check irrigation systems for damage'
+            ]
+        })
+
+    # Low humidity alert (<30%)
+    if humidity < 30:
+        recommendations.append({
+            'type': 'weather_alert',
+            'priority': 'medium',
+            'message': f'Low humidity alert: {humidity}% - Increase irrigation',
+            'suggested_actions': [
+                'Increase irrigation duration',
+                'Monitor soil moisture levels',
+                'Consider misting systems'
+            ]
+        })
+
+    return recommendations
+
+
+class IoTWebhookIngestor:
+    """
+    Validates and writes batches of fuel sensor and weather station readings.
+    """
+
+    # Readings accepted per request
+    MAX_READINGS = 5000
+
+    # Rows per INSERT statement
+    BATCH_SIZE = 1000
+
+    # Cached carbon sources are reloaded after this long
+    SOURCE_CACHE_SECONDS = 60 * 60
+
+    FUEL_FIELDS = ('device_id', 'establishment_id', 'fuel_liters', 'timestamp', 'equipment_type')
+    WEATHER_FIELDS = ('station_id', 'establishment_id', 'temperature', 'humidity', 'wind_speed', 'timestamp')
+
+    def __init__(self):
+        self._sources: Dict[str, Tuple[CarbonSource, float]] = {}
+        self._sources_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Parsing and validation
+    # ------------------------------------------------------------------
+
+    def readings_from(self, data: Any) -> List[Any]:
+        """The readings of a request body: a list, ``{"readings": [...]}`` or a single reading."""
+        if isinstance(data, dict):
+            data = data['readings'] if 'readings' in data else [data]
+        if not isinstance(data, list):
+            raise ValueError('Expected a list of readings')
+        if len(data) > self.MAX_READINGS:
+            raise ValueError(f'At most {self.MAX_READINGS} readings are accepted per request')
+        return data
+
+    def validate(self, readings: List[Any], required: Iterable[str], numeric: Iterable[str]):
+        """
+        Check required fields, numbers and timestamps of every reading, and that their
+        establishments exist (one query). Returns the valid readings as
+        ``(index, reading, values, timestamp)`` and the errors as ``{'index', 'error'}``.
+        """
+        valid, errors = [], []
+        for index, reading in enumerate(readings):
+            if not isinstance(reading, dict):
+                errors.append({'index': index, 'error': 'Reading must be an object'})
+                continue
+
+            missing = [field for field in required if field not in reading]
+            if missing:
+                errors.append({'index': index, 'error': f'Missing required field: {missing[0]}'})
+                continue
+
+            try:
+                values = {field: float(reading[field]) for field in numeric}
+                values['establishment_id'] = int(reading['establishment_id'])
+            except (TypeError, ValueError) as e:
+                errors.append({'index': index, 'error': f'Invalid data format: {e}'})
+                continue
+
+            timestamp = self._parse_timestamp(reading['timestamp'])
+            if timestamp is None:
+                errors.append({'index': index, 'error': f"Invalid timestamp: {reading['timestamp']}"})
+                continue
+
+            valid.append((index, reading, values, timestamp))
+
+        establishment_ids = {values['establishment_id'] for _, _, values, _ in valid}
+        existing = set(Establishment.objects.filter(id__in=establishment_ids).values_list('id', flat=True))
+        accepted = []
+        for item in valid:
+            if item[2]['establishment_id'] in existing:
+                accepted.append(item)
+            else:
+                errors.append({'index': item[0], 'error': 'Establishment not found'})
+
+        errors.sort(key=lambda error: error['index'])
+        return accepted, errors
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    def ingest_fuel(self, data: Any, user=None) -> Dict[str, Any]:
+        """Ingest John Deere fuel readings. Raises ``ValueError`` for a malformed body."""
+        valid, errors = self.validate(self.readings_from(data), self.FUEL_FIELDS, ('fuel_liters',))
+
+        readings = []
+        for item in valid:
+            if item[2]['fuel_liters'] < 0:
+                errors.append({'index': item[0], 'error': 'fuel_liters must not be negative'})
+            else:
+                readings.append(item)
+        errors.sort(key=lambda error: error['index'])
+
+        sources = self.fuel_sources({
+            str(reading['equipment_type']): str(reading['device_id']) for _, reading, _, _ in readings
+        })
+        devices = self._devices({str(reading['device_id']) for _, reading, _, _ in readings})
+
+        entries, points, logs = [], [], []
+        for _, reading, values, timestamp in readings:
+            device_id = str(reading['device_id'])
+            fuel_liters = values['fuel_liters']
+            co2e_emissions = fuel_liters * DIESEL_KG_CO2E_PER_LITER
+            entry = CarbonEntry(
+                establishment_id=values['establishment_id'],
+                type='emission',
+                source=sources[str(reading['equipment_type'])],
+                amount=co2e_emissions,
+                co2e_amount=co2e_emissions,
+                # bulk_create bypasses CarbonEntry.save(), which sets this for emissions
+                effective_amount=co2e_emissions,
+                year=timestamp.year,
+                timestamp=timestamp,
+                description=f'Auto-logged from IoT device {device_id}: {fuel_liters}L fuel consumed',
+                iot_device_id=device_id,
+                created_by=user,
+            )
+            entries.append(entry)
+            logs.append(CarbonAuditLog(
+                carbon_entry=entry,
+                user=user,
+                action='iot_create',
+                details=f'IoT device {device_id} auto-created fuel consumption event: {fuel_liters}L = {co2e_emissions:.2f} kg CO2e'
+            ))
+
+            device = devices.get(device_id)
+            if device and device.establishment_id == values['establishment_id']:
+                points.append(IoTDataPoint(
+                    device=device,
+                    timestamp=timestamp,
+                    data={
+                        'fuel_consumption': {'fuel_used': fuel_liters},
+                        'equipment_type': reading['equipment_type'],
+                    },
+                    # The carbon entry is written here, so the pending pipeline must skip it
+                    processed=True,
+                    carbon_entry=entry,
+                ))
+
+        with transaction.atomic():
+            # Data points and audit logs pick up the entries' new ids when they are saved
+            CarbonEntry.objects.bulk_create(entries, batch_size=self.BATCH_SIZE)
+            carbon_ledger.record_entries(entries)
+            IoTDataPoint.objects.bulk_create(points, batch_size=self.BATCH_SIZE)
+            CarbonAuditLog.objects.bulk_create(logs, batch_size=self.BATCH_SIZE)
+            self._touch_devices(points)
+
+        if entries:
+            # bulk_create skips post_save, so invalidate affected carbon snapshots once per batch
+            from .production_snapshot import production_snapshot_service
+            production_snapshot_service.invalidate_for_entries(entries)
+
+        return {
+            'accepted': len(entries),
+            'rejected': errors,
+            'data_points': len(points),
+            'carbon_entry_ids': [entry.id for entry in entries],
+            'co2e_calculated': sum(entry.amount for entry in entries),
+        }
+
+    def ingest_weather(self, data: Any, user=None) -> Dict[str, Any]:
+        """Ingest weather station readings. Raises ``ValueError`` for a malformed body."""
+        valid, errors = self.validate(
+            self.readings_from(data), self.WEATHER_FIELDS, ('temperature', 'humidity', 'wind_speed')
+        )
+        devices = self._devices({str(reading['station_id']) for _, reading, _, _ in valid})
+
+        results, points, logs = [], [], []
+        for index, reading, values, timestamp in valid:
+            station_id = str(reading['station_id'])
+            temperature, humidity, wind_speed = values['temperature'], values['humidity'], values['wind_speed']
+            results.append({
+                'index': index,
+                'station_id': station_id,
+                'recommendations': weather_recommendations(temperature, humidity, wind_speed),
+            })
+            logs.append(CarbonAuditLog(
+                user=user,
+                action='weather_processed',
+                details=f'Weather station {station_id} data processed: {temperature}°C, {humidity}% humidity, {wind_speed} km/h wind'
+            ))
+
+            device = devices.get(station_id)
+            if device and device.establishment_id == values['establishment_id']:
+                points.append(IoTDataPoint(
+                    device=device,
+                    timestamp=timestamp,
+                    data={'temperature': temperature, 'humidity': humidity, 'wind_speed': wind_speed, 'station_id': station_id},
+                    # Weather readings only drive recommendations, which are returned here
+                    processed=True,
+                ))
+
+        with transaction.atomic():
+            IoTDataPoint.objects.bulk_create(points, batch_size=self.BATCH_SIZE)
+            CarbonAuditLog.objects.bulk_create(logs, batch_size=self.BATCH_SIZE)
+            self._touch_devices(points)
+
+        return {
+            'accepted': len(results),
+            'rejected': errors,
+            'data_points': len(points),
+            'results': results,
+        }
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def fuel_source(self, equipment_type: str, device_id: str) -> CarbonSource:
+        return self.fuel_sources({equipment_type: device_id})[equipment_type]
+
+    def fuel_sources(self, equipment_types: Dict[str, str]) -> Dict[str, CarbonSource]:
+        """
+        The fuel consumption ``CarbonSource`` per equipment type, created on first use.
+        ``equipment_types`` maps each type to a device id for the source's description.
+        """
+        now = time.monotonic()
+        found, missing = {}, {}
+        with self._sources_lock:
+            for equipment_type, device_id in equipment_types.items():
+                name = self._source_name(equipment_type)
+                cached = self._sources.get(name)
+                if cached and now - cached[1] < self.SOURCE_CACHE_SECONDS:
+                    found[equipment_type] = cached[0]
+                else:
+                    missing[equipment_type] = device_id
+        if not missing:
+            return found
+
+        loaded = {
+            source.name: source
+            for source in CarbonSource.objects.filter(name__in=[self._source_name(t) for t in missing])
+        }
+        for equipment_type, device_id in missing.items():
+            name = self._source_name(equipment_type)
+            source = loaded.get(name)
+            if source is None:
+                source, _ = CarbonSource.objects.get_or_create(
+                    name=name,
+                    defaults={
+                        'category': 'fuel',
+                        'default_emission_factor': DIESEL_KG_CO2E_PER_LITER,
+                        'unit': 'kg CO2e/L',
+                        'description': f'Automatically created for IoT device: {device_id}'
+                    }
+                )
+            found[equipment_type] = source
+
+        with self._sources_lock:
+            for equipment_type in missing:
+                self._sources[self._source_name(equipment_type)] = (found[equipment_type], now)
+        return found
+
+    def clear_cache(self):
+        with self._sources_lock:
+            self._sources.clear()
+
+    def _devices(self, device_ids: Iterable[str]) -> Dict[str, IoTDevice]:
+        device_ids = list(device_ids)
+        if not device_ids:
+            return {}
+        return {device.device_id: device for device in IoTDevice.objects.filter(device_id__in=device_ids)}
+
+    def _touch_devices(self, points: List[IoTDataPoint]):
+        """Count new data points and mark their devices online, in one UPDATE."""
+        counts = Counter(point.device_id for point in points)
+        if not counts:
+            return
+        now = timezone.now()
+        IoTDevice.objects.filter(id__in=counts).update(
+            total_data_points=F('total_data_points') + Case(
+                *[When(id=device_id, then=Value(count)) for device_id, count in counts.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            status='online',
+            last_seen=now,
+            last_data_received=now,
+        )
+
+    @staticmethod
+    def _source_name(equipment_type: str) -> str:
+        return f'{equipment_type.title()} Fuel Consumption'
+
+    @staticmethod
+    def _parse_timestamp(value: Any) -> Optional[datetime]:
+        if isinstance(value, datetime):
+            timestamp = value
+        else:
+            try:
+                timestamp = parse_datetime(str(value))
+            except ValueError:
+                return None
+        if timestamp is None:
+            return None
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+        return timestamp
+
+
+iot_webhook_ingestor = IoTWebhookIngestor()
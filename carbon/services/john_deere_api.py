@@ -8,8 +8,9 @@ API Documentation: https://developer.deere.com/
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.conf import settings
 from django.utils import timezone
 from django.core.cache import cache
@@ -34,6 +35,12 @@ class JohnDeereAPI:
     and real-time equipment monitoring for carbon tracking.
     """
     
+    # Pooled HTTP connections to the API
+    POOL_SIZE = getattr(settings, 'JOHN_DEERE_SYNC_CONCURRENCY', 8)
+    
+    # Seconds before an API request is abandoned
+    REQUEST_TIMEOUT = 30
+    
     def __init__(self):
         self.client_id = getattr(settings, 'JOHN_DEERE_CLIENT_ID', None)
         self.client_secret = getattr(settings, 'JOHN_DEERE_CLIENT_SECRET', None)
@@ -51,11 +58,14 @@ class JohnDeereAPI:
             self.auth_url = "https://api.deere.com/platform/oauth2/authorize"
             self.token_url = "https://api.deere.com/platform/oauth2/token"
         
+        # Shared by all API calls; the pool keeps a connection per concurrent sync worker
         self.session = requests.Session()
         self.session.headers.update({
             'Accept': 'application/vnd.deere.axiom.v3+json',
             'Content-Type': 'application/json'
         })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.POOL_SIZE)
+        self.session.mount('https://', adapter)
         
         if not self.client_id or not self.client_secret:
             logger.warning("John Deere API credentials not configured. Set JOHN_DEERE_CLIENT_ID and JOHN_DEERE_CLIENT_SECRET in settings.")
@@ -206,10 +216,10 @@ class JohnDeereAPI:
         
         try:
             if method.upper() == 'GET':
-                response = requests.get(url, headers=headers)
+                response = self.session.get(url, headers=headers, timeout=self.REQUEST_TIMEOUT)
             elif method.upper() == 'POST':
                 headers['Content-Type'] = 'application/json'
-                response = requests.post(url, headers=headers, json=data)
+                response = self.session.post(url, headers=headers, json=data, timeout=self.REQUEST_TIMEOUT)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
             
@@ -293,26 +303,32 @@ class JohnDeereAPI:
             end_date = timezone.now()
         
         try:
-            # Format dates for API
-            start_str = start_date.strftime('%Y-%m-%dT%H:%M:%S.000Z')
-            end_str = end_date.strftime('%Y-%m-%dT%H:%M:%S.000Z')
-            
-            endpoint = f'/machines/{machine_id}/fuelConsumption'
-            params = {
-                'startTime': start_str,
-                'endTime': end_str
-            }
-            
-            # Add query parameters to endpoint
-            endpoint += '?' + urlencode(params)
-            
-            response = self._make_authenticated_request(endpoint)
-            return response.get('values', [])
-            
+            return self.fetch_fuel_data(machine_id, start_date, end_date)
         except JohnDeereAPIError as e:
             logger.error(f"Failed to fetch fuel data for machine {machine_id}: {e}")
             return []
     
+    def fetch_fuel_data(self, machine_id: str, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
+        """
+        Fuel consumption records of a machine between two times.
+        Unlike ``get_machine_fuel_data``, raises ``JohnDeereAPIError`` on failure.
+        """
+        # Format dates for API
+        start_str = start_date.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        end_str = end_date.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        
+        endpoint = f'/machines/{machine_id}/fuelConsumption'
+        params = {
+            'startTime': start_str,
+            'endTime': end_str
+        }
+        
+        # Add query parameters to endpoint
+        endpoint += '?' + urlencode(params)
+        
+        response = self._make_authenticated_request(endpoint)
+        return response.get('values', [])
+    
     def get_machine_location_data(self, machine_id: str, start_date: datetime = None, end_date: datetime = None) -> List[Dict[str, Any]]:
         """
         Get location/GPS data for a specific machine.
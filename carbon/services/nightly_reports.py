@@ -0,0 +1,138 @@
+"""
+Set-based daily carbon reports for every establishment.
+
+The nightly job splits establishments into id-range shards. Each shard computes
+the day's emission and offset totals for all of its establishments with one
+grouped query and writes their ``CarbonReport`` rows with one ``bulk_create``.
+The industry average used for scoring is computed once per run.
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Avg, Max, Min, Q, Sum
+from django.utils import timezone
+
+from company.models import Establishment
+from ..models import CarbonBenchmark, CarbonEntry, CarbonReport
+
+logger = logging.getLogger(__name__)
+
+
+class NightlyReportEngine:
+    """
+    Generates one daily ``CarbonReport`` per establishment.
+    """
+
+    # Establishment ids per worker task
+    SHARD_SIZE = 2000
+
+    # Rows per INSERT
+    BATCH_SIZE = 1000
+
+    def industry_average(self, year: int) -> float:
+        return CarbonBenchmark.objects.filter(year=year).aggregate(Avg('average_emissions'))['average_emissions__avg'] or 0
+
+    def shards(self) -> List[Tuple[int, int]]:
+        """Inclusive ``(first_id, last_id)`` ranges covering every establishment."""
+        bounds = Establishment.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            return []
+        return [
+            (start, min(start + self.SHARD_SIZE - 1, bounds['last']))
+            for start in range(bounds['first'], bounds['last'] + 1, self.SHARD_SIZE)
+        ]
+
+    def dispatch(self, report_date: Optional[date] = None) -> Dict[str, Any]:
+        """Fan the day's shards out to ``generate_nightly_report_shard`` workers."""
+        from ..tasks import generate_nightly_report_shard
+
+        report_date = report_date or timezone.now().date() - timedelta(days=1)
+        industry_average = self.industry_average(report_date.year)
+
+        shards = self.shards()
+        inline_reports = 0
+        for first_id, last_id in shards:
+            args = [report_date.isoformat(), first_id, last_id, industry_average]
+            try:
+                generate_nightly_report_shard.apply_async(args=args, queue='carbon')
+            except Exception as e:
+                logger.warning(f"Could not enqueue report shard {first_id}-{last_id}, generating inline: {e}")
+                inline_reports += self.generate_shard(report_date, first_id, last_id, industry_average)
+
+        logger.info(f"Nightly reports for {report_date}: {len(shards)} shards dispatched")
+        return {'report_date': report_date.isoformat(), 'shards': len(shards), 'inline_reports': inline_reports}
+
+    def generate_shard(self, report_date: date, first_id: int, last_id: int,
+                       industry_average: Optional[float] = None) -> int:
+        """
+        Write the day's reports for establishments ``first_id..last_id``. Re-running a
+        shard replaces its reports for that day instead of duplicating them.
+        """
+        if industry_average is None:
+            industry_average = self.industry_average(report_date.year)
+
+        day_start = timezone.make_aware(datetime.combine(report_date, time.min))
+        day_end = day_start + timedelta(days=1)
+
+        totals = {
+            row['establishment_id']: row
+            for row in CarbonEntry.objects.filter(
+                establishment_id__gte=first_id,
+                establishment_id__lte=last_id,
+                timestamp__gte=day_start,
+                timestamp__lt=day_end,
+            )
+            .values('establishment_id')
+            .annotate(
+                emissions=Sum('co2e_amount', filter=Q(type='emission')),
+                offsets=Sum('co2e_amount', filter=Q(type='offset')),
+            )
+            .order_by()
+        }
+
+        generated_at = timezone.now()
+        reports = []
+        establishment_ids = Establishment.objects.filter(id__gte=first_id, id__lte=last_id).values_list('id', flat=True)
+        for establishment_id in establishment_ids.iterator(chunk_size=self.BATCH_SIZE):
+            row = totals.get(establishment_id, {})
+            total_emissions = row.get('emissions') or 0
+            total_offsets = row.get('offsets') or 0
+            net_footprint = total_emissions - total_offsets
+
+            reports.append(CarbonReport(
+                establishment_id=establishment_id,
+                period_start=report_date,
+                period_end=report_date,
+                total_emissions=total_emissions,
+                total_offsets=total_offsets,
+                net_footprint=net_footprint,
+                carbon_score=self.carbon_score(net_footprint, industry_average),
+                generated_at=generated_at,
+            ))
+
+        with transaction.atomic():
+            CarbonReport.objects.filter(
+                establishment_id__gte=first_id,
+                establishment_id__lte=last_id,
+                production__isnull=True,
+                period_start=report_date,
+                period_end=report_date,
+            ).delete()
+            CarbonReport.objects.bulk_create(reports, batch_size=self.BATCH_SIZE)
+
+        logger.info(f"Nightly reports for {report_date}, establishments {first_id}-{last_id}: {len(reports)} written")
+        return len(reports)
+
+    @staticmethod
+    def carbon_score(net_footprint: float, industry_average: float) -> int:
+        carbon_score = 100
+        if industry_average > 0:
+            ratio = net_footprint / industry_average
+            carbon_score = max(1, min(100, int(100 * (1 - ratio))))
+        return carbon_score
+
+
+nightly_report_engine = NightlyReportEngine()
@@ -0,0 +1,511 @@
+"""
+Materialized production carbon snapshots for the public QR endpoints.
+
+Consumer QR scans are the highest-volume traffic we serve, so the carbon metrics
+behind ``qr_summary`` and ``complete_summary`` are computed once, persisted in a
+``ProductionCarbonSnapshot`` row and rebuilt in the background whenever the
+underlying carbon entries, events or benchmarks change.
+"""
+
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Any, Iterable, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from common.cache_tags import establishment_tag, production_tag, tagged_cache
+from ..models import CarbonBenchmark, CarbonEntry, ProductionCarbonSnapshot
+from .carbon_aggregation import summarize_carbon_entries
+
+logger = logging.getLogger(__name__)
+
+
+class ProductionSnapshotService:
+    """
+    Builds, serves and invalidates ``ProductionCarbonSnapshot`` rows.
+    """
+
+    # Coalesce bursts of changes (e.g. IoT ingestion) into a single rebuild
+    REBUILD_DEBOUNCE_SECONDS = 5
+
+    # Re-enqueue a rebuild if a stale snapshot has not been refreshed by then
+    STALE_RETRY_AFTER = timedelta(minutes=10)
+
+    def get_snapshot(self, production) -> ProductionCarbonSnapshot:
+        """
+        Return the stored snapshot for a production.
+
+        Stale snapshots are served as-is while the background rebuild runs; a
+        synchronous build only happens the first time a production is scanned.
+        """
+        try:
+            snapshot = production.carbon_snapshot
+        except ProductionCarbonSnapshot.DoesNotExist:
+            return self.build_snapshot(production)
+
+        if snapshot.is_stale and snapshot.computed_at < timezone.now() - self.STALE_RETRY_AFTER:
+            self.schedule_rebuild(production.id)
+
+        return snapshot
+
+    def build_snapshot(self, production) -> ProductionCarbonSnapshot:
+        """
+        Recompute and persist the carbon snapshot for a production.
+        """
+        establishment = production.parcel.establishment if production.parcel else None
+        year = production.start_date.year if production.start_date else timezone.now().year
+        crop_name = production.product.name if production.product else "unknown"
+        crop_type = crop_name.lower().replace(' ', '_')
+
+        entries, scope = self._select_entries(production, establishment, year)
+        totals = summarize_carbon_entries(entries)
+
+        total_emissions = totals['total_emissions']
+        total_offsets = totals['total_offsets']
+        net_footprint = total_emissions - total_offsets
+
+        benchmark, benchmark_source, industry_average = self._resolve_benchmark(
+            establishment, crop_name, crop_type, year
+        )
+        production_amount = getattr(production, 'production_amount', None) or 1000  # Default 1000kg
+        net_footprint_per_kg = net_footprint / production_amount if production_amount > 0 else net_footprint
+
+        industry_percentile = self._calculate_percentile(
+            benchmark, industry_average, net_footprint_per_kg, total_emissions, total_offsets
+        )
+        carbon_score = self._calculate_score(benchmark, net_footprint_per_kg, total_emissions, total_offsets)
+
+        blockchain_verification = self._get_blockchain_verification(
+            production, crop_name, total_emissions, total_offsets,
+            carbon_score, industry_percentile, benchmark
+        )
+
+        snapshot, _ = ProductionCarbonSnapshot.objects.update_or_create(
+            production=production,
+            defaults={
+                'establishment': establishment,
+                'scope': scope,
+                'year': year,
+                'crop_type': crop_type,
+                'total_emissions': float(total_emissions),
+                'total_offsets': float(total_offsets),
+                'net_footprint': float(net_footprint),
+                'entry_count': totals['entry_count'],
+                'carbon_score': carbon_score,
+                'industry_percentile': industry_percentile,
+                'industry_average': float(industry_average),
+                'benchmark': benchmark,
+                'benchmark_source': benchmark_source,
+                'usda_verified': bool(benchmark and benchmark.usda_verified),
+                'verification_date': benchmark.last_updated if benchmark else None,
+                'emissions_by_source': totals['emissions_by_source'],
+                'emissions_by_category': totals['emissions_by_category'],
+                'offsets_by_action': totals['offsets_by_action'],
+                'blockchain_verification': blockchain_verification,
+                'is_stale': False,
+                'computed_at': timezone.now(),
+            }
+        )
+        production.carbon_snapshot = snapshot
+
+        self._clear_response_cache([production.id])
+        logger.info(f"Built carbon snapshot for production {production.id} (score {carbon_score})")
+        return snapshot
+
+    def rebuild(self, production_id: int) -> Optional[ProductionCarbonSnapshot]:
+        """Rebuild the snapshot for a production id, if it still exists."""
+        from history.models import History
+
+        cache.delete(self._rebuild_lock_key(production_id))
+
+        try:
+            production = History.objects.select_related(
+                'product', 'parcel__establishment'
+            ).get(id=production_id)
+        except History.DoesNotExist:
+            return None
+
+        return self.build_snapshot(production)
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+
+    def mark_stale(self, production_ids: Iterable[int]) -> int:
+        """
+        Flag snapshots as stale, drop the response caches and enqueue rebuilds.
+        """
+        production_ids = {pid for pid in production_ids if pid}
+        if not production_ids:
+            return 0
+
+        snapshots = ProductionCarbonSnapshot.objects.filter(production_id__in=production_ids)
+        snapshot_ids = list(snapshots.values_list('production_id', flat=True))
+        snapshots.update(is_stale=True)
+
+        self._clear_response_cache(production_ids)
+        # Productions that were never scanned get their snapshot built on first scan
+        for production_id in snapshot_ids:
+            self.schedule_rebuild(production_id)
+
+        return len(snapshot_ids)
+
+    def invalidate_for_entry(self, entry) -> int:
+        """Invalidate snapshots affected by a CarbonEntry change."""
+        return self.invalidate_for_entries([entry])
+
+    def invalidate_for_entries(self, entries: Iterable[Any]) -> int:
+        """Invalidate snapshots affected by many CarbonEntry changes, e.g. after a bulk_create."""
+        production_ids = set()
+        establishment_years = set()
+        for entry in entries:
+            if entry.production_id:
+                production_ids.add(entry.production_id)
+            if entry.establishment_id:
+                establishment_years.add((entry.establishment_id, entry.year))
+
+        # Establishment-level responses (e.g. carbon cost summaries) are tagged by establishment
+        from history.models import History
+
+        establishment_ids = {establishment_id for establishment_id, _ in establishment_years}
+        if production_ids:
+            establishment_ids.update(
+                History.objects.filter(id__in=production_ids).values_list('parcel__establishment_id', flat=True)
+            )
+        tagged_cache.invalidate(*[establishment_tag(establishment_id) for establishment_id in establishment_ids if establishment_id])
+
+        # Productions without their own entries fall back to establishment entries
+        if establishment_years:
+            fallback = Q()
+            for establishment_id, year in establishment_years:
+                fallback |= Q(establishment_id=establishment_id, year=year)
+            production_ids.update(
+                ProductionCarbonSnapshot.objects.filter(fallback, scope='establishment')
+                .values_list('production_id', flat=True)
+            )
+
+        return self.mark_stale(production_ids)
+
+    def invalidate_for_benchmark(self, benchmark) -> int:
+        """Invalidate snapshots that were, or could be, scored against a benchmark."""
+        snapshots = ProductionCarbonSnapshot.objects.filter(year=benchmark.year)
+        if benchmark.crop_type:
+            snapshots = snapshots.filter(
+                Q(benchmark_id=benchmark.id) | Q(crop_type__icontains=benchmark.crop_type)
+            )
+        else:
+            snapshots = snapshots.filter(
+                Q(benchmark_id=benchmark.id) | Q(benchmark__isnull=True) | Q(benchmark__crop_type='')
+            )
+
+        return self.mark_stale(snapshots.values_list('production_id', flat=True))
+
+    def schedule_rebuild(self, production_id: int):
+        """Enqueue a debounced background rebuild once the transaction commits."""
+        try:
+            added = cache.add(self._rebuild_lock_key(production_id), True, self.REBUILD_DEBOUNCE_SECONDS)
+        except Exception as e:
+            logger.warning(f"Could not debounce snapshot rebuild for production {production_id}: {e}")
+            added = None
+        # False: a rebuild is already queued. None: the cache is down (errors are
+        # swallowed into None), so enqueue rather than leave the snapshot stale.
+        if added is False:
+            return
+
+        def _enqueue():
+            try:
+                from ..tasks import rebuild_production_snapshot
+                rebuild_production_snapshot.apply_async(
+                    args=[production_id],
+                    countdown=self.REBUILD_DEBOUNCE_SECONDS,
+                    queue='carbon'
+                )
+            except Exception as e:
+                logger.warning(f"Could not enqueue snapshot rebuild for production {production_id}: {e}")
+
+        transaction.on_commit(_enqueue)
+
+    # ------------------------------------------------------------------
+    # Computation helpers
+    # ------------------------------------------------------------------
+
+    def _select_entries(self, production, establishment, year):
+        """Production-specific entries first, falling back to the establishment's year."""
+        production_entries = CarbonEntry.objects.filter(production=production)
+        if production_entries.exists() or not establishment:
+            return production_entries, 'production'
+
+        return CarbonEntry.objects.filter(establishment=establishment, year=year), 'establishment'
+
+    def _resolve_benchmark(self, establishment, crop_name, crop_type, year):
+        """Crop-specific USDA benchmark first, then the general industry benchmark."""
+        benchmark = None
+        benchmark_source = "industry_average"
+        industry_average = 0
+
+        try:
+            benchmark = self._find_crop_benchmark(crop_type, year, usda_verified=True)
+
+            if not benchmark and crop_type != "unknown":
+                # Try partial crop name matches
+                for keyword in crop_name.lower().split():
+                    benchmark = CarbonBenchmark.objects.filter(
+                        crop_type__icontains=keyword,
+                        year=year,
+                        usda_verified=True
+                    ).first()
+                    if benchmark:
+                        break
+
+            if benchmark:
+                benchmark_source = f"crop_specific_{benchmark.crop_type}"
+                industry_average = benchmark.average_emissions
+            elif establishment:
+                industry = getattr(establishment, 'industry', None) or getattr(establishment, 'type', 'agriculture')
+                benchmark = CarbonBenchmark.objects.filter(
+                    industry=industry,
+                    year=year,
+                    crop_type=''  # General industry benchmark
+                ).first()
+
+                if benchmark:
+                    industry_average = benchmark.average_emissions
+                    benchmark_source = f"industry_{industry}"
+        except Exception as e:
+            logger.error(f"Error resolving carbon benchmark for {crop_type}: {e}")
+
+        return benchmark, benchmark_source, industry_average
+
+    def _normalize_crop_name(self, crop_name):
+        """Normalize crop name to handle plural/singular matching"""
+        if not crop_name:
+            return ""
+        
+        # Convert to lowercase and remove spaces/underscores
+        normalized = crop_name.lower().replace(' ', '_').replace('-', '_')
+        
+        # Common plural to singular mappings for agricultural products
+        plural_to_singular = {
+            'strawberries': 'strawberry',
+            'blueberries': 'blueberry',
+            'raspberries': 'raspberry',
+            'blackberries': 'blackberry',
+            'cranberries': 'cranberry',
+            'cherries': 'cherry',
+            'grapes': 'grape',
+            'apples': 'apple',
+            'oranges': 'orange',
+            'lemons': 'lemon',
+            'limes': 'lime',
+            'peaches': 'peach',
+            'pears': 'pear',
+            'bananas': 'banana',
+            'avocados': 'avocado',
+            'tomatoes': 'tomato',
+            'potatoes': 'potato',
+            'onions': 'onion',
+            'carrots': 'carrot',
+            'peppers': 'pepper',
+            'cucumbers': 'cucumber',
+            'lettuce': 'lettuce',
+            'spinach': 'spinach',
+            'broccoli': 'broccoli',
+            'cauliflower': 'cauliflower',
+            'beans': 'bean',
+            'peas': 'pea',
+            'soybeans': 'soybean',
+            'corn': 'corn',
+            'wheat': 'wheat',
+            'rice': 'rice',
+            'oats': 'oat',
+            'barley': 'barley',
+            'almonds': 'almond',
+            'walnuts': 'walnut',
+            'pecans': 'pecan',
+            'pistachios': 'pistachio',
+        }
+        
+        # Check if it's a known plural form
+        if normalized in plural_to_singular:
+            return plural_to_singular[normalized]
+        
+        # Handle generic plural endings
+        if normalized.endswith('ies'):
+            # berries -> berry, cherries -> cherry
+            return normalized[:-3] + 'y'
+        elif normalized.endswith('es') and len(normalized) > 3:
+            # tomatoes -> tomato, potatoes -> potato
+            return normalized[:-2]
+        elif normalized.endswith('s') and len(normalized) > 2:
+            # apples -> apple, grapes -> grape
+            return normalized[:-1]
+        
+        return normalized
+
+    def _find_crop_benchmark(self, crop_name, year, usda_verified=True):
+        """Find crop benchmark with flexible matching for plural/singular forms"""
+        if not crop_name:
+            return None
+            
+        # First try exact match
+        benchmark = CarbonBenchmark.objects.filter(
+            crop_type=crop_name,
+            year=year,
+            usda_verified=usda_verified
+        ).first()
+        
+        if benchmark:
+            return benchmark
+        
+        # Try normalized version
+        normalized_crop = self._normalize_crop_name(crop_name)
+        if normalized_crop != crop_name:
+            benchmark = CarbonBenchmark.objects.filter(
+                crop_type=normalized_crop,
+                year=year,
+                usda_verified=usda_verified
+            ).first()
+            
+            if benchmark:
+                return benchmark
+        
+        # Try reverse matching - check if any benchmark crop names match our normalized name
+        # This handles cases where benchmark has plural but product has singular
+        all_benchmarks = CarbonBenchmark.objects.filter(
+            year=year,
+            usda_verified=usda_verified
+        )
+        
+        for benchmark in all_benchmarks:
+            if self._normalize_crop_name(benchmark.crop_type) == normalized_crop:
+                return benchmark
+        
+        return None
+
+    def _offset_based_score(self, total_emissions, total_offsets):
+        if total_emissions > 0:
+            offset_percentage = min(100, (total_offsets / total_emissions) * 100)
+            if offset_percentage >= 100:
+                return 85 + min(15, ((offset_percentage - 100) / 50) * 15)
+            return offset_percentage * 0.85
+        if total_offsets > 0:
+            return 95  # High score for carbon negative
+        return 50  # Default score when no data
+
+    def _calculate_percentile(self, benchmark, industry_average, net_footprint_per_kg, total_emissions, total_offsets) -> int:
+        try:
+            if benchmark and industry_average > 0:
+                if net_footprint_per_kg <= 0:
+                    return 95  # Very good if carbon neutral/negative
+                if net_footprint_per_kg <= benchmark.min_emissions:
+                    return 95  # Top performers
+                if net_footprint_per_kg >= benchmark.max_emissions:
+                    return 5  # Bottom performers
+                # Linear interpolation between min and max
+                position = (net_footprint_per_kg - benchmark.min_emissions) / (benchmark.max_emissions - benchmark.min_emissions)
+                return max(5, min(95, int(95 - (position * 90))))
+
+            # No benchmark available - estimate based on carbon score
+            return max(5, min(95, int(self._offset_based_score(total_emissions, total_offsets) * 0.9)))
+        except Exception as e:
+            logger.error(f"Error calculating industry percentile: {e}")
+            return 50
+
+    def _calculate_score(self, benchmark, net_footprint_per_kg, total_emissions, total_offsets) -> int:
+        if benchmark and benchmark.average_emissions > 0 and benchmark.max_emissions > benchmark.average_emissions:
+            if net_footprint_per_kg <= 0:
+                carbon_score = 95  # Excellent for carbon neutral/negative
+            elif net_footprint_per_kg <= benchmark.min_emissions:
+                carbon_score = 90  # Excellent performance
+            elif net_footprint_per_kg <= benchmark.average_emissions:
+                # Better than average: scale from 70-90
+                ratio = net_footprint_per_kg / benchmark.average_emissions
+                carbon_score = int(90 - (ratio * 20))
+            elif net_footprint_per_kg <= benchmark.max_emissions:
+                # Worse than average: scale from 30-70
+                ratio = (net_footprint_per_kg - benchmark.average_emissions) / (benchmark.max_emissions - benchmark.average_emissions)
+                carbon_score = int(70 - (ratio * 40))
+            else:
+                # Worse than max: scale from 10-30
+                ratio = min(net_footprint_per_kg / benchmark.max_emissions, 2.0)
+                carbon_score = max(10, int(30 - ((ratio - 1) * 20)))
+        else:
+            carbon_score = self._offset_based_score(total_emissions, total_offsets)
+
+        return max(1, min(100, round(carbon_score)))
+
+    def _get_blockchain_verification(self, production, crop_name, total_emissions, total_offsets,
+                                     carbon_score, industry_percentile, benchmark) -> dict:
+        """Verify (or create) the production's blockchain record at build time."""
+        from .blockchain import blockchain_service
+
+        pk = int(production.id)
+        try:
+            carbon_data = {
+                'production_id': pk,
+                'total_emissions': float(total_emissions),
+                'total_offsets': float(total_offsets),
+                'crop_type': crop_name,
+                'calculation_method': 'crop_specific_usda_benchmarking',
+                'usda_verified': bool(benchmark and benchmark.usda_verified),
+                'timestamp': int(production.start_date.timestamp()) if production.start_date else int(timezone.now().timestamp()),
+                'carbon_score': carbon_score,
+                'industry_percentile': industry_percentile
+            }
+
+            verification_result = blockchain_service.verify_carbon_record(pk)
+            if not verification_result.get('verified', False):
+                blockchain_result = blockchain_service.create_carbon_record(pk, carbon_data)
+                blockchain_verification = {
+                    'verified': True,
+                    'transaction_hash': blockchain_result.get('transaction_hash'),
+                    'record_hash': blockchain_result.get('record_hash'),
+                    'verification_url': blockchain_result.get('verification_url'),
+                    'network': blockchain_result.get('network', 'ethereum'),
+                    'verification_date': timezone.now().isoformat(),
+                    'mock_data': blockchain_result.get('mock_data', False)
+                }
+            else:
+                blockchain_verification = {
+                    'verified': verification_result.get('verified', False),
+                    'record_hash': verification_result.get('record_hash'),
+                    'verification_url': f"https://etherscan.io/tx/{verification_result.get('transaction_hash', '')}",
+                    'network': 'ethereum',
+                    'verification_date': timezone.now().isoformat(),
+                    'mock_data': verification_result.get('mock_data', False)
+                }
+
+            compliance_result = blockchain_service.check_compliance(pk)
+            blockchain_verification.update({
+                'compliance_status': compliance_result.get('compliant', False),
+                'eligible_for_credits': compliance_result.get('eligible_for_credits', False)
+            })
+            return blockchain_verification
+
+        except Exception as e:
+            logger.warning(f"Error with blockchain verification for production {pk}: {e}")
+            fallback_hash = hashlib.sha256(f"fallback_{pk}".encode()).hexdigest()
+            return {
+                'verified': True,
+                'transaction_hash': f'0x{fallback_hash}',
+                'verification_url': f'https://etherscan.io/tx/0x{fallback_hash}',
+                'network': 'ethereum_testnet',
+                'verification_date': timezone.now().isoformat(),
+                'compliance_status': True,
+                'eligible_for_credits': carbon_score >= 70,
+                'fallback_data': True
+            }
+
+    def _clear_response_cache(self, production_ids: Iterable[int]):
+        """Expire the public endpoints' responses cached on top of the snapshot."""
+        tagged_cache.invalidate(*[production_tag(pid) for pid in production_ids])
+
+    def _rebuild_lock_key(self, production_id: int) -> str:
+        return f'production_snapshot_rebuild_{production_id}'
+
+
+production_snapshot_service = ProductionSnapshotService()
@@ -1,15 +1,35 @@
+"""
+PDF rendering for carbon reports.
+
+Rendering works from a plain ``report_payload`` dict, so it can run in a
+separate process. Fonts are registered and the paragraph styles are built once
+per process instead of per report. Rendered documents are stored under a name
+derived from a hash of the payload, so a report whose content hasn't changed
+keeps its file and isn't rendered again.
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
 import os
-import uuid
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Dict, Iterable, List, Optional
+
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from django.conf import settings
-from django.core.files.storage import default_storage
+from django.core.files.base import ContentFile
+from django.utils.dateparse import parse_date
+
+logger = logging.getLogger(__name__)
 
 # Get the path to the font files
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -21,121 +41,206 @@ if not os.path.exists(font_path):
 try:
     pdfmetrics.registerFont(TTFont('Roboto', os.path.join(font_path, 'Roboto-Regular.ttf')))
     pdfmetrics.registerFont(TTFont('Roboto-Bold', os.path.join(font_path, 'Roboto-Bold.ttf')))
-except:
+    FONT, BOLD_FONT = 'Roboto', 'Roboto-Bold'
+except Exception:
     # Fallback to built-in fonts if Roboto is not available
-    pass
+    FONT, BOLD_FONT = 'Helvetica', 'Helvetica-Bold'
+
+# Bump when the layout changes so existing documents are re-rendered
+TEMPLATE_VERSION = 1
+
+SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgreen),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), BOLD_FONT),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+
+@lru_cache(maxsize=None)
+def _styles():
+    """Title, heading and body styles, built once per process."""
+    styles = getSampleStyleSheet()
+    styles['Title'].fontName = BOLD_FONT
+    styles['Heading1'].fontName = BOLD_FONT
+    styles['Normal'].fontName = FONT
+    return styles['Title'], styles['Heading1'], styles['Normal']
+
+
+def _format_date(value: str) -> str:
+    return parse_date(value).strftime('%B %d, %Y')
+
+
+def render_pdf(payload: Dict[str, Any]) -> bytes:
+    """
+    Render a report payload (see ``CarbonReportGenerator.report_payload``) to PDF bytes.
+    """
+    title_style, heading_style, normal_style = _styles()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=72
+    )
+
+    elements = []
+
+    # Title
+    elements.append(Paragraph('Carbon Footprint Report', title_style))
+    elements.append(Spacer(1, 0.25 * inch))
+
+    # Report details
+    elements.append(Paragraph(f"Entity: {payload['entity_name']}", heading_style))
+    elements.append(Spacer(1, 0.1 * inch))
+
+    period = f"Period: {_format_date(payload['period_start'])} to {_format_date(payload['period_end'])}"
+    elements.append(Paragraph(period, normal_style))
+    elements.append(Paragraph(f"Generated: {_format_date(payload['generated_on'])}", normal_style))
+    elements.append(Spacer(1, 0.5 * inch))
+
+    # Summary section
+    elements.append(Paragraph("Carbon Footprint Summary", heading_style))
+    elements.append(Spacer(1, 0.25 * inch))
+
+    summary_data = [
+        ["Metric", "Value", "Unit"],
+        ["Total Emissions", f"{payload['total_emissions']:.2f}", "kg CO₂e"],
+        ["Total Offsets", f"{payload['total_offsets']:.2f}", "kg CO₂e"],
+        ["Net Footprint", f"{payload['net_footprint']:.2f}", "kg CO₂e"],
+        ["Carbon Score", f"{payload['carbon_score']}", "0-100"]
+    ]
+    table = Table(summary_data, colWidths=[2*inch, 1.5*inch, 1*inch])
+    table.setStyle(SUMMARY_TABLE_STYLE)
+    elements.append(table)
+    elements.append(Spacer(1, 0.5 * inch))
+
+    # Recommendations section (if available)
+    if payload['recommendations']:
+        elements.append(Paragraph("Recommendations", heading_style))
+        elements.append(Spacer(1, 0.25 * inch))
+
+        for i, recommendation in enumerate(payload['recommendations']):
+            elements.append(Paragraph(f"{i+1}. {recommendation}", normal_style))
+            elements.append(Spacer(1, 0.1 * inch))
+
+    # Footer
+    elements.append(Spacer(1, 0.5 * inch))
+    elements.append(Paragraph(f"Report ID: {payload['id']}", normal_style))
+    elements.append(Paragraph("This report was generated by Trazo Carbon Management System", normal_style))
+    if payload['usda_verified']:
+        elements.append(Paragraph("✓ USDA Verified", normal_style))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
 
 class CarbonReportGenerator:
     """
-    Generate a PDF report for carbon emissions and offsets.
+    Generate PDF documents for carbon emissions and offsets reports.
     """
-    
-    def generate_report(self, report):
+
+    UPLOAD_DIR = 'carbon_reports'
+
+    # Worker processes for batch rendering; 0 or 1 renders in the calling process
+    PROCESSES = getattr(settings, 'CARBON_REPORT_RENDER_PROCESSES', os.cpu_count() or 1)
+
+    def report_payload(self, report) -> Dict[str, Any]:
+        """Everything the PDF shows, as JSON-serializable values."""
+        entity_name = report.establishment.name if report.establishment else report.production.name if report.production else "Unknown"
+        recommendations = getattr(report, 'recommendations', None) or []
+        return {
+            'id': report.id,
+            'entity_name': entity_name,
+            'period_start': self._field_value(report, 'period_start').isoformat(),
+            'period_end': self._field_value(report, 'period_end').isoformat(),
+            'generated_on': self._field_value(report, 'generated_at').date().isoformat(),
+            'total_emissions': report.total_emissions,
+            'total_offsets': report.total_offsets,
+            'net_footprint': report.net_footprint,
+            'carbon_score': report.carbon_score,
+            'usda_verified': report.usda_verified,
+            'recommendations': [str(recommendation) for recommendation in recommendations],
+        }
+
+    @staticmethod
+    def _field_value(report, name: str):
+        """
+        A date field's value as a date/datetime. Until a report is reloaded its
+        fields can still hold the model's string defaults (e.g. '2023-01-01').
         """
-        Generate a PDF report for a CarbonReport instance.
-        
+        return report._meta.get_field(name).to_python(getattr(report, name))
+
+    def document_name(self, payload: Dict[str, Any]) -> str:
+        content = json.dumps([TEMPLATE_VERSION, payload], sort_keys=True, default=str)
+        return f"{self.UPLOAD_DIR}/{hashlib.sha256(content.encode()).hexdigest()}.pdf"
+
+    def generate_report(self, report) -> str:
+        """
+        Generate (or reuse) the PDF document for a CarbonReport instance.
+
         Args:
             report: CarbonReport instance
-            
+
         Returns:
             str: URL path to the generated PDF
         """
-        # Generate a unique filename
-        filename = f"carbon_reports/{uuid.uuid4()}.pdf"
-        filepath = os.path.join(settings.MEDIA_ROOT, filename) if hasattr(settings, 'MEDIA_ROOT') else filename
-        
-        # Create the directory if it doesn't exist
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        
-        # Create PDF document
-        doc = SimpleDocTemplate(
-            filepath,
-            pagesize=letter,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=72
-        )
-        
-        # Get styles
-        styles = getSampleStyleSheet()
-        title_style = styles['Title']
-        title_style.fontName = 'Roboto-Bold'
-        
-        heading_style = styles['Heading1']
-        heading_style.fontName = 'Roboto-Bold'
-        
-        normal_style = styles['Normal']
-        normal_style.fontName = 'Roboto'
-        
-        # Create elements for the PDF
-        elements = []
-        
-        # Title
-        elements.append(Paragraph('Carbon Footprint Report', title_style))
-        elements.append(Spacer(1, 0.25 * inch))
-        
-        # Report details
-        entity_name = report.establishment.name if report.establishment else report.production.name if report.production else "Unknown"
-        elements.append(Paragraph(f"Entity: {entity_name}", heading_style))
-        elements.append(Spacer(1, 0.1 * inch))
-        
-        period = f"Period: {report.period_start.strftime('%B %d, %Y')} to {report.period_end.strftime('%B %d, %Y')}"
-        elements.append(Paragraph(period, normal_style))
-        elements.append(Paragraph(f"Generated: {report.generated_at.strftime('%B %d, %Y')}", normal_style))
-        elements.append(Spacer(1, 0.5 * inch))
-        
-        # Summary section
-        elements.append(Paragraph("Carbon Footprint Summary", heading_style))
-        elements.append(Spacer(1, 0.25 * inch))
-        
-        # Summary table
-        summary_data = [
-            ["Metric", "Value", "Unit"],
-            ["Total Emissions", f"{report.total_emissions:.2f}", "kg CO₂e"],
-            ["Total Offsets", f"{report.total_offsets:.2f}", "kg CO₂e"],
-            ["Net Footprint", f"{report.net_footprint:.2f}", "kg CO₂e"],
-            ["Carbon Score", f"{report.carbon_score}", "0-100"]
-        ]
-        
-        # Create table
-        table = Table(summary_data, colWidths=[2*inch, 1.5*inch, 1*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgreen),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Roboto-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(table)
-        elements.append(Spacer(1, 0.5 * inch))
-        
-        # Recommendations section (if available)
-        if hasattr(report, 'recommendations') and report.recommendations:
-            elements.append(Paragraph("Recommendations", heading_style))
-            elements.append(Spacer(1, 0.25 * inch))
-            
-            for i, recommendation in enumerate(report.recommendations):
-                rec_text = recommendation if isinstance(recommendation, str) else str(recommendation)
-                elements.append(Paragraph(f"{i+1}. {rec_text}", normal_style))
-                elements.append(Spacer(1, 0.1 * inch))
-        
-        # Footer
-        elements.append(Spacer(1, 0.5 * inch))
-        elements.append(Paragraph(f"Report ID: {report.id}", normal_style))
-        elements.append(Paragraph("This report was generated by Trazo Carbon Management System", normal_style))
-        if report.usda_verified:
-            elements.append(Paragraph("✓ USDA Verified", normal_style))
-        
-        # Build PDF
-        doc.build(elements)
-        
-        # Return the URL
-        url = default_storage.url(filename) if hasattr(default_storage, 'url') else f"/media/{filename}"
-        return url
-
-report_generator = CarbonReportGenerator() 
\ No newline at end of file
+        self.generate_many([report])
+        return report.document.url
+
+    def generate_many(self, reports: Iterable, processes: Optional[int] = None) -> Dict[str, int]:
+        """
+        Render documents for ``reports``, skipping those whose content is unchanged.
+
+        Missing documents are rendered in a process pool, stored, and the reports'
+        ``document`` fields updated with one query.
+        """
+        from ..models import CarbonReport
+
+        storage = CarbonReport._meta.get_field('document').storage
+        stats = {'reports': 0, 'unchanged': 0, 'reused': 0, 'rendered': 0}
+
+        pending: Dict[str, Dict[str, Any]] = {}
+        seen = set()
+        changed: List = []
+        for report in reports:
+            stats['reports'] += 1
+            payload = self.report_payload(report)
+            name = self.document_name(payload)
+            if report.document and report.document.name == name:
+                stats['unchanged'] += 1
+                continue
+            report.document.name = name
+            changed.append(report)
+            if name in seen:
+                continue
+            seen.add(name)
+            if storage.exists(name):
+                stats['reused'] += 1
+            else:
+                pending[name] = payload
+
+        for name, pdf in zip(pending, self._render(list(pending.values()), processes)):
+            storage.save(name, ContentFile(pdf))
+            stats['rendered'] += 1
+
+        CarbonReport.objects.bulk_update(changed, ['document'], batch_size=500)
+        logger.info(f"Carbon report documents: {stats}")
+        return stats
+
+    def _render(self, payloads: List[Dict[str, Any]], processes: Optional[int] = None) -> List[bytes]:
+        processes = min(self.PROCESSES if processes is None else processes, len(payloads))
+        # Daemonic processes (e.g. Celery prefork children) can't start a pool of their own
+        if processes <= 1 or multiprocessing.current_process().daemon:
+            return [render_pdf(payload) for payload in payloads]
+        with ProcessPoolExecutor(max_workers=processes, initializer=_styles) as pool:
+            return list(pool.map(render_pdf, payloads))
+
+
+report_generator = CarbonReportGenerator()
@@ -3,14 +3,74 @@ import random
 import logging
 from django.utils import timezone
 from django.conf import settings
-from django.db.models import Sum, Count, Q
 from datetime import timedelta, datetime
 from decimal import Decimal
+from company.models import Establishment
 from ..models import CarbonEntry
+from .carbon_ledger import carbon_ledger
 from .registry_integration import RegistryIntegrationService
 
 logger = logging.getLogger(__name__)
 
+
+class VerificationContext:
+    """
+    The data the verification checks read besides the entry itself, queried as
+    the checks ask for it. Ledger totals are memoized for the life of the
+    context, so one verification reads each scope once.
+
+    ``BatchVerificationContext`` (carbon/services/batch_verification.py) answers
+    the same questions for many entries from data loaded up front.
+    """
+
+    def __init__(self, service: 'VerificationService'):
+        self.service = service
+        self.now = timezone.now()
+        self._establishment_totals = {}
+        self._user_totals = {}
+
+    def establishment_totals(self, establishment_id: int) -> Dict[str, float]:
+        if establishment_id not in self._establishment_totals:
+            self._establishment_totals[establishment_id] = carbon_ledger.establishment_totals(establishment_id, self.now)
+        return self._establishment_totals[establishment_id]
+
+    def user_totals(self, user_id: int) -> Dict[str, float]:
+        if user_id not in self._user_totals:
+            self._user_totals[user_id] = carbon_ledger.user_totals(user_id, self.now)
+        return self._user_totals[user_id]
+
+    def similar_offsets(self, state: Optional[str], description_prefix: str) -> int:
+        """Offsets in establishments of ``state`` whose description contains ``description_prefix``."""
+        return CarbonEntry.objects.filter(
+            establishment__state=state,
+            type='offset',
+            description__icontains=description_prefix
+        ).count()
+
+    def establishments_in_state(self, state: Optional[str]) -> int:
+        return Establishment.objects.filter(state=state).count()
+
+    def identical_recent_offsets(self, carbon_entry) -> int:
+        """The user's offsets of the last 24 hours with the entry's amount and description."""
+        return CarbonEntry.objects.filter(
+            created_by_id=carbon_entry.created_by_id,
+            type='offset',
+            amount=carbon_entry.amount,
+            description=carbon_entry.description,
+            created_at__gte=self.now - timedelta(days=1)
+        ).count()
+
+    def methodology_template(self, source_name: str) -> Dict[str, Any]:
+        return self.service.registry_service.get_methodology_template(source_name)
+
+    def registry_result(self, carbon_entry) -> Dict[str, Any]:
+        return self.service._verify_with_third_party_registry(carbon_entry)
+
+    def entry_changed(self, carbon_entry):
+        """Persist fields a check updated on the entry."""
+        carbon_entry.save()
+
+
 class VerificationService:
     """
     Industry-standard carbon offset verification service with comprehensive anti-gaming mechanisms.
@@ -41,12 +101,14 @@ class VerificationService:
     def __init__(self):
         self.registry_service = RegistryIntegrationService()
 
-    def verify_offset_entry(self, carbon_entry) -> Dict[str, Any]:
+    def verify_offset_entry(self, carbon_entry, context: Optional[VerificationContext] = None) -> Dict[str, Any]:
         """
         Main verification method implementing industry-standard anti-gaming mechanisms.
         
         Returns verification result with anti-gaming flags, requirements, and recommendations.
+        ``context`` supplies the data the checks read; by default it is queried for this entry.
         """
+        context = context or VerificationContext(self)
         logger.info(f"🔍 Starting verification for carbon entry {carbon_entry.id}")
         logger.info(f"   Entry details: {carbon_entry.amount} kg CO₂e, level: {carbon_entry.verification_level}")
         
@@ -70,7 +132,7 @@ class VerificationService:
             logger.info(f"🏛️ Attempting third-party registry verification for entry {carbon_entry.id}")
             logger.info(f"   Registry ID: {carbon_entry.registry_verification_id}")
             
-            registry_result = self._verify_with_third_party_registry(carbon_entry)
+            registry_result = context.registry_result(carbon_entry)
             result['registry_validation'] = registry_result
             
             logger.info(f"📋 Registry verification result: {registry_result}")
@@ -90,7 +152,7 @@ class VerificationService:
             
             # Update carbon entry with registry data
             carbon_entry.third_party_verification_url = registry_result.get('project_url', '')
-            carbon_entry.save()
+            context.entry_changed(carbon_entry)
         elif carbon_entry.verification_level == 'certified_project':
             logger.warning(f"⚠️ Entry {carbon_entry.id} marked as certified_project but missing registry_verification_id")
         else:
@@ -98,7 +160,7 @@ class VerificationService:
 
         # 2. ADDITIONALITY TESTING (following Oxford/Berkeley research)
         logger.info(f"🧪 Running additionality assessment for entry {carbon_entry.id}")
-        additionality_result = self._assess_additionality(carbon_entry)
+        additionality_result = self._assess_additionality(carbon_entry, context)
         result['additionality_assessment'] = additionality_result
         
         if not additionality_result['passes_test']:
@@ -109,7 +171,7 @@ class VerificationService:
 
         # 3. CUMULATIVE LIMITS ENFORCEMENT
         logger.info(f"📊 Checking cumulative limits for entry {carbon_entry.id}")
-        cumulative_check = self._check_cumulative_limits(carbon_entry)
+        cumulative_check = self._check_cumulative_limits(carbon_entry, context)
         if cumulative_check['violations']:
             logger.warning(f"⚠️ Cumulative limits exceeded for entry {carbon_entry.id}")
             logger.warning(f"   Violations: {cumulative_check['violations']}")
@@ -118,7 +180,7 @@ class VerificationService:
 
         # 4. RAPID SUBMISSION PATTERN DETECTION
         logger.info(f"⏱️ Analyzing submission patterns for entry {carbon_entry.id}")
-        submission_pattern = self._analyze_submission_patterns(carbon_entry)
+        submission_pattern = self._analyze_submission_patterns(carbon_entry, context)
         if submission_pattern['suspicious']:
             logger.warning(f"⚠️ Suspicious submission pattern detected for entry {carbon_entry.id}")
             logger.warning(f"   Flags: {submission_pattern['flags']}")
@@ -127,7 +189,7 @@ class VerificationService:
 
         # 5. UNREALISTIC OFFSET RATIO DETECTION
         logger.info(f"⚖️ Checking offset-to-emission ratio for entry {carbon_entry.id}")
-        offset_ratio_check = self._check_offset_emission_ratio(carbon_entry)
+        offset_ratio_check = self._check_offset_emission_ratio(carbon_entry, context)
         if offset_ratio_check['unrealistic']:
             logger.warning(f"⚠️ Unrealistic offset ratio detected for entry {carbon_entry.id}")
             logger.warning(f"   Flags: {offset_ratio_check['flags']}")
@@ -136,7 +198,7 @@ class VerificationService:
 
         # 6. ACREAGE CAPACITY VALIDATION
         logger.info(f"🌾 Validating acreage capacity for entry {carbon_entry.id}")
-        acreage_check = self._validate_acreage_capacity(carbon_entry)
+        acreage_check = self._validate_acreage_capacity(carbon_entry, context)
         if acreage_check['exceeds_capacity']:
             logger.warning(f"⚠️ Acreage capacity exceeded for entry {carbon_entry.id}")
             logger.warning(f"   Flags: {acreage_check['flags']}")
@@ -161,7 +223,7 @@ class VerificationService:
 
         # 9. METHODOLOGY TEMPLATE VALIDATION
         logger.info(f"📋 Validating methodology template for entry {carbon_entry.id}")
-        methodology_check = self._validate_methodology_template(carbon_entry)
+        methodology_check = self._validate_methodology_template(carbon_entry, context)
         result['methodology_validation'] = methodology_check
         if not methodology_check['valid']:
             logger.info(f"📄 Methodology validation issues for entry {carbon_entry.id}: {methodology_check['requirements']}")
@@ -333,14 +395,15 @@ class VerificationService:
                 'error': error_msg
             }
 
-    def _validate_methodology_template(self, carbon_entry) -> Dict[str, Any]:
+    def _validate_methodology_template(self, carbon_entry, context: Optional[VerificationContext] = None) -> Dict[str, Any]:
         """
         Validate that the carbon entry follows appropriate methodology templates
         """
+        context = context or VerificationContext(self)
         try:
             # Get methodology template based on source
             source_name = carbon_entry.source.name.lower() if carbon_entry.source else ''
-            methodology_template = self.registry_service.get_methodology_template(source_name)
+            methodology_template = context.methodology_template(source_name)
             
             if not methodology_template:
                 return {
@@ -391,7 +454,7 @@ class VerificationService:
                 'error': str(e)
             }
 
-    def _assess_additionality(self, carbon_entry) -> Dict[str, Any]:
+    def _assess_additionality(self, carbon_entry, context: Optional[VerificationContext] = None) -> Dict[str, Any]:
         """
         Comprehensive additionality testing following Verra VM0042 and research standards.
         
@@ -400,6 +463,7 @@ class VerificationService:
         2. Barrier analysis - implementation obstacles
         3. Common practice assessment - regional baselines
         """
+        context = context or VerificationContext(self)
         result = {
             'passes_test': True,
             'violations': [],
@@ -420,15 +484,12 @@ class VerificationService:
         establishment = carbon_entry.establishment
         if establishment:
             # Check if practice is already common (>30% adoption) in region
-            similar_offsets = CarbonEntry.objects.filter(
-                establishment__state=establishment.state,
-                type='offset',
-                description__icontains=carbon_entry.description[:20] if carbon_entry.description else ''
-            ).count()
+            similar_offsets = context.similar_offsets(
+                establishment.state,
+                carbon_entry.description[:20] if carbon_entry.description else ''
+            )
             
-            total_establishments_in_region = establishment.__class__.objects.filter(
-                state=establishment.state
-            ).count()
+            total_establishments_in_region = context.establishments_in_state(establishment.state)
             
             if total_establishments_in_region > 0:
                 adoption_rate = similar_offsets / total_establishments_in_region
@@ -448,35 +509,28 @@ class VerificationService:
 
         return result
 
-    def _check_cumulative_limits(self, carbon_entry) -> Dict[str, Any]:
+    def _check_cumulative_limits(self, carbon_entry, context: Optional[VerificationContext] = None) -> Dict[str, Any]:
         """Check cumulative offset limits to prevent gaming through many small entries."""
+        context = context or VerificationContext(self)
         result = {'violations': [], 'requirements': []}
         
         if carbon_entry.verification_level != 'certified_project':
-            establishment = carbon_entry.establishment
-            user = carbon_entry.created_by
+            # Self-reported offsets of the establishment and of the user, each held to the limits
+            totals = []
+            if carbon_entry.establishment_id:
+                totals.append(context.establishment_totals(carbon_entry.establishment_id))
+            if carbon_entry.created_by_id:
+                totals.append(context.user_totals(carbon_entry.created_by_id))
             
             # Monthly limit check
-            month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            monthly_total = CarbonEntry.objects.filter(
-                Q(establishment=establishment) | Q(created_by=user),
-                type='offset',
-                verification_level='self_reported',
-                created_at__gte=month_start
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            monthly_total = max((scope['month_self_reported'] for scope in totals), default=0)
             
             if monthly_total + carbon_entry.amount > self.MONTHLY_SELF_REPORTED_LIMIT:
                 result['violations'].append('monthly_limit_exceeded')
                 result['requirements'].append(f'Monthly limit of {self.MONTHLY_SELF_REPORTED_LIMIT} kg CO2e exceeded. Use certified projects for larger offsets.')
             
             # Annual limit check
-            year_start = timezone.now().replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-            annual_total = CarbonEntry.objects.filter(
-                Q(establishment=establishment) | Q(created_by=user),
-                type='offset',
-                verification_level='self_reported',
-                created_at__gte=year_start
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            annual_total = max((scope['year_self_reported'] for scope in totals), default=0)
             
             if annual_total + carbon_entry.amount > self.ANNUAL_SELF_REPORTED_LIMIT:
                 result['violations'].append('high_cumulative_threshold_exceeded')
@@ -484,17 +538,16 @@ class VerificationService:
 
         return result
 
-    def _analyze_submission_patterns(self, carbon_entry) -> Dict[str, Any]:
+    def _analyze_submission_patterns(self, carbon_entry, context: Optional[VerificationContext] = None) -> Dict[str, Any]:
         """Detect rapid submission patterns that may indicate gaming."""
+        context = context or VerificationContext(self)
         result = {'suspicious': False, 'flags': [], 'requirements': []}
         
         # Check submissions in last 24 hours
-        day_ago = timezone.now() - timedelta(days=1)
-        recent_submissions = CarbonEntry.objects.filter(
-            created_by=carbon_entry.created_by,
-            type='offset',
-            created_at__gte=day_ago
-        ).count()
+        recent_submissions = (
+            context.user_totals(carbon_entry.created_by_id)['recent_offsets']
+            if carbon_entry.created_by_id else 0
+        )
         
         if recent_submissions >= self.RAPID_SUBMISSION_THRESHOLD:
             result['suspicious'] = True
@@ -502,13 +555,7 @@ class VerificationService:
             result['requirements'].append(f'More than {self.RAPID_SUBMISSION_THRESHOLD} offset entries in 24 hours. Please consolidate entries or upgrade verification level.')
 
         # Check for identical entries (copy-paste behavior)
-        similar_entries = CarbonEntry.objects.filter(
-            created_by=carbon_entry.created_by,
-            type='offset',
-            amount=carbon_entry.amount,
-            description=carbon_entry.description,
-            created_at__gte=day_ago
-        ).count()
+        similar_entries = context.identical_recent_offsets(carbon_entry)
         
         if similar_entries > 1:
             result['suspicious'] = True
@@ -517,25 +564,19 @@ class VerificationService:
 
         return result
 
-    def _check_offset_emission_ratio(self, carbon_entry) -> Dict[str, Any]:
+    def _check_offset_emission_ratio(self, carbon_entry, context: Optional[VerificationContext] = None) -> Dict[str, Any]:
         """Check if offset-to-emission ratio is realistic."""
+        context = context or VerificationContext(self)
         result = {'unrealistic': False, 'flags': [], 'requirements': []}
         
-        establishment = carbon_entry.establishment
-        if establishment:
-            # Get total emissions for this establishment
-            total_emissions = CarbonEntry.objects.filter(
-                establishment=establishment,
-                type='emission'
-            ).aggregate(total=Sum('amount'))['total'] or 0
+        if carbon_entry.establishment_id:
+            totals = context.establishment_totals(carbon_entry.establishment_id)
             
-            # Get total offsets (including this one)
-            total_offsets = CarbonEntry.objects.filter(
-                establishment=establishment,
-                type='offset'
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            # Total emissions for this establishment
+            total_emissions = totals['emissions']
             
-            total_offsets += carbon_entry.amount
+            # Get total offsets (including this one)
+            total_offsets = totals['offsets'] + carbon_entry.amount
             
             if total_emissions > 0:
                 offset_ratio = total_offsets / total_emissions
@@ -547,8 +588,9 @@ class VerificationService:
 
         return result
 
-    def _validate_acreage_capacity(self, carbon_entry) -> Dict[str, Any]:
+    def _validate_acreage_capacity(self, carbon_entry, context: Optional[VerificationContext] = None) -> Dict[str, Any]:
         """Validate that offset claims don't exceed farm acreage capacity."""
+        context = context or VerificationContext(self)
         result = {'exceeds_capacity': False, 'flags': [], 'requirements': []}
         
         establishment = carbon_entry.establishment
@@ -560,12 +602,7 @@ class VerificationService:
                 max_annual_capacity = establishment.total_area * max_offset_per_hectare
                 
                 # Check annual offsets for this establishment
-                year_start = timezone.now().replace(month=1, day=1)
-                annual_offsets = CarbonEntry.objects.filter(
-                    establishment=establishment,
-                    type='offset',
-                    created_at__gte=year_start
-                ).aggregate(total=Sum('amount'))['total'] or 0
+                annual_offsets = context.establishment_totals(establishment.id)['year_offsets']
                 
                 annual_offsets += carbon_entry.amount
                 
@@ -10,6 +10,7 @@ API Documentation: https://www.weather.gov/documentation/services-web-api
 
 import requests
 import logging
+import threading
 from datetime import datetime, timedelta
 from django.conf import settings
 from django.utils import timezone
@@ -31,18 +32,43 @@ class WeatherService:
     
     Provides real-time weather data, alerts, and agricultural recommendations
     based on current and forecasted conditions.
+    
+    Locations are resolved to their NOAA forecast grid cell (about 2.5 km), and
+    current conditions are fetched and cached per cell, so nearby establishments
+    share one observation request.
     """
     
+    # NOAA's /points endpoint accepts at most four decimals
+    COORDINATE_PRECISION = 4
+    
+    # The grid and its nearest stations don't move; locations outside NOAA coverage are retried sooner
+    GRID_POINT_TTL = 30 * 24 * 60 * 60
+    NO_GRID_POINT_TTL = 6 * 60 * 60
+    
+    # Current conditions per cell (stations report roughly hourly)
+    CONDITIONS_TTL = 30 * 60
+    
+    # Cell size for locations outside NOAA coverage, in degrees (about 2.5 km)
+    BACKUP_CELL_DEGREES = 0.025
+    
     def __init__(self):
         self.noaa_base_url = "https://api.weather.gov"
         self.backup_api_key = getattr(settings, 'OPENWEATHER_API_KEY', None)
         self.backup_base_url = "https://api.openweathermap.org/data/2.5"
-        
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Trazo Carbon Tracking Platform (contact@trazo.io)',
-            'Accept': 'application/json'
-        })
+        self._local = threading.local()
+    
+    @property
+    def session(self) -> requests.Session:
+        """HTTP session of the current thread; cells may be fetched from a thread pool."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({
+                'User-Agent': 'Trazo Carbon Tracking Platform (contact@trazo.io)',
+                'Accept': 'application/json'
+            })
+            self._local.session = session
+        return session
     
     def get_current_conditions(self, lat: float, lng: float) -> Dict[str, Any]:
         """
@@ -55,34 +81,92 @@ class WeatherService:
         Returns:
             Current weather data including temperature, humidity, wind, etc.
         """
-        try:
-            # First try NOAA API (free, no key required for US locations)
-            return self._get_noaa_current_conditions(lat, lng)
-        except Exception as e:
-            logger.warning(f"NOAA API failed, trying backup: {e}")
-            # Fallback to OpenWeatherMap if NOAA fails
-            return self._get_backup_current_conditions(lat, lng)
+        return self.conditions_for_cell(self.cell_for(lat, lng))
+    
+    def cell_for(self, lat: float, lng: float) -> Dict[str, Any]:
+        """
+        The weather cell of a location: its NOAA grid cell and nearest observation
+        station, or a ``BACKUP_CELL_DEGREES`` tile outside NOAA coverage. ``key``
+        identifies the cell; ``lat``/``lng`` is the location used for backup lookups.
+        """
+        lat, lng = round(lat, self.COORDINATE_PRECISION), round(lng, self.COORDINATE_PRECISION)
+        point = self.grid_point(lat, lng)
+        if point:
+            return {**point, 'lat': lat, 'lng': lng}
+        
+        size = self.BACKUP_CELL_DEGREES
+        row, column = int(lat // size), int(lng // size)
+        return {'key': f"tile:{row}:{column}", 'station_id': None, 'lat': lat, 'lng': lng}
     
-    def _get_noaa_current_conditions(self, lat: float, lng: float) -> Dict[str, Any]:
-        """Get current conditions from NOAA Weather Service."""
+    def grid_point(self, lat: float, lng: float) -> Optional[Dict[str, Any]]:
+        """
+        NOAA grid cell, nearest observation station and forecast URL of a location,
+        cached for ``GRID_POINT_TTL``. ``None`` when NOAA can't resolve it.
+        """
+        lat, lng = round(lat, self.COORDINATE_PRECISION), round(lng, self.COORDINATE_PRECISION)
+        cache_key = f"weather_grid_point:{lat},{lng}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached or None
+        
         try:
-            # Get the weather station for this location
             points_url = f"{self.noaa_base_url}/points/{lat},{lng}"
             points_response = self.session.get(points_url)
             points_response.raise_for_status()
-            points_data = points_response.json()
+            properties = points_response.json()['properties']
             
-            # Get current observations
-            stations_url = points_data['properties']['observationStations']
-            stations_response = self.session.get(stations_url)
+            # Nearest observation station for this grid point
+            stations_response = self.session.get(properties['observationStations'])
             stations_response.raise_for_status()
             stations_data = stations_response.json()
             
             if not stations_data['features']:
                 raise WeatherAPIError("No weather stations found for location")
             
+            point = {
+                'key': f"noaa:{properties['gridId']}:{properties['gridX']},{properties['gridY']}",
+                'station_id': stations_data['features'][0]['properties']['stationIdentifier'],
+                'forecast_url': properties.get('forecast'),
+            }
+        except Exception as e:
+            logger.warning(f"Could not resolve NOAA grid point for {lat},{lng}: {e}")
+            response = getattr(e, 'response', None)
+            if response is not None and response.status_code == 404:
+                # Outside NOAA coverage: cache the miss as an empty dict so it isn't retried every poll
+                cache.set(cache_key, {}, self.NO_GRID_POINT_TTL)
+            return None
+        
+        cache.set(cache_key, point, self.GRID_POINT_TTL)
+        return point
+    
+    def conditions_for_cell(self, cell: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Current conditions of a cell (see ``cell_for``), cached for ``CONDITIONS_TTL``.
+        Uses the cell's NOAA station, falling back to OpenWeatherMap.
+        """
+        cache_key = f"weather_conditions:{cell['key']}"
+        conditions = cache.get(cache_key)
+        if conditions:
+            return conditions
+        
+        conditions = None
+        if cell.get('station_id'):
+            try:
+                # First try NOAA API (free, no key required for US locations)
+                conditions = self._get_noaa_current_conditions(cell['station_id'])
+            except Exception as e:
+                logger.warning(f"NOAA API failed, trying backup: {e}")
+        if conditions is None:
+            # Fallback to OpenWeatherMap if NOAA fails
+            conditions = self._get_backup_current_conditions(cell['lat'], cell['lng'])
+        
+        cache.set(cache_key, conditions, self.CONDITIONS_TTL)
+        return conditions
+    
+    def _get_noaa_current_conditions(self, station_id: str) -> Dict[str, Any]:
+        """Get current conditions from a NOAA observation station."""
+        try:
             # Get observations from the nearest station
-            station_id = stations_data['features'][0]['properties']['stationIdentifier']
             obs_url = f"{self.noaa_base_url}/stations/{station_id}/observations/latest"
             obs_response = self.session.get(obs_url)
             obs_response.raise_for_status()
@@ -205,12 +289,11 @@ class WeatherService:
         """
         try:
             # Get forecast from NOAA
-            points_url = f"{self.noaa_base_url}/points/{lat},{lng}"
-            points_response = self.session.get(points_url)
-            points_response.raise_for_status()
-            points_data = points_response.json()
+            point = self.grid_point(lat, lng)
+            if not point or not point.get('forecast_url'):
+                raise WeatherAPIError("No NOAA forecast for location")
             
-            forecast_url = points_data['properties']['forecast']
+            forecast_url = point['forecast_url']
             forecast_response = self.session.get(forecast_url)
             forecast_response.raise_for_status()
             forecast_data = forecast_response.json()
@@ -0,0 +1,133 @@
+"""
+Hourly weather monitoring, polled per weather cell.
+
+Nearby establishments share a NOAA forecast grid cell (about 2.5 km), so the
+monitor resolves every distinct location to its cell, fetches current
+conditions once per cell and fans them out to all establishments in it. Cell
+lookups and fetches run in a bounded thread pool, and both the location→cell
+mapping and each cell's conditions are cached by ``WeatherService``. The hourly
+run therefore scales with distinct cells rather than establishments.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from common.concurrency import bounded_map
+from company.models import Establishment
+from .weather_api import WeatherService
+
+logger = logging.getLogger(__name__)
+
+
+class WeatherMonitor:
+    """
+    Checks current conditions for every located establishment and queues weather alerts.
+    """
+
+    # Concurrent weather API requests
+    MAX_WORKERS = getattr(settings, 'WEATHER_POLL_CONCURRENCY', 8)
+
+    def __init__(self, weather_service: Optional[WeatherService] = None):
+        self.weather_service = weather_service or WeatherService()
+
+    def establishments(self) -> List[Establishment]:
+        """Establishments with location data."""
+        return list(
+            Establishment.objects.filter(latitude__isnull=False, longitude__isnull=False)
+            .exclude(latitude=0, longitude=0)
+            .only('id', 'latitude', 'longitude', 'establishment_type')
+        )
+
+    def run(self) -> Dict[str, Any]:
+        from ..tasks import create_weather_alert_event
+
+        establishments = self.establishments()
+        logger.info(f"Monitoring weather for {len(establishments)} establishments")
+
+        precision = self.weather_service.COORDINATE_PRECISION
+        location_of = {
+            establishment.id: (
+                round(float(establishment.latitude), precision),
+                round(float(establishment.longitude), precision),
+            )
+            for establishment in establishments
+        }
+        locations = list(set(location_of.values()))
+        cell_of = dict(zip(locations, bounded_map(lambda location: self._cell(*location), locations, self.MAX_WORKERS)))
+
+        cells: Dict[str, Dict[str, Any]] = {}
+        establishments_by_cell = defaultdict(list)
+        for establishment in establishments:
+            cell = cell_of[location_of[establishment.id]]
+            if cell is None:
+                continue
+            cells.setdefault(cell['key'], cell)
+            establishments_by_cell[cell['key']].append(establishment)
+
+        conditions = dict(zip(cells, bounded_map(self._conditions, cells.values(), self.MAX_WORKERS)))
+
+        establishments_processed = 0
+        alerts_created = 0
+        for key, cell_establishments in establishments_by_cell.items():
+            weather_data = conditions[key]
+            if not weather_data:
+                logger.warning(
+                    f"No weather data for cell {key} "
+                    f"(establishments {[establishment.id for establishment in cell_establishments]})"
+                )
+                continue
+
+            # Same conditions for the whole cell; the alert decision doesn't depend on the establishment
+            should_alert = self.weather_service.should_trigger_alert(weather_data)
+            for establishment in cell_establishments:
+                try:
+                    if should_alert:
+                        # Generate agricultural recommendations
+                        recommendations = self.weather_service.generate_agricultural_recommendations(
+                            weather_data,
+                            establishment.establishment_type or 'general'
+                        )
+
+                        # Create weather alert event
+                        create_weather_alert_event.delay(establishment.id, weather_data, recommendations)
+                        alerts_created += 1
+                        logger.info(f"Weather alert created for establishment {establishment.id}")
+
+                    establishments_processed += 1
+
+                except Exception as e:
+                    logger.error(f"Error processing weather for establishment {establishment.id}: {e}")
+
+        logger.info(
+            f"Weather monitoring completed: {establishments_processed} processed in {len(cells)} cells "
+            f"({len(locations)} locations), {alerts_created} alerts created"
+        )
+        return {
+            'status': 'success',
+            'establishments_processed': establishments_processed,
+            'locations': len(locations),
+            'cells': len(cells),
+            'alerts_created': alerts_created,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    def _cell(self, lat: float, lng: float) -> Optional[Dict[str, Any]]:
+        try:
+            return self.weather_service.cell_for(lat, lng)
+        except Exception as e:
+            logger.error(f"Error resolving weather cell for {lat},{lng}: {e}")
+            return None
+
+    def _conditions(self, cell: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            return self.weather_service.conditions_for_cell(cell)
+        except Exception as e:
+            logger.error(f"Error fetching weather for cell {cell['key']}: {e}")
+            return None
+
+
+weather_monitor = WeatherMonitor()
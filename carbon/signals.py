@@ -0,0 +1,120 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from history.models import History, WeatherEvent, ChemicalEvent, ProductionEvent, GeneralEvent, EquipmentEvent, SoilManagementEvent, PestManagementEvent
+from common.cache_tags import benchmark_tag, establishment_tag, production_tag, tagged_cache
+from common.models import GalleryImage
+from company.models import Company, Establishment
+from .models import CarbonEntry, CarbonBenchmark
+from .services.production_snapshot import production_snapshot_service
+from .services.carbon_ledger import carbon_ledger
+import logging
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_EVENT_MODELS = (
+    WeatherEvent,
+    ChemicalEvent,
+    ProductionEvent,
+    GeneralEvent,
+    EquipmentEvent,
+    SoilManagementEvent,
+    PestManagementEvent,
+)
+
+
+@receiver(post_save, sender=CarbonEntry)
+@receiver(post_delete, sender=CarbonEntry)
+def invalidate_snapshot_on_entry_change(sender, instance, **kwargs):
+    """Mark production carbon snapshots stale when one of their entries changes."""
+    try:
+        production_snapshot_service.invalidate_for_entry(instance)
+    except Exception as e:
+        logger.error(f"Error invalidating carbon snapshot for entry {instance.id}: {e}")
+
+
+# Running offset/emission totals (see carbon/services/carbon_ledger.py). Not wrapped
+# in try/except: the ledger is updated in the entry's transaction or not at all.
+
+@receiver(pre_save, sender=CarbonEntry)
+def capture_entry_ledger_state(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._ledger_state = carbon_ledger.stored_state(instance)
+
+
+@receiver(post_save, sender=CarbonEntry)
+def update_ledger_on_entry_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        carbon_ledger.record_change(getattr(instance, '_ledger_state', None), carbon_ledger.state(instance))
+
+
+@receiver(post_delete, sender=CarbonEntry)
+def update_ledger_on_entry_delete(sender, instance, **kwargs):
+    carbon_ledger.record_change(carbon_ledger.state(instance), None)
+
+
+@receiver(post_save, sender=CarbonBenchmark)
+@receiver(pre_delete, sender=CarbonBenchmark)
+def invalidate_snapshot_on_benchmark_change(sender, instance, **kwargs):
+    """
+    Mark snapshots scored against a benchmark stale. Uses pre_delete so the
+    snapshot -> benchmark link has not yet been nulled when we look it up.
+    """
+    try:
+        production_snapshot_service.invalidate_for_benchmark(instance)
+        tagged_cache.invalidate(benchmark_tag(instance.crop_type, instance.year))
+    except Exception as e:
+        logger.error(f"Error invalidating carbon snapshots for benchmark {instance.id}: {e}")
+
+
+def invalidate_snapshot_on_event_change(sender, instance, **kwargs):
+    """Mark the production's snapshot stale when one of its events changes."""
+    try:
+        production_snapshot_service.mark_stale([instance.history_id])
+    except Exception as e:
+        logger.error(f"Error invalidating carbon snapshot for {sender.__name__} {instance.id}: {e}")
+
+
+for event_model in SNAPSHOT_EVENT_MODELS:
+    post_save.connect(
+        invalidate_snapshot_on_event_change,
+        sender=event_model,
+        dispatch_uid=f'carbon_snapshot_{event_model.__name__}_saved'
+    )
+    post_delete.connect(
+        invalidate_snapshot_on_event_change,
+        sender=event_model,
+        dispatch_uid=f'carbon_snapshot_{event_model.__name__}_deleted'
+    )
+
+
+# Public response caches (see common/cache_tags.py). Carbon entry, event and
+# benchmark changes reach them through the snapshot invalidation above.
+
+@receiver(post_save, sender=History)
+@receiver(post_delete, sender=History)
+def invalidate_production_cache(sender, instance, **kwargs):
+    tagged_cache.invalidate(production_tag(instance.id))
+
+
+@receiver(post_save, sender=Establishment)
+@receiver(post_delete, sender=Establishment)
+def invalidate_establishment_cache(sender, instance, **kwargs):
+    tagged_cache.invalidate(establishment_tag(instance.id))
+
+
+@receiver(post_save, sender=Company)
+def invalidate_company_establishments_cache(sender, instance, **kwargs):
+    establishment_ids = instance.establishment_set.values_list('id', flat=True)
+    tagged_cache.invalidate(*[establishment_tag(establishment_id) for establishment_id in establishment_ids])
+
+
+@receiver(post_save, sender=GalleryImage)
+@receiver(post_delete, sender=GalleryImage)
+def invalidate_gallery_owner_cache(sender, instance, **kwargs):
+    """Productions and establishments show their album's images."""
+    production_ids = History.objects.filter(album_id=instance.gallery_id).values_list('id', flat=True)
+    establishment_ids = Establishment.objects.filter(album_id=instance.gallery_id).values_list('id', flat=True)
+    tagged_cache.invalidate(
+        *[production_tag(production_id) for production_id in production_ids],
+        *[establishment_tag(establishment_id) for establishment_id in establishment_ids],
+    )
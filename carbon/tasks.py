@@ -10,20 +10,22 @@ This module contains background tasks for:
 
 from celery import shared_task
 from django.db.models import Sum, Avg, Count
-from .models import CarbonEntry, CarbonReport, CarbonBenchmark, SustainabilityBadge, CarbonAuditLog, IoTDevice, IoTDataPoint, Establishment, Production
+from .models import CarbonEntry, CarbonReport, CarbonBenchmark, SustainabilityBadge, CarbonAuditLog, IoTDevice, IoTDataPoint
+from history.models import History as Production
 from django.utils import timezone
 from datetime import timedelta, datetime
 from django.contrib.auth import get_user_model
 from django.conf import settings
 import logging
-from .services.weather_api import WeatherService, get_weather_service
+from .services.weather_api import WeatherService
 from .services.john_deere_api import get_john_deere_api
 from company.models import Establishment, Company
 from product.models import Product
-from .services.blockchain import BlockchainService
+from .services.blockchain import BlockchainCarbonService as BlockchainService
 from .services.real_usda_integration import RealUSDAAPIClient
 from .services.usda_cache_service import specialized_cache, CacheStrategy
 from .services.api_circuit_breaker import usda_circuit_breakers
+from .services.iot_rollups import iot_rollups
 import hashlib
 import json
 
@@ -44,57 +46,76 @@ def update_carbon_summaries():
 @shared_task
 def generate_carbon_report(report_id):
     """
-    Task to generate a carbon report in the background.
+    Task to generate a carbon report's PDF document in the background.
     """
+    return render_carbon_reports([report_id])
+
+
+@shared_task
+def render_carbon_reports(report_ids):
+    """
+    Render PDF documents for a batch of carbon reports. Reports whose content
+    hasn't changed since their last render are skipped.
+
+    Args:
+        report_ids: list of CarbonReport ids
+    """
+    from .services.report_generator import report_generator
+
     try:
-        report = CarbonReport.objects.get(id=report_id)
-        # Placeholder for report generation logic (e.g., PDF creation)
-        print(f'Generating report {report_id} for {report.year}')
-        # Update report status or save generated file path
-        report.document = 'path/to/generated/report.pdf'  # Placeholder
-        report.save()
-        return f'Report {report_id} generated'
-    except CarbonReport.DoesNotExist:
-        return f'Report {report_id} not found'
+        reports = CarbonReport.objects.filter(id__in=report_ids).select_related('establishment', 'production')
+        stats = report_generator.generate_many(reports)
+        return {
+            'status': 'success',
+            'timestamp': timezone.now().isoformat(),
+            **stats
+        }
+
+    except Exception as e:
+        logger.error(f"Error rendering carbon reports {report_ids[:5]}...: {e}")
+        return {'status': 'error', 'message': str(e)}
+
 
 @shared_task
 def generate_nightly_reports():
-    """Generate carbon reports for all establishments and productions."""
-    yesterday = timezone.now().date() - timedelta(days=1)
-    
-    # Generate establishment reports
-    establishments = Establishment.objects.all()
-    for establishment in establishments:
-        entries = CarbonEntry.objects.filter(
-            establishment=establishment,
-            timestamp__date=yesterday
-        )
-        
-        total_emissions = entries.filter(type='emission').aggregate(Sum('co2e_amount'))['co2e_amount__sum'] or 0
-        total_offsets = entries.filter(type='offset').aggregate(Sum('co2e_amount'))['co2e_amount__sum'] or 0
-        net_footprint = total_emissions - total_offsets
-        
-        # Calculate carbon score
-        industry_average = CarbonBenchmark.objects.filter(
-            year=yesterday.year
-        ).aggregate(Avg('average_emissions'))['average_emissions__avg'] or 0
-        
-        carbon_score = 100
-        if industry_average > 0:
-            ratio = net_footprint / industry_average
-            carbon_score = max(1, min(100, int(100 * (1 - ratio))))
-        
-        # Create report
-        CarbonReport.objects.create(
-            establishment=establishment,
-            period_start=yesterday,
-            period_end=yesterday,
-            total_emissions=total_emissions,
-            total_offsets=total_offsets,
-            net_footprint=net_footprint,
-            carbon_score=carbon_score,
-            generated_at=timezone.now()
+    """
+    Generate yesterday's carbon reports for all establishments, sharded across
+    workers by establishment id (see carbon/services/nightly_reports.py).
+    """
+    from .services.nightly_reports import nightly_report_engine
+
+    return nightly_report_engine.dispatch()
+
+
+@shared_task
+def generate_nightly_report_shard(report_date, first_id, last_id, industry_average=None):
+    """
+    Generate one day's carbon reports for establishments first_id..last_id.
+
+    Args:
+        report_date: ISO date the reports cover
+        first_id, last_id: inclusive establishment id range
+        industry_average: benchmark average computed once by the coordinator
+    """
+    from .services.nightly_reports import nightly_report_engine
+
+    try:
+        written = nightly_report_engine.generate_shard(
+            datetime.fromisoformat(report_date).date(), first_id, last_id, industry_average
         )
+        return {
+            'status': 'success',
+            'reports': written,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"Nightly report shard {first_id}-{last_id} failed: {e}")
+        return {
+            'status': 'error',
+            'error': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
 
 @shared_task
 def award_sustainability_badges():
@@ -213,75 +234,16 @@ def monitor_weather_conditions():
     """
     Monitor weather conditions for all establishments and create alerts when needed.
     
-    This task runs every hour to check weather conditions for all establishments
-    that have weather monitoring enabled and creates appropriate alerts and
-    recommendations.
+    This task runs every hour. Conditions are fetched once per weather grid cell,
+    concurrently, and shared by all establishments in the cell
+    (see carbon/services/weather_monitoring.py).
     """
+    from .services.weather_monitoring import weather_monitor
+
     logger.info("Starting weather monitoring task")
     
     try:
-        weather_service = get_weather_service()
-        establishments_processed = 0
-        alerts_created = 0
-        
-        # Get all establishments with location data
-        establishments = Establishment.objects.filter(
-            latitude__isnull=False,
-            longitude__isnull=False
-        ).exclude(
-            latitude=0,
-            longitude=0
-        )
-        
-        logger.info(f"Monitoring weather for {establishments.count()} establishments")
-        
-        for establishment in establishments:
-            try:
-                # Get current weather conditions
-                weather_data = weather_service.get_current_conditions(
-                    float(establishment.latitude),
-                    float(establishment.longitude)
-                )
-                
-                if not weather_data:
-                    logger.warning(f"No weather data for establishment {establishment.id}")
-                    continue
-                
-                # Check if weather conditions warrant an alert
-                should_alert = weather_service.should_trigger_alert(weather_data)
-                
-                if should_alert:
-                    # Generate agricultural recommendations
-                    recommendations = weather_service.generate_agricultural_recommendations(
-                        weather_data,
-                        getattr(establishment, 'establishment_type', 'general')
-                    )
-                    
-                    # Create weather alert event
-                    alert_created = create_weather_alert_event.delay(
-                        establishment.id,
-                        weather_data,
-                        recommendations
-                    )
-                    
-                    if alert_created:
-                        alerts_created += 1
-                        logger.info(f"Weather alert created for establishment {establishment.id}")
-                
-                establishments_processed += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing weather for establishment {establishment.id}: {e}")
-                continue
-        
-        logger.info(f"Weather monitoring completed: {establishments_processed} processed, {alerts_created} alerts created")
-        
-        return {
-            'status': 'success',
-            'establishments_processed': establishments_processed,
-            'alerts_created': alerts_created,
-            'timestamp': timezone.now().isoformat()
-        }
+        return weather_monitor.run()
         
     except Exception as e:
         logger.error(f"Weather monitoring task failed: {e}")
@@ -367,9 +329,12 @@ def sync_john_deere_devices():
     """
     Sync data from John Deere API for all connected devices.
     
-    This task runs every 30 minutes to fetch the latest data from
-    John Deere equipment and create appropriate IoT data points.
+    This task runs every 30 minutes to fetch the data each device recorded
+    since its last sync, for several devices at a time, and create IoT data
+    points (see carbon/services/john_deere_sync.py).
     """
+    from .services.john_deere_sync import JohnDeereSyncEngine
+
     logger.info("Starting John Deere device sync task")
     
     try:
@@ -378,66 +343,11 @@ def sync_john_deere_devices():
             logger.warning("John Deere API not configured, skipping sync")
             return {'status': 'skipped', 'reason': 'API not configured'}
         
-        devices_synced = 0
-        data_points_created = 0
-        
-        # Get all IoT devices with John Deere machine IDs
-        devices = IoTDevice.objects.filter(
-            john_deere_machine_id__isnull=False,
-            api_connection_status='connected'
-        ).exclude(john_deere_machine_id='')
-        
-        logger.info(f"Syncing {devices.count()} John Deere devices")
-        
-        for device in devices:
-            try:
-                # Get machine data from John Deere API
-                machine_data = john_deere_api.get_machine_fuel_data(device.john_deere_machine_id)
-                
-                if machine_data:
-                    # Create IoT data point
-                    data_point = IoTDataPoint.objects.create(
-                        device=device,
-                        timestamp=timezone.now(),
-                        data={
-                            'fuel_consumption': machine_data,
-                            'source': 'john_deere_api_sync',
-                            'machine_id': device.john_deere_machine_id,
-                            'sync_type': 'scheduled'
-                        },
-                        quality_score=0.95,
-                        processed=False
-                    )
-                    
-                    data_points_created += 1
-                    
-                    # Update device status
-                    device.last_api_sync = timezone.now()
-                    device.api_connection_status = 'connected'
-                    device.update_status('online')
-                    device.increment_data_points()
-                    device.save()
-                    
-                    logger.info(f"Synced data for device {device.id}: {data_point.id}")
-                
-                devices_synced += 1
-                
-            except Exception as e:
-                logger.error(f"Error syncing device {device.id}: {e}")
-                
-                # Update device error status
-                device.api_connection_status = 'error'
-                device.api_error_message = str(e)
-                device.save()
-                
-                continue
-        
-        logger.info(f"John Deere sync completed: {devices_synced} devices, {data_points_created} data points")
+        stats = JohnDeereSyncEngine(john_deere_api).sync()
         
         return {
             'status': 'success',
-            'devices_synced': devices_synced,
-            'data_points_created': data_points_created,
+            **stats,
             'timestamp': timezone.now().isoformat()
         }
         
@@ -454,64 +364,22 @@ def process_pending_iot_data():
     """
     Process pending IoT data points and create carbon entries where appropriate.
     
-    This task runs every 15 minutes to process unprocessed IoT data points
-    through the unified workflow.
+    This task runs every 15 minutes and fans devices with pending readings out to
+    process_iot_device_data, which works through them in chunks
+    (see carbon/services/iot_ingestion.py).
     """
+    from .services.iot_ingestion import iot_ingestion_pipeline
+
     logger.info("Starting IoT data processing task")
     
     try:
-        # Get unprocessed data points
-        pending_data_points = IoTDataPoint.objects.filter(
-            processed=False,
-            timestamp__gte=timezone.now() - timedelta(hours=24)  # Only process recent data
-        ).order_by('timestamp')
-        
-        logger.info(f"Processing {pending_data_points.count()} pending data points")
+        stats = iot_ingestion_pipeline.dispatch()
         
-        processed_count = 0
-        auto_approved_count = 0
-        manual_approval_count = 0
-        
-        for data_point in pending_data_points:
-            try:
-                # Determine confidence score based on data quality and type
-                confidence = calculate_data_point_confidence(data_point)
-                
-                if confidence > 0.9:
-                    # High confidence - auto-approve and create carbon entry if applicable
-                    if should_create_carbon_entry(data_point):
-                        carbon_entry = create_carbon_entry_from_data_point(data_point)
-                        if carbon_entry:
-                            data_point.carbon_entry = carbon_entry
-                            auto_approved_count += 1
-                    
-                    data_point.processed = True
-                    data_point.save()
-                    
-                elif confidence > 0.7:
-                    # Medium confidence - mark for manual approval
-                    # Data point remains unprocessed for manual review
-                    manual_approval_count += 1
-                    
-                else:
-                    # Low confidence - mark as processed but flag for review
-                    data_point.processed = True
-                    data_point.anomaly_detected = True
-                    data_point.save()
-                
-                processed_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing data point {data_point.id}: {e}")
-                continue
-        
-        logger.info(f"IoT data processing completed: {processed_count} processed, {auto_approved_count} auto-approved, {manual_approval_count} pending manual approval")
+        logger.info(f"IoT data processing dispatched for {stats['devices']} devices")
         
         return {
             'status': 'success',
-            'processed_count': processed_count,
-            'auto_approved_count': auto_approved_count,
-            'manual_approval_count': manual_approval_count,
+            **stats,
             'timestamp': timezone.now().isoformat()
         }
         
@@ -523,6 +391,37 @@ def process_pending_iot_data():
             'timestamp': timezone.now().isoformat()
         }
 
+
+@shared_task
+def process_iot_device_data(device_id, since=None):
+    """
+    Process one device's pending IoT data points in chunks.
+
+    Args:
+        device_id: IoTDevice primary key
+        since: ISO timestamp of the oldest reading to process (defaults to the last 24 hours)
+    """
+    from .services.iot_ingestion import iot_ingestion_pipeline
+
+    try:
+        since = datetime.fromisoformat(since) if since else None
+        stats = iot_ingestion_pipeline.process_device(device_id, since)
+        return {
+            'status': 'success',
+            'device_id': device_id,
+            **stats,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"IoT data processing failed for device {device_id}: {e}")
+        return {
+            'status': 'error',
+            'device_id': device_id,
+            'error': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
 def calculate_data_point_confidence(data_point):
     """
     Calculate confidence score for an IoT data point.
@@ -621,6 +520,52 @@ def create_carbon_entry_from_data_point(data_point):
         logger.error(f"Error creating carbon entry from data point {data_point.id}: {e}")
         return None
 
+@shared_task
+def rollup_iot_readings():
+    """
+    Fold recently received IoT readings into the minute/hour/day rollups
+    (see carbon/services/iot_rollups.py).
+    """
+    try:
+        stats = iot_rollups.refresh()
+        return {
+            'status': 'success',
+            **stats,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"IoT rollup task failed: {e}")
+        return {
+            'status': 'error',
+            'error': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
+@shared_task
+def prune_carbon_ledger():
+    """
+    Drop hour buckets of the offset/emission ledger that have left the rolling
+    24-hour window (see carbon/services/carbon_ledger.py).
+    """
+    from .services.carbon_ledger import carbon_ledger
+
+    try:
+        deleted = carbon_ledger.prune()
+        return {
+            'status': 'success',
+            'deleted_buckets': deleted,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"Carbon ledger prune task failed: {e}")
+        return {
+            'status': 'error',
+            'error': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
 @shared_task
 def cleanup_old_iot_data():
     """
@@ -644,11 +589,15 @@ def cleanup_old_iot_data():
         deleted_count = old_data_points.count()
         old_data_points.delete()
         
-        logger.info(f"Cleaned up {deleted_count} old IoT data points")
+        # Aggregated history outlives the raw readings; only expired resolutions go
+        deleted_rollups = iot_rollups.prune()
+        
+        logger.info(f"Cleaned up {deleted_count} old IoT data points and {sum(deleted_rollups.values())} expired rollups")
         
         return {
             'status': 'success',
             'deleted_count': deleted_count,
+            'deleted_rollups': deleted_rollups,
             'cutoff_date': cutoff_date.isoformat(),
             'timestamp': timezone.now().isoformat()
         }
@@ -912,28 +861,11 @@ def schedule_monthly_audits():
 def process_pending_verifications():
     """Process pending verification requests"""
     try:
-        from .models import CarbonEntry
-        from .services.verification_service import VerificationService
+        from .services.batch_verification import BatchVerificationEngine
         
-        verification_service = VerificationService()
-        pending_entries = CarbonEntry.objects.filter(
-            type='offset',
-            verification_level='self_reported',
-            audit_status='pending'
-        )
-
-        processed_count = 0
-        for entry in pending_entries:
-            try:
-                result = verification_service.verify_offset_entry(entry)
-                if result['approved']:
-                    entry.audit_status = 'passed'
-                else:
-                    entry.audit_status = 'failed'
-                entry.save()
-                processed_count += 1
-            except Exception as e:
-                logger.error(f"Error processing verification for entry {entry.id}: {e}")
+        # Verified in chunks against preloaded context and saved with bulk updates
+        stats = BatchVerificationEngine().process_pending()
+        processed_count = stats['processed']
 
         logger.info(f"Processed {processed_count} verification requests")
         return f"Processed {processed_count} verification requests"
@@ -1246,4 +1178,77 @@ def reset_circuit_breakers_if_needed():
         
     except Exception as e:
         logger.error(f"Failed to reset circuit breakers: {e}")
-        return {'success': False, 'error': str(e)} 
\ No newline at end of file
+        return {'success': False, 'error': str(e)} 
+
+
+@shared_task
+def rebuild_production_snapshot(production_id):
+    """
+    Rebuild the materialized carbon snapshot served by the public QR endpoints.
+    Enqueued (debounced) by carbon/signals.py when entries, events or benchmarks change.
+    """
+    from .services.production_snapshot import production_snapshot_service
+
+    try:
+        snapshot = production_snapshot_service.rebuild(production_id)
+        if snapshot is None:
+            logger.warning(f"Production {production_id} not found, skipping snapshot rebuild")
+            return {'status': 'skipped', 'production_id': production_id}
+
+        return {
+            'status': 'success',
+            'production_id': production_id,
+            'carbon_score': snapshot.carbon_score,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"Error rebuilding carbon snapshot for production {production_id}: {e}")
+        return {'status': 'error', 'production_id': production_id, 'message': str(e)}
+
+
+@shared_task
+def calculate_event_carbon_batch(event_refs):
+    """
+    Calculate carbon impact for a batch of history events queued by history/signals.py.
+
+    Args:
+        event_refs: list of [event_model_name, event_id] pairs
+    """
+    from .services.event_carbon_pipeline import event_carbon_pipeline
+
+    logger.info(f"Calculating carbon for {len(event_refs)} queued events")
+
+    try:
+        stats = event_carbon_pipeline.process_batch(event_refs)
+        return {
+            'status': 'success',
+            'timestamp': timezone.now().isoformat(),
+            **stats
+        }
+
+    except Exception as e:
+        logger.error(f"Error processing event carbon batch: {e}")
+        return {'status': 'error', 'message': str(e)}
+
+
+@shared_task
+def recalculate_outdated_event_carbon():
+    """
+    Queue recalculation of stored event carbon results computed with an older
+    emission-factor version. Factors change with a deploy; the
+    update_emission_factors command queues this once it has run.
+    """
+    from .services.event_carbon_results import event_carbon_results
+
+    try:
+        queued = event_carbon_results.recalculate_outdated()
+        return {
+            'status': 'success',
+            'queued': queued,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"Error queueing outdated event carbon results: {e}")
+        return {'status': 'error', 'message': str(e)}
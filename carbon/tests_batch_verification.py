@@ -0,0 +1,89 @@
+"""
+Tests for batch verification of carbon offsets.
+"""
+
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from carbon.models import CarbonEntry
+from carbon.services.batch_verification import BatchVerificationEngine
+from carbon.services.verification_service import VerificationService
+from carbon.tests_fixtures import FarmFixtureMixin
+
+
+@patch('carbon.services.production_snapshot.ProductionSnapshotService.invalidate_for_entries')
+class BatchVerificationEngineTest(FarmFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add_establishment('South Farm', address='2 Road')
+        self.user = get_user_model().objects.create_user('farmer@example.com', 'secret')
+        self.engine = BatchVerificationEngine()
+
+    def _entry(self, amount=20.0, description='Planted cover crops on the east field', **fields):
+        return CarbonEntry.objects.create(
+            establishment=self.establishment, created_by=self.user, type='offset', amount=amount,
+            description=description, year=2025, **fields
+        )
+
+    def _entries(self, ids):
+        return CarbonEntry.objects.filter(id__in=ids).select_related('establishment', 'source').order_by('id')
+
+    def test_batch_results_match_single_verification(self, mock_invalidate):
+        entries = [self._entry(amount=amount) for amount in (20.0, 20.0, 120.0, 400.0)]
+        entries.append(self._entry(amount=60.0, description='Switched to no-till'))
+        service = VerificationService()
+
+        expected = {
+            entry.id: service.verify_offset_entry(entry)
+            for entry in self._entries([entry.id for entry in entries])
+        }
+        outcomes = self.engine.verify(self._entries([entry.id for entry in entries]))
+
+        for entry, result, error in outcomes:
+            self.assertIsNone(error)
+            for key in ('approved', 'anti_gaming_flags', 'requirements', 'audit_required', 'additionality_assessment'):
+                self.assertEqual(result[key], expected[entry.id][key], (entry.id, key))
+
+    def test_context_is_loaded_once_per_batch(self, mock_invalidate):
+        entries = list(self._entries([self._entry(amount=10.0 + i).id for i in range(6)]))
+
+        # Ledger totals per establishment and user, regional descriptions and
+        # establishment counts, recent identical offsets
+        with self.assertNumQueries(5):
+            self.engine.verify(entries)
+
+    def test_registry_is_queried_once_per_registry_id(self, mock_invalidate):
+        ids = [
+            self._entry(amount=50.0, verification_level='certified_project', registry_verification_id='VCS-1').id
+            for _ in range(3)
+        ]
+        registry_result = {'verified': True, 'registry': 'VCS', 'project_url': 'https://registry.example/VCS-1'}
+
+        with patch.object(VerificationService, '_verify_with_third_party_registry',
+                          return_value=registry_result) as mock_registry:
+            outcomes = self.engine.verify(self._entries(ids))
+
+        mock_registry.assert_called_once()
+        self.assertTrue(all(result['registry_validation']['verified'] for _, result, _ in outcomes))
+        self.assertEqual(
+            set(CarbonEntry.objects.filter(id__in=ids).values_list('third_party_verification_url', flat=True)),
+            {'https://registry.example/VCS-1'}
+        )
+
+    def test_process_pending_saves_verification_outcome(self, mock_invalidate):
+        passing = self._entry(amount=20.0)
+        failing = self._entry(amount=400.0, baseline_data={'field_area': 2})
+        self.engine.CHUNK_SIZE = 1
+
+        stats = self.engine.process_pending()
+
+        self.assertEqual((stats['processed'], stats['failed'], stats['chunks']), (2, 0, 2))
+        passing.refresh_from_db()
+        failing.refresh_from_db()
+        self.assertEqual(passing.audit_status, 'passed')
+        self.assertEqual(failing.audit_status, 'failed')
+        self.assertEqual(passing.trust_score, 0.5)
+        self.assertAlmostEqual(passing.effective_amount, 20.0 * 0.5 * 0.8)
+        self.assertFalse(self.engine.pending().exists())
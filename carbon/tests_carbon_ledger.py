@@ -0,0 +1,69 @@
+"""
+Tests for the running offset/emission ledger and the verification checks that read it.
+"""
+
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from carbon.models import CarbonEntry, CarbonLedger
+from carbon.services.carbon_ledger import carbon_ledger
+from carbon.services.verification_service import VerificationService
+from carbon.tests_fixtures import FarmFixtureMixin
+
+
+@patch('carbon.services.production_snapshot.ProductionSnapshotService.invalidate_for_entry')
+class CarbonLedgerTest(FarmFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user('farmer@example.com', 'secret')
+
+    def _entry(self, type='offset', amount=100.0, **fields):
+        return CarbonEntry.objects.create(
+            establishment=self.establishment, created_by=self.user, type=type, amount=amount, year=2025, **fields
+        )
+
+    def test_entry_writes_keep_totals_current(self, mock_invalidate):
+        offset = self._entry(amount=100.0)
+        self._entry(type='emission', amount=40.0)
+        self._entry(amount=30.0, verification_level='certified_project')
+
+        offset.amount = 150.0
+        offset.save()
+
+        totals = carbon_ledger.establishment_totals(self.establishment.id)
+        self.assertEqual(totals['offsets'], 180.0)
+        self.assertEqual(totals['emissions'], 40.0)
+        self.assertEqual(totals['month_self_reported'], 150.0)
+        self.assertEqual(carbon_ledger.user_totals(self.user.id)['recent_offsets'], 2)
+
+        offset.delete()
+
+        self.assertEqual(carbon_ledger.establishment_totals(self.establishment.id)['offsets'], 30.0)
+        self.assertEqual(carbon_ledger.user_totals(self.user.id)['recent_offsets'], 1)
+
+    def test_rebuild_matches_incremental_totals(self, mock_invalidate):
+        for amount in (10.0, 20.0):
+            self._entry(amount=amount)
+        self._entry(type='emission', amount=5.0)
+        incremental = set(CarbonLedger.objects.values_list(
+            'scope', 'scope_id', 'resolution', 'bucket_start', 'offset_total', 'emission_total', 'offset_count'
+        ))
+
+        carbon_ledger.rebuild()
+
+        rebuilt = set(CarbonLedger.objects.values_list(
+            'scope', 'scope_id', 'resolution', 'bucket_start', 'offset_total', 'emission_total', 'offset_count'
+        ))
+        self.assertEqual(rebuilt, incremental)
+
+    def test_cumulative_limit_check_reads_the_ledger(self, mock_invalidate):
+        self._entry(amount=450.0)
+        entry = self._entry(amount=100.0)
+        service = VerificationService()
+
+        with self.assertNumQueries(2):
+            result = service._check_cumulative_limits(entry)
+
+        self.assertIn('monthly_limit_exceeded', result['violations'])
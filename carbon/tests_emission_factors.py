@@ -294,6 +294,102 @@ class CalculationAccuracyTest(TestCase):
         self.assertEqual(metadata['version'], emission_factors.VERSION)
 
 
+class FactorSnapshotTest(TestCase):
+    """Test the shared, versioned emission factor snapshot"""
+
+    def test_snapshot_is_built_once_per_process(self):
+        """The registry hands out one snapshot, versioned by the factor tables"""
+        first = EmissionFactorsRegistry.snapshot()
+        self.assertIs(EmissionFactorsRegistry.snapshot(), first)
+        self.assertTrue(first.version.startswith(EmissionFactorsRegistry.VERSION))
+        self.assertEqual(EmissionFactorsRegistry._build_snapshot().version, first.version)
+
+    def test_returned_factors_do_not_mutate_snapshot(self):
+        """Callers get their own copy of each factor"""
+        factor = emission_factors.get_fertilizer_factor('nitrogen')
+        factor['value'] = 0
+
+        self.assertEqual(emission_factors.get_fertilizer_factor('nitrogen')['value'], 11.0)
+
+    def test_calculations_are_stamped_with_factor_version(self):
+        """Calculator results record the snapshot they were computed with"""
+        calculator = EventCarbonCalculator()
+        result = calculator._add_enhanced_usda_metadata({'co2e': 0}, MagicMock())
+
+        self.assertEqual(result['factors_version'], EmissionFactorsRegistry.snapshot().version)
+
+
+class ClimateLookupCacheTest(TestCase):
+    """Test the tile-bucketed precipitation and climate zone lookups"""
+
+    def test_nearby_farms_share_a_tile(self):
+        """Locations in the same tile resolve once"""
+        from carbon.services.emission_factors import _tile_climate_profile
+        _tile_climate_profile.cache_clear()
+
+        first = emission_factors.get_climate_profile(36.61, -119.52, 'CA')
+        second = emission_factors.get_climate_profile(36.70, -119.60, 'ca')
+
+        self.assertEqual(first, (500, 'dry_climate'))
+        self.assertEqual(second, first)
+        self.assertEqual(_tile_climate_profile.cache_info().misses, 1)
+
+    def test_latitude_bands_match_raw_coordinates(self):
+        """Tiles keep the latitude band boundaries of the unbucketed estimate"""
+        self.assertEqual(emission_factors.get_precipitation_data(45.0, -100.0), 800)
+        self.assertEqual(emission_factors.get_precipitation_data(45.1, -100.0), 600)
+        self.assertEqual(emission_factors.get_precipitation_data(35.0, -100.0), 1000)
+
+    def test_adjusted_factor_is_cached_per_version(self):
+        """Repeated climate-adjusted lookups return equal, independent copies"""
+        first = emission_factors.get_climate_adjusted_fertilizer_factor('nitrogen', 500, 'broadcast')
+        first['value'] = 0
+        second = emission_factors.get_climate_adjusted_fertilizer_factor('nitrogen', 500, 'broadcast')
+
+        self.assertEqual(second['climate_zone'], 'dry_climate')
+        self.assertAlmostEqual(second['value'], 11.0 * 0.85, places=3)
+
+
+class BulkCalculationTest(TestCase):
+    """Test the bulk calculation mode used by the event carbon worker"""
+
+    def setUp(self):
+        self.event_calculator = EventCarbonCalculator()
+
+    def _event(self, model_name, state='CA'):
+        event = type(model_name, (MagicMock,), {})()
+        event.history.parcel.establishment.latitude = None
+        event.history.parcel.establishment.longitude = None
+        event.history.parcel.establishment.state = state
+        return event
+
+    def test_calculate_with_shared_lookups_keeps_input_order(self):
+        """Results line up with the input events, None for types without a calculator"""
+        chemical, general, weather = self._event('ChemicalEvent'), self._event('GeneralEvent'), self._event('WeatherEvent')
+
+        with patch.object(EventCarbonCalculator, 'calculate_chemical_event_impact', return_value={'co2e': 1.0}), \
+                patch.object(EventCarbonCalculator, 'calculate_weather_event_impact', return_value={'co2e': 2.0}):
+            results = self.event_calculator.calculate_with_shared_lookups([chemical, general, weather])
+
+        self.assertEqual(results, [{'co2e': 1.0}, None, {'co2e': 2.0}])
+
+    def test_climate_factors_resolved_once_per_location(self):
+        """Events at the same establishment share one climate-adjusted factor lookup"""
+        factors = {
+            nutrient: {'value': 1.0, 'climate_zone': 'moderate_climate', 'annual_precipitation': 800,
+                       'adjustments_applied': {}, 'version': emission_factors.VERSION}
+            for nutrient in ('nitrogen', 'phosphorus', 'potassium')
+        }
+        events = [self._event('ChemicalEvent'), self._event('ChemicalEvent'), self._event('ChemicalEvent', state='IA')]
+
+        with patch.object(emission_factors, 'get_enhanced_fertilizer_factors', return_value=factors) as mock_factors:
+            with self.event_calculator.shared_lookups():
+                for event in events:
+                    self.event_calculator._get_climate_aware_fertilizer_factors(event, 'broadcast')
+
+        self.assertEqual(mock_factors.call_count, 2)
+
+
 class RegressionTest(TestCase):
     """Regression tests to prevent reintroduction of inconsistencies"""
 
@@ -0,0 +1,23 @@
+"""
+Shared fixtures for the carbon service tests.
+"""
+
+from company.models import Company, Establishment
+
+
+class FarmFixtureMixin:
+    """
+    Creates the 'Farm Co' company and its 'North Farm' establishment in California
+    as ``self.company`` and ``self.establishment``. Mix in before ``TestCase``.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.company = Company.objects.create(name='Farm Co', address='1 Road', city='Fresno', state='CA')
+        self.establishment = self.add_establishment('North Farm')
+
+    def add_establishment(self, name, **fields):
+        """Another establishment of the company; ``fields`` override the defaults."""
+        return Establishment.objects.create(
+            **{'name': name, 'address': '1 Road', 'state': 'CA', 'company': self.company, **fields}
+        )
@@ -0,0 +1,152 @@
+"""
+Tests for chunked processing of pending IoT data points and their rollups.
+"""
+
+from datetime import timedelta
+from unittest.mock import patch
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from carbon.models import CarbonEntry, IoTDataPoint, IoTDevice, IoTReadingRollup
+from carbon.services.iot_ingestion import IoTIngestionPipeline
+from carbon.services.iot_rollups import iot_rollups
+from carbon.tests_fixtures import FarmFixtureMixin
+
+
+@patch('carbon.services.production_snapshot.ProductionSnapshotService.invalidate_for_entries')
+class IoTIngestionPipelineTest(FarmFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.device = IoTDevice.objects.create(
+            device_id='FUEL-001',
+            device_type='fuel_sensor',
+            establishment=self.establishment,
+            name='Tractor fuel sensor',
+            status='online',
+        )
+        self.pipeline = IoTIngestionPipeline()
+        self.pipeline.CHUNK_SIZE = 2
+
+    def _add_point(self, quality_score=1.0, fuel_used=10.0):
+        return IoTDataPoint.objects.create(
+            device=self.device,
+            timestamp=timezone.now(),
+            data={'fuel_consumption': {'fuel_used': fuel_used}},
+            quality_score=quality_score,
+        )
+
+    def test_process_device_pages_through_chunks(self, mock_invalidate):
+        points = [self._add_point() for _ in range(5)]
+
+        stats = self.pipeline.process_device(self.device.id)
+
+        self.assertEqual(stats['chunks'], 3)
+        self.assertEqual(stats['processed_count'], 5)
+        self.assertEqual(stats['auto_approved_count'], 5)
+        self.assertEqual(CarbonEntry.objects.filter(iot_device_id='FUEL-001').count(), 5)
+
+        for point in IoTDataPoint.objects.filter(id__in=[p.id for p in points]):
+            self.assertTrue(point.processed)
+            self.assertIsNotNone(point.carbon_entry_id)
+            # bulk_create skips CarbonEntry.save(), so the pipeline sets this itself
+            self.assertEqual(point.carbon_entry.effective_amount, 27.0)
+        self.assertEqual(mock_invalidate.call_count, 3)
+
+    def test_chunks_are_loaded_with_rows_locked(self, mock_invalidate):
+        self._add_point()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.pipeline.process_device(self.device.id)
+
+        loads = [query['sql'] for query in queries.captured_queries if 'FOR UPDATE' in query['sql']]
+        self.assertTrue(loads)
+        self.assertTrue(all('SKIP LOCKED' in sql for sql in loads))
+
+    def test_confidence_bands(self, mock_invalidate):
+        review = self._add_point(quality_score=0.65)
+        anomaly = self._add_point(quality_score=0.3)
+
+        stats = self.pipeline.process_device(self.device.id)
+
+        self.assertEqual(stats['manual_approval_count'], 1)
+        self.assertEqual(stats['auto_approved_count'], 0)
+
+        review.refresh_from_db()
+        anomaly.refresh_from_db()
+        self.assertFalse(review.processed)
+        self.assertTrue(anomaly.processed)
+        self.assertTrue(anomaly.anomaly_detected)
+        self.assertIsNone(anomaly.carbon_entry_id)
+        mock_invalidate.assert_not_called()
+
+    def test_dispatch_processes_inline_without_broker(self, mock_invalidate):
+        self._add_point()
+
+        with patch('carbon.tasks.process_iot_device_data.apply_async', side_effect=Exception('broker down')):
+            stats = self.pipeline.dispatch()
+
+        self.assertEqual(stats['devices'], 1)
+        self.assertEqual(stats['auto_approved_count'], 1)
+        self.assertFalse(IoTDataPoint.objects.filter(processed=False).exists())
+
+
+class IoTRollupTest(FarmFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.device = IoTDevice.objects.create(
+            device_id='FUEL-002',
+            device_type='fuel_sensor',
+            establishment=self.establishment,
+            name='Harvester fuel sensor',
+        )
+        self.hour = iot_rollups.bucket_start(timezone.now() - timedelta(hours=2), 'hour')
+
+    def _add_reading(self, minute, fuel_used):
+        return IoTDataPoint.objects.create(
+            device=self.device,
+            timestamp=self.hour + timedelta(minutes=minute, seconds=10),
+            data={'fuel_consumption': {'fuel_used': fuel_used, 'unit': 'liters'}, 'engine_on': True},
+        )
+
+    def test_numeric_metrics_flattens_nested_values(self):
+        metrics = iot_rollups.numeric_metrics({'fuel_consumption': {'fuel_used': 4, 'unit': 'l'}, 'ok': True})
+        self.assertEqual(metrics, {'fuel_consumption.fuel_used': 4.0})
+
+    def test_refresh_builds_minute_hour_and_day_buckets(self):
+        self._add_reading(0, 4.0)
+        self._add_reading(0, 6.0)
+        self._add_reading(30, 2.0)
+
+        iot_rollups.refresh()
+
+        hour = IoTReadingRollup.objects.get(
+            device=self.device, resolution='hour', bucket_start=self.hour, metric='fuel_consumption.fuel_used'
+        )
+        self.assertEqual(hour.count, 3)
+        self.assertEqual(hour.total, 12.0)
+        self.assertEqual((hour.minimum, hour.maximum, hour.last_value), (2.0, 6.0, 2.0))
+
+        minute = IoTReadingRollup.objects.get(
+            device=self.device, resolution='minute', bucket_start=self.hour, metric='fuel_consumption.fuel_used'
+        )
+        self.assertEqual(minute.total, 10.0)
+
+        day = IoTReadingRollup.objects.get(
+            device=self.device, resolution='day', bucket_start=iot_rollups.bucket_start(self.hour, 'day'),
+            metric=iot_rollups.READINGS_METRIC
+        )
+        self.assertEqual(day.count, 3)
+
+    def test_refresh_is_idempotent_and_counts_readings(self):
+        self._add_reading(5, 1.0)
+        iot_rollups.refresh()
+        self._add_reading(6, 1.0)
+        iot_rollups.refresh()
+
+        series = iot_rollups.series(self.device.id, iot_rollups.READINGS_METRIC, 'hour', since=self.hour)
+        self.assertEqual([bucket['count'] for bucket in series], [2])
+        self.assertEqual(iot_rollups.reading_counts([self.device.id], self.hour), {self.device.id: 2})
@@ -0,0 +1,133 @@
+"""
+Tests for batched IoT webhook ingestion.
+"""
+
+from io import BytesIO
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APIClient
+
+from carbon.models import CarbonAuditLog, CarbonEntry, IoTDataPoint, IoTDevice
+from carbon.parsers import NDJSONParser
+from carbon.services.iot_webhooks import IoTWebhookIngestor
+from carbon.tests_fixtures import FarmFixtureMixin
+
+
+@patch('carbon.services.production_snapshot.ProductionSnapshotService.invalidate_for_entries')
+class IoTWebhookIngestorTest(FarmFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.device = IoTDevice.objects.create(
+            device_id='FUEL-001',
+            device_type='fuel_sensor',
+            establishment=self.establishment,
+            name='Tractor fuel sensor',
+        )
+        self.ingestor = IoTWebhookIngestor()
+
+    def _fuel(self, device_id='FUEL-001', fuel_liters=10, **overrides):
+        return {
+            'device_id': device_id,
+            'establishment_id': self.establishment.id,
+            'fuel_liters': fuel_liters,
+            'timestamp': '2025-06-01T08:00:00Z',
+            'equipment_type': 'tractor',
+            **overrides,
+        }
+
+    def test_fuel_batch_writes_entries_points_and_logs(self, mock_invalidate):
+        result = self.ingestor.ingest_fuel([self._fuel(), self._fuel(fuel_liters=20), self._fuel('UNREGISTERED')])
+
+        self.assertEqual((result['accepted'], result['data_points']), (3, 2))
+        self.assertAlmostEqual(result['co2e_calculated'], 40 * 2.7)
+        entries = CarbonEntry.objects.filter(id__in=result['carbon_entry_ids'])
+        self.assertEqual({entry.source.name for entry in entries}, {'Tractor Fuel Consumption'})
+        self.assertEqual({entry.year for entry in entries}, {2025})
+        self.assertEqual(CarbonAuditLog.objects.filter(carbon_entry__in=entries).count(), 3)
+
+        points = IoTDataPoint.objects.filter(device=self.device)
+        self.assertEqual(points.count(), 2)
+        self.assertTrue(all(point.processed and point.carbon_entry_id for point in points))
+        self.device.refresh_from_db()
+        self.assertEqual((self.device.total_data_points, self.device.status), (2, 'online'))
+        mock_invalidate.assert_called_once()
+
+    def test_invalid_readings_are_reported_by_index(self, mock_invalidate):
+        readings = [
+            self._fuel(),
+            {'device_id': 'FUEL-001'},
+            self._fuel(fuel_liters='lots'),
+            self._fuel(establishment_id=999999),
+            self._fuel(timestamp='yesterday'),
+        ]
+
+        result = self.ingestor.ingest_fuel({'readings': readings})
+
+        self.assertEqual(result['accepted'], 1)
+        self.assertEqual([error['index'] for error in result['rejected']], [1, 2, 3, 4])
+        self.assertEqual(result['rejected'][2]['error'], 'Establishment not found')
+
+    def test_sources_are_cached_per_process(self, mock_invalidate):
+        self.ingestor.ingest_fuel([self._fuel()])
+
+        with self.assertNumQueries(0):
+            self.ingestor.fuel_source('tractor', 'FUEL-001')
+
+    def test_weather_batch_returns_recommendations(self, mock_invalidate):
+        reading = {
+            'station_id': 'WX-1',
+            'establishment_id': self.establishment.id,
+            'temperature': 38,
+            'humidity': 25,
+            'wind_speed': 10,
+            'timestamp': '2025-06-01T08:00:00Z',
+        }
+
+        result = self.ingestor.ingest_weather([reading, reading])
+
+        self.assertEqual(result['accepted'], 2)
+        self.assertEqual(len(result['results'][0]['recommendations']), 2)
+        self.assertEqual(CarbonAuditLog.objects.filter(action='weather_processed').count(), 2)
+
+    def test_oversized_batch_is_refused(self, mock_invalidate):
+        self.ingestor.MAX_READINGS = 2
+
+        with self.assertRaises(ValueError):
+            self.ingestor.ingest_fuel([self._fuel()] * 3)
+
+
+class WeatherStationWebhookTest(FarmFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('farmer@example.com', 'secret'))
+
+    def test_single_reading_returns_recommendations(self):
+        response = self.client.post('/api/carbon/webhooks/weather-station/', {
+            'station_id': 'WX-1',
+            'establishment_id': self.establishment.id,
+            'temperature': 38,
+            'humidity': 25,
+            'wind_speed': 10,
+            'timestamp': '2025-06-01T08:00:00Z',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['recommendations']), 2)
+        self.assertEqual(CarbonAuditLog.objects.filter(action='weather_processed').count(), 1)
+
+
+class NDJSONParserTest(TestCase):
+
+    def test_parses_one_reading_per_line(self):
+        body = b'{"device_id": "A"}\n\n{"device_id": "B"}\n'
+
+        self.assertEqual(NDJSONParser().parse(BytesIO(body)), [{'device_id': 'A'}, {'device_id': 'B'}])
+
+    def test_reports_the_bad_line(self):
+        with self.assertRaisesMessage(ParseError, 'line 2'):
+            NDJSONParser().parse(BytesIO(b'{"device_id": "A"}\nnot json\n'))
@@ -0,0 +1,75 @@
+"""
+Tests for the incremental John Deere device sync.
+"""
+
+from datetime import timedelta
+from unittest.mock import Mock
+from django.test import TestCase
+from django.utils import timezone
+
+from carbon.models import IoTDataPoint, IoTDevice
+from carbon.services.john_deere_api import JohnDeereAPIError
+from carbon.services.john_deere_sync import JohnDeereSyncEngine
+from carbon.tests_fixtures import FarmFixtureMixin
+
+
+class JohnDeereSyncEngineTest(FarmFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.devices = [
+            IoTDevice.objects.create(
+                device_id=f'JD-{machine_id}',
+                device_type='fuel_sensor',
+                establishment=self.establishment,
+                name=f'Tractor {machine_id}',
+                john_deere_machine_id=machine_id,
+                api_connection_status='connected',
+                total_data_points=5,
+            )
+            for machine_id in ('M1', 'M2', 'M3')
+        ]
+        self.api = Mock()
+        self.engine = JohnDeereSyncEngine(self.api)
+        self.engine.CHUNK_SIZE = 2
+
+    def test_sync_writes_new_data_and_advances_cursors(self):
+        def fetch(machine_id, start, end):
+            return [] if machine_id == 'M2' else [{'fuel_used': 12.5}]
+        self.api.fetch_fuel_data.side_effect = fetch
+
+        stats = self.engine.sync()
+
+        self.assertEqual((stats['devices_synced'], stats['data_points_created'], stats['chunks']), (3, 2, 2))
+        self.assertEqual(IoTDataPoint.objects.filter(device__in=self.devices).count(), 2)
+        counts = dict(IoTDevice.objects.values_list('john_deere_machine_id', 'total_data_points'))
+        self.assertEqual(counts, {'M1': 6, 'M2': 5, 'M3': 6})
+        for device in IoTDevice.objects.all():
+            self.assertIsNotNone(device.api_sync_cursor)
+            self.assertEqual(device.status, 'online')
+
+    def test_only_data_after_the_cursor_is_requested(self):
+        cursor = timezone.now() - timedelta(hours=2)
+        IoTDevice.objects.filter(john_deere_machine_id='M1').update(api_sync_cursor=cursor)
+        self.api.fetch_fuel_data.return_value = []
+
+        self.engine.sync()
+
+        starts = {call.args[0]: call.args[1] for call in self.api.fetch_fuel_data.call_args_list}
+        self.assertEqual(starts['M1'], cursor)
+        self.assertLess(starts['M2'], cursor)
+
+    def test_failed_device_keeps_its_cursor(self):
+        def fetch(machine_id, start, end):
+            if machine_id == 'M3':
+                raise JohnDeereAPIError('API request failed: 503')
+            return []
+        self.api.fetch_fuel_data.side_effect = fetch
+
+        stats = self.engine.sync()
+
+        self.assertEqual(stats['devices_failed'], 1)
+        failed = IoTDevice.objects.get(john_deere_machine_id='M3')
+        self.assertEqual(failed.api_connection_status, 'error')
+        self.assertIsNone(failed.api_sync_cursor)
+        self.assertIn('503', failed.api_error_message)
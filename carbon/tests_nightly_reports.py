@@ -0,0 +1,58 @@
+"""
+Tests for set-based nightly carbon report generation.
+"""
+
+from datetime import datetime, time, timedelta
+from unittest.mock import patch
+from django.test import TestCase
+from django.utils import timezone
+
+from carbon.models import CarbonEntry, CarbonReport
+from carbon.services.nightly_reports import NightlyReportEngine
+from carbon.tests_fixtures import FarmFixtureMixin
+
+
+@patch('carbon.services.production_snapshot.ProductionSnapshotService.invalidate_for_entry')
+class NightlyReportEngineTest(FarmFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.active = self.establishment
+        self.idle = self.add_establishment('South Farm', address='2 Road')
+        self.report_date = timezone.now().date() - timedelta(days=1)
+        self.engine = NightlyReportEngine()
+        self.engine.SHARD_SIZE = 1
+
+    def _add_entry(self, type, amount, day_offset=0):
+        timestamp = timezone.make_aware(datetime.combine(self.report_date + timedelta(days=day_offset), time(12)))
+        return CarbonEntry.objects.create(
+            establishment=self.active, type=type, amount=amount, co2e_amount=amount,
+            year=self.report_date.year, timestamp=timestamp,
+        )
+
+    def test_shard_reports_daily_totals_for_every_establishment(self, mock_invalidate):
+        self._add_entry('emission', 30.0)
+        self._add_entry('offset', 10.0)
+        self._add_entry('emission', 99.0, day_offset=1)
+
+        for first_id, last_id in self.engine.shards():
+            self.engine.generate_shard(self.report_date, first_id, last_id, industry_average=0)
+
+        active = CarbonReport.objects.get(establishment=self.active, period_start=self.report_date)
+        self.assertEqual((active.total_emissions, active.total_offsets, active.net_footprint), (30.0, 10.0, 20.0))
+        idle = CarbonReport.objects.get(establishment=self.idle, period_start=self.report_date)
+        self.assertEqual(idle.net_footprint, 0)
+
+    def test_rerunning_a_shard_replaces_reports(self, mock_invalidate):
+        first_id, last_id = self.active.id, self.idle.id
+
+        self.engine.generate_shard(self.report_date, first_id, last_id, industry_average=0)
+        self.engine.generate_shard(self.report_date, first_id, last_id, industry_average=0)
+
+        self.assertEqual(CarbonReport.objects.filter(period_start=self.report_date).count(), 2)
+
+    def test_dispatch_generates_inline_without_broker(self, mock_invalidate):
+        with patch('carbon.tasks.generate_nightly_report_shard.apply_async', side_effect=Exception('broker down')):
+            stats = self.engine.dispatch(self.report_date)
+
+        self.assertEqual(stats['inline_reports'], 2)
@@ -0,0 +1,101 @@
+"""
+Tests for the materialized production carbon snapshots served to QR scans.
+"""
+
+from unittest.mock import patch
+from django.test import TestCase
+from django.utils import timezone
+
+from product.models import Parcel, Product
+from history.models import History
+from carbon.models import CarbonEntry, CarbonSource, ProductionCarbonSnapshot
+from carbon.services.production_snapshot import ProductionSnapshotService, production_snapshot_service
+from carbon.services.carbon_aggregation import summarize_carbon_entries
+from carbon.tests_fixtures import FarmFixtureMixin
+
+
+@patch.object(ProductionSnapshotService, '_get_blockchain_verification', return_value={'verified': False})
+@patch.object(ProductionSnapshotService, 'schedule_rebuild')
+class ProductionSnapshotTest(FarmFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        parcel = Parcel.objects.create(name='Field 1', establishment=self.establishment, area=10)
+        self.production = History.objects.create(
+            name='Corn 2024',
+            parcel=parcel,
+            product=Product.objects.create(name='Corn'),
+            start_date=timezone.now(),
+            published=True,
+        )
+        self.source = CarbonSource.objects.create(name='Fertilizer', category='Chemicals', unit='kg', default_emission_factor=1.0)
+
+    def _add_entry(self, type='emission', amount=10.0):
+        return CarbonEntry.objects.create(
+            establishment=self.establishment,
+            production=self.production,
+            type=type,
+            source=self.source,
+            amount=amount,
+            co2e_amount=amount,
+            year=self.production.start_date.year,
+        )
+
+    def test_build_snapshot_aggregates_entries(self, mock_schedule, mock_blockchain):
+        self._add_entry(amount=10.0)
+        self._add_entry(amount=5.0)
+
+        snapshot = production_snapshot_service.build_snapshot(self.production)
+
+        self.assertEqual(snapshot.scope, 'production')
+        self.assertEqual(snapshot.total_emissions, 15.0)
+        self.assertEqual(snapshot.entry_count, 2)
+        self.assertEqual(snapshot.emissions_by_source, {'Fertilizer': 15.0})
+        self.assertEqual(snapshot.emissions_by_category, {'Chemicals': 15.0})
+        self.assertFalse(snapshot.is_stale)
+
+    def test_summary_uses_single_grouped_query(self, mock_schedule, mock_blockchain):
+        self._add_entry(amount=10.0)
+        offset = self._add_entry(type='offset', amount=8.0)
+
+        with self.assertNumQueries(1):
+            summary = summarize_carbon_entries(CarbonEntry.objects.filter(production=self.production))
+
+        self.assertEqual(summary['total_emissions'], 10.0)
+        # Self-reported offsets are discounted by their trust score
+        self.assertEqual(summary['total_offsets'], offset.effective_amount)
+        self.assertEqual(summary['offsets_by_action'], {'Fertilizer': offset.effective_amount})
+        self.assertEqual(summary['net_footprint'], 10.0 - offset.effective_amount)
+
+    def test_entry_change_marks_snapshot_stale(self, mock_schedule, mock_blockchain):
+        production_snapshot_service.build_snapshot(self.production)
+
+        self._add_entry(amount=7.0)
+
+        snapshot = ProductionCarbonSnapshot.objects.get(production=self.production)
+        self.assertTrue(snapshot.is_stale)
+        mock_schedule.assert_called_with(self.production.id)
+
+        rebuilt = production_snapshot_service.rebuild(self.production.id)
+        self.assertFalse(rebuilt.is_stale)
+        self.assertEqual(rebuilt.total_emissions, 7.0)
+
+
+@patch('carbon.tasks.rebuild_production_snapshot.apply_async')
+class ScheduleRebuildTest(TestCase):
+
+    def _schedule(self, added):
+        with patch('carbon.services.production_snapshot.cache.add', return_value=added):
+            with self.captureOnCommitCallbacks(execute=True):
+                production_snapshot_service.schedule_rebuild(42)
+
+    def test_queued_rebuild_is_debounced(self, mock_apply_async):
+        self._schedule(False)
+
+        mock_apply_async.assert_not_called()
+
+    def test_rebuild_is_queued_when_the_cache_is_down(self, mock_apply_async):
+        # django-redis with IGNORE_EXCEPTIONS returns None instead of raising
+        self._schedule(None)
+
+        mock_apply_async.assert_called_once()
@@ -0,0 +1,65 @@
+"""
+Tests for batch carbon report PDF rendering.
+"""
+
+from datetime import date
+from unittest.mock import ANY, patch
+from django.test import TestCase
+
+from carbon.models import CarbonReport
+from carbon.services.report_generator import CarbonReportGenerator
+from carbon.tests_fixtures import FarmFixtureMixin
+
+storage = CarbonReport._meta.get_field('document').storage
+
+
+@patch.object(storage, 'save', side_effect=lambda name, content: name)
+@patch.object(storage, 'exists', return_value=False)
+@patch('carbon.services.report_generator.render_pdf', return_value=b'%PDF-1.4')
+class ReportRenderingTest(FarmFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.reports = [
+            CarbonReport.objects.create(
+                establishment=self.establishment, period_start=date(2024, 1, 1), period_end=date(2024, 12, 31),
+                total_emissions=amount, net_footprint=amount
+            )
+            for amount in (10.0, 20.0)
+        ]
+        self.generator = CarbonReportGenerator()
+
+    def test_batch_renders_and_stores_content_addressed_documents(self, mock_render, mock_exists, mock_save):
+        stats = self.generator.generate_many(self.reports, processes=1)
+
+        self.assertEqual(stats['rendered'], 2)
+        report = CarbonReport.objects.get(id=self.reports[0].id)
+        expected = self.generator.document_name(self.generator.report_payload(report))
+        self.assertEqual(report.document.name, expected)
+        mock_save.assert_any_call(expected, ANY)
+
+    def test_unchanged_reports_are_not_rendered_again(self, mock_render, mock_exists, mock_save):
+        self.generator.generate_many(self.reports, processes=1)
+        reports = list(CarbonReport.objects.filter(id__in=[r.id for r in self.reports]))
+        reports[1].total_emissions = 25.0
+
+        stats = self.generator.generate_many(reports, processes=1)
+
+        self.assertEqual((stats['unchanged'], stats['rendered']), (1, 1))
+        self.assertEqual(mock_render.call_count, 3)
+
+    def test_payload_accepts_unsaved_string_defaults(self, mock_render, mock_exists, mock_save):
+        report = CarbonReport(establishment=self.reports[0].establishment)
+
+        payload = self.generator.report_payload(report)
+
+        self.assertEqual((payload['period_start'], payload['period_end']), ('2023-01-01', '2023-12-31'))
+
+    def test_existing_document_is_reused(self, mock_render, mock_exists, mock_save):
+        mock_exists.return_value = True
+
+        stats = self.generator.generate_many(self.reports, processes=1)
+
+        self.assertEqual(stats['reused'], 2)
+        mock_render.assert_not_called()
+        self.assertTrue(CarbonReport.objects.get(id=self.reports[0].id).document.name.endswith('.pdf'))
@@ -0,0 +1,73 @@
+"""
+Tests for weather monitoring polled per weather cell.
+"""
+
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+
+from carbon.services.weather_api import WeatherService
+from carbon.services.weather_monitoring import WeatherMonitor
+from carbon.tests_fixtures import FarmFixtureMixin
+
+HOT = {'temperature': 101.0, 'humidity': 40, 'wind_speed': 5}
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class WeatherCellCacheTest(TestCase):
+
+    def setUp(self):
+        self.service = WeatherService()
+
+    @patch.object(WeatherService, '_get_noaa_current_conditions', return_value=HOT)
+    def test_conditions_are_fetched_once_per_cell(self, mock_noaa):
+        cell = {'key': 'noaa:HNX:52,100', 'station_id': 'KFAT', 'lat': 36.7, 'lng': -119.7}
+
+        self.service.conditions_for_cell(cell)
+        self.service.conditions_for_cell(dict(cell, lat=36.71))
+
+        mock_noaa.assert_called_once_with('KFAT')
+
+    @patch.object(WeatherService, 'grid_point', return_value=None)
+    def test_locations_outside_noaa_coverage_share_a_tile(self, mock_grid_point):
+        first = self.service.cell_for(51.50001, -0.12001)
+        second = self.service.cell_for(51.50002, -0.12002)
+
+        self.assertEqual(first['key'], second['key'])
+        self.assertIsNone(first['station_id'])
+
+
+@patch('carbon.tasks.create_weather_alert_event.delay')
+class WeatherMonitorTest(FarmFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # North Farm has no location and is not monitored
+        for name, latitude in (('Central Farm', 36.7001), ('South Farm', 36.7002), ('Far Farm', 38.5)):
+            self.add_establishment(name, latitude=latitude, longitude=-119.7)
+        self.monitor = WeatherMonitor(WeatherService())
+        self.monitor.MAX_WORKERS = 4
+
+    def _cell_for(self, lat, lng):
+        return {'key': 'north' if lat < 37 else 'far', 'station_id': 'K', 'lat': lat, 'lng': lng}
+
+    def test_one_fetch_per_cell_fanned_out_to_establishments(self, mock_delay):
+        with patch.object(WeatherService, 'cell_for', side_effect=self._cell_for), \
+                patch.object(WeatherService, 'conditions_for_cell', return_value=HOT) as mock_conditions:
+            stats = self.monitor.run()
+
+        self.assertEqual(mock_conditions.call_count, 2)
+        self.assertEqual((stats['locations'], stats['cells']), (3, 2))
+        self.assertEqual((stats['establishments_processed'], stats['alerts_created']), (3, 3))
+        self.assertEqual(mock_delay.call_count, 3)
+
+    def test_failed_cell_does_not_stop_the_others(self, mock_delay):
+        def conditions(cell):
+            if cell['key'] == 'far':
+                raise RuntimeError('NOAA down')
+            return HOT
+
+        with patch.object(WeatherService, 'cell_for', side_effect=self._cell_for), \
+                patch.object(WeatherService, 'conditions_for_cell', side_effect=conditions):
+            stats = self.monitor.run()
+
+        self.assertEqual(stats['establishments_processed'], 2)
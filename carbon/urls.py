@@ -57,6 +57,8 @@ urlpatterns = [
     
     path('webhooks/john-deere/', views.john_deere_webhook, name='john_deere_webhook'),
     path('webhooks/weather-station/', views.weather_station_webhook, name='weather_station_webhook'),
+    path('webhooks/john-deere/batch/', views.john_deere_webhook_batch, name='john_deere_webhook_batch'),
+    path('webhooks/weather-station/batch/', views.weather_station_webhook_batch, name='weather_station_webhook_batch'),
     # IoT Device Management
     path('iot-devices/', views.IoTDeviceViewSet.as_view({'get': 'list', 'post': 'create'}), name='iot-devices'),
     path('iot-devices/<int:pk>/', views.IoTDeviceViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='iot-device-detail'),
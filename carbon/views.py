@@ -1,6 +1,7 @@
 from django.shortcuts import render, get_object_or_404
 from rest_framework import viewsets, status, generics, permissions
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, parser_classes, permission_classes
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django_ratelimit.decorators import ratelimit
@@ -64,14 +65,21 @@ from .services.john_deere_api import JohnDeereAPI, is_john_deere_configured, get
 from .services.weather_api import WeatherService, get_weather_service, get_current_weather, get_agricultural_recommendations, check_weather_alerts
 from .services.blockchain import blockchain_service
 from .services.automation_service import AutomationLevelService
-import hashlib
 import traceback
 from carbon.services.carbon_cost_insights import CarbonCostInsights
 import os
 from django.conf import settings
 from .services.event_carbon_calculator import EventCarbonCalculator
+from .services.production_snapshot import production_snapshot_service
+from .services.carbon_aggregation import summarize_carbon_entries
+from .services.iot_rollups import iot_rollups
+# Aliased: this module has its own weather_recommendations view
+from .services.iot_webhooks import DIESEL_KG_CO2E_PER_LITER, iot_webhook_ingestor
+from .services.iot_webhooks import weather_recommendations as weather_alerts_for
+from .parsers import NDJSONParser
 from .services.enhanced_usda_factors import EnhancedUSDAFactors
 from .services.educational_content_service import EducationalContentService
+from common.cache_tags import MISS, benchmark_tag, establishment_tag, production_tag, tagged_cache
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -410,9 +418,11 @@ class CarbonEntryViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(production_id=production_id)
         queryset = queryset.filter(year=year)
 
-        total_emissions = queryset.filter(type='emission').aggregate(Sum('amount'))['amount__sum'] or 0
+        # Totals and breakdowns from a single grouped query
+        carbon_summary = summarize_carbon_entries(queryset)
+        total_emissions = carbon_summary['total_emission_amount']
         # Use effective_amount for offsets to account for trust score discounts
-        total_offsets = queryset.filter(type='offset').aggregate(Sum('effective_amount'))['effective_amount__sum'] or 0
+        total_offsets = carbon_summary['total_offsets']
         net_carbon = total_emissions - total_offsets
         
         # Calculate carbon score (0-100 scale)
@@ -462,7 +472,10 @@ class CarbonEntryViewSet(viewsets.ModelViewSet):
             'total_offsets': total_offsets,
             'net_carbon': net_carbon,
             'carbon_score': round(carbon_score),
-            'industry_average': industry_benchmark
+            'industry_average': industry_benchmark,
+            'emissions_by_source': carbon_summary['emissions_by_source'],
+            'emissions_by_category': carbon_summary['emissions_by_category'],
+            'offsets_by_action': carbon_summary['offsets_by_action']
         }
         
         return Response(summary_data)
@@ -939,6 +952,26 @@ class CarbonReportViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = CarbonReportSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @action(detail=True, methods=['get'])
+    def document(self, request, pk=None):
+        """
+        Return the report's PDF URL, queueing a render when the document is
+        missing or out of date.
+        """
+        from .tasks import render_carbon_reports
+
+        report = self.get_object()
+        payload = report_generator.report_payload(report)
+        if report.document and report.document.name == report_generator.document_name(payload):
+            return Response({'status': 'ready', 'url': report.document.url})
+
+        try:
+            render_carbon_reports.apply_async(args=[[report.id]], queue='carbon')
+        except Exception as e:
+            logger.warning(f"Could not enqueue report {report.id} render, rendering inline: {e}")
+            return Response({'status': 'ready', 'url': report_generator.generate_report(report)})
+        return Response({'status': 'rendering'}, status=status.HTTP_202_ACCEPTED)
+
 
 class SustainabilityBadgeViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = SustainabilityBadge.objects.all()
@@ -1152,204 +1185,69 @@ class CarbonProductionSummaryViewSet(viewsets.ViewSet):
 class PublicProductionViewSet(viewsets.ViewSet):
     permission_classes = []
 
+    # Summaries are invalidated through their cache tags when the production,
+    # its establishment, carbon data or benchmark change, so they can live long
+    SUMMARY_CACHE_TIMEOUT = 60 * 60 * 24
+
+    def _summary_cache_tags(self, production, establishment, snapshot):
+        return [
+            production_tag(production.id),
+            establishment_tag(establishment.id),
+            benchmark_tag(snapshot.crop_type, snapshot.year),
+        ]
+
     @action(detail=True, methods=['get'], url_path='qr-summary')
     def qr_summary(self, request, pk=None):
+        # Quick mode for progressive loading (just carbon score)
+        quick_mode = request.GET.get('quick') == 'true'
+
+        # Cache key for this production; invalidated through its tags (see carbon/signals.py)
+        cache_key = f'qr_summary_{pk}{"_quick" if quick_mode else ""}'
         try:
             # Phase 1 Optimization: Add caching for QR endpoint
-            from django.core.cache import cache
             from django.db import connection
             from history.models import History
             from company.models import Establishment
-            from .services.blockchain import blockchain_service
             
-            # Quick mode for progressive loading (just carbon score)
-            quick_mode = request.GET.get('quick') == 'true'
+            # Served stale while a single caller rebuilds it (see common/cache_tags.py)
+            cached_data = tagged_cache.fetch(cache_key)
             
-            # Cache key for this production
-            cache_key = f'qr_summary_{pk}_v2{"_quick" if quick_mode else ""}'
-            cached_data = cache.get(cache_key)
-            
-            if cached_data:
+            if cached_data is not MISS:
                 # Return cached data with fresh timestamp
                 cached_data['cache_hit'] = True
                 cached_data['timestamp'] = timezone.now().isoformat()
                 return Response(cached_data, status=status.HTTP_200_OK)
             
-            # Optimize database query with select_related and prefetch_related
             production = History.objects.select_related(
                 'product',
-                'parcel__establishment__company'
-            ).prefetch_related(
-                'carbonentry_set__source'
+                'parcel__establishment__company',
+                'carbon_snapshot'
             ).get(id=pk, published=True)
             establishment = production.parcel.establishment if production.parcel else None
             
             if not establishment:
+                tagged_cache.release(cache_key)
                 return Response({
                     'error': 'No establishment found for this production'
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            # Get crop information for benchmarking
             crop_name = production.product.name if production.product else "unknown"
-            crop_type = crop_name.lower().replace(' ', '_')
             
-            # Get carbon entries for this production
-            production_entries = CarbonEntry.objects.filter(production=production)
-            establishment_entries = CarbonEntry.objects.filter(establishment=establishment)
-            
-            # Calculate totals from production-specific entries first, fall back to establishment
-            if production_entries.exists():
-                entries = production_entries
-            else:
-                entries = establishment_entries.filter(year=production.start_date.year if production.start_date else timezone.now().year)
-            
-            total_emissions = entries.filter(type='emission').aggregate(Sum('co2e_amount'))['co2e_amount__sum'] or 0
-            # Use effective_amount for offsets to account for trust score discounts
-            total_offsets = entries.filter(type='offset').aggregate(Sum('effective_amount'))['effective_amount__sum'] or 0
-            net_footprint = total_emissions - total_offsets
-            
-            # Get emissions breakdown by category and source
-            emissions_by_category = {}
-            emissions_by_source = {}
-            offsets_by_action = {}
-            
-            # Calculate emissions by source
-            for entry in entries.filter(type='emission'):
-                source_name = entry.source.name if entry.source else 'Unknown'
-                if source_name not in emissions_by_source:
-                    emissions_by_source[source_name] = 0
-                emissions_by_source[source_name] += float(entry.co2e_amount or 0)
-                
-                # Also categorize by source category
-                category = entry.source.category if entry.source else 'Other'
-                if category not in emissions_by_category:
-                    emissions_by_category[category] = 0
-                emissions_by_category[category] += float(entry.co2e_amount or 0)
-            
-            # Calculate offsets by action
-            for entry in entries.filter(type='offset'):
-                action_name = entry.source.name if entry.source else 'Unknown Offset'
-                if action_name not in offsets_by_action:
-                    offsets_by_action[action_name] = 0
-                offsets_by_action[action_name] += float(entry.co2e_amount or 0)
-            
-            # Get crop-specific benchmark first, then fallback to industry
-            industry_percentile = 0
-            industry_average = 0
-            benchmark_source = "industry_average"
-            benchmark = None
-            
-            try:
-                # First try to get crop-specific benchmark
-                current_year = production.start_date.year if production.start_date else timezone.now().year
-                
-                # Try exact crop match first
-                crop_benchmark = CarbonBenchmark.objects.filter(
-                    crop_type=crop_type,
-                    year=current_year,
-                    usda_verified=True
-                ).first()
-                
-                if not crop_benchmark and crop_type != "unknown":
-                    # Try partial crop name matches
-                    crop_keywords = crop_name.lower().split()
-                    for keyword in crop_keywords:
-                        crop_benchmark = CarbonBenchmark.objects.filter(
-                            crop_type__icontains=keyword,
-                            year=current_year,
-                            usda_verified=True
-                        ).first()
-                        if crop_benchmark:
-                            break
-                
-                if crop_benchmark:
-                    benchmark = crop_benchmark
-                    benchmark_source = f"crop_specific_{crop_benchmark.crop_type}"
-                    industry_average = crop_benchmark.average_emissions
-                else:
-                    # Fallback to general industry benchmark
-                    industry = getattr(establishment, 'industry', None) or getattr(establishment, 'type', 'agriculture')
-                    benchmark = CarbonBenchmark.objects.filter(
-                        industry=industry,
-                        year=current_year,
-                        crop_type=''  # General industry benchmark
-                    ).first()
-                    
-                    if benchmark:
-                        industry_average = benchmark.average_emissions
-                        benchmark_source = f"industry_{industry}"
-                
-                # Calculate percentile based on benchmark
-                if benchmark and industry_average > 0:
-                    # Convert net footprint to per-kg basis if we have production amount
-                    production_amount = getattr(production, 'production_amount', None) or 1000  # Default 1000kg
-                    net_footprint_per_kg = net_footprint / production_amount if production_amount > 0 else net_footprint
-                    
-                    if net_footprint_per_kg <= 0:
-                        industry_percentile = 95  # Very good if carbon neutral/negative
-                    elif net_footprint_per_kg <= benchmark.min_emissions:
-                        industry_percentile = 95  # Top performers
-                    elif net_footprint_per_kg >= benchmark.max_emissions:
-                        industry_percentile = 5   # Bottom performers
-                    else:
-                        # Linear interpolation between min and max
-                        position = (net_footprint_per_kg - benchmark.min_emissions) / (benchmark.max_emissions - benchmark.min_emissions)
-                        industry_percentile = max(5, min(95, int(95 - (position * 90))))
-                else:
-                    # No benchmark available - estimate based on carbon score
-                    carbon_score_temp = 50
-                    if total_emissions > 0:
-                        offset_percentage = min(100, (total_offsets / total_emissions) * 100)
-                        if offset_percentage >= 100:
-                            carbon_score_temp = 85 + min(15, ((offset_percentage - 100) / 50) * 15)
-                        else:
-                            carbon_score_temp = offset_percentage * 0.85
-                    elif total_offsets > 0:
-                        carbon_score_temp = 95
-                    
-                    industry_percentile = max(5, min(95, int(carbon_score_temp * 0.9)))
-                    
-            except Exception as e:
-                print(f"Error calculating crop-specific benchmarks: {e}")
-                industry_percentile = 50
-            
-            # Calculate carbon score with crop-specific considerations
-            carbon_score = 0
-            if benchmark:
-                # Use benchmark-based scoring
-                production_amount = getattr(production, 'production_amount', None) or 1000
-                net_footprint_per_kg = net_footprint / production_amount if production_amount > 0 else net_footprint
-                
-                if net_footprint_per_kg <= 0:
-                    carbon_score = 95  # Excellent for carbon neutral/negative
-                elif net_footprint_per_kg <= benchmark.min_emissions:
-                    carbon_score = 90  # Excellent performance
-                elif net_footprint_per_kg <= benchmark.average_emissions:
-                    # Better than average: scale from 70-90
-                    ratio = net_footprint_per_kg / benchmark.average_emissions
-                    carbon_score = int(90 - (ratio * 20))
-                elif net_footprint_per_kg <= benchmark.max_emissions:
-                    # Worse than average: scale from 30-70
-                    ratio = (net_footprint_per_kg - benchmark.average_emissions) / (benchmark.max_emissions - benchmark.average_emissions)
-                    carbon_score = int(70 - (ratio * 40))
-                else:
-                    # Worse than max: scale from 10-30
-                    ratio = min(net_footprint_per_kg / benchmark.max_emissions, 2.0)
-                    carbon_score = max(10, int(30 - ((ratio - 1) * 20)))
-            else:
-                # Fallback to offset-based scoring
-                if total_emissions > 0:
-                    offset_percentage = min(100, (total_offsets / total_emissions) * 100)
-                    if offset_percentage >= 100:
-                        carbon_score = 85 + min(15, ((offset_percentage - 100) / 50) * 15)
-                    else:
-                        carbon_score = offset_percentage * 0.85
-                elif total_offsets > 0:
-                    carbon_score = 95  # High score for carbon negative
-                else:
-                    carbon_score = 50  # Default score when no data
-            
-            carbon_score = max(1, min(100, round(carbon_score)))
+            # Carbon metrics come from the materialized snapshot, which is rebuilt in the
+            # background whenever entries, events or benchmarks change
+            snapshot = production_snapshot_service.get_snapshot(production)
+            cache_versions = tagged_cache.versions(self._summary_cache_tags(production, establishment, snapshot))
+            
+            total_emissions = snapshot.total_emissions
+            total_offsets = snapshot.total_offsets
+            net_footprint = snapshot.net_footprint
+            emissions_by_category = snapshot.emissions_by_category
+            emissions_by_source = snapshot.emissions_by_source
+            offsets_by_action = snapshot.offsets_by_action
+            industry_percentile = snapshot.industry_percentile
+            industry_average = snapshot.industry_average
+            benchmark_source = snapshot.benchmark_source
+            carbon_score = snapshot.carbon_score
             
             # Quick mode: return minimal data for fast loading
             if quick_mode:
@@ -1360,71 +1258,10 @@ class PublicProductionViewSet(viewsets.ViewSet):
                     'cache_hit': False,
                     'timestamp': timezone.now().isoformat()
                 }
-                # Cache quick response for 5 minutes
-                cache.set(cache_key, quick_response, 300)
+                tagged_cache.set(cache_key, quick_response, timeout=self.SUMMARY_CACHE_TIMEOUT, versions=cache_versions)
                 return Response(quick_response, status=status.HTTP_200_OK)
             
-            # Create blockchain verification if not already exists
-            blockchain_verification = None
-            try:
-                # Prepare carbon data for blockchain
-                carbon_data = {
-                    'production_id': int(pk),
-                    'total_emissions': float(total_emissions),
-                    'total_offsets': float(total_offsets),
-                    'crop_type': crop_name,
-                    'calculation_method': 'crop_specific_usda_benchmarking',
-                    'usda_verified': bool(benchmark and benchmark.usda_verified),
-                    'timestamp': int(production.start_date.timestamp()) if production.start_date else int(timezone.now().timestamp()),
-                    'carbon_score': carbon_score,
-                    'industry_percentile': industry_percentile
-                }
-                
-                # Check if blockchain record exists, create if not
-                verification_result = blockchain_service.verify_carbon_record(int(pk))
-                if not verification_result.get('verified', False):
-                    # Create new blockchain record
-                    blockchain_result = blockchain_service.create_carbon_record(int(pk), carbon_data)
-                    blockchain_verification = {
-                        'verified': True,
-                        'transaction_hash': blockchain_result.get('transaction_hash'),
-                        'record_hash': blockchain_result.get('record_hash'),
-                        'verification_url': blockchain_result.get('verification_url'),
-                        'network': blockchain_result.get('network', 'ethereum'),
-                        'verification_date': timezone.now().isoformat(),
-                        'mock_data': blockchain_result.get('mock_data', False)
-                    }
-                else:
-                    # Use existing blockchain record
-                    blockchain_verification = {
-                        'verified': verification_result.get('verified', False),
-                        'record_hash': verification_result.get('record_hash'),
-                        'verification_url': f"https://etherscan.io/tx/{verification_result.get('transaction_hash', '')}",
-                        'network': 'ethereum',
-                        'verification_date': timezone.now().isoformat(),
-                        'mock_data': verification_result.get('mock_data', False)
-                    }
-                    
-                # Check compliance status
-                compliance_result = blockchain_service.check_compliance(int(pk))
-                blockchain_verification.update({
-                    'compliance_status': compliance_result.get('compliant', False),
-                    'eligible_for_credits': compliance_result.get('eligible_for_credits', False)
-                })
-                
-            except Exception as e:
-                print(f"Error with blockchain verification: {e}")
-                # Fallback blockchain verification for demo
-                blockchain_verification = {
-                    'verified': True,
-                    'transaction_hash': f'0x{hashlib.sha256(f"fallback_{pk}".encode()).hexdigest()}',
-                    'verification_url': f'https://etherscan.io/tx/0x{hashlib.sha256(f"fallback_{pk}".encode()).hexdigest()}',
-                    'network': 'ethereum_testnet',
-                    'verification_date': timezone.now().isoformat(),
-                    'compliance_status': True,
-                    'eligible_for_credits': carbon_score >= 70,
-                    'fallback_data': True
-                }
+            blockchain_verification = snapshot.blockchain_verification
             
             # Get sustainability badges for this establishment/production
             badges = []
@@ -1561,7 +1398,7 @@ class PublicProductionViewSet(viewsets.ViewSet):
                 'relatableFootprint': relatable_footprint,
                 'industryPercentile': industry_percentile,
                 'industryAverage': float(industry_average),
-                'isUsdaVerified': getattr(establishment, 'usda_verified', False) if hasattr(establishment, 'usda_verified') else bool(benchmark and benchmark.usda_verified),
+                'isUsdaVerified': getattr(establishment, 'usda_verified', False) if hasattr(establishment, 'usda_verified') else snapshot.usda_verified,
                 'cropType': crop_name,
                 'benchmarkSource': benchmark_source,
                 'badges': badges,
@@ -1575,7 +1412,7 @@ class PublicProductionViewSet(viewsets.ViewSet):
                     'totalUsers': 500,
                     'averageRating': 4.5
                 },
-                'verificationDate': benchmark.last_updated.isoformat() if benchmark else None,
+                'verificationDate': snapshot.verification_date.isoformat() if snapshot.verification_date else None,
                 # Enhanced blockchain verification data
                 'blockchainVerification': blockchain_verification,
                 # Add essential location and establishment data for consumer experience
@@ -1609,17 +1446,17 @@ class PublicProductionViewSet(viewsets.ViewSet):
                 'timestamp': timezone.now().isoformat()
             }
             
-            # Cache the response for 15 minutes (900 seconds)
-            # Production data doesn't change frequently, so caching is safe
-            cache.set(cache_key, response_data, 900)
+            tagged_cache.set(cache_key, response_data, timeout=self.SUMMARY_CACHE_TIMEOUT, versions=cache_versions)
             
             return Response(response_data, status=status.HTTP_200_OK)
             
         except History.DoesNotExist:
+            tagged_cache.release(cache_key)
             return Response({
                 'error': 'Production not found or not published'
             }, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
+            tagged_cache.release(cache_key)
             print(f"Error in qr_summary: {e}")
             import traceback
             traceback.print_exc()
@@ -1665,30 +1502,31 @@ class PublicProductionViewSet(viewsets.ViewSet):
         - Load Time: 147ms → ~25ms (83% reduction)
         - Single source of truth for all product data
         """
+        # Enhanced cache key for complete endpoint; invalidated through its tags
+        cache_key = f'complete_summary_{pk}'
         try:
-            from django.core.cache import cache
             from django.db import connection
-            from history.models import History, HistoryScan
+            from history.models import History
+            from history.scan_ingestion import scan_ingestion
             from company.models import Establishment
-            from .services.blockchain import blockchain_service
             
-            # Enhanced cache key for complete endpoint
-            cache_key = f'complete_summary_{pk}_v1'
-            cached_data = cache.get(cache_key)
+            # Served stale while a single caller rebuilds it (see common/cache_tags.py)
+            cached_data = tagged_cache.fetch(cache_key)
             
-            if cached_data:
-                # Return cached data with fresh timestamp
+            if cached_data is not MISS:
+                # Return cached data with fresh timestamp; every scan is still recorded
                 cached_data['cache_hit'] = True
                 cached_data['timestamp'] = timezone.now().isoformat()
+                cached_data['history_scan'] = scan_ingestion.record_request(History(id=cached_data['product']['id']), request)
                 return Response(cached_data, status=status.HTTP_200_OK)
             
             # Single optimized query with all necessary joins and prefetches
             production = History.objects.select_related(
                 'product',
                 'parcel__establishment__company',
-                'album'
+                'album',
+                'carbon_snapshot'
             ).prefetch_related(
-                'carbonentry_set__source',
                 'album__images',
                 'history_weatherevent_events',
                 'history_chemicalevent_events',
@@ -1703,60 +1541,28 @@ class PublicProductionViewSet(viewsets.ViewSet):
             establishment = production.parcel.establishment if production.parcel else None
             
             if not establishment:
+                tagged_cache.release(cache_key)
                 return Response({
                     'error': 'No establishment found for this production'
                 }, status=status.HTTP_404_NOT_FOUND)
 
-            # === CARBON DATA CALCULATION (from existing qr_summary logic) ===
+            # === CARBON DATA (materialized snapshot shared with qr_summary) ===
             
-            # Get crop information for benchmarking
             crop_name = production.product.name if production.product else "unknown"
             crop_type = crop_name.lower().replace(' ', '_')
             
-            # Get carbon entries for this production
-            production_entries = CarbonEntry.objects.filter(production=production)
-            establishment_entries = CarbonEntry.objects.filter(establishment=establishment)
+            snapshot = production_snapshot_service.get_snapshot(production)
+            cache_versions = tagged_cache.versions(self._summary_cache_tags(production, establishment, snapshot))
             
-            # Calculate totals from production-specific entries first, fall back to establishment
-            if production_entries.exists():
-                entries = production_entries
-            else:
-                entries = establishment_entries.filter(year=production.start_date.year if production.start_date else timezone.now().year)
-            
-            total_emissions = entries.filter(type='emission').aggregate(Sum('co2e_amount'))['co2e_amount__sum'] or 0
-            # Use effective_amount for offsets to account for trust score discounts  
-            total_offsets = entries.filter(type='offset').aggregate(Sum('effective_amount'))['effective_amount__sum'] or 0
-            net_footprint = total_emissions - total_offsets
-            
-            # Get emissions breakdown by category and source
-            emissions_by_category = {}
-            emissions_by_source = {}
-            offsets_by_action = {}
-            
-            # Calculate emissions by source
-            for entry in entries.filter(type='emission'):
-                source_name = entry.source.name if entry.source else 'Unknown'
-                if source_name not in emissions_by_source:
-                    emissions_by_source[source_name] = 0
-                emissions_by_source[source_name] += float(entry.co2e_amount or 0)
-                
-                # Also categorize by source category
-                category = entry.source.category if entry.source else 'Other'
-                if category not in emissions_by_category:
-                    emissions_by_category[category] = 0
-                emissions_by_category[category] += float(entry.co2e_amount or 0)
-            
-            # Calculate offsets by action - using effective amounts
-            for entry in entries.filter(type='offset'):
-                action_name = entry.source.name if entry.source else 'Unknown Offset'
-                if action_name not in offsets_by_action:
-                    offsets_by_action[action_name] = 0
-                offsets_by_action[action_name] += float(entry.effective_amount or entry.co2e_amount or 0)
-
-            # Calculate carbon score and industry percentile (using existing logic)
-            carbon_score = self._calculate_carbon_score(total_emissions, total_offsets, production, crop_type)
-            industry_percentile = self._calculate_industry_percentile(net_footprint, production, crop_type)
-            industry_average = self._get_industry_average(crop_type, production)
+            total_emissions = snapshot.total_emissions
+            total_offsets = snapshot.total_offsets
+            net_footprint = snapshot.net_footprint
+            emissions_by_category = snapshot.emissions_by_category
+            emissions_by_source = snapshot.emissions_by_source
+            offsets_by_action = snapshot.offsets_by_action
+            carbon_score = snapshot.carbon_score
+            industry_percentile = snapshot.industry_percentile
+            industry_average = snapshot.industry_average
             
             # === TIMELINE DATA (combined from all event types) ===
             timeline_data = self._get_complete_timeline(production)
@@ -1870,41 +1676,11 @@ class PublicProductionViewSet(viewsets.ViewSet):
             # === SIMILAR PRODUCTS ===
             similar_products = self._get_similar_products(production)
             
-            # === SCAN TRACKING (create scan record like history API does) ===
-            x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
-            if x_forwarded_for:
-                ip_address = x_forwarded_for.split(",")[0]
-            else:
-                ip_address = request.META.get("HTTP_X_REAL_IP")
-
-            city = None
-            country = None
-
-            # Get city and country from IP using free API (no GDAL required)
-            if ip_address:
-                try:
-                    import requests
-                    # Using ipapi.co - free tier allows 1000 requests/day
-                    response = requests.get(f'https://ipapi.co/{ip_address}/json/', timeout=2)
-                    if response.status_code == 200:
-                        data = response.json()
-                        city = data.get('city')
-                        country = data.get('country_name')
-                except Exception as e:
-                    # If geolocation fails, continue without it
-                    print(f"IP geolocation failed: {e}")
-                    pass
-
-            history_scan = HistoryScan.objects.create(
-                history=production,
-                user=request.user if request.user.is_authenticated else None,
-                ip_address=ip_address,
-                city=city,
-                country=country,
-            )
+            # === SCAN TRACKING (buffered like the history API, see history/scan_ingestion.py) ===
+            history_scan_id = scan_ingestion.record_request(production, request)
             
-            # === BLOCKCHAIN VERIFICATION ===
-            blockchain_verification = self._get_blockchain_verification(production)
+            # === BLOCKCHAIN VERIFICATION (stored on the snapshot, like qr_summary) ===
+            blockchain_verification = snapshot.blockchain_verification or {}
             
             # === SUSTAINABILITY METRICS AND RECOMMENDATIONS ===
             recommendations = self._generate_sustainability_recommendations(
@@ -1943,7 +1719,7 @@ class PublicProductionViewSet(viewsets.ViewSet):
                 'industryAverage': industry_average,
                 'isUsdaVerified': self._check_usda_verification(production),
                 'cropType': crop_type,
-                'benchmarkSource': f'crop_specific_{crop_type}',
+                'benchmarkSource': snapshot.benchmark_source,
                 
                 # Emissions breakdown
                 'emissionsByCategory': emissions_by_category,
@@ -1970,7 +1746,7 @@ class PublicProductionViewSet(viewsets.ViewSet):
                 'similar_histories': similar_products,  # Alias for history API compatibility
                 
                 # Scan tracking
-                'history_scan': history_scan.id,
+                'history_scan': history_scan_id,
                 
                 # Sustainability features
                 'recommendations': recommendations,
@@ -1986,16 +1762,17 @@ class PublicProductionViewSet(viewsets.ViewSet):
                 'api_version': 'complete_v1'
             }
             
-            # Cache the complete response for 15 minutes (900 seconds)
-            cache.set(cache_key, response_data, 900)
+            tagged_cache.set(cache_key, response_data, timeout=self.SUMMARY_CACHE_TIMEOUT, versions=cache_versions)
             
             return Response(response_data, status=status.HTTP_200_OK)
             
         except History.DoesNotExist:
+            tagged_cache.release(cache_key)
             return Response({
                 'error': 'Production not found or not published'
             }, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
+            tagged_cache.release(cache_key)
             print(f"Error in complete_summary: {e}")
             import traceback
             traceback.print_exc()
@@ -2214,202 +1991,6 @@ class PublicProductionViewSet(viewsets.ViewSet):
         except Exception:
             return []
 
-    def _normalize_crop_name(self, crop_name):
-        """Normalize crop name to handle plural/singular matching"""
-        if not crop_name:
-            return ""
-        
-        # Convert to lowercase and remove spaces/underscores
-        normalized = crop_name.lower().replace(' ', '_').replace('-', '_')
-        
-        # Common plural to singular mappings for agricultural products
-        plural_to_singular = {
-            'strawberries': 'strawberry',
-            'blueberries': 'blueberry',
-            'raspberries': 'raspberry',
-            'blackberries': 'blackberry',
-            'cranberries': 'cranberry',
-            'cherries': 'cherry',
-            'grapes': 'grape',
-            'apples': 'apple',
-            'oranges': 'orange',
-            'lemons': 'lemon',
-            'limes': 'lime',
-            'peaches': 'peach',
-            'pears': 'pear',
-            'bananas': 'banana',
-            'avocados': 'avocado',
-            'tomatoes': 'tomato',
-            'potatoes': 'potato',
-            'onions': 'onion',
-            'carrots': 'carrot',
-            'peppers': 'pepper',
-            'cucumbers': 'cucumber',
-            'lettuce': 'lettuce',
-            'spinach': 'spinach',
-            'broccoli': 'broccoli',
-            'cauliflower': 'cauliflower',
-            'beans': 'bean',
-            'peas': 'pea',
-            'soybeans': 'soybean',
-            'corn': 'corn',
-            'wheat': 'wheat',
-            'rice': 'rice',
-            'oats': 'oat',
-            'barley': 'barley',
-            'almonds': 'almond',
-            'walnuts': 'walnut',
-            'pecans': 'pecan',
-            'pistachios': 'pistachio',
-        }
-        
-        # Check if it's a known plural form
-        if normalized in plural_to_singular:
-            return plural_to_singular[normalized]
-        
-        # Handle generic plural endings
-        if normalized.endswith('ies'):
-            # berries -> berry, cherries -> cherry
-            return normalized[:-3] + 'y'
-        elif normalized.endswith('es') and len(normalized) > 3:
-            # tomatoes -> tomato, potatoes -> potato
-            return normalized[:-2]
-        elif normalized.endswith('s') and len(normalized) > 2:
-            # apples -> apple, grapes -> grape
-            return normalized[:-1]
-        
-        return normalized
-
-    def _find_crop_benchmark(self, crop_name, year, usda_verified=True):
-        """Find crop benchmark with flexible matching for plural/singular forms"""
-        if not crop_name:
-            return None
-            
-        # First try exact match
-        benchmark = CarbonBenchmark.objects.filter(
-            crop_type=crop_name,
-            year=year,
-            usda_verified=usda_verified
-        ).first()
-        
-        if benchmark:
-            return benchmark
-        
-        # Try normalized version
-        normalized_crop = self._normalize_crop_name(crop_name)
-        if normalized_crop != crop_name:
-            benchmark = CarbonBenchmark.objects.filter(
-                crop_type=normalized_crop,
-                year=year,
-                usda_verified=usda_verified
-            ).first()
-            
-            if benchmark:
-                return benchmark
-        
-        # Try reverse matching - check if any benchmark crop names match our normalized name
-        # This handles cases where benchmark has plural but product has singular
-        all_benchmarks = CarbonBenchmark.objects.filter(
-            year=year,
-            usda_verified=usda_verified
-        )
-        
-        for benchmark in all_benchmarks:
-            if self._normalize_crop_name(benchmark.crop_type) == normalized_crop:
-                return benchmark
-        
-        return None
-
-    def _calculate_carbon_score(self, total_emissions, total_offsets, production, crop_type):
-        """Calculate carbon score using existing logic from qr_summary"""
-        try:
-            # Try to get benchmark for more accurate scoring with flexible matching
-            year = production.start_date.year if production.start_date else timezone.now().year
-            benchmark = self._find_crop_benchmark(crop_type, year, usda_verified=True)
-            
-            if benchmark:
-                # Use benchmark-based scoring
-                production_amount = getattr(production, 'production_amount', None) or 1000
-                net_footprint_per_kg = (total_emissions - total_offsets) / production_amount if production_amount > 0 else (total_emissions - total_offsets)
-                
-                if net_footprint_per_kg <= 0:
-                    return 95  # Excellent for carbon neutral/negative
-                elif net_footprint_per_kg <= benchmark.min_emissions:
-                    return 90  # Excellent performance
-                elif net_footprint_per_kg <= benchmark.average_emissions:
-                    # Better than average: scale from 70-90
-                    ratio = net_footprint_per_kg / benchmark.average_emissions
-                    return int(90 - (ratio * 20))
-                elif net_footprint_per_kg <= benchmark.max_emissions:
-                    # Worse than average: scale from 30-70
-                    ratio = (net_footprint_per_kg - benchmark.average_emissions) / (benchmark.max_emissions - benchmark.average_emissions)
-                    return int(70 - (ratio * 40))
-                else:
-                    # Worse than max: scale from 10-30
-                    ratio = min(net_footprint_per_kg / benchmark.max_emissions, 2.0)
-                    return max(10, int(30 - ((ratio - 1) * 20)))
-            else:
-                # Fallback to offset-based scoring
-                if total_emissions > 0:
-                    offset_percentage = min(100, (total_offsets / total_emissions) * 100)
-                    if offset_percentage >= 100:
-                        return 85 + min(15, ((offset_percentage - 100) / 50) * 15)
-                    else:
-                        return offset_percentage * 0.85
-                elif total_offsets > 0:
-                    return 95  # High score for carbon negative
-                else:
-                    return 50  # Default score when no data
-        except Exception:
-            return 50
-
-    def _calculate_industry_percentile(self, net_footprint, production, crop_type):
-        """Calculate industry percentile using existing logic"""
-        try:
-            year = production.start_date.year if production.start_date else timezone.now().year
-            benchmark = self._find_crop_benchmark(crop_type, year, usda_verified=True)
-            
-            if benchmark and benchmark.average_emissions > 0:
-                # Convert net footprint to per-kg basis if we have production amount
-                production_amount = getattr(production, 'production_amount', None) or 1000
-                net_footprint_per_kg = net_footprint / production_amount if production_amount > 0 else net_footprint
-                
-                if net_footprint_per_kg <= 0:
-                    return 95  # Very good if carbon neutral/negative
-                elif net_footprint_per_kg <= benchmark.min_emissions:
-                    return 95  # Top performers
-                elif net_footprint_per_kg >= benchmark.max_emissions:
-                    return 5   # Bottom performers
-                else:
-                    # Linear interpolation between min and max
-                    position = (net_footprint_per_kg - benchmark.min_emissions) / (benchmark.max_emissions - benchmark.min_emissions)
-                    return max(5, min(95, int(95 - (position * 90))))
-            else:
-                # No benchmark available - estimate based on carbon score
-                carbon_score = self._calculate_carbon_score(0, 0, production, crop_type)  # Will use fallback logic
-                return max(5, min(95, int(carbon_score * 0.9)))
-        except Exception:
-            return 50
-
-    def _get_industry_average(self, crop_type, production):
-        """Get industry average emissions for the crop type"""
-        try:
-            year = production.start_date.year if production.start_date else timezone.now().year
-            benchmark = self._find_crop_benchmark(crop_type, year, usda_verified=True)
-            
-            if benchmark:
-                return benchmark.average_emissions
-            else:
-                # Fallback to general agriculture average
-                general_benchmark = CarbonBenchmark.objects.filter(
-                    industry='agriculture',
-                    year=year,
-                    crop_type=''
-                ).first()
-                return general_benchmark.average_emissions if general_benchmark else 0.0
-        except Exception:
-            return 0.0
-
     def _get_complete_timeline(self, production):
         """Get complete timeline data from all event types with carbon calculations"""
         try:
@@ -2420,7 +2001,7 @@ class PublicProductionViewSet(viewsets.ViewSet):
                 WeatherEvent, ProductionEvent, ChemicalEvent, 
                 GeneralEvent, EquipmentEvent, SoilManagementEvent, PestManagementEvent
             )
-            from .models import CarbonEntry
+            from .services.event_carbon_results import event_carbon_results
             
             event_types = [
                 (production.history_weatherevent_events.all(), 'weather'),
@@ -2432,29 +2013,40 @@ class PublicProductionViewSet(viewsets.ViewSet):
                 (production.history_pestmanagementevent_events.all(), 'pest_management'),
             ]
             
-            for events, event_category in event_types:
-                for event in events:
-                    # Build basic event data
-                    event_data = {
-                        'id': event.id,
-                        'type': event_category,
-                        'description': getattr(event, 'description', '') or getattr(event, 'name', ''),
-                        'observation': getattr(event, 'observation', ''),
-                        'date': event.date.isoformat() if event.date else None,
-                        'certified': getattr(event, 'certified', True),
-                        'index': getattr(event, 'index', 0),
-                        'volume': getattr(event, 'volume', None),
-                        'concentration': getattr(event, 'concentration', None),
-                        'area': getattr(event, 'area', None),
-                        'equipment': getattr(event, 'commercial_name', None) or getattr(event, 'equipment', None)
-                    }
-                    
-                    # Add carbon calculation data if available
-                    carbon_data = self._get_event_carbon_data(event, event_category, production)
-                    if carbon_data:
-                        event_data['carbon_data'] = carbon_data
-                    
-                    timeline_events.append(event_data)
+            categorized_events = [
+                (event, event_category)
+                for events, event_category in event_types
+                for event in events
+            ]
+            all_events = [event for event, _ in categorized_events]
+            # Stored results and linked carbon entries for the whole timeline, one query each
+            carbon_results = event_carbon_results.get_many(all_events)
+            carbon_entries = event_carbon_results.latest_entries(all_events)
+            
+            for event, event_category in categorized_events:
+                # Build basic event data
+                event_data = {
+                    'id': event.id,
+                    'type': event_category,
+                    'description': getattr(event, 'description', '') or getattr(event, 'name', ''),
+                    'observation': getattr(event, 'observation', ''),
+                    'date': event.date.isoformat() if event.date else None,
+                    'certified': getattr(event, 'certified', True),
+                    'index': getattr(event, 'index', 0),
+                    'volume': getattr(event, 'volume', None),
+                    'concentration': getattr(event, 'concentration', None),
+                    'area': getattr(event, 'area', None),
+                    'equipment': getattr(event, 'commercial_name', None) or getattr(event, 'equipment', None)
+                }
+                
+                # Add carbon calculation data if available
+                carbon_data = self._get_event_carbon_data(
+                    event, event_category, production, carbon_results, carbon_entries
+                )
+                if carbon_data:
+                    event_data['carbon_data'] = carbon_data
+                
+                timeline_events.append(event_data)
             
             # Sort by date
             timeline_events.sort(key=lambda x: x['date'] or '1900-01-01')
@@ -2464,41 +2056,43 @@ class PublicProductionViewSet(viewsets.ViewSet):
             print(f"Error getting timeline: {e}")
             return []
 
-    def _get_event_carbon_data(self, event, event_category, production):
-        """Get carbon calculation data for a specific event"""
+    def _get_event_carbon_data(self, event, event_category, production, carbon_results=None, carbon_entries=None):
+        """
+        Get carbon calculation data for a specific event. ``carbon_results`` and
+        ``carbon_entries`` are the timeline-wide lookups from ``_get_complete_timeline``;
+        without them the event is looked up on its own.
+        """
         try:
-            from .models import CarbonEntry
-            
-            # First, try to get from event's extra_data field (stored during event creation)
-            if hasattr(event, 'extra_data') and event.extra_data:
-                carbon_calc = event.extra_data.get('carbon_calculation')
-                if carbon_calc:
-                    return {
-                        'co2e': float(carbon_calc.get('co2e', 0)),
-                        'efficiency_score': float(carbon_calc.get('efficiency_score', 0)),
-                        'usda_verified': carbon_calc.get('usda_factors_based', False),
-                        'calculation_method': carbon_calc.get('calculation_method', 'USDA Agricultural Emission Factors'),
-                        'verification_confidence': carbon_calc.get('confidence_level', 'medium'),
-                        'cost_analysis': carbon_calc.get('cost_analysis') if carbon_calc.get('cost_analysis') else None
-                    }
+            from .services.event_carbon_results import event_carbon_results
             
-            # Second, try to find related CarbonEntry records
-            carbon_entries = CarbonEntry.objects.filter(
-                production=production,
-                extra_data__event_id=event.id
-            ).order_by('-created_at')
+            key = event_carbon_results.event_key(event)
+            if carbon_results is None:
+                carbon_results = event_carbon_results.get_many([event])
+            if carbon_entries is None:
+                carbon_entries = event_carbon_results.latest_entries([event])
             
-            if carbon_entries.exists():
-                carbon_entry = carbon_entries.first()
-                extra_data = carbon_entry.extra_data or {}
-                
+            # First, try the stored event carbon result
+            carbon_calc = carbon_results.get(key)
+            if carbon_calc:
+                return {
+                    'co2e': float(carbon_calc.get('co2e', 0)),
+                    'efficiency_score': float(carbon_calc.get('efficiency_score', 0)),
+                    'usda_verified': carbon_calc.get('usda_factors_based', False),
+                    'calculation_method': carbon_calc.get('calculation_method', 'USDA Agricultural Emission Factors'),
+                    'verification_confidence': carbon_calc.get('confidence_level', 'medium'),
+                    'cost_analysis': carbon_calc.get('cost_analysis') if carbon_calc.get('cost_analysis') else None
+                }
+            
+            # Second, try the CarbonEntry created from the event
+            carbon_entry = carbon_entries.get(key)
+            if carbon_entry:
                 return {
                     'co2e': float(carbon_entry.amount),
-                    'efficiency_score': float(extra_data.get('efficiency_score', 75)),
+                    'efficiency_score': 75.0,
                     'usda_verified': carbon_entry.usda_factors_based,
                     'calculation_method': carbon_entry.data_source or 'USDA Agricultural Emission Factors',
-                    'verification_confidence': extra_data.get('confidence_level', 'high'),
-                    'cost_analysis': extra_data.get('cost_analysis') if extra_data.get('cost_analysis') else None
+                    'verification_confidence': 'high',
+                    'cost_analysis': None
                 }
             
             # Third, try to calculate on-the-fly for events without stored calculations
@@ -2558,23 +2152,6 @@ class PublicProductionViewSet(viewsets.ViewSet):
             print(f"Error calculating carbon on-demand for event {event.id}: {e}")
             return None
 
-    def _get_blockchain_verification(self, production):
-        """Get blockchain verification status"""
-        try:
-            # Check if production has blockchain verification
-            # This would integrate with your blockchain service
-            return {
-                'verified': True,  # Placeholder - implement actual verification logic
-                'transaction_hash': None,
-                'verification_date': timezone.now().isoformat(),
-                'certifying_body': 'USDA SOE'
-            }
-        except Exception:
-            return {
-                'verified': False,
-                'error': 'Verification service unavailable'
-            }
-
     def _generate_sustainability_recommendations(self, crop_name, total_emissions, total_offsets, carbon_score):
         """Generate sustainability recommendations based on crop and performance"""
         try:
@@ -3231,19 +2808,10 @@ def john_deere_webhook(request):
             )
         
         # Calculate carbon emissions (diesel: 2.7 kg CO2e/liter)
-        co2e_emissions = fuel_liters * 2.7
+        co2e_emissions = fuel_liters * DIESEL_KG_CO2E_PER_LITER
         
-        # Find or create a CarbonSource for IoT-generated fuel consumption events
-        source_name = f'{equipment_type.title()} Fuel Consumption'
-        carbon_source, created = CarbonSource.objects.get_or_create(
-            name=source_name,
-            defaults={
-                'category': 'fuel',
-                'default_emission_factor': 2.7,  # Diesel emission factor
-                'unit': 'kg CO2e/L',
-                'description': f'Automatically created for IoT device: {device_id}'
-            }
-        )
+        # CarbonSource for IoT-generated fuel consumption events, cached per process
+        carbon_source = iot_webhook_ingestor.fuel_source(equipment_type, device_id)
         
         # Create carbon entry automatically
         carbon_entry = CarbonEntry.objects.create(
@@ -3320,46 +2888,7 @@ def weather_station_webhook(request):
             )
         
         # Generate weather-based recommendations
-        recommendations = []
-        
-        # High temperature alert (>35°C)
-        if temperature > 35:
-            recommendations.append({
-                'type': 'weather_alert',
-                'priority': 'high',
-                'message': f'High temperature alert: {temperature}°C - Consider crop protection measures',
-                'suggested_actions': [
-                    'Increase irrigation frequency',
-                    'Apply shade cloth if available',
-                    'Monitor plant stress indicators'
-                ]
-            })
-        
-        # High wind alert (>25 km/h)
-        if wind_speed > 25:
-            recommendations.append({
-                'type': 'weather_alert',
-                'priority': 'medium',
-                'message': f'High wind alert: {wind_speed} km/h - Avoid chemical applications',
-                'suggested_actions': [
-                    'Postpone spraying operations',
-                    'Secure loose equipment',
-                    'Check irrigation systems for damage'
-                ]
-            })
-        
-        # Low humidity alert (<30%)
-        if humidity < 30:
-            recommendations.append({
-                'type': 'weather_alert',
-                'priority': 'medium',
-                'message': f'Low humidity alert: {humidity}% - Increase irrigation',
-                'suggested_actions': [
-                    'Increase irrigation duration',
-                    'Monitor soil moisture levels',
-                    'Consider misting systems'
-                ]
-            })
+        recommendations = weather_alerts_for(temperature, humidity, wind_speed)
         
         # Log weather data processing
         CarbonAuditLog.objects.create(
@@ -3392,6 +2921,69 @@ def weather_station_webhook(request):
         )
 
 
+def _batch_response(result):
+    """201 when any reading was accepted (listing rejected ones), 400 when none was."""
+    accepted = result['accepted']
+    return Response({
+        'status': 'success' if not result['rejected'] else 'partial' if accepted else 'error',
+        **result,
+        'timestamp': timezone.now().isoformat(),
+    }, status=status.HTTP_201_CREATED if accepted else status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser, NDJSONParser])
+def john_deere_webhook_batch(request):
+    """
+    Batch webhook for John Deere fuel sensor readings: a JSON array (or
+    ``{"readings": [...]}``) or NDJSON with the fields of ``john_deere_webhook``.
+    Valid readings are written in one transaction; invalid ones are reported by index.
+    """
+    # Parse errors are raised here and rendered by DRF as 400s
+    data = request.data
+    try:
+        result = iot_webhook_ingestor.ingest_fuel(data, request.user)
+        return _batch_response(result)
+    except ValueError as e:
+        return Response(
+            {'error': f'Invalid data format: {str(e)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error processing John Deere webhook batch: {str(e)}")
+        return Response(
+            {'error': 'Failed to process IoT data'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser, NDJSONParser])
+def weather_station_webhook_batch(request):
+    """
+    Batch webhook for weather station readings, in the formats accepted by
+    ``john_deere_webhook_batch``. Returns the recommendations for each reading.
+    """
+    # Parse errors are raised here and rendered by DRF as 400s
+    data = request.data
+    try:
+        result = iot_webhook_ingestor.ingest_weather(data, request.user)
+        return _batch_response(result)
+    except ValueError as e:
+        return Response(
+            {'error': f'Invalid data format: {str(e)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error processing weather station webhook batch: {str(e)}")
+        return Response(
+            {'error': 'Failed to process weather data'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 class IoTDeviceViewSet(viewsets.ViewSet):
     """
     ViewSet for IoT device management and monitoring.
@@ -3659,16 +3251,15 @@ class IoTDeviceViewSet(viewsets.ViewSet):
         
         try:
             # Query real IoT devices from database
-            devices = IoTDevice.objects.filter(establishment_id=establishment_id)
+            devices = list(IoTDevice.objects.filter(establishment_id=establishment_id))
+            
+            # Count today's data points from the hourly rollups
+            today_start = iot_rollups.bucket_start(timezone.now(), 'day')
+            counts_today = iot_rollups.reading_counts([device.id for device in devices], today_start)
             
             device_data = []
             for device in devices:
-                # Count data points for today
-                today = timezone.now().date()
-                data_points_today = IoTDataPoint.objects.filter(
-                    device=device,
-                    timestamp__date=today
-                ).count()
+                data_points_today = counts_today.get(device.id, 0)
                 
                 # Determine signal strength based on last seen
                 signal_strength = 'offline'
@@ -3735,6 +3326,50 @@ class IoTDeviceViewSet(viewsets.ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=True, methods=['get'])
+    def readings(self, request, pk=None):
+        """Get aggregated readings for a device from the minute/hour/day rollups."""
+        resolution = request.query_params.get('resolution', 'hour')
+        metric = request.query_params.get('metric', iot_rollups.READINGS_METRIC)
+        
+        if resolution not in iot_rollups.RESOLUTIONS:
+            return Response(
+                {'error': f"resolution must be one of {', '.join(iot_rollups.RESOLUTIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            hours = int(request.query_params.get('hours', 24))
+        except ValueError:
+            return Response(
+                {'error': 'hours must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            device = IoTDevice.objects.get(id=pk)
+            since = timezone.now() - timedelta(hours=hours)
+            
+            return Response({
+                'device_id': device.device_id,
+                'metric': metric,
+                'resolution': resolution,
+                'since': since.isoformat(),
+                'buckets': iot_rollups.series(device.id, metric, resolution, since)
+            }, status=status.HTTP_200_OK)
+            
+        except IoTDevice.DoesNotExist:
+            return Response(
+                {'error': 'Device not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except Exception as e:
+            logger.error(f"Error fetching IoT device readings: {str(e)}")
+            return Response(
+                {'error': 'Failed to fetch device readings', 'details': str(e)}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
     @action(detail=False, methods=['get'])
     def device_types(self, request):
         """Get available device types for registration."""
@@ -5184,6 +4819,10 @@ class BlockchainVerificationViewSet(viewsets.ViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Carbon cost insights are invalidated through their cache tags
+CARBON_INSIGHTS_CACHE_TIMEOUT = 60 * 60 * 6
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_production_carbon_economics(request, production_id):
@@ -5293,7 +4932,12 @@ def get_establishment_carbon_summary(request, establishment_id):
         )
         
         insights_service = CarbonCostInsights()
-        summary_data = insights_service.get_establishment_carbon_summary(establishment_id)
+        summary_data = tagged_cache.get_or_set(
+            f'establishment_carbon_summary_{establishment.id}',
+            lambda: insights_service.get_establishment_carbon_summary(establishment.id),
+            tags=[establishment_tag(establishment.id)],
+            timeout=CARBON_INSIGHTS_CACHE_TIMEOUT,
+        )
         
         return Response({
             'success': True,
@@ -5329,7 +4973,12 @@ def get_carbon_credit_potential(request, production_id):
         )
         
         insights_service = CarbonCostInsights()
-        credit_data = insights_service.calculate_carbon_credit_potential(production)
+        credit_data = tagged_cache.get_or_set(
+            f'carbon_credit_potential_{production.id}',
+            lambda: insights_service.calculate_carbon_credit_potential(production),
+            tags=[production_tag(production.id)],
+            timeout=CARBON_INSIGHTS_CACHE_TIMEOUT,
+        )
         
         return Response({
             'success': True,
@@ -6964,7 +6613,7 @@ def bulk_verify_entries(request):
     }
     """
     try:
-        from .services.verification_service import VerificationService
+        from .services.batch_verification import BatchVerificationEngine
         from .services.audit_scheduler import AuditScheduler
         
         data = request.data
@@ -6977,20 +6626,37 @@ def bulk_verify_entries(request):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # Get carbon entries
-        carbon_entries = CarbonEntry.objects.filter(
+        carbon_entries = list(CarbonEntry.objects.filter(
             id__in=entry_ids,
             created_by=request.user
-        )
+        ).select_related('establishment', 'source'))
         
-        if carbon_entries.count() != len(entry_ids):
+        if len(carbon_entries) != len(entry_ids):
             return Response({
                 'error': 'Some carbon entries not found or access denied'
             }, status=status.HTTP_404_NOT_FOUND)
         
         # Initialize services
-        verification_service = VerificationService()
         audit_scheduler = AuditScheduler()
         
+        # Verify all entries the action needs in one batch, against context loaded once
+        if verification_action == 'verify_registry':
+            entries_to_verify = [entry for entry in carbon_entries if entry.registry_verification_id]
+        elif verification_action == 'validate_evidence':
+            entries_to_verify = carbon_entries
+        else:
+            entries_to_verify = []
+        verifications = {
+            entry.id: (result, error)
+            for entry, result, error in BatchVerificationEngine().verify(entries_to_verify)
+        }
+        
+        def verification_for(entry):
+            result, error = verifications[entry.id]
+            if error is not None:
+                raise error
+            return result
+        
         results = []
         
         for entry in carbon_entries:
@@ -7009,7 +6675,7 @@ def bulk_verify_entries(request):
                 elif verification_action == 'verify_registry':
                     # Verify registry credentials
                     if entry.registry_verification_id:
-                        verification_result = verification_service.verify_offset_entry(entry)
+                        verification_result = verification_for(entry)
                         registry_verified = verification_result.get('registry_validation', {}).get('verified', False)
                         
                         results.append({
@@ -7029,7 +6695,7 @@ def bulk_verify_entries(request):
                         
                 elif verification_action == 'validate_evidence':
                     # Validate evidence requirements
-                    verification_result = verification_service.verify_offset_entry(entry)
+                    verification_result = verification_for(entry)
                     evidence_complete = verification_result.get('evidence_complete', False)
                     
                     results.append({
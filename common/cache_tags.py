@@ -0,0 +1,226 @@
+"""
+Cache entries invalidated by dependency tags.
+
+Each tag (``production:12``, ``establishment:3``, ``benchmark:corn:2024``) has a
+version token in the cache. Entries are stored together with the versions of
+their tags at the time they were computed, and a read only hits when all of
+those versions are still current. Invalidating a tag replaces its token, which
+expires every entry tagged with it at once without having to know their keys.
+Model signals invalidate tags precisely, so tagged entries can use long TTLs.
+
+``fetch`` protects expensive entries against stampedes: one caller at a time
+recomputes a key (a single-flight lock), the others are served the previous
+value meanwhile (stale-while-revalidate), and entries are refreshed a little
+before they expire with a probability that grows as expiry nears. Each lock
+holds a token unique to the caller that took it, so a caller whose lock expired
+can't release the lock another caller has taken since.
+"""
+
+import math
+import random
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from django.core.cache import cache
+
+# Returned by ``get`` on a miss, so ``None`` can be cached as a value
+MISS = object()
+
+
+def production_tag(production_id) -> str:
+    return f"production:{production_id}"
+
+
+def establishment_tag(establishment_id) -> str:
+    return f"establishment:{establishment_id}"
+
+
+def benchmark_tag(crop_type, year) -> str:
+    return f"benchmark:{'-'.join((crop_type or '').lower().split())}:{year}"
+
+
+class TaggedCache:
+    """
+    Reads, writes and invalidates tagged cache entries.
+    """
+
+    KEY_PREFIX = "tagged"
+    TAG_PREFIX = "cache_tag"
+
+    # Expired or invalidated entries stay servable this long while one caller refreshes them
+    STALE_SECONDS = 60 * 60
+
+    # A refresh that hasn't finished by then can be retried by another caller
+    LOCK_SECONDS = 30
+
+    # How long callers wait for a value someone else is computing on a cold miss
+    WAIT_SECONDS = 2.0
+    WAIT_INTERVAL_SECONDS = 0.05
+
+    EARLY_REFRESH_BETA = 1.0
+
+    def __init__(self):
+        # Refresh locks taken by the current thread: key -> (token, acquired at)
+        self._local = threading.local()
+
+    def versions(self, tags: Iterable[str]) -> Dict[str, str]:
+        """
+        Current version token of each tag, creating tokens for new tags. Capture
+        these before computing a value and pass them to ``set``, so an invalidation
+        that lands while the value is being computed isn't lost.
+        """
+        tags = list(dict.fromkeys(tags))
+        stored = cache.get_many([self._tag_key(tag) for tag in tags])
+        versions = {tag: stored.get(self._tag_key(tag)) for tag in tags}
+
+        missing = {tag: uuid.uuid4().hex for tag, version in versions.items() if version is None}
+        for tag, version in missing.items():
+            # Another process may create the token first; use whichever won
+            if not cache.add(self._tag_key(tag), version, None):
+                version = cache.get(self._tag_key(tag))
+            versions[tag] = version
+        return versions
+
+    def get(self, key: str) -> Any:
+        """The cached value, or ``MISS`` if absent, expired or any of its tags was invalidated."""
+        entry = cache.get(self._entry_key(key))
+        if entry is None or not self._is_current(entry) or self._is_expired(entry):
+            return MISS
+        return entry["value"]
+
+    def fetch(self, key: str) -> Any:
+        """
+        Read ``key`` with stampede protection. Returns ``MISS`` only to the one caller
+        that should compute the value and ``set`` it (or ``release`` the key on failure):
+
+        - fresh entries are returned as-is, except that as expiry approaches a
+          caller is picked at random to refresh early;
+        - expired or invalidated entries are served stale to everyone except the
+          caller holding the key's refresh lock;
+        - on a cold miss the other callers wait briefly for the value and only
+          compute it themselves if it doesn't show up. If the lock couldn't be
+          taken but nobody holds it either (the cache is unavailable and its
+          errors are ignored), the caller computes the value right away.
+        """
+        entry = cache.get(self._entry_key(key))
+        if entry is not None:
+            if self._is_current(entry) and not self._should_refresh(entry):
+                return entry["value"]
+            if not self._acquire(key):
+                return entry["value"]
+            return MISS
+
+        if self._acquire(key) or cache.get(self._lock_key(key)) is None:
+            return MISS
+
+        deadline = time.monotonic() + self.WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(self.WAIT_INTERVAL_SECONDS)
+            entry = cache.get(self._entry_key(key))
+            if entry is not None:
+                return entry["value"]
+        return MISS
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = (), timeout: Optional[int] = None,
+            versions: Optional[Dict[str, str]] = None):
+        """
+        Store ``value`` as fresh for ``timeout`` seconds; it is kept ``STALE_SECONDS``
+        longer to be served stale while a refresh runs. Releases the refresh lock.
+        """
+        now = time.time()
+        held = self._held().get(key)
+        cache.set(
+            self._entry_key(key),
+            {
+                "value": value,
+                "tags": versions if versions is not None else self.versions(tags),
+                "fresh_until": now + timeout if timeout is not None else None,
+                # How long the value took to compute, for probabilistic early refresh
+                "compute_seconds": max(now - held[1], 0) if held else 0,
+            },
+            timeout + self.STALE_SECONDS if timeout is not None else None,
+        )
+        self.release(key)
+
+    def release(self, key: str):
+        """
+        Drop the refresh lock this caller took in ``fetch``, e.g. when computing the
+        value failed. Leaves the lock alone if this caller doesn't hold it: it never
+        took it, or it expired and another caller has taken it since.
+        """
+        held = self._held().pop(key, None)
+        if held is None:
+            return
+        lock_key = self._lock_key(key)
+        if cache.get(lock_key) == held[0]:
+            cache.delete(lock_key)
+
+    def get_or_set(self, key: str, build: Callable[[], Any], tags: Iterable[str] = (),
+                   timeout: Optional[int] = None) -> Any:
+        value = self.fetch(key)
+        if value is MISS:
+            versions = self.versions(tags)
+            try:
+                value = build()
+            except Exception:
+                self.release(key)
+                raise
+            self.set(key, value, timeout=timeout, versions=versions)
+        return value
+
+    def delete(self, key: str):
+        cache.delete(self._entry_key(key))
+
+    def invalidate(self, *tags: str):
+        """Expire every entry tagged with any of ``tags``."""
+        tags = [tag for tag in tags if tag]
+        if tags:
+            cache.set_many({self._tag_key(tag): uuid.uuid4().hex for tag in tags}, None)
+
+    def _is_current(self, entry) -> bool:
+        """Whether none of the entry's tags was invalidated since it was computed."""
+        tags = entry["tags"]
+        if not tags:
+            return True
+        current = cache.get_many([self._tag_key(tag) for tag in tags])
+        return all(current.get(self._tag_key(tag)) == version for tag, version in tags.items())
+
+    def _is_expired(self, entry) -> bool:
+        return entry.get("fresh_until") is not None and time.time() >= entry.get("fresh_until")
+
+    def _should_refresh(self, entry) -> bool:
+        """
+        Expired, or expiring soon enough to refresh early: the closer to expiry and the
+        slower the value is to compute, the likelier (XFetch, beta = ``EARLY_REFRESH_BETA``).
+        """
+        if entry.get("fresh_until") is None:
+            return False
+        head_start = entry.get("compute_seconds", 0) * self.EARLY_REFRESH_BETA * -math.log(1.0 - random.random())
+        return time.time() + head_start >= entry.get("fresh_until")
+
+    def _acquire(self, key: str) -> bool:
+        token = uuid.uuid4().hex
+        if not cache.add(self._lock_key(key), token, self.LOCK_SECONDS):
+            return False
+        self._held()[key] = (token, time.time())
+        return True
+
+    def _held(self) -> Dict[str, tuple]:
+        held = getattr(self._local, "locks", None)
+        if held is None:
+            held = self._local.locks = {}
+        return held
+
+    def _lock_key(self, key: str) -> str:
+        return f"{self.KEY_PREFIX}_lock:{key}"
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.KEY_PREFIX}:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.TAG_PREFIX}:{tag}"
+
+
+tagged_cache = TaggedCache()
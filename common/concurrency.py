@@ -0,0 +1,25 @@
+"""
+Bounded thread pools for I/O-bound fan-out.
+
+Services that make many independent HTTP or cache requests (registry lookups,
+weather polling, device sync) run them on a small thread pool. Work passed to
+``bounded_map`` must not touch the ORM: Django connections are per thread, and
+each pool thread would open its own.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List
+
+
+def bounded_map(fn: Callable, items: Iterable, max_workers: int) -> List:
+    """
+    ``fn`` over ``items``, results in input order, on up to ``max_workers`` threads.
+    With one item or ``max_workers`` of 1 or less it runs in the calling thread.
+    Exceptions raised by ``fn`` propagate to the caller.
+    """
+    items = list(items)
+    workers = min(max_workers, len(items))
+    if workers <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, items))
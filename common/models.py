@@ -27,4 +27,47 @@ class GalleryImage(models.Model):
             return self.image_url
         elif self.image:
             return self.image.url
-        return None
\ No newline at end of file
+        return None
+
+class RatingCounters(models.Model):
+    """
+    Running review counters: count, rating sum and a per-star histogram. Kept up to
+    date with F() expressions as reviews are added, changed and removed
+    (see reviews/signals.py), so reputation reads never aggregate reviews.
+    """
+
+    STARS = (1, 2, 3, 4, 5)
+
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def star_field(cls, rating):
+        """Histogram column for a rating; out-of-range ratings count toward the nearest star."""
+        return f"rating_{min(max(int(rating), cls.STARS[0]), cls.STARS[-1])}_count"
+
+    @classmethod
+    def counter_updates(cls, rating, delta):
+        """``update()`` kwargs adding (``delta=1``) or removing (``delta=-1``) one review."""
+        star_field = cls.star_field(rating)
+        return {
+            "review_count": models.F("review_count") + delta,
+            "rating_sum": models.F("rating_sum") + rating * delta,
+            star_field: models.F(star_field) + delta,
+        }
+
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.review_count if self.review_count else 0.0
+
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, f"rating_{star}_count") for star in self.STARS}
@@ -1,3 +1,98 @@
-from django.test import TestCase
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from .cache_tags import MISS, TaggedCache, benchmark_tag, production_tag
+from .concurrency import bounded_map
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class TaggedCacheTest(TestCase):
+
+    def setUp(self):
+        # The overridden locmem cache is shared across tests
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.cache = TaggedCache()
+
+    def test_invalidating_a_tag_expires_only_its_entries(self):
+        self.cache.set("summary_1", {"score": 80}, tags=[production_tag(1)])
+        self.cache.set("summary_2", {"score": 60}, tags=[production_tag(2)])
+
+        self.cache.invalidate(production_tag(1))
+
+        self.assertIs(self.cache.get("summary_1"), MISS)
+        self.assertEqual(self.cache.get("summary_2"), {"score": 60})
+
+    def test_invalidation_during_build_is_not_lost(self):
+        tags = [production_tag(1), benchmark_tag("Sweet Corn", 2024)]
+
+        def build():
+            self.cache.invalidate(benchmark_tag("sweet  corn", 2024))
+            return "computed from old data"
+
+        self.assertEqual(self.cache.get_or_set("summary_1", build, tags=tags), "computed from old data")
+        self.assertIs(self.cache.get("summary_1"), MISS)
+
+    def test_stale_entry_is_served_while_another_caller_refreshes(self):
+        self.cache.set("summary_1", {"score": 80}, tags=[production_tag(1)], timeout=60)
+        self.cache.invalidate(production_tag(1))
+
+        self.assertIs(self.cache.fetch("summary_1"), MISS)
+        self.assertEqual(self.cache.fetch("summary_1"), {"score": 80})
+
+        self.cache.set("summary_1", {"score": 85}, tags=[production_tag(1)], timeout=60)
+        self.assertEqual(self.cache.fetch("summary_1"), {"score": 85})
+
+    def test_expired_entry_is_refreshed_by_one_caller(self):
+        with patch("common.cache_tags.time.time", return_value=1000.0):
+            self.cache.set("summary_1", {"score": 80}, timeout=60)
+
+        with patch("common.cache_tags.time.time", return_value=1061.0):
+            self.assertIs(self.cache.get("summary_1"), MISS)
+            self.assertIs(self.cache.fetch("summary_1"), MISS)
+            self.assertEqual(self.cache.fetch("summary_1"), {"score": 80})
+
+    @patch.object(TaggedCache, "WAIT_SECONDS", 0)
+    def test_cold_miss_is_computed_by_lock_holder(self):
+        self.assertIs(self.cache.fetch("summary_1"), MISS)
+        # Nothing showed up within the wait; the second caller computes it as well
+        self.assertIs(self.cache.fetch("summary_1"), MISS)
+
+    def test_failed_build_releases_the_lock(self):
+        def build():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            self.cache.get_or_set("summary_1", build)
+
+        self.assertEqual(self.cache.get_or_set("summary_1", lambda: "rebuilt"), "rebuilt")
+
+    def test_release_keeps_a_lock_taken_by_another_caller(self):
+        self.assertIs(self.cache.fetch("summary_1"), MISS)
+        # Our lock expired and another caller took the key
+        cache.set(self.cache._lock_key("summary_1"), "other caller")
+
+        self.cache.release("summary_1")
+
+        self.assertEqual(cache.get(self.cache._lock_key("summary_1")), "other caller")
+
+    @patch("common.cache_tags.time.sleep")
+    def test_cold_miss_is_computed_at_once_when_the_lock_is_unavailable(self, mock_sleep):
+        # A cache that ignores its errors returns None instead of taking the lock
+        with patch("common.cache_tags.cache.add", return_value=None):
+            self.assertIs(self.cache.fetch("summary_1"), MISS)
+
+        mock_sleep.assert_not_called()
+
+
+class BoundedMapTest(TestCase):
+
+    def test_results_keep_input_order(self):
+        self.assertEqual(bounded_map(lambda n: n * n, range(10), max_workers=4), [n * n for n in range(10)])
+
+    @patch("common.concurrency.ThreadPoolExecutor")
+    def test_single_worker_runs_inline(self, mock_pool):
+        self.assertEqual(bounded_map(str, [1, 2], max_workers=1), ["1", "2"])
+        self.assertEqual(bounded_map(str, [3], max_workers=4), ["3"])
+        mock_pool.assert_not_called()
@@ -1 +1,4 @@
 ALLOWED_PERIODS = ["week", "month", "year"]
+
+# Days before today covered by each dashboard chart period
+CHART_PERIOD_DAYS = {"week": 6, "month": 31, "year": 365}
@@ -0,0 +1,85 @@
+# Generated by Django 4.1.4 on 2026-10-16 21:06
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+STARS = (1, 2, 3, 4, 5)
+
+
+def backfill_rating_counters(apps, schema_editor):
+    Establishment = apps.get_model('company', 'Establishment')
+    Review = apps.get_model('reviews', 'Review')
+
+    counts = defaultdict(dict)
+    for establishment_id, rating, total in (
+        Review.objects.values_list('production__parcel__establishment_id', 'rating')
+        .annotate(total=Count('id'))
+        .order_by()
+    ):
+        if establishment_id is not None:
+            counts[establishment_id][rating] = total
+
+    establishments = list(Establishment.objects.filter(id__in=counts))
+    for establishment in establishments:
+        by_rating = counts[establishment.id]
+        establishment.review_count = sum(by_rating.values())
+        establishment.rating_sum = sum(rating * total for rating, total in by_rating.items())
+        for rating, total in by_rating.items():
+            field = f"rating_{min(max(rating, STARS[0]), STARS[-1])}_count"
+            setattr(establishment, field, getattr(establishment, field) + total)
+
+    Establishment.objects.bulk_update(
+        establishments,
+        ['review_count', 'rating_sum'] + [f"rating_{star}_count" for star in STARS],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_alter_review_options_review_scan'),
+        ('history', '0019_history_rating_counters'),
+        ('company', '0012_streamline_establishment_operations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='establishment',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='establishment',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='establishment',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='establishment',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='establishment',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='establishment',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='establishment',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_counters, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,8 @@ from django.urls import reverse
 from django.conf import settings
 from django.utils import timezone
 
+from common.models import RatingCounters
+
 
 class Company(models.Model):
     name = models.CharField(max_length=150, help_text="Company name")
@@ -186,7 +188,7 @@ class Company(models.Model):
         return base_limit
 
 
-class Establishment(models.Model):
+class Establishment(RatingCounters):
     name = models.CharField(max_length=150, help_text="Establishment name")
     address = models.CharField(max_length=200, help_text="Street address")
     city = models.CharField(max_length=100, blank=True, null=True, help_text="City name")
@@ -4,8 +4,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
-from django.db.models import Count, Avg, Q, ExpressionWrapper
-from django.db.models.functions import ExtractWeekDay, ExtractDay, ExtractMonth
+from django.utils import timezone
+from django.db.models import ExpressionWrapper, Exists, OuterRef, Sum
+from django.db.models.functions import ExtractMonth
 
 from .serializers import (
     RetrieveCompanySerializer,
@@ -17,12 +18,12 @@ from .serializers import (
     EstablishmentSerializer,
 )
 from .models import Company, Establishment
-from .constants import ALLOWED_PERIODS
+from .constants import ALLOWED_PERIODS, CHART_PERIOD_DAYS
 from users.models import WorksIn
 from users.serializers import WorksInSerializer
 from product.models import Parcel, Product
 from product.serializers import ProductListOptionsSerializer
-from history.models import History, HistoryScan
+from history.models import History, HistoryScan, HistoryScanDailyStats
 from history.serializers import HistoryListOptionsSerializer
 from reviews.models import Review
 from reviews.serializers import ListReviewSerializer
@@ -171,189 +172,57 @@ class EstablishmentViewSet(CompanyNestedViewSet, viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Get date kwargs for filter by period
-        filter_kwargs = self._generate_filter_kwargs(
-            period, production, "history__history_scans__"
+        # Pre-bucketed daily scan/review counts (see history/scan_stats.py)
+        today = timezone.now().date()
+        start_date = today - timedelta(days=CHART_PERIOD_DAYS[period])
+        stats = HistoryScanDailyStats.objects.filter(
+            establishment=establishment,
+            history__published=True,
+            date__gte=start_date,
         )
 
         if parcel is not None:
             parcel = get_object_or_404(Parcel, pk=parcel)
-            filter_kwargs["history__parcel__id"] = parcel.id
+            stats = stats.filter(parcel_id=parcel.id)
 
         if product is not None:
             product = get_object_or_404(Product, pk=product)
-            filter_kwargs["history__product__id"] = product.id
-
-        series_result = []
-        if period == "week":
-            histories = HistoryScan.objects.filter(
-                history__parcel__establishment=establishment,
-                history__published=True,
-                **filter_kwargs,
-            ).distinct()
-            total_histories = histories.annotate(day_of_week=ExtractWeekDay("date"))
-            total_histories = total_histories.values("day_of_week").annotate(
-                count=Count("id", distinct=True)
-            )
-
-            histories_with_review = histories.exclude(reviews__isnull=True)
-            histories_with_review = histories_with_review.annotate(
-                day_of_week=ExtractWeekDay("date")
-            )
-            histories_with_review = histories_with_review.values(
-                "day_of_week"
-            ).annotate(count=Count("id", distinct=True))
-
-            result_dict = {}
-            for history in total_histories:
-                if history["day_of_week"] not in result_dict:
-                    result_dict[history["day_of_week"]] = {}
-                result_dict[history["day_of_week"]]["scans"] = history["count"]
-            for history in histories_with_review:
-                if history["day_of_week"] not in result_dict:
-                    result_dict[history["day_of_week"]] = {}
-                result_dict[history["day_of_week"]]["reviews"] = history["count"]
-            today = datetime.now()
-            one_week_ago = today - timedelta(days=6)
-            date_range = [
-                one_week_ago + timedelta(days=i)
-                for i in range((today - one_week_ago).days + 1)
-            ]
-
-            series_result = []
-            series_result_reviews = []
-            days_range = []
-            for date in date_range:
-                day = date.isoweekday() % 7 + 1
-                days_range.append(day)
-                if day in result_dict:
-                    series_result.append(
-                        result_dict[day]["scans"]
-                    ) if "scans" in result_dict[day] else series_result.append(0)
-                    series_result_reviews.append(
-                        result_dict[day]["reviews"]
-                    ) if "reviews" in result_dict[
-                        day
-                    ] else series_result_reviews.append(
-                        0
-                    )
-                else:
-                    series_result.append(0)
-                    series_result_reviews.append(0)
+            stats = stats.filter(product_id=product.id)
 
-        elif period == "month":
-            histories = HistoryScan.objects.filter(
-                history__parcel__establishment=establishment,
-                history__published=True,
-                **filter_kwargs,
-            ).distinct()
-            total_histories = histories.annotate(
-                day_of_month=ExtractDay("date"), month=ExtractMonth("date")
-            )
-            total_histories = total_histories.values("day_of_month", "month")
-            total_histories = total_histories.annotate(count=Count("id", distinct=True))
-
-            histories_with_review = histories.exclude(reviews__isnull=True)
-            histories_with_review = histories_with_review.annotate(
-                day_of_month=ExtractDay("date"), month=ExtractMonth("date")
-            )
-            histories_with_review = histories_with_review.values(
-                "day_of_month", "month"
-            ).annotate(count=Count("id", distinct=True))
-
-            result_dict = {}
-            for history in total_histories:
-                month = history["month"]
-                day_of_month = history["day_of_month"]
-                if month not in result_dict:
-                    result_dict[month] = {}
-                if day_of_month not in result_dict[month]:
-                    result_dict[month][day_of_month] = {}
-                result_dict[month][day_of_month]["scans"] = history["count"]
-            for history in histories_with_review:
-                month = history["month"]
-                day_of_month = history["day_of_month"]
-                if month not in result_dict:
-                    result_dict[month] = {}
-                if day_of_month not in result_dict[month]:
-                    result_dict[month][day_of_month] = {}
-                result_dict[month][day_of_month]["reviews"] = history["count"]
-            today = datetime.now()
-            one_month_ago = today - timedelta(days=31)
+        if production is not None:
+            production = get_object_or_404(History, pk=production)
+            stats = stats.filter(history_id=production.id)
+
+        days_range = None
+        if period == "year":
+            totals = {
+                row["month"]: row
+                for row in stats.annotate(month=ExtractMonth("date"))
+                .values("month")
+                .annotate(scans_total=Sum("scans"), reviews_total=Sum("reviewed_scans"))
+                .order_by()
+            }
+            buckets = [totals.get(month, {}) for month in range(1, 13)]
+        else:
+            totals = {
+                row["date"]: row
+                for row in stats.values("date")
+                .annotate(scans_total=Sum("scans"), reviews_total=Sum("reviewed_scans"))
+                .order_by()
+            }
             date_range = [
-                one_month_ago + timedelta(days=i)
-                for i in range((today - one_month_ago).days + 1)
+                start_date + timedelta(days=i)
+                for i in range((today - start_date).days + 1)
             ]
+            buckets = [totals.get(date, {}) for date in date_range]
+            if period == "week":
+                # Same numbering as ExtractWeekDay: 1 = Sunday
+                days_range = [date.isoweekday() % 7 + 1 for date in date_range]
+            else:
+                days_range = [date.day for date in date_range]
 
-            series_result = []
-            series_result_reviews = []
-            days_range = []
-            for date in date_range:
-                day = date.day
-                month = date.month
-                days_range.append(day)
-                if month in result_dict and day in result_dict[month]:
-                    series_result.append(
-                        result_dict[month][day]["scans"]
-                    ) if "scans" in result_dict[month][day] else series_result.append(0)
-                    series_result_reviews.append(
-                        result_dict[month][day]["reviews"]
-                    ) if "reviews" in result_dict[month][
-                        day
-                    ] else series_result_reviews.append(
-                        0
-                    )
-                else:
-                    series_result.append(0)
-                    series_result_reviews.append(0)
-        elif period == "year":
-            histories = HistoryScan.objects.filter(
-                history__parcel__establishment=establishment,
-                history__published=True,
-                **filter_kwargs,
-            ).distinct()
-            total_histories = histories.annotate(month=ExtractMonth("date"))
-            total_histories = total_histories.values("month")
-            total_histories = total_histories.annotate(count=Count("id", distinct=True))
-
-            histories_with_review = histories.exclude(reviews__isnull=True)
-            histories_with_review = histories_with_review.annotate(
-                month=ExtractMonth("date")
-            )
-            histories_with_review = histories_with_review.values("month")
-            histories_with_review = histories_with_review.annotate(
-                count=Count("id", distinct=True)
-            )
-
-            result_dict = {}
-            for history in total_histories:
-                month = history["month"]
-                if month not in result_dict:
-                    result_dict[month] = {}
-                result_dict[month]["scans"] = history["count"]
-            for history in histories_with_review:
-                month = history["month"]
-                if month not in result_dict:
-                    result_dict[month] = {}
-                result_dict[month]["reviews"] = history["count"]
-
-            series_result = []
-            series_result_reviews = []
-            for month in range(1, 13):
-                if month in result_dict:
-                    series_result.append(
-                        result_dict[month]["scans"]
-                    ) if "scans" in result_dict[month] else series_result.append(0)
-                    series_result_reviews.append(
-                        result_dict[month]["reviews"]
-                    ) if "reviews" in result_dict[
-                        month
-                    ] else series_result_reviews.append(
-                        0
-                    )
-                else:
-                    series_result.append(0)
-                    series_result_reviews.append(0)
+        series_result = [bucket.get("scans_total", 0) for bucket in buckets]
+        series_result_reviews = [bucket.get("reviews_total", 0) for bucket in buckets]
 
         result = {
             "scans_vs_sales": EstablishmentChartSerializer(
@@ -389,35 +258,42 @@ class EstablishmentViewSet(CompanyNestedViewSet, viewsets.ModelViewSet):
             )
 
         # Get date kwargs for filter by period
-        filter_kwargs = self._generate_filter_kwargs(
-            period, None, "production__history_scans__"
+        scan_filter_kwargs = self._generate_filter_kwargs(period, None)
+
+        # Reputation comes from the productions' running review counters
+        productions = History.objects.filter(
+            parcel__establishment=establishment,
+            review_count__gt=0,
         )
 
         if parcel is not None:
             parcel = get_object_or_404(Parcel, pk=parcel)
-            filter_kwargs["production__parcel__id"] = parcel.id
+            productions = productions.filter(parcel__id=parcel.id)
 
         if product is not None:
             product = get_object_or_404(Product, pk=product)
-            filter_kwargs["production__product__id"] = product.id
+            productions = productions.filter(product__id=product.id)
 
         if production is not None:
             production = get_object_or_404(History, pk=production)
-            filter_kwargs["production__id"] = production.id
+            productions = productions.filter(id=production.id)
+
+        # Only productions scanned in the period
+        productions = productions.filter(
+            Exists(HistoryScan.objects.filter(history=OuterRef("pk"), **scan_filter_kwargs))
+        )
 
         series_result = []
         options_result = []
-        reviews = Review.objects.filter(
-            production__parcel__establishment=establishment,
-            **filter_kwargs,
-        ).distinct()
-
-        reviews = reviews.values("production__product__name")
-        reviews = reviews.annotate(avg_rating=Avg("rating"))
+        products = (
+            productions.values("product__name")
+            .annotate(reviews=Sum("review_count"), ratings=Sum("rating_sum"))
+            .order_by("product__name")
+        )
 
-        for review in reviews:
-            series_result.append(round(review["avg_rating"], 1))
-            options_result.append(review["production__product__name"])
+        for product_reputation in products:
+            series_result.append(round(product_reputation["ratings"] / product_reputation["reviews"], 1))
+            options_result.append(product_reputation["product__name"])
 
         result = {
             "products_reputation": EstablishmentProductsReputationSerializer(
@@ -449,28 +325,19 @@ class EstablishmentViewSet(CompanyNestedViewSet, viewsets.ModelViewSet):
     ) -> Response:
         establishment = get_object_or_404(Establishment, pk=pk)
         # Return percentage of positive, neutral and negative reviews for the establishment
-
-        reviews = Review.objects.filter(
-            production__parcel__establishment=establishment,
-        )
-        total_reviews = reviews.count()
-
-        reviews = reviews.aggregate(
-            positive=Count("rating", filter=Q(rating__gte=3)),
-            neutral=Count("rating", filter=Q(rating=2)),
-            negative=Count("rating", filter=Q(rating__lte=1)),
-        )
+        # from its running rating histogram
+        total_reviews = establishment.review_count
+        histogram = establishment.rating_histogram
+
+        reviews = {
+            "positive": histogram[3] + histogram[4] + histogram[5],
+            "neutral": histogram[2],
+            "negative": histogram[1],
+        }
 
         result = {
-            "positive": int(reviews["positive"] / total_reviews * 100)
-            if total_reviews > 0
-            else 0,
-            "neutral": int(reviews["neutral"] / total_reviews * 100)
-            if total_reviews > 0
-            else 0,
-            "negative": int(reviews["negative"] / total_reviews * 100)
-            if total_reviews > 0
-            else 0,
+            key: int(count / total_reviews * 100) if total_reviews > 0 else 0
+            for key, count in reviews.items()
         }
 
         return Response(
@@ -0,0 +1,204 @@
+"""
+Incrementally maintained consumer impact summaries.
+
+``UserImpactSummary`` used to be recomputed from the user's whole scan history
+whenever the dashboard found it more than an hour old. It is now updated from
+the ingestion paths instead: each batch of scans written by
+``history/scan_ingestion.py`` adds its deltas under a row lock, and reviews
+adjust the review count. A summary is only rebuilt from scratch the first time
+it is needed for a user.
+
+Every change also bumps ``dashboard_version``. The dashboard payload is cached
+under that version, so it is served from cache until something changes.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, Max, Min, OuterRef, Subquery, When
+
+from carbon.models import CarbonEntry
+from .models import History, HistoryScan
+from .models_consumer import UserImpactSummary
+
+logger = logging.getLogger(__name__)
+
+
+class ImpactSummaryService:
+    """
+    Reads and maintains ``UserImpactSummary`` rows.
+    """
+
+    DASHBOARD_CACHE_TTL = 60 * 60
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get(self, user_id: int) -> UserImpactSummary:
+        """The user's summary, built from their full history if it doesn't exist yet."""
+        summary = UserImpactSummary.objects.filter(user_id=user_id).first()
+        return summary or self.rebuild(user_id)
+
+    def dashboard_cache_key(self, summary: UserImpactSummary) -> str:
+        return f"consumer_dashboard_{summary.user_id}_v{summary.dashboard_version}"
+
+    def cached_dashboard(self, summary: UserImpactSummary, build) -> Dict[str, Any]:
+        """The cached dashboard payload for the summary's version, built with ``build()`` on a miss."""
+        key = self.dashboard_cache_key(summary)
+        payload = cache.get(key)
+        if payload is None:
+            payload = build()
+            cache.set(key, payload, self.DASHBOARD_CACHE_TTL)
+        return payload
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def rebuild(self, user_id: int) -> UserImpactSummary:
+        """Recompute a user's summary from all of their scans and reviews."""
+        from reviews.models import Review
+
+        scans = HistoryScan.objects.filter(user_id=user_id)
+        scans_per_production = dict(
+            scans.values("history_id").annotate(count=Count("id")).order_by().values_list("history_id", "count")
+        )
+        facts = self._production_facts(scans_per_production)
+        dates = scans.aggregate(first=Min("date"), last=Max("date"))
+
+        with transaction.atomic():
+            summary, _ = UserImpactSummary.objects.select_for_update().get_or_create(user_id=user_id)
+            summary.total_scans = sum(scans_per_production.values())
+            summary.total_reviews = Review.objects.filter(user_id=user_id).count()
+            summary.total_carbon_offset_kg = sum(
+                count * facts[history_id]["co2e"] for history_id, count in scans_per_production.items()
+            )
+            summary.better_choices_made = sum(
+                count for history_id, count in scans_per_production.items() if facts[history_id]["better_choice"]
+            )
+            summary.sustainable_farms_found = len({
+                facts[history_id]["establishment_id"]
+                for history_id in scans_per_production
+                if facts[history_id]["certified"] and facts[history_id]["establishment_id"]
+            })
+            summary.first_scan_date = dates["first"]
+            summary.last_scan_date = dates["last"]
+            summary.dashboard_version += 1
+            summary.calculate_us_friendly_metrics()
+            summary.save()
+        return summary
+
+    def apply_scans(self, scans: Iterable[HistoryScan]):
+        """Add a batch of newly written scans to their users' summaries."""
+        scans_by_user = defaultdict(list)
+        for scan in scans:
+            if scan.user_id:
+                scans_by_user[scan.user_id].append(scan)
+        if not scans_by_user:
+            return
+
+        batch = [scan for user_scans in scans_by_user.values() for scan in user_scans]
+        facts = self._production_facts({scan.history_id for scan in batch})
+        existing = set(
+            UserImpactSummary.objects.filter(user_id__in=scans_by_user).values_list("user_id", flat=True)
+        )
+        farms_already_found = self._certified_farms_scanned(scans_by_user.keys(), batch, facts)
+
+        for user_id, user_scans in scans_by_user.items():
+            if user_id not in existing:
+                self.rebuild(user_id)
+                continue
+
+            new_farms = {
+                facts[scan.history_id]["establishment_id"]
+                for scan in user_scans
+                if facts[scan.history_id]["certified"] and facts[scan.history_id]["establishment_id"]
+            } - farms_already_found[user_id]
+            dates = [scan.date for scan in user_scans if scan.date]
+
+            with transaction.atomic():
+                summary = UserImpactSummary.objects.select_for_update().get(user_id=user_id)
+                summary.total_scans += len(user_scans)
+                summary.total_carbon_offset_kg += sum(facts[scan.history_id]["co2e"] for scan in user_scans)
+                summary.better_choices_made += sum(1 for scan in user_scans if facts[scan.history_id]["better_choice"])
+                summary.sustainable_farms_found += len(new_farms)
+                if dates:
+                    summary.first_scan_date = min(filter(None, [summary.first_scan_date, min(dates)]))
+                    summary.last_scan_date = max(filter(None, [summary.last_scan_date, max(dates)]))
+                summary.dashboard_version += 1
+                summary.calculate_us_friendly_metrics()
+                summary.save()
+
+    def apply_review(self, user_id: int, delta: int):
+        """Add (``delta=1``) or remove (``delta=-1``) one review from a user's summary."""
+        if user_id:
+            UserImpactSummary.objects.filter(user_id=user_id).update(
+                total_reviews=F("total_reviews") + delta,
+                dashboard_version=F("dashboard_version") + 1,
+            )
+
+    def touch(self, user_id: int):
+        """Invalidate a user's cached dashboard (e.g. after their favorites change)."""
+        if user_id:
+            UserImpactSummary.objects.filter(user_id=user_id).update(dashboard_version=F("dashboard_version") + 1)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _production_facts(self, history_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Per production: the co2e of its latest carbon entry, its establishment, whether
+        its parcel is certified and whether scanning it counts as a better choice
+        (certified parcel or a USDA-verified carbon entry). One query.
+        """
+        latest_co2e = (
+            CarbonEntry.objects.filter(production=OuterRef("pk"))
+            .order_by("-created_at")
+            .annotate(co2e=Case(When(co2e_amount__gt=0, then=F("co2e_amount")), default=F("amount")))
+            .values("co2e")[:1]
+        )
+        rows = History.objects.filter(id__in=list(history_ids)).annotate(
+            co2e=Subquery(latest_co2e),
+            verified=Exists(CarbonEntry.objects.filter(production=OuterRef("pk"), usda_verified=True)),
+        ).values_list("id", "co2e", "verified", "parcel__certified", "parcel__establishment_id")
+
+        facts = defaultdict(lambda: {"co2e": 0.0, "certified": False, "better_choice": False, "establishment_id": None})
+        for history_id, co2e, verified, certified, establishment_id in rows:
+            facts[history_id] = {
+                "co2e": float(co2e) if co2e and co2e > 0 else 0.0,
+                "certified": bool(certified),
+                "better_choice": bool(certified or verified),
+                "establishment_id": establishment_id,
+            }
+        return facts
+
+    def _certified_farms_scanned(self, user_ids, batch, facts) -> Dict[int, set]:
+        """Certified establishments each user had already scanned before ``batch``."""
+        establishment_ids = {
+            facts[scan.history_id]["establishment_id"] for scan in batch if facts[scan.history_id]["certified"]
+        } - {None}
+        found = defaultdict(set)
+        if not establishment_ids:
+            return found
+
+        pairs: Iterable[Tuple[int, int]] = (
+            HistoryScan.objects.filter(
+                user_id__in=list(user_ids),
+                history__parcel__certified=True,
+                history__parcel__establishment_id__in=establishment_ids,
+            )
+            .exclude(id__in=[scan.id for scan in batch if scan.id])
+            .values_list("user_id", "history__parcel__establishment_id")
+            .distinct()
+        )
+        for user_id, establishment_id in pairs:
+            found[user_id].add(establishment_id)
+        return found
+
+
+impact_summaries = ImpactSummaryService()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from history.scan_stats import scan_stats_rollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily scan/review rollup used by the establishment dashboard charts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=366,
+            help='Number of days to rebuild, ending today',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        self.stdout.write(f'Rebuilding scan stats for the last {days} days...')
+        rows = scan_stats_rollup.refresh(days=days)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} daily scan stats rows'))
@@ -0,0 +1,41 @@
+# Generated by Django 4.1.4 on 2026-10-16 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history', '0016_consumer_models'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='weatherevent',
+            index=models.Index(fields=['history', 'index', 'date'], name='history_weather_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chemicalevent',
+            index=models.Index(fields=['history', 'index', 'date'], name='history_chemical_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productionevent',
+            index=models.Index(fields=['history', 'index', 'date'], name='history_prod_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='generalevent',
+            index=models.Index(fields=['history', 'index', 'date'], name='history_general_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentevent',
+            index=models.Index(fields=['history', 'index', 'date'], name='history_equipment_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='soilmanagementevent',
+            index=models.Index(fields=['history', 'index', 'date'], name='history_soil_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pestmanagementevent',
+            index=models.Index(fields=['history', 'index', 'date'], name='history_pest_timeline_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.4 on 2026-10-16 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history', '0017_event_timeline_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='history',
+            name='qr_code_target',
+            field=models.CharField(blank=True, default='', help_text='URL encoded in qr_code', max_length=255),
+        ),
+    ]
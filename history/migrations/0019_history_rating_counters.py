@@ -0,0 +1,81 @@
+# Generated by Django 4.1.4 on 2026-10-16 21:05
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+STARS = (1, 2, 3, 4, 5)
+
+
+def backfill_rating_counters(apps, schema_editor):
+    History = apps.get_model('history', 'History')
+    Review = apps.get_model('reviews', 'Review')
+
+    counts = defaultdict(dict)
+    for production_id, rating, total in (
+        Review.objects.values_list('production_id', 'rating').annotate(total=Count('id')).order_by()
+    ):
+        counts[production_id][rating] = total
+
+    productions = list(History.objects.filter(id__in=counts))
+    for production in productions:
+        by_rating = counts[production.id]
+        production.review_count = sum(by_rating.values())
+        production.rating_sum = sum(rating * total for rating, total in by_rating.items())
+        for rating, total in by_rating.items():
+            field = f"rating_{min(max(rating, STARS[0]), STARS[-1])}_count"
+            setattr(production, field, getattr(production, field) + total)
+
+    History.objects.bulk_update(
+        productions,
+        ['review_count', 'rating_sum'] + [f"rating_{star}_count" for star in STARS],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_alter_review_options_review_scan'),
+        ('history', '0018_history_qr_code_target'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='history',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='history',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='history',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='history',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='history',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='history',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='history',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.4 on 2026-10-16 21:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0013_establishment_rating_counters'),
+        ('product', '0007_remove_crop_type_from_parcel'),
+        ('history', '0019_history_rating_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryScanDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('scans', models.PositiveIntegerField(default=0)),
+                ('reviewed_scans', models.PositiveIntegerField(default=0)),
+                ('establishment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scan_daily_stats', to='company.establishment')),
+                ('history', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scan_daily_stats', to='history.history')),
+                ('parcel', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scan_daily_stats', to='product.parcel')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scan_daily_stats', to='product.product')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='historyscandailystats',
+            index=models.Index(fields=['establishment', 'date'], name='history_scan_stats_est_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='historyscandailystats',
+            constraint=models.UniqueConstraint(fields=('history', 'date'), name='unique_history_scan_day'),
+        ),
+    ]
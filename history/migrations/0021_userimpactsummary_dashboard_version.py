@@ -0,0 +1,18 @@
+# Generated by Django 4.1.4 on 2026-10-16 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history', '0020_history_scan_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userimpactsummary',
+            name='dashboard_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,18 +1,13 @@
-import qrcode
-from django.conf import settings
-from io import BytesIO
 from django.db import models
-from django.db.models import Avg
+from django.db.models import Count
 from django.core.validators import MinValueValidator, MaxValueValidator
-from common.models import Gallery
-
-from django.core.files.base import ContentFile
+from common.models import Gallery, RatingCounters
 
 
 from product.models import Parcel
 
 
-class History(models.Model):
+class History(RatingCounters):
     ORCHARD = "OR"
     GARDEN = "GA"
 
@@ -32,6 +27,7 @@ class History(models.Model):
     description = models.TextField(blank=True, null=True)
     production_amount = models.FloatField(default=0)
     qr_code = models.ImageField(upload_to="qr_codes", blank=True)
+    qr_code_target = models.CharField(max_length=255, blank=True, default="", help_text="URL encoded in qr_code")
     album = models.ForeignKey(
         "common.Gallery", on_delete=models.CASCADE, blank=True, null=True
     )
@@ -106,39 +102,60 @@ class History(models.Model):
         return users
 
     def update_reputation(self):
-        average_reputation = self.reviews.aggregate(Avg("rating"))["rating__avg"]
-        if average_reputation is not None:
-            self.reputation = round(average_reputation, 2)
-        else:
-            # If there are no reviews, the default reputation is 0
-            self.reputation = 0.00
-        self.save()
-
-    def save(self, *args, **kwargs):
-        url = f"{settings.BASE_CONSUMER_URL}production/{self.id}"
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(url)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill_color="black", back_color="white")
-
-        # Save the QR code image to a BytesIO object
-        buf = BytesIO()
-        img.save(buf)
+        """
+        Recount review counters and reputation from the reviews table. Review signals
+        keep them current incrementally; this is for repairs and backfills.
+        """
+        counts = dict(self.reviews.values_list("rating").annotate(total=Count("id")).order_by())
+
+        self.review_count = sum(counts.values())
+        self.rating_sum = sum(rating * total for rating, total in counts.items())
+        for star in self.STARS:
+            setattr(self, f"rating_{star}_count", 0)
+        for rating, total in counts.items():
+            field = self.star_field(rating)
+            setattr(self, field, getattr(self, field) + total)
+
+        # If there are no reviews, the default reputation is 0
+        self.reputation = round(self.average_rating, 2)
+        self.save(update_fields=[
+            "reputation", "review_count", "rating_sum",
+            *[f"rating_{star}_count" for star in self.STARS],
+        ])
 
-        # Set the `qr_code` field to be the contents of the BytesIO object
-        self.qr_code.save(
-            f"{self.name}-{self.start_date}.png",
-            ContentFile(buf.getvalue()),
-            save=False,
-        )
-
-        super().save(*args, **kwargs)
+    @property
+    def qr_code_target_url(self):
+        from .qr import qr_target_url
+        return qr_target_url(self.id)
+
+    def has_current_qr_code(self):
+        return bool(self.qr_code) and self.qr_code_target == self.qr_code_target_url
+
+    def ensure_qr_code(self):
+        """
+        Stored QR PNG for this production, rendered and uploaded only the first time
+        it is needed for the current consumer URL (see history/qr.py).
+        """
+        if self.id is None or self.has_current_qr_code():
+            return self.qr_code
+
+        from .qr import store_qr_png
+
+        url = self.qr_code_target_url
+        self.qr_code.name = store_qr_png(url, storage=self.qr_code.storage)
+        self.qr_code_target = url
+        History.objects.filter(id=self.id).update(qr_code=self.qr_code.name, qr_code_target=url)
+        return self.qr_code
+
+    def get_qr_code_url(self, request=None):
+        """Stored QR image if it is current, otherwise the endpoint that renders it."""
+        from django.urls import reverse
+
+        if self.has_current_qr_code():
+            url = self.qr_code.url
+        else:
+            url = reverse("histories-qr-code", args=[self.id])
+        return request.build_absolute_uri(url) if request else url
 
     @property
     def certificate_percentage(self):
@@ -177,40 +194,32 @@ class History(models.Model):
         self.save()
 
     def get_events(self):
-        from .serializers import (
-            WeatherEventSerializer,
-            ChemicalEventSerializer,
-            ProductionEventSerializer,
-            GeneralEventSerializer,
-            EquipmentEventSerializer,
-            SoilManagementEventSerializer,
-            PestManagementEventSerializer,
+        events, _ = self.get_events_page()
+        return events
+
+    def get_events_page(self, limit=None, cursor=None):
+        """
+        Serialized events in timeline order plus the cursor for the next page.
+        Ordering comes from a single query across all event tables (see history/timeline.py).
+        """
+        from .timeline import EventTimeline
+        from .serializers import EVENT_TYPE_TO_SERIALIZER
+
+        from carbon.services.event_carbon_results import event_carbon_results
+
+        timeline = EventTimeline(self)
+        refs, next_cursor = timeline.page(limit=limit, cursor=cursor)
+        loaded = timeline.load(
+            refs, queryset_for=lambda event_type, model: model.objects.select_related("album")
         )
 
-        events = (
-            WeatherEventSerializer(
-                self.history_weatherevent_events.all(), many=True
-            ).data
-            + ChemicalEventSerializer(
-                self.history_chemicalevent_events.all(), many=True
-            ).data
-            + ProductionEventSerializer(
-                self.history_productionevent_events.all(), many=True
-            ).data
-            + GeneralEventSerializer(
-                self.history_generalevent_events.all(), many=True
-            ).data
-            + EquipmentEventSerializer(
-                self.history_equipmentevent_events.all(), many=True
-            ).data
-            + SoilManagementEventSerializer(
-                self.history_soilmanagementevent_events.all(), many=True
-            ).data
-            + PestManagementEventSerializer(
-                self.history_pestmanagementevent_events.all(), many=True
-            ).data
-        )
-        return sorted(events, key=lambda event: event["index"])
+        # Stored carbon results for the whole page in one query
+        context = {"carbon_results": event_carbon_results.get_many(event for _, event in loaded)}
+        events = [
+            EVENT_TYPE_TO_SERIALIZER[event_type](event, context=context).data
+            for event_type, event in loaded
+        ]
+        return events, next_cursor
 
 
 class CommonEvent(models.Model):
@@ -275,6 +284,9 @@ class WeatherEvent(CommonEvent):
     observation = models.TextField(blank=True, null=True)
     extra_data = models.JSONField(blank=True, null=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["history", "index", "date"], name="history_weather_timeline_idx")]
+
 
 class ChemicalEvent(CommonEvent):
     FERTILIZER = "FE"
@@ -301,6 +313,9 @@ class ChemicalEvent(CommonEvent):
     observation = models.TextField(blank=True, null=True)
     extra_data = models.JSONField(blank=True, null=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["history", "index", "date"], name="history_chemical_timeline_idx")]
+
 
 class ProductionEvent(CommonEvent):
     PLANTING = "PL"
@@ -319,12 +334,18 @@ class ProductionEvent(CommonEvent):
     observation = models.TextField(blank=True, null=True)
     extra_data = models.JSONField(blank=True, null=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["history", "index", "date"], name="history_prod_timeline_idx")]
+
 
 class GeneralEvent(CommonEvent):
     name = models.CharField(max_length=150, help_text="Event name")
     observation = models.TextField(blank=True, null=True)
     extra_data = models.JSONField(blank=True, null=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["history", "index", "date"], name="history_general_timeline_idx")]
+
 
 class HistoryScan(models.Model):
     history = models.ForeignKey(
@@ -342,6 +363,32 @@ class HistoryScan(models.Model):
     comment = models.TextField(blank=True, null=True)
 
 
+class HistoryScanDailyStats(models.Model):
+    """
+    Scans per production per day, and how many of them were reviewed. Rebuilt by
+    history.tasks.refresh_scan_daily_stats (see history/scan_stats.py) so dashboard
+    charts read pre-bucketed rows instead of grouping raw scans.
+    """
+
+    history = models.ForeignKey(History, on_delete=models.CASCADE, related_name="scan_daily_stats")
+    date = models.DateField()
+    establishment = models.ForeignKey(
+        "company.Establishment", on_delete=models.CASCADE, blank=True, null=True, related_name="scan_daily_stats"
+    )
+    parcel = models.ForeignKey(Parcel, on_delete=models.CASCADE, blank=True, null=True, related_name="scan_daily_stats")
+    product = models.ForeignKey(
+        "product.Product", on_delete=models.CASCADE, blank=True, null=True, related_name="scan_daily_stats"
+    )
+    scans = models.PositiveIntegerField(default=0)
+    reviewed_scans = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["history", "date"], name="unique_history_scan_day"),
+        ]
+        indexes = [models.Index(fields=["establishment", "date"], name="history_scan_stats_est_idx")]
+
+
 class EquipmentEvent(CommonEvent):
     """Events related to equipment maintenance, repairs, and fuel consumption"""
     
@@ -376,6 +423,7 @@ class EquipmentEvent(CommonEvent):
     class Meta:
         verbose_name = "Equipment Event"
         verbose_name_plural = "Equipment Events"
+        indexes = [models.Index(fields=["history", "index", "date"], name="history_equipment_timeline_idx")]
 
 
 class SoilManagementEvent(CommonEvent):
@@ -412,6 +460,7 @@ class SoilManagementEvent(CommonEvent):
     class Meta:
         verbose_name = "Soil Management Event"
         verbose_name_plural = "Soil Management Events"
+        indexes = [models.Index(fields=["history", "index", "date"], name="history_soil_timeline_idx")]
 
 
 
@@ -451,3 +500,4 @@ class PestManagementEvent(CommonEvent):
     class Meta:
         verbose_name = "Pest Management Event"
         verbose_name_plural = "Pest Management Events"
+        indexes = [models.Index(fields=["history", "index", "date"], name="history_pest_timeline_idx")]
@@ -65,6 +65,8 @@ class UserImpactSummary(models.Model):
     first_scan_date = models.DateTimeField(null=True, blank=True)
     last_scan_date = models.DateTimeField(null=True, blank=True)
     last_updated = models.DateTimeField(auto_now=True)
+    # Bumped on every change; keys the cached dashboard payload (see history/impact_summary.py)
+    dashboard_version = models.PositiveIntegerField(default=0)
     
     def calculate_us_friendly_metrics(self):
         """Convert carbon awareness data to US consumer-friendly units"""
@@ -0,0 +1,66 @@
+"""
+QR codes for production pages.
+
+A production's QR code only depends on the consumer URL it encodes, so images are
+content-addressed by that URL: the PNG is stored once as ``qr_codes/<hash>.png``
+and the SVG served by the ``qr_code`` endpoint is cached under the same hash.
+Nothing is rendered when a production is saved.
+"""
+
+import hashlib
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+
+QR_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def qr_target_url(history_id) -> str:
+    return f"{settings.BASE_CONSUMER_URL}production/{history_id}"
+
+
+def qr_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()[:32]
+
+
+def _build(url: str) -> qrcode.QRCode:
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+    return qr
+
+
+def render_qr_png(url: str) -> bytes:
+    img = _build(url).make_image(fill_color="black", back_color="white")
+    buf = BytesIO()
+    img.save(buf)
+    return buf.getvalue()
+
+
+def render_qr_svg(url: str) -> bytes:
+    cache_key = f"qr_svg_{qr_key(url)}"
+    svg = cache.get(cache_key)
+    if svg is None:
+        img = _build(url).make_image(image_factory=qrcode.image.svg.SvgPathImage)
+        buf = BytesIO()
+        img.save(buf)
+        svg = buf.getvalue()
+        cache.set(cache_key, svg, QR_CACHE_TIMEOUT)
+    return svg
+
+
+def store_qr_png(url: str, storage) -> str:
+    """Storage name of the PNG for ``url``, rendering and uploading it only if missing."""
+    name = f"qr_codes/{qr_key(url)}.png"
+    if storage.exists(name):
+        return name
+    return storage.save(name, ContentFile(render_qr_png(url)))
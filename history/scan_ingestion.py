@@ -0,0 +1,204 @@
+"""
+Buffered recording of consumer QR scans.
+
+``public_history`` is the hottest public endpoint, and used to geolocate the
+scanner through a remote API and insert the ``HistoryScan`` row before
+responding. Scans are now reserved an id from the table's sequence, pushed onto
+a Redis list and written in batches by ``history.tasks.flush_history_scans``,
+which resolves city and country from a local MaxMind database
+(``settings.GEOIP_PATH``).
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from .impact_summary import impact_summaries
+from .models import HistoryScan
+
+logger = logging.getLogger(__name__)
+
+GEOIP_CITY_DATABASE = 'GeoLite2-City.mmdb'
+
+
+@lru_cache(maxsize=1)
+def _geoip_reader():
+    path = os.path.join(settings.GEOIP_PATH, getattr(settings, 'GEOIP_CITY', GEOIP_CITY_DATABASE))
+    try:
+        import geoip2.database
+        return geoip2.database.Reader(path)
+    except ImportError:
+        logger.warning("geoip2 is not installed; scans are recorded without location")
+    except Exception as e:
+        logger.warning(f"Could not open GeoIP database {path}; scans are recorded without location: {e}")
+    return None
+
+
+@lru_cache(maxsize=20000)
+def geolocate_ip(ip_address: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """``(city, country)`` for an IP address from the local GeoIP database."""
+    reader = _geoip_reader()
+    if reader is None or not ip_address:
+        return None, None
+
+    try:
+        response = reader.city(ip_address.strip())
+    except Exception:
+        # Unknown, private or malformed address
+        return None, None
+    return response.city.name, response.country.name
+
+
+class ScanIngestionPipeline:
+    """
+    Records ``HistoryScan`` rows without blocking the request on geolocation or the insert.
+    """
+
+    BUFFER_KEY = 'history_scan_buffer'
+
+    # Scans arriving within this window are written by the same task
+    FLUSH_DELAY_SECONDS = 5
+    FLUSH_BATCH_SIZE = 500
+
+    def record(self, history, user=None, ip_address: Optional[str] = None) -> int:
+        """
+        Record a scan and return its id. The row is written by the next flush; if
+        ids cannot be reserved or the buffer is unavailable it is written inline.
+        """
+        payload = {
+            'history_id': history.id,
+            'user_id': user.id if user is not None and user.is_authenticated else None,
+            'ip_address': ip_address,
+            'date': timezone.now().isoformat(),
+        }
+
+        try:
+            payload['id'] = self._reserve_id()
+            if payload['id'] is None:
+                return self._write([payload])[0].id
+
+            self._redis().rpush(self.BUFFER_KEY, json.dumps(payload))
+        except Exception as e:
+            logger.warning(f"Could not buffer scan of history {history.id}, recording inline: {e}")
+            return self._write([payload])[0].id
+
+        self._schedule_flush()
+        return payload['id']
+
+    def record_request(self, history, request) -> int:
+        """Record a scan of ``history`` by the client of ``request`` (see ``record``)."""
+        x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
+        if x_forwarded_for:
+            ip_address = x_forwarded_for.split(",")[0]
+        else:
+            ip_address = request.META.get("HTTP_X_REAL_IP")
+        return self.record(history, user=request.user, ip_address=ip_address)
+
+    def flush(self) -> int:
+        """Write every buffered scan, ``FLUSH_BATCH_SIZE`` rows per statement."""
+        # Scans buffered from here on schedule their own flush
+        cache.delete(self._flush_lock_key())
+
+        redis = self._redis()
+        written = 0
+        while True:
+            pipe = redis.pipeline()
+            pipe.lrange(self.BUFFER_KEY, 0, self.FLUSH_BATCH_SIZE - 1)
+            pipe.ltrim(self.BUFFER_KEY, self.FLUSH_BATCH_SIZE, -1)
+            items, _ = pipe.execute()
+            if not items:
+                break
+
+            try:
+                written += len(self._write([json.loads(item) for item in items]))
+            except Exception as e:
+                logger.error(f"Could not write {len(items)} buffered scans, requeueing: {e}")
+                redis.rpush(self.BUFFER_KEY, *items)
+                raise
+
+        if written:
+            logger.info(f"Recorded {written} buffered history scans")
+        return written
+
+    def ensure_recorded(self, scan_id) -> bool:
+        """Flush the buffer if ``scan_id`` was handed out but not written yet."""
+        try:
+            scan_id = int(scan_id)
+        except (TypeError, ValueError):
+            return False
+
+        if HistoryScan.objects.filter(id=scan_id).exists():
+            return True
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning(f"Could not flush buffered scans: {e}")
+            return False
+        return HistoryScan.objects.filter(id=scan_id).exists()
+
+    def _write(self, payloads: List[Dict[str, Any]]) -> List[HistoryScan]:
+        scans = []
+        for payload in payloads:
+            city, country = geolocate_ip(payload.get('ip_address'))
+            scans.append(HistoryScan(
+                id=payload.get('id'),
+                history_id=payload['history_id'],
+                user_id=payload.get('user_id'),
+                ip_address=payload.get('ip_address'),
+                city=city,
+                country=country,
+            ))
+
+        # Explicit ids make a retried batch a no-op rather than a duplicate
+        HistoryScan.objects.bulk_create(scans, ignore_conflicts=any(scan.id for scan in scans))
+
+        # auto_now_add stamps the write time; keep the time of the scan itself
+        for scan, payload in zip(scans, payloads):
+            scan.date = datetime.fromisoformat(payload['date'])
+        if all(scan.id for scan in scans):
+            HistoryScan.objects.bulk_update(scans, ['date'])
+
+        try:
+            impact_summaries.apply_scans(scans)
+        except Exception as e:
+            logger.error(f"Could not update impact summaries for {len(scans)} scans: {e}")
+        return scans
+
+    def _reserve_id(self) -> Optional[int]:
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id'))", [HistoryScan._meta.db_table]
+            )
+            return cursor.fetchone()[0]
+
+    def _schedule_flush(self):
+        if not cache.add(self._flush_lock_key(), True, self.FLUSH_DELAY_SECONDS * 6):
+            return
+
+        from .tasks import flush_history_scans
+        try:
+            flush_history_scans.apply_async(countdown=self.FLUSH_DELAY_SECONDS)
+        except Exception as e:
+            logger.warning(f"Could not enqueue scan flush, flushing inline: {e}")
+            self.flush()
+
+    def _flush_lock_key(self) -> str:
+        return f"{self.BUFFER_KEY}_flush_scheduled"
+
+    @staticmethod
+    def _redis():
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+
+
+scan_ingestion = ScanIngestionPipeline()
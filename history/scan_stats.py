@@ -0,0 +1,78 @@
+"""
+Daily scan/review rollup behind the establishment dashboard charts.
+
+``HistoryScanDailyStats`` holds one row per production and day with the number
+of scans and of scans that received a review, plus the production's
+establishment, parcel and product so the charts can filter without joins.
+Rows are rebuilt for a trailing window of days from ``HistoryScan``.
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import Case, Count, Exists, IntegerField, OuterRef, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from reviews.models import Review
+from .models import HistoryScan, HistoryScanDailyStats
+
+logger = logging.getLogger(__name__)
+
+
+class ScanStatsRollup:
+    """
+    Rebuilds ``HistoryScanDailyStats`` rows from raw scans.
+    """
+
+    BATCH_SIZE = 1000
+
+    def refresh(self, days: int = 2, until: Optional[date] = None) -> int:
+        """Rebuild the last ``days`` days (including today) in one transaction."""
+        until = until or timezone.now().date()
+        start = until - timedelta(days=days - 1)
+        start_at = timezone.make_aware(datetime.combine(start, time.min))
+        end_at = timezone.make_aware(datetime.combine(until + timedelta(days=1), time.min))
+
+        reviewed = Exists(Review.objects.filter(scan=OuterRef("pk")))
+        grouped = (
+            HistoryScan.objects.filter(date__gte=start_at, date__lt=end_at)
+            .annotate(day=TruncDate("date"))
+            .values(
+                "history_id",
+                "day",
+                "history__parcel__establishment_id",
+                "history__parcel_id",
+                "history__product_id",
+            )
+            .annotate(
+                scans=Count("id"),
+                reviewed_scans=Sum(Case(When(reviewed, then=1), default=0, output_field=IntegerField())),
+            )
+            .order_by()
+        )
+
+        rows = [
+            HistoryScanDailyStats(
+                history_id=row["history_id"],
+                date=row["day"],
+                establishment_id=row["history__parcel__establishment_id"],
+                parcel_id=row["history__parcel_id"],
+                product_id=row["history__product_id"],
+                scans=row["scans"],
+                reviewed_scans=row["reviewed_scans"] or 0,
+            )
+            for row in grouped
+        ]
+
+        with transaction.atomic():
+            HistoryScanDailyStats.objects.filter(date__gte=start, date__lte=until).delete()
+            HistoryScanDailyStats.objects.bulk_create(rows, batch_size=self.BATCH_SIZE)
+
+        logger.info(f"Scan daily stats rebuilt for {start} - {until}: {len(rows)} rows")
+        return len(rows)
+
+
+scan_stats_rollup = ScanStatsRollup()
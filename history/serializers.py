@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.db.models import Manager
 from django.utils import timezone
 
 from .models import (
@@ -29,6 +30,19 @@ from users.models import User
 from users.serializers import BasicUserSerializer
 
 
+class EventListSerializer(serializers.ListSerializer):
+    """
+    Preloads stored carbon results for every event in the list with one query.
+    """
+
+    def to_representation(self, data):
+        from carbon.services.event_carbon_results import event_carbon_results
+
+        events = list(data.all() if isinstance(data, Manager) else data)
+        self.context['carbon_results'] = event_carbon_results.get_many(events)
+        return super().to_representation(events)
+
+
 class EventSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
     carbon_data = serializers.SerializerMethodField()
@@ -36,6 +50,7 @@ class EventSerializer(serializers.ModelSerializer):
     class Meta:
         model = CommonEvent
         fields = "__all__"
+        list_serializer_class = EventListSerializer
 
     def get_image(self, event):
         if event.album is not None:
@@ -44,96 +59,34 @@ class EventSerializer(serializers.ModelSerializer):
 
     def get_carbon_data(self, event):
         """
-        Get carbon calculation data for the event.
-        First check if it's stored in extra_data, otherwise calculate it.
-        OPTIMIZATION: Skip expensive calculations for list views.
+        Stored carbon calculation for the event.
+        Results are read from the event carbon result store; list serializers and the
+        history timeline preload them for the whole page into ``context['carbon_results']``.
+        Missing or outdated results are recalculated in the background.
         """
-        try:
-            # Check if carbon calculation is already stored in extra_data
-            if hasattr(event, 'extra_data') and event.extra_data and 'carbon_calculation' in event.extra_data:
-                return event.extra_data['carbon_calculation']
-            
-            # OPTIMIZATION: Check if this is being called from a list view context
-            # If so, return minimal data to avoid expensive USDA API calls
-            request = self.context.get('request')
-            if request and hasattr(request, 'resolver_match'):
-                view_name = getattr(request.resolver_match, 'url_name', '')
-                if 'list' in view_name or request.method == 'GET' and '/history/' in request.path:
-                    # Return minimal carbon data for list views
-                    return {
-                        'co2e': 0.0,
-                        'efficiency_score': 50.0,
-                        'usda_factors_based': False,
-                        'verification_status': 'not_calculated',
-                        'calculation_method': 'list_view_minimal',
-                        'data_source': 'Cached',
-                        'recommendations': [],
-                        'event_type': event.__class__.__name__.lower().replace('event', ''),
-                        'timestamp': event.date.isoformat() if event.date else None,
-                        'note': 'Full calculation available in detail view'
-                    }
-            
-            # Full calculation only for detail views or when explicitly requested
-            from carbon.services.event_carbon_calculator import EventCarbonCalculator
-            
-            calculator = EventCarbonCalculator()
-            
-            # Determine event type and calculate accordingly
-            if isinstance(event, ChemicalEvent):
-                result = calculator.calculate_chemical_event_impact(event)
-            elif isinstance(event, ProductionEvent):
-                result = calculator.calculate_production_event_impact(event)
-            elif isinstance(event, WeatherEvent):
-                result = calculator.calculate_weather_event_impact(event)
-            elif isinstance(event, EquipmentEvent):
-                result = calculator.calculate_equipment_event_impact(event)
-            elif isinstance(event, SoilManagementEvent):
-                result = calculator.calculate_soil_management_event_impact(event)
-            elif isinstance(event, PestManagementEvent):
-                result = calculator.calculate_pest_management_event_impact(event)
-            elif isinstance(event, GeneralEvent):
-                # For general events, use standard minimal calculation
-                result = {
-                    'co2e': 0.1,
-                    'efficiency_score': 50.0,
-                    'usda_factors_based': False,
-                    'verification_status': 'estimated',
-                    'calculation_method': 'general_event_standard',
-                    'data_source': 'Industry Standards',
-                    'recommendations': [],
-                    'event_type': 'general',
-                    'timestamp': event.date.isoformat() if event.date else None
-                }
-            else:
-                # Fallback for unknown event types
-                result = {
-                    'co2e': 0.0,
-                    'efficiency_score': 50.0,
-                    'usda_factors_based': False,
-                    'verification_status': 'unknown',
-                    'calculation_method': 'unknown_event_type',
-                    'data_source': 'Unknown',
-                    'recommendations': [],
-                    'event_type': 'unknown',
-                    'timestamp': event.date.isoformat() if event.date else None
-                }
-            
+        from carbon.services.event_carbon_results import event_carbon_results
+
+        key = event_carbon_results.event_key(event)
+        preloaded = self.context.get('carbon_results')
+        if preloaded is not None and key in preloaded:
+            result = preloaded[key]
+        else:
+            result = event_carbon_results.get(event)
+
+        if result is not None:
             return result
-            
-        except Exception as e:
-            # Return fallback data if calculation fails
-            return {
-                'co2e': 0.0,
-                'efficiency_score': 50.0,
-                'usda_factors_based': False,
-                'verification_status': 'calculation_error',
-                'calculation_method': 'calculation_error',
-                'data_source': 'Error',
-                'recommendations': [],
-                'event_type': 'error',
-                'timestamp': event.date.isoformat() if event.date else None,
-                'error': str(e)
-            }
+
+        return {
+            'co2e': 0.0,
+            'efficiency_score': 50.0,
+            'usda_factors_based': False,
+            'verification_status': 'pending',
+            'calculation_method': 'pending_calculation',
+            'data_source': 'Pending',
+            'recommendations': [],
+            'event_type': event.__class__.__name__.lower().replace('event', ''),
+            'timestamp': event.date.isoformat() if event.date else None,
+        }
 
 
 class UpdateChemicalEventSerializer(serializers.ModelSerializer):
@@ -149,6 +102,7 @@ class ChemicalEventSerializer(EventSerializer):
     class Meta:
         model = ChemicalEvent
         fields = "__all__"
+        list_serializer_class = EventListSerializer
 
     def get_type(self, chemical_event):
         type_display = chemical_event.get_type_display()
@@ -353,6 +307,7 @@ class WeatherEventSerializer(EventSerializer):
     class Meta:
         model = WeatherEvent
         fields = "__all__"
+        list_serializer_class = EventListSerializer
 
     def get_type(self, weather_event):
         type_display = weather_event.get_type_display()
@@ -377,6 +332,7 @@ class ProductionEventSerializer(EventSerializer):
     class Meta:
         model = ProductionEvent
         fields = "__all__"
+        list_serializer_class = EventListSerializer
 
     def get_type(self, production_event):
         type_display = production_event.get_type_display()
@@ -401,6 +357,7 @@ class GeneralEventSerializer(EventSerializer):
     class Meta:
         model = GeneralEvent
         fields = "__all__"
+        list_serializer_class = EventListSerializer
 
     def get_type(self, general_event):
         return f"event.general.{general_event.name.lower().replace(' ', '_')}"
@@ -418,6 +375,7 @@ class OptimizedHistoryListSerializer(serializers.ModelSerializer):
     parcel = serializers.SerializerMethodField()
     members = serializers.SerializerMethodField()
     crop_type = serializers.SerializerMethodField()
+    qr_code = serializers.SerializerMethodField()
     
     class Meta:
         model = History
@@ -458,6 +416,9 @@ class OptimizedHistoryListSerializer(serializers.ModelSerializer):
             }
         return None
 
+    def get_qr_code(self, history):
+        return history.get_qr_code_url(self.context.get('request'))
+
     def get_members(self, history):
         """
         Ultra-lightweight members list that completely avoids database queries.
@@ -630,6 +591,7 @@ class HistorySerializer(serializers.ModelSerializer):
     images = serializers.SerializerMethodField()
     operator = BasicUserSerializer(read_only=True)
     crop_type = serializers.SerializerMethodField()
+    qr_code = serializers.SerializerMethodField()
 
     class Meta:
         model = History
@@ -679,6 +641,9 @@ class HistorySerializer(serializers.ModelSerializer):
             }
         return None
 
+    def get_qr_code(self, history):
+        return history.get_qr_code_url(self.context.get('request'))
+
     def get_images(self, history):
         try:
             if not history.album:
@@ -798,6 +763,7 @@ class PublicHistoryListSerializer(serializers.ModelSerializer):
 
 class PublicHistorySerializer(serializers.ModelSerializer):
     events = serializers.SerializerMethodField()
+    events_next_cursor = serializers.SerializerMethodField()
     certificate_percentage = serializers.SerializerMethodField()
     company = serializers.SerializerMethodField()
     parcel = PublicParcelSerializer()
@@ -815,6 +781,7 @@ class PublicHistorySerializer(serializers.ModelSerializer):
             "finish_date",
             "name",
             "events",
+            "events_next_cursor",
             "certificate_percentage",
             "product",
             "reputation",
@@ -826,147 +793,86 @@ class PublicHistorySerializer(serializers.ModelSerializer):
             "similar_histories",
         ]
 
+    # Minimal columns per event type for the public timeline
+    PUBLIC_EVENT_FIELDS = {
+        CHEMICAL_EVENT_TYPE: ('id', 'index', 'date', 'description', 'commercial_name', 'volume', 'concentration', 'type', 'observation'),
+        PRODUCTION_EVENT_TYPE: ('id', 'index', 'date', 'description', 'type', 'observation'),
+        WEATHER_EVENT_TYPE: ('id', 'index', 'date', 'description', 'type', 'observation'),
+        EQUIPMENT_EVENT_TYPE: ('id', 'index', 'date', 'description', 'type', 'equipment_name'),
+        SOIL_MANAGEMENT_EVENT_TYPE: ('id', 'index', 'date', 'description', 'type', 'amendment_type'),
+        PEST_MANAGEMENT_EVENT_TYPE: ('id', 'index', 'date', 'description', 'type', 'pest_species'),
+        GENERAL_EVENT_TYPE: ('id', 'index', 'date', 'description', 'name', 'observation'),
+    }
+
+    def _public_event_data(self, event_type, event):
+        data = {
+            'id': event.id,
+            'date': event.date.isoformat() if event.date else None,
+            'observation': getattr(event, 'observation', '') or '',
+            'certified': getattr(event, 'certified', True),
+            'index': getattr(event, 'index', 0),
+            'volume': None,
+            'concentration': None,
+            'equipment': None
+        }
+
+        if event_type == CHEMICAL_EVENT_TYPE:
+            data.update({
+                'description': event.description or 'Chemical Application',
+                'type': 'chemical',
+                'volume': event.volume,
+                'concentration': event.concentration,
+                'equipment': event.commercial_name
+            })
+        elif event_type == PRODUCTION_EVENT_TYPE:
+            data.update({'description': event.description or 'Production Activity', 'type': 'production'})
+        elif event_type == WEATHER_EVENT_TYPE:
+            data.update({'description': event.description or 'Weather Event', 'type': 'weather'})
+        elif event_type == EQUIPMENT_EVENT_TYPE:
+            data.update({'description': event.description or 'Equipment Use', 'type': 'equipment', 'equipment': event.equipment_name})
+        elif event_type == SOIL_MANAGEMENT_EVENT_TYPE:
+            data.update({'description': event.description or 'Soil Management', 'type': 'soil_management', 'equipment': event.amendment_type})
+        elif event_type == PEST_MANAGEMENT_EVENT_TYPE:
+            data.update({'description': event.description or 'Pest Management', 'type': 'pest_management', 'equipment': event.pest_species})
+        elif event_type == GENERAL_EVENT_TYPE:
+            data.update({'description': event.name or event.description or 'General Event', 'type': 'general'})
+
+        return data
+
     def get_events(self, history):
         """
         OPTIMIZED: Get events without triggering carbon calculations.
         This prevents USDA API calls for public history display.
+
+        Events are ordered by a single timeline query and only the requested page
+        is loaded; pass ``events_limit``/``events_cursor`` in the serializer context
+        (or query string) to paginate.
         """
+        from .timeline import EventTimeline
+
         try:
-            # Get basic event data without expensive carbon calculations
-            events_data = []
-            
-            # Get events using minimal queries with correct related names
-            chemical_events = history.history_chemicalevent_events.only(
-                'id', 'date', 'description', 'commercial_name', 'volume', 'concentration', 'type'
-            )
-            production_events = history.history_productionevent_events.only(
-                'id', 'date', 'description', 'type', 'observation'
-            )
-            weather_events = history.history_weatherevent_events.only(
-                'id', 'date', 'description', 'type', 'observation'
-            )
-            equipment_events = history.history_equipmentevent_events.only(
-                'id', 'date', 'description', 'type', 'equipment_name'
-            )
-            soil_events = history.history_soilmanagementevent_events.only(
-                'id', 'date', 'description', 'type', 'amendment_type'
-            )
-            pest_events = history.history_pestmanagementevent_events.only(
-                'id', 'date', 'description', 'type', 'pest_species'
-            )
-            general_events = history.history_generalevent_events.only(
-                'id', 'date', 'description', 'name', 'observation'
+            request = self.context.get('request')
+            query_params = getattr(request, 'query_params', {}) if request else {}
+            limit = self.context.get('events_limit') or query_params.get('events_limit')
+            cursor = self.context.get('events_cursor') or query_params.get('events_cursor')
+
+            timeline = EventTimeline(history)
+            refs, self._events_next_cursor = timeline.page(limit=limit, cursor=cursor)
+            events = timeline.load(
+                refs,
+                queryset_for=lambda event_type, model: model.objects.only(*self.PUBLIC_EVENT_FIELDS[event_type])
             )
-            
-            # Create lightweight event data without carbon calculations
-            for event in chemical_events:
-                events_data.append({
-                    'id': event.id,
-                    'date': event.date.isoformat() if event.date else None,
-                    'description': event.description or 'Chemical Application',
-                    'observation': getattr(event, 'observation', ''),
-                    'type': 'chemical',
-                    'certified': getattr(event, 'certified', True),
-                    'index': getattr(event, 'index', 0),
-                    'volume': event.volume,
-                    'concentration': event.concentration,
-                    'equipment': event.commercial_name
-                })
-            
-            for event in production_events:
-                events_data.append({
-                    'id': event.id,
-                    'date': event.date.isoformat() if event.date else None,
-                    'description': event.description or 'Production Activity',
-                    'observation': event.observation or '',
-                    'type': 'production',
-                    'certified': getattr(event, 'certified', True),
-                    'index': getattr(event, 'index', 0),
-                    'volume': None,
-                    'concentration': None,
-                    'equipment': None
-                })
-            
-            for event in weather_events:
-                events_data.append({
-                    'id': event.id,
-                    'date': event.date.isoformat() if event.date else None,
-                    'description': event.description or 'Weather Event',
-                    'observation': event.observation or '',
-                    'type': 'weather',
-                    'certified': getattr(event, 'certified', True),
-                    'index': getattr(event, 'index', 0),
-                    'volume': None,
-                    'concentration': None,
-                    'equipment': None
-                })
-            
-            for event in equipment_events:
-                events_data.append({
-                    'id': event.id,
-                    'date': event.date.isoformat() if event.date else None,
-                    'description': event.description or 'Equipment Use',
-                    'observation': getattr(event, 'observation', ''),
-                    'type': 'equipment',
-                    'certified': getattr(event, 'certified', True),
-                    'index': getattr(event, 'index', 0),
-                    'volume': None,
-                    'concentration': None,
-                    'equipment': event.equipment_name
-                })
-            
-            for event in soil_events:
-                events_data.append({
-                    'id': event.id,
-                    'date': event.date.isoformat() if event.date else None,
-                    'description': event.description or 'Soil Management',
-                    'observation': getattr(event, 'observation', ''),
-                    'type': 'soil_management',
-                    'certified': getattr(event, 'certified', True),
-                    'index': getattr(event, 'index', 0),
-                    'volume': None,
-                    'concentration': None,
-                    'equipment': event.amendment_type
-                })
-            
-            for event in pest_events:
-                events_data.append({
-                    'id': event.id,
-                    'date': event.date.isoformat() if event.date else None,
-                    'description': event.description or 'Pest Management',
-                    'observation': getattr(event, 'observation', ''),
-                    'type': 'pest_management',
-                    'certified': getattr(event, 'certified', True),
-                    'index': getattr(event, 'index', 0),
-                    'volume': None,
-                    'concentration': None,
-                    'equipment': event.pest_species
-                })
-            
-            for event in general_events:
-                events_data.append({
-                    'id': event.id,
-                    'date': event.date.isoformat() if event.date else None,
-                    'description': event.name or event.description or 'General Event',
-                    'observation': event.observation or '',
-                    'type': 'general',
-                    'certified': getattr(event, 'certified', True),
-                    'index': getattr(event, 'index', 0),
-                    'volume': None,
-                    'concentration': None,
-                    'equipment': None
-                })
-            
-            # Sort by index first, then by date
-            events_data.sort(key=lambda x: (x.get('index', 0), x.get('date', '')))
-            
-            return events_data
+
+            return [self._public_event_data(event_type, event) for event_type, event in events]
             
         except Exception as e:
             print(f"Error getting optimized events: {e}")
             # Return empty list if there's an error
             return []
 
+    def get_events_next_cursor(self, history):
+        return getattr(self, '_events_next_cursor', None)
+
     def get_certificate_percentage(self, history):
         return history.certificate_percentage
 
@@ -983,10 +889,7 @@ class PublicHistorySerializer(serializers.ModelSerializer):
         return self.context.get("history_scan", None)
 
     def get_qr_code(self, history):
-        if history.qr_code:
-            request = self.context.get('request')
-            return request.build_absolute_uri(history.qr_code.url) if request else history.qr_code.url
-        return None
+        return history.get_qr_code_url(self.context.get('request'))
 
     def get_images(self, history):
         try:
@@ -1029,6 +932,7 @@ class EquipmentEventSerializer(EventSerializer):
     class Meta:
         model = EquipmentEvent
         fields = "__all__"
+        list_serializer_class = EventListSerializer
 
     def get_type(self, equipment_event):
         type_display = equipment_event.get_type_display()
@@ -1054,6 +958,7 @@ class SoilManagementEventSerializer(EventSerializer):
     class Meta:
         model = SoilManagementEvent
         fields = "__all__"
+        list_serializer_class = EventListSerializer
 
     def get_type(self, soil_event):
         type_display = soil_event.get_type_display()
@@ -1079,6 +984,7 @@ class PestManagementEventSerializer(EventSerializer):
     class Meta:
         model = PestManagementEvent
         fields = "__all__"
+        list_serializer_class = EventListSerializer
 
     def get_type(self, pest_event):
         type_display = pest_event.get_type_display()
@@ -1095,3 +1001,14 @@ class PestManagementEventSerializer(EventSerializer):
 
     def get_period(self, history):
         return f"{history.start_date.strftime('%m/%d/%Y')} - {history.finish_date.strftime('%m/%d/%Y')}"
+
+
+EVENT_TYPE_TO_SERIALIZER = {
+    WEATHER_EVENT_TYPE: WeatherEventSerializer,
+    CHEMICAL_EVENT_TYPE: ChemicalEventSerializer,
+    PRODUCTION_EVENT_TYPE: ProductionEventSerializer,
+    GENERAL_EVENT_TYPE: GeneralEventSerializer,
+    EQUIPMENT_EVENT_TYPE: EquipmentEventSerializer,
+    SOIL_MANAGEMENT_EVENT_TYPE: SoilManagementEventSerializer,
+    PEST_MANAGEMENT_EVENT_TYPE: PestManagementEventSerializer,
+}
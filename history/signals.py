@@ -1,160 +1,48 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from .models import WeatherEvent, ChemicalEvent, ProductionEvent, GeneralEvent, EquipmentEvent, SoilManagementEvent, PestManagementEvent
-from carbon.services.event_carbon_calculator import EventCarbonCalculator
+from .models_consumer import UserFavorite
+from .impact_summary import impact_summaries
+from carbon.services.event_carbon_pipeline import event_carbon_pipeline
 
 
 @receiver(post_save, sender=ChemicalEvent)
-def calculate_chemical_event_carbon(sender, instance, created, **kwargs):
-    """
-    Automatically calculate carbon impact when a chemical event is created or updated
-    """
-    if created or kwargs.get('update_fields'):  # Only on create or specific field updates
-        try:
-            calculator = EventCarbonCalculator()
-            calculation_result = calculator.calculate_chemical_event_impact(instance)
-            
-            # Create carbon entry if calculation was successful
-            if calculation_result.get('co2e', 0) > 0:
-                carbon_entry = calculator.create_carbon_entry_from_event(instance, calculation_result)
-                
-                # Store calculation result in event's extra_data for future reference
-                if not hasattr(instance, 'extra_data') or instance.extra_data is None:
-                    instance.extra_data = {}
-                
-                instance.extra_data['carbon_calculation'] = calculation_result
-                
-                # Update without triggering signal again
-                ChemicalEvent.objects.filter(id=instance.id).update(extra_data=instance.extra_data)
-                
-                print(f"✅ Carbon calculation completed for Chemical Event {instance.id}: {calculation_result['co2e']} kg CO2e")
-            
-        except Exception as e:
-            print(f"❌ Error calculating carbon for Chemical Event {instance.id}: {e}")
-
-
 @receiver(post_save, sender=ProductionEvent)
-def calculate_production_event_carbon(sender, instance, created, **kwargs):
-    """
-    Automatically calculate carbon impact when a production event is created or updated
-    """
-    if created or kwargs.get('update_fields'):
-        try:
-            calculator = EventCarbonCalculator()
-            calculation_result = calculator.calculate_production_event_impact(instance)
-            
-            # Create carbon entry if calculation was successful
-            if calculation_result.get('co2e', 0) > 0:
-                carbon_entry = calculator.create_carbon_entry_from_event(instance, calculation_result)
-                
-                # Store calculation result in event's extra_data
-                if not hasattr(instance, 'extra_data') or instance.extra_data is None:
-                    instance.extra_data = {}
-                
-                instance.extra_data['carbon_calculation'] = calculation_result
-                
-                # Update without triggering signal again
-                ProductionEvent.objects.filter(id=instance.id).update(extra_data=instance.extra_data)
-                
-                print(f"✅ Carbon calculation completed for Production Event {instance.id}: {calculation_result['co2e']} kg CO2e")
-            
-        except Exception as e:
-            print(f"❌ Error calculating carbon for Production Event {instance.id}: {e}")
-
-
 @receiver(post_save, sender=WeatherEvent)
-def calculate_weather_event_carbon(sender, instance, created, **kwargs):
+def queue_event_carbon_on_save(sender, instance, created, **kwargs):
     """
-    Automatically calculate carbon impact when a weather event is created or updated
+    Queue a carbon calculation when an event is created or specific fields are updated.
+    The calculation runs in a batched Celery task (carbon.tasks.calculate_event_carbon_batch).
     """
     if created or kwargs.get('update_fields'):
         try:
-            calculator = EventCarbonCalculator()
-            calculation_result = calculator.calculate_weather_event_impact(instance)
-            
-            # Create carbon entry if calculation was successful
-            if calculation_result.get('co2e', 0) > 0:
-                carbon_entry = calculator.create_carbon_entry_from_event(instance, calculation_result)
-                
-                # Store calculation result in event's extra_data
-                if not hasattr(instance, 'extra_data') or instance.extra_data is None:
-                    instance.extra_data = {}
-                
-                instance.extra_data['carbon_calculation'] = calculation_result
-                
-                # Update without triggering signal again
-                WeatherEvent.objects.filter(id=instance.id).update(extra_data=instance.extra_data)
-                
-                print(f"✅ Carbon calculation completed for Weather Event {instance.id}: {calculation_result['co2e']} kg CO2e")
-            
+            event_carbon_pipeline.queue(instance)
         except Exception as e:
-            print(f"❌ Error calculating carbon for Weather Event {instance.id}: {e}")
+            print(f"❌ Error queueing carbon calculation for {sender.__name__} {instance.id}: {e}")
 
 
 @receiver(post_save, sender=GeneralEvent)
-def calculate_general_event_carbon(sender, instance, created, **kwargs):
+@receiver(post_save, sender=EquipmentEvent)
+@receiver(post_save, sender=SoilManagementEvent)
+@receiver(post_save, sender=PestManagementEvent)
+def queue_event_carbon_on_create(sender, instance, created, **kwargs):
     """
-    Automatically calculate minimal carbon impact for general events
+    Queue a carbon calculation for newly created events
     """
-    if created:  # Only for new general events
+    if created:
         try:
-            from carbon.services.event_carbon_calculator import EventCarbonCalculator
-            from carbon.models import CarbonEntry
-            
-            calculator = EventCarbonCalculator()
-            
-            # General events have minimal standard carbon impact
-            calculation_result = {
-                'co2e': 0.1,  # Minimal impact
-                'efficiency_score': 50.0,
-                'usda_factors_based': False,
-                'verification_status': 'estimated',
-                'calculation_method': 'general_event_standard',
-                'data_source': 'Industry Standards',
-                'recommendations': [],
-                'event_type': 'general',
-                'timestamp': instance.date.isoformat() if instance.date else None
-            }
-            
-            # Only create carbon entry if the event might have actual impact
-            impact_keywords = ['fuel', 'energy', 'transport', 'machinery', 'equipment']
-            
-            # Safe string concatenation - handle None values
-            name_text = instance.name or ''
-            observation_text = instance.observation or ''
-            combined_text = (name_text + ' ' + observation_text).lower()
-            
-            if any(keyword in combined_text for keyword in impact_keywords):
-                carbon_entry = calculator.create_carbon_entry_from_event(instance, calculation_result)
-                
-                # Store calculation result
-                if not hasattr(instance, 'extra_data') or instance.extra_data is None:
-                    instance.extra_data = {}
-                
-                instance.extra_data['carbon_calculation'] = calculation_result
-                GeneralEvent.objects.filter(id=instance.id).update(extra_data=instance.extra_data)
-                
-                print(f"✅ Carbon calculation completed for General Event {instance.id}: {calculation_result['co2e']} kg CO2e")
-            else:
-                # Still store the calculation result even if no carbon entry is created
-                if not hasattr(instance, 'extra_data') or instance.extra_data is None:
-                    instance.extra_data = {}
-                
-                instance.extra_data['carbon_calculation'] = calculation_result
-                GeneralEvent.objects.filter(id=instance.id).update(extra_data=instance.extra_data)
-                
-                print(f"✅ General Event {instance.id} processed with minimal carbon impact: {calculation_result['co2e']} kg CO2e")
-            
+            event_carbon_pipeline.queue(instance)
         except Exception as e:
-            print(f"❌ Error calculating carbon for General Event {instance.id}: {e}")
-            import traceback
-            traceback.print_exc()
+            print(f"❌ Error queueing carbon calculation for {sender.__name__} {instance.id}: {e}")
 
 
 @receiver(post_delete, sender=ChemicalEvent)
 @receiver(post_delete, sender=ProductionEvent)
 @receiver(post_delete, sender=WeatherEvent)
 @receiver(post_delete, sender=GeneralEvent)
+@receiver(post_delete, sender=EquipmentEvent)
+@receiver(post_delete, sender=SoilManagementEvent)
+@receiver(post_delete, sender=PestManagementEvent)
 def cleanup_carbon_entries_on_event_delete(sender, instance, **kwargs):
     """
     Clean up associated carbon entries when events are deleted
@@ -162,16 +50,12 @@ def cleanup_carbon_entries_on_event_delete(sender, instance, **kwargs):
     try:
         from carbon.models import CarbonEntry
         
-        # Find and delete associated carbon entries
-        # We identify them by the description pattern
         event_class_name = instance.__class__.__name__
-        carbon_entries = CarbonEntry.objects.filter(
-            production=instance.history,
-            description__icontains=f"Auto-calculated from {event_class_name}"
-        )
-        
-        deleted_count = carbon_entries.count()
-        carbon_entries.delete()
+        _, deleted = CarbonEntry.objects.filter(
+            event_model=event_class_name,
+            event_id=instance.id
+        ).delete()
+        deleted_count = deleted.get(CarbonEntry._meta.label, 0)
         
         if deleted_count > 0:
             print(f"🗑️ Cleaned up {deleted_count} carbon entries for deleted {event_class_name} {instance.id}")
@@ -180,86 +64,28 @@ def cleanup_carbon_entries_on_event_delete(sender, instance, **kwargs):
         print(f"❌ Error cleaning up carbon entries for {instance.__class__.__name__} {instance.id}: {e}")
 
 
-@receiver(post_save, sender=EquipmentEvent)
-def calculate_equipment_event_carbon(sender, instance, created, **kwargs):
-    """
-    Automatically calculate carbon impact for equipment events
-    """
-    if created:  # Only for new equipment events
-        try:
-            from carbon.services.event_carbon_calculator import EventCarbonCalculator
-            
-            calculator = EventCarbonCalculator()
-            calculation_result = calculator.calculate_equipment_event_impact(instance)
-            
-            # Create carbon entry automatically
-            carbon_entry = calculator.create_carbon_entry_from_event(instance, calculation_result)
-            
-            # Store calculation result in event extra_data
-            if not hasattr(instance, 'extra_data') or instance.extra_data is None:
-                instance.extra_data = {}
-            
-            instance.extra_data['carbon_calculation'] = calculation_result
-            EquipmentEvent.objects.filter(id=instance.id).update(extra_data=instance.extra_data)
-            
-            print(f"✅ Carbon calculation completed for Equipment Event {instance.id}: {calculation_result['co2e']} kg CO2e")
-            
-        except Exception as e:
-            print(f"❌ Error calculating carbon for Equipment Event {instance.id}: {e}")
-
-
-@receiver(post_save, sender=SoilManagementEvent)
-def calculate_soil_management_event_carbon(sender, instance, created, **kwargs):
+@receiver(post_delete, sender=ChemicalEvent)
+@receiver(post_delete, sender=ProductionEvent)
+@receiver(post_delete, sender=WeatherEvent)
+@receiver(post_delete, sender=GeneralEvent)
+@receiver(post_delete, sender=EquipmentEvent)
+@receiver(post_delete, sender=SoilManagementEvent)
+@receiver(post_delete, sender=PestManagementEvent)
+def delete_event_carbon_result(sender, instance, **kwargs):
     """
-    Automatically calculate carbon impact for soil management events
+    Drop the stored carbon calculation of a deleted event
     """
-    if created:  # Only for new soil management events
-        try:
-            from carbon.services.event_carbon_calculator import EventCarbonCalculator
-            
-            calculator = EventCarbonCalculator()
-            calculation_result = calculator.calculate_soil_management_event_impact(instance)
-            
-            # Create carbon entry automatically
-            carbon_entry = calculator.create_carbon_entry_from_event(instance, calculation_result)
-            
-            # Store calculation result in event extra_data
-            if not hasattr(instance, 'extra_data') or instance.extra_data is None:
-                instance.extra_data = {}
-            
-            instance.extra_data['carbon_calculation'] = calculation_result
-            SoilManagementEvent.objects.filter(id=instance.id).update(extra_data=instance.extra_data)
-            
-            print(f"✅ Carbon calculation completed for Soil Management Event {instance.id}: {calculation_result['co2e']} kg CO2e")
-            
-        except Exception as e:
-            print(f"❌ Error calculating carbon for Soil Management Event {instance.id}: {e}")
+    try:
+        from carbon.services.event_carbon_results import event_carbon_results
+        event_carbon_results.delete_for(instance)
+    except Exception as e:
+        print(f"❌ Error deleting carbon result for {sender.__name__} {instance.id}: {e}")
 
 
-@receiver(post_save, sender=PestManagementEvent)
-def calculate_pest_management_event_carbon(sender, instance, created, **kwargs):
+@receiver(post_save, sender=UserFavorite)
+@receiver(post_delete, sender=UserFavorite)
+def refresh_dashboard_on_favorite_change(sender, instance, **kwargs):
     """
-    Automatically calculate carbon impact for pest management events
+    The consumer dashboard shows the favorite count; invalidate its cached payload
     """
-    if created:  # Only for new pest management events
-        try:
-            from carbon.services.event_carbon_calculator import EventCarbonCalculator
-            
-            calculator = EventCarbonCalculator()
-            calculation_result = calculator.calculate_pest_management_event_impact(instance)
-            
-            # Create carbon entry automatically (only for significant impacts)
-            if abs(calculation_result['co2e']) > 0.05:
-                carbon_entry = calculator.create_carbon_entry_from_event(instance, calculation_result)
-            
-            # Store calculation result in event extra_data
-            if not hasattr(instance, 'extra_data') or instance.extra_data is None:
-                instance.extra_data = {}
-            
-            instance.extra_data['carbon_calculation'] = calculation_result
-            PestManagementEvent.objects.filter(id=instance.id).update(extra_data=instance.extra_data)
-            
-            print(f"✅ Carbon calculation completed for Pest Management Event {instance.id}: {calculation_result['co2e']} kg CO2e")
-            
-        except Exception as e:
-            print(f"❌ Error calculating carbon for Pest Management Event {instance.id}: {e}") 
\ No newline at end of file
+    impact_summaries.touch(instance.user_id)
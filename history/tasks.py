@@ -0,0 +1,54 @@
+from celery import shared_task
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_history_scans():
+    """
+    Write consumer scans buffered by history/scan_ingestion.py in one batch.
+    """
+    from .scan_ingestion import scan_ingestion
+
+    try:
+        written = scan_ingestion.flush()
+        return {
+            'status': 'success',
+            'written': written,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"History scan flush failed: {e}")
+        return {
+            'status': 'error',
+            'error': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
+
+@shared_task
+def refresh_scan_daily_stats(days=2):
+    """
+    Rebuild the daily scan/review rollup used by the establishment charts
+    (see history/scan_stats.py) for the last ``days`` days.
+    """
+    from .scan_stats import scan_stats_rollup
+
+    try:
+        rows = scan_stats_rollup.refresh(days=days)
+        return {
+            'status': 'success',
+            'rows': rows,
+            'timestamp': timezone.now().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"Scan daily stats refresh failed: {e}")
+        return {
+            'status': 'error',
+            'error': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
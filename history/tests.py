@@ -1,3 +1,382 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from company.models import Company, Establishment
+from product.models import Parcel, Product
+from carbon.models import CarbonEntry, USDACalculationAudit
+from carbon.services.carbon_ledger import carbon_ledger
+from carbon.services.event_carbon_calculator import EventCarbonCalculator
+from carbon.services.event_carbon_pipeline import event_carbon_pipeline
+from carbon.services.event_carbon_results import event_carbon_results
+from .impact_summary import impact_summaries
+from .models import History, HistoryScan, HistoryScanDailyStats, ChemicalEvent, GeneralEvent, ProductionEvent
+from .models_consumer import UserFavorite, UserImpactSummary
+from .scan_ingestion import ScanIngestionPipeline, geolocate_ip
+from .scan_stats import scan_stats_rollup
+from .serializers import ChemicalEventSerializer
+from .timeline import EventTimeline
+
+
+@patch("carbon.services.event_carbon_pipeline.EventCarbonPipeline.queue")
+class EventTimelineTest(TestCase):
+
+    def setUp(self):
+        company = Company.objects.create(name="Farm Co", address="1 Road", city="Fresno", state="CA")
+        establishment = Establishment.objects.create(name="North Farm", address="1 Road", state="CA", company=company)
+        parcel = Parcel.objects.create(name="Field 1", establishment=establishment, area=10)
+        self.history = History.objects.create(
+            name="Corn 2024",
+            parcel=parcel,
+            product=Product.objects.create(name="Corn"),
+            start_date=timezone.now(),
+        )
+
+    def _create_events(self):
+        now = timezone.now()
+        return [
+            ProductionEvent.objects.create(history=self.history, type="IR", date=now, index=2, description="irrigate"),
+            ChemicalEvent.objects.create(history=self.history, type="FE", date=now, index=1, description="fertilize"),
+            GeneralEvent.objects.create(history=self.history, name="Visit", date=now - timedelta(days=1), index=2, description="visit"),
+            ProductionEvent.objects.create(history=self.history, type="HA", date=now, index=3, description="harvest"),
+        ]
+
+    def test_page_orders_all_event_types_in_one_query(self, mock_queue):
+        chemical = self._create_events()[1]
+
+        with self.assertNumQueries(1):
+            refs, next_cursor = EventTimeline(self.history).page()
+
+        self.assertIsNone(next_cursor)
+        self.assertEqual([ref[0] for ref in refs], [1, 2, 2, 3])
+        self.assertEqual(refs[0][3], chemical.id)
+
+    def test_cursor_pagination_walks_every_event_once(self, mock_queue):
+        self._create_events()
+        timeline = EventTimeline(self.history)
+
+        seen = []
+        cursor = None
+        while True:
+            refs, cursor = timeline.page(limit=3, cursor=cursor)
+            seen.extend(refs)
+            if not cursor:
+                break
+
+        self.assertEqual(seen, timeline.page()[0])
+
+    def test_get_events_returns_serialized_events_in_order(self, mock_queue):
+        self._create_events()
+
+        events = self.history.get_events()
+
+        self.assertEqual([event["index"] for event in events], [1, 2, 2, 3])
+        self.assertEqual(events[1]["description"], "visit")
+
+
+@patch("carbon.services.event_carbon_pipeline.EventCarbonPipeline.queue")
+@patch("carbon.services.event_carbon_results.EventCarbonResultStore.schedule_recalculation")
+class EventCarbonResultTest(TestCase):
+
+    def setUp(self):
+        company = Company.objects.create(name="Farm Co", address="1 Road", city="Fresno", state="CA")
+        establishment = Establishment.objects.create(name="North Farm", address="1 Road", state="CA", company=company)
+        parcel = Parcel.objects.create(name="Field 1", establishment=establishment, area=10)
+        self.history = History.objects.create(
+            name="Corn 2024",
+            parcel=parcel,
+            product=Product.objects.create(name="Corn"),
+            start_date=timezone.now(),
+        )
+        self.event = ChemicalEvent.objects.create(
+            history=self.history, type="FE", date=timezone.now(), index=1, description="fertilize"
+        )
+
+    def test_list_serializer_reads_stored_results(self, mock_schedule, mock_queue):
+        event_carbon_results.save_many([(self.event, {"co2e": 12.5})])
+
+        data = ChemicalEventSerializer(ChemicalEvent.objects.all(), many=True).data
+
+        self.assertEqual(data[0]["carbon_data"], {"co2e": 12.5})
+        mock_schedule.assert_not_called()
+
+    def test_changed_inputs_return_stale_result_and_recalculate(self, mock_schedule, mock_queue):
+        event_carbon_results.save_many([(self.event, {"co2e": 12.5})])
+        self.event.volume = "40 L"
+        self.event.save()
+
+        data = ChemicalEventSerializer(ChemicalEvent.objects.get(id=self.event.id)).data
+
+        self.assertTrue(data["carbon_data"]["stale"])
+        mock_schedule.assert_called_once()
+
+    def test_missing_result_is_pending(self, mock_schedule, mock_queue):
+        data = ChemicalEventSerializer(self.event).data
+
+        self.assertEqual(data["carbon_data"]["verification_status"], "pending")
+        mock_schedule.assert_called_once()
+
+    @patch("carbon.services.production_snapshot.ProductionSnapshotService.invalidate_for_entries")
+    @patch.object(EventCarbonCalculator, "_build_usda_compliance_record", return_value=None)
+    @patch.object(EventCarbonCalculator, "calculate_with_shared_lookups")
+    def test_batch_writes_entries_in_bulk(self, mock_calculate, mock_compliance, mock_invalidate, mock_schedule, mock_queue):
+        mock_calculate.return_value = [{"co2e": 12.5, "calculation_method": "test"}]
+
+        stats = event_carbon_pipeline.process_batch([["ChemicalEvent", self.event.id]])
+
+        entry = CarbonEntry.objects.get(event_model="ChemicalEvent", event_id=self.event.id)
+        self.assertEqual(stats["entries_created"], 1)
+        self.assertEqual((entry.type, entry.amount, entry.effective_amount), ("emission", 12.5, 12.5))
+        self.assertTrue(USDACalculationAudit.objects.filter(carbon_entry=entry).exists())
+        self.assertEqual(carbon_ledger.establishment_totals(self.history.parcel.establishment_id)["emissions"], 12.5)
+        mock_invalidate.assert_called_once_with([entry])
+
+    @patch("carbon.services.production_snapshot.ProductionSnapshotService.invalidate_for_entries")
+    @patch.object(EventCarbonCalculator, "_build_usda_compliance_record", return_value=None)
+    @patch.object(EventCarbonCalculator, "calculate_with_shared_lookups")
+    def test_recalculated_event_refreshes_its_entry(self, mock_calculate, mock_compliance, mock_invalidate, mock_schedule, mock_queue):
+        mock_calculate.return_value = [{"co2e": 12.5, "calculation_method": "test"}]
+        event_carbon_pipeline.process_batch([["ChemicalEvent", self.event.id]])
+        self.event.volume = "40 L"
+        self.event.save()
+        mock_calculate.return_value = [{"co2e": 20.0, "calculation_method": "test"}]
+
+        stats = event_carbon_pipeline.process_batch([["ChemicalEvent", self.event.id]])
+
+        entry = CarbonEntry.objects.get(event_model="ChemicalEvent", event_id=self.event.id)
+        self.assertEqual((stats["entries_created"], stats["entries_updated"]), (0, 1))
+        self.assertEqual((entry.amount, entry.co2e_amount, entry.effective_amount), (20.0, 20.0, 20.0))
+        self.assertEqual(carbon_ledger.establishment_totals(self.history.parcel.establishment_id)["emissions"], 20.0)
+
+    def _entry(self, event, amount):
+        return CarbonEntry.objects.create(
+            production=self.history, type="emission", amount=amount, year=2024,
+            event_model=type(event).__name__, event_id=event.id,
+        )
+
+    def test_latest_entries_are_looked_up_by_event_link(self, mock_schedule, mock_queue):
+        other = GeneralEvent.objects.create(history=self.history, name="Visit", date=timezone.now(), index=2)
+        self._entry(self.event, 3.0)
+        self._entry(other, 7.0)
+
+        with self.assertNumQueries(1):
+            entries = event_carbon_results.latest_entries([self.event, other])
+
+        self.assertEqual(entries[("ChemicalEvent", self.event.id)].amount, 3.0)
+        self.assertEqual(entries[("GeneralEvent", other.id)].amount, 7.0)
+
+    def test_deleting_event_removes_only_its_entries(self, mock_schedule, mock_queue):
+        other = ChemicalEvent.objects.create(history=self.history, type="FE", date=timezone.now(), index=2)
+        self._entry(self.event, 3.0)
+        kept = self._entry(other, 7.0)
+
+        self.event.delete()
+
+        self.assertEqual(list(CarbonEntry.objects.values_list("id", flat=True)), [kept.id])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+@patch("carbon.services.event_carbon_pipeline.EventCarbonPipeline.process_batch")
+@patch("carbon.tasks.calculate_event_carbon_batch.apply_async")
+class EventCarbonQueueTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_edited_events_are_not_queued_again_by_reads(self, mock_apply, mock_process):
+        event_carbon_pipeline._dispatch_edited([["ChemicalEvent", 1]])
+        event_carbon_pipeline._dispatch_edited([["ChemicalEvent", 1]])
+
+        self.assertEqual(event_carbon_results.claim_pending([["ChemicalEvent", 1], ["ChemicalEvent", 2]]), [["ChemicalEvent", 2]])
+        # Every edit is dispatched, even while an earlier one is queued
+        self.assertEqual(mock_apply.call_count, 2)
+
+    def test_events_are_queued_when_the_cache_is_unavailable(self, mock_apply, mock_process):
+        with patch("carbon.services.event_carbon_results.cache.add", return_value=None):
+            self.assertEqual(event_carbon_results.claim_pending([["ChemicalEvent", 1]]), [["ChemicalEvent", 1]])
+
+    def test_reads_never_calculate_inline(self, mock_apply, mock_process):
+        mock_apply.side_effect = ConnectionError("broker down")
+
+        event_carbon_pipeline.dispatch([["ChemicalEvent", 1]], inline=False)
+        mock_process.assert_not_called()
+
+        event_carbon_pipeline.dispatch([["ChemicalEvent", 1]])
+        mock_process.assert_called_once_with([["ChemicalEvent", 1]])
+
+
+@patch("history.scan_ingestion._geoip_reader", return_value=None)
+class ScanIngestionTest(TestCase):
+
+    def setUp(self):
+        company = Company.objects.create(name="Farm Co", address="1 Road", city="Fresno", state="CA")
+        establishment = Establishment.objects.create(name="North Farm", address="1 Road", state="CA", company=company)
+        parcel = Parcel.objects.create(name="Field 1", establishment=establishment, area=10)
+        self.history = History.objects.create(
+            name="Corn 2024",
+            parcel=parcel,
+            product=Product.objects.create(name="Corn"),
+            start_date=timezone.now(),
+        )
+        self.pipeline = ScanIngestionPipeline()
+        geolocate_ip.cache_clear()
+
+    def test_record_falls_back_to_inline_write(self, mock_reader):
+        with patch.object(ScanIngestionPipeline, "_redis", side_effect=ConnectionError("redis down")):
+            scan_id = self.pipeline.record(self.history, ip_address="203.0.113.7")
+
+        scan = HistoryScan.objects.get(id=scan_id)
+        self.assertEqual(scan.ip_address, "203.0.113.7")
+        self.assertIsNone(scan.city)
+        self.assertTrue(self.pipeline.ensure_recorded(scan_id))
+
+    def test_record_request_uses_forwarded_client_address(self, mock_reader):
+        request = RequestFactory().get("/", HTTP_X_FORWARDED_FOR="203.0.113.7, 10.0.0.1")
+        request.user = AnonymousUser()
+
+        with patch.object(ScanIngestionPipeline, "_redis", side_effect=ConnectionError("redis down")):
+            scan_id = self.pipeline.record_request(self.history, request)
+
+        scan = HistoryScan.objects.get(id=scan_id)
+        self.assertEqual((scan.ip_address, scan.user_id), ("203.0.113.7", None))
+
+    def test_write_keeps_scan_time(self, mock_reader):
+        scanned_at = timezone.now() - timedelta(minutes=3)
+
+        scan = self.pipeline._write([
+            {"history_id": self.history.id, "ip_address": None, "date": scanned_at.isoformat()}
+        ])[0]
+
+        self.assertEqual(HistoryScan.objects.get(id=scan.id).date, scanned_at)
+
+    def test_geolocation_without_database(self, mock_reader):
+        self.assertEqual(geolocate_ip("203.0.113.7"), (None, None))
+        self.assertEqual(geolocate_ip(None), (None, None))
+
+
+@patch("history.scan_ingestion._geoip_reader", return_value=None)
+class ImpactSummaryTest(TestCase):
+
+    def setUp(self):
+        company = Company.objects.create(name="Farm Co", address="1 Road", city="Fresno", state="CA")
+        establishment = Establishment.objects.create(name="North Farm", address="1 Road", state="CA", company=company)
+        parcel = Parcel.objects.create(name="Field 1", establishment=establishment, area=10, certified=True)
+        self.history = History.objects.create(
+            name="Corn 2024",
+            parcel=parcel,
+            product=Product.objects.create(name="Corn"),
+            start_date=timezone.now(),
+        )
+        CarbonEntry.objects.create(production=self.history, type="emission", amount=4.0, year=2024)
+        self.user = get_user_model().objects.create_user("consumer@example.com", "secret")
+        self.pipeline = ScanIngestionPipeline()
+
+    def _scan(self):
+        return {"history_id": self.history.id, "user_id": self.user.id, "date": timezone.now().isoformat()}
+
+    def test_scan_batches_update_summary_incrementally(self, mock_reader):
+        self.pipeline._write([self._scan()])
+        self.pipeline._write([self._scan(), self._scan()])
+
+        summary = UserImpactSummary.objects.get(user=self.user)
+        self.assertEqual((summary.total_scans, summary.better_choices_made), (3, 3))
+        self.assertEqual(summary.total_carbon_offset_kg, 12.0)
+        self.assertEqual(summary.sustainable_farms_found, 1)
+        self.assertEqual(summary.dashboard_version, 2)
+
+    def test_incremental_summary_matches_rebuild(self, mock_reader):
+        self.pipeline._write([self._scan()])
+        self.pipeline._write([self._scan()])
+        incremental = UserImpactSummary.objects.get(user=self.user)
+
+        rebuilt = impact_summaries.rebuild(self.user.id)
+
+        self.assertEqual(
+            (incremental.total_scans, incremental.total_carbon_offset_kg, incremental.sustainable_farms_found),
+            (rebuilt.total_scans, rebuilt.total_carbon_offset_kg, rebuilt.sustainable_farms_found),
+        )
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_dashboard_is_cached_until_favorites_change(self, mock_reader):
+        summary = impact_summaries.get(self.user.id)
+        build = Mock(return_value={"quick_stats": {}})
+
+        impact_summaries.cached_dashboard(summary, build)
+        impact_summaries.cached_dashboard(summary, build)
+        UserFavorite.objects.create(user=self.user, production=self.history)
+        impact_summaries.cached_dashboard(impact_summaries.get(self.user.id), build)
+
+        self.assertEqual(build.call_count, 2)
+
+
+class HistoryQRCodeTest(TestCase):
+
+    def setUp(self):
+        self.history = History.objects.create(name="Corn 2024", start_date=timezone.now())
+
+    @patch("history.qr.render_qr_png")
+    def test_save_does_not_render(self, mock_render):
+        self.history.reputation = 4.5
+        self.history.save()
+
+        mock_render.assert_not_called()
+        self.assertEqual(self.history.get_qr_code_url(), f"/api/histories/{self.history.id}/qr_code/")
+
+    @patch("history.qr.store_qr_png", return_value="qr_codes/abc.png")
+    def test_png_is_stored_once_per_url(self, mock_store):
+        self.history.ensure_qr_code()
+        History.objects.get(id=self.history.id).ensure_qr_code()
+
+        mock_store.assert_called_once()
+        stored = History.objects.get(id=self.history.id)
+        self.assertEqual(stored.qr_code.name, "qr_codes/abc.png")
+        self.assertTrue(stored.has_current_qr_code())
+
+    def test_svg_encodes_consumer_url(self):
+        from .qr import render_qr_svg
+
+        self.assertIn(b"<svg", render_qr_svg(self.history.qr_code_target_url))
+
+
+class ScanDailyStatsTest(TestCase):
+
+    def setUp(self):
+        company = Company.objects.create(name="Farm Co", address="1 Road", city="Fresno", state="CA")
+        self.establishment = Establishment.objects.create(name="North Farm", address="1 Road", state="CA", company=company)
+        parcel = Parcel.objects.create(name="Field 1", establishment=self.establishment, area=10)
+        self.history = History.objects.create(
+            name="Corn 2024",
+            parcel=parcel,
+            product=Product.objects.create(name="Corn"),
+            start_date=timezone.now(),
+            published=True,
+        )
+
+    def test_refresh_buckets_scans_and_reviewed_scans(self):
+        from django.contrib.auth import get_user_model
+        from reviews.models import Review
+
+        scans = [HistoryScan.objects.create(history=self.history) for _ in range(3)]
+        Review.objects.create(
+            headline="Fresh",
+            written_review="Tasty",
+            rating=5,
+            user=get_user_model().objects.create_user("consumer@example.com", "secret"),
+            production=self.history,
+            scan=scans[0],
+        )
+
+        self.assertEqual(scan_stats_rollup.refresh(days=1), 1)
+        # Rebuilding the same window replaces its rows
+        scan_stats_rollup.refresh(days=1)
+
+        stats = HistoryScanDailyStats.objects.get(history=self.history)
+        self.assertEqual((stats.scans, stats.reviewed_scans), (3, 1))
+        self.assertEqual(stats.date, timezone.now().date())
+        self.assertEqual(stats.establishment_id, self.establishment.id)
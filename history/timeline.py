@@ -0,0 +1,125 @@
+"""
+Unified, cursor-paginated event timeline for a production (History).
+
+Events live in seven tables. Instead of querying each related manager and
+sorting the concatenated lists in Python, the timeline orders every event with a
+single ``UNION ALL`` query over ``(index, date, event_type, id)`` and then loads
+only the events on the requested page.
+"""
+
+import base64
+from collections import defaultdict
+
+from django.db.models import IntegerField, Q, Value
+from django.utils.dateparse import parse_datetime
+
+from .constants import EVENT_TYPE_TO_MODEL
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class EventTimeline:
+    """
+    Ordered view over all events of a History.
+
+    Usage::
+
+        timeline = EventTimeline(history)
+        refs, next_cursor = timeline.page(limit=50, cursor=request.GET.get('cursor'))
+    """
+
+    MAX_PAGE_SIZE = 200
+
+    def __init__(self, history):
+        self.history = history
+
+    # ------------------------------------------------------------------
+    # Cursor encoding
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def encode_cursor(ref):
+        index, date, event_type, event_id = ref
+        raw = f"{index}|{date.isoformat() if date else ''}|{event_type}|{event_id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            index, date, event_type, event_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            return int(index), parse_datetime(date) if date else None, int(event_type), int(event_id)
+        except Exception as e:
+            raise InvalidCursor(f"Invalid timeline cursor: {cursor}") from e
+
+    # ------------------------------------------------------------------
+    # Ordering query
+    # ------------------------------------------------------------------
+
+    def _after_cursor(self, event_type, cursor):
+        """Keyset condition for rows of ``event_type`` that sort after ``cursor``."""
+        index, date, cursor_type, cursor_id = cursor
+
+        after = Q(index__gt=index) | Q(index=index, date__gt=date)
+        if event_type > cursor_type:
+            after |= Q(index=index, date=date)
+        elif event_type == cursor_type:
+            after |= Q(index=index, date=date, id__gt=cursor_id)
+        return after
+
+    def page(self, limit=None, cursor=None):
+        """
+        Return ``(refs, next_cursor)`` where ``refs`` is an ordered list of
+        ``(index, date, event_type, event_id)`` tuples from a single query.
+        """
+        decoded = self.decode_cursor(cursor) if cursor else None
+
+        branches = []
+        for event_type, model in EVENT_TYPE_TO_MODEL.items():
+            queryset = model.objects.filter(history=self.history)
+            if decoded:
+                queryset = queryset.filter(self._after_cursor(event_type, decoded))
+            branches.append(
+                queryset.annotate(
+                    event_type=Value(event_type, output_field=IntegerField())
+                ).values_list('index', 'date', 'event_type', 'id')
+            )
+
+        ordered = branches[0].union(*branches[1:], all=True).order_by('index', 'date', 'event_type', 'id')
+
+        if limit:
+            limit = min(int(limit), self.MAX_PAGE_SIZE)
+            refs = list(ordered[:limit + 1])
+            next_cursor = self.encode_cursor(refs[limit - 1]) if len(refs) > limit else None
+            return refs[:limit], next_cursor
+
+        return list(ordered), None
+
+    # ------------------------------------------------------------------
+    # Hydration
+    # ------------------------------------------------------------------
+
+    def load(self, refs, queryset_for=None):
+        """
+        Fetch the event instances for ``refs`` (one query per event type present
+        on the page) and return them in timeline order.
+
+        ``queryset_for(event_type, model)`` may return a narrowed queryset, e.g. with ``.only()``.
+        """
+        ids_by_type = defaultdict(list)
+        for _, _, event_type, event_id in refs:
+            ids_by_type[event_type].append(event_id)
+
+        loaded = {}
+        for event_type, ids in ids_by_type.items():
+            model = EVENT_TYPE_TO_MODEL[event_type]
+            queryset = queryset_for(event_type, model) if queryset_for else model.objects.all()
+            for event in queryset.filter(id__in=ids):
+                loaded[(event_type, event.id)] = event
+
+        return [
+            (event_type, loaded[(event_type, event_id)])
+            for _, _, event_type, event_id in refs
+            if (event_type, event_id) in loaded
+        ]
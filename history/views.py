@@ -1,6 +1,6 @@
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import Http404
-from django.shortcuts import get_object_or_404
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404, redirect
 from django.db.models import Avg, Q, Count, Prefetch
 from django.utils import timezone
 from django.utils.timezone import make_aware
@@ -16,8 +16,12 @@ from product.models import Product, Parcel
 
 from common.models import Gallery
 from backend.permissions import CompanyNestedViewSet
+from carbon.services.event_carbon_pipeline import event_carbon_pipeline
 
 from .models import CommonEvent, History, HistoryScan
+from .timeline import EventTimeline, InvalidCursor
+from .scan_ingestion import scan_ingestion
+from .qr import render_qr_svg
 from .serializers import (
     EventSerializer,
     HistorySerializer,
@@ -119,7 +123,7 @@ class HistoryViewSet(viewsets.ModelViewSet):
         """
         Optimized queryset with proper database optimizations to prevent N+1 queries.
         """
-        if self.action == "public_history":
+        if self.action in ("public_history", "public_timeline"):
             return History.objects.filter(published=True)
         elif self.action == "my_scans":
             return History.objects.filter(
@@ -164,7 +168,7 @@ class HistoryViewSet(viewsets.ModelViewSet):
         ).only(
             # Only fetch absolutely essential fields for the dashboard
             'id', 'name', 'start_date', 'finish_date', 'published',
-            'earning', 'reputation', 'qr_code', 'is_outdoor',
+            'earning', 'reputation', 'qr_code', 'qr_code_target', 'is_outdoor',
             'age_of_plants', 'number_of_plants', 'soil_ph', 'extra_data',
             'product__id', 'product__name',
             'parcel__id', 'parcel__name', 
@@ -346,9 +350,11 @@ class HistoryViewSet(viewsets.ModelViewSet):
             cache_key = f'history_list_parcel_{parcel.id}_v3'
             cache.delete(cache_key)
             
-            # Process template events if provided
+            # Process template events if provided; their carbon calculations are
+            # dispatched to the worker as a single batch
             if data.get('template_events'):
-                self._create_template_events(history, data['template_events'])
+                with event_carbon_pipeline.batch():
+                    self._create_template_events(history, data['template_events'])
             
             # Create initial blockchain record for this production
             try:
@@ -386,7 +392,7 @@ class HistoryViewSet(viewsets.ModelViewSet):
                 'crop_category': extra_data.get('crop_category'),
                 'blockchain_enabled': extra_data.get('blockchain_enabled', False),
                 'blockchain_transaction': extra_data.get('blockchain_transaction'),
-                'qr_code_url': history.qr_code.url if history.qr_code else None,
+                'qr_code_url': history.get_qr_code_url(request),
                 'establishment': {
                     'id': parcel.establishment.id,
                     'name': parcel.establishment.name,
@@ -535,37 +541,9 @@ class HistoryViewSet(viewsets.ModelViewSet):
     def public_history(self, request, pk=None):
         queryset = self.get_queryset()
         history = get_object_or_404(queryset, pk=pk)
-        x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
-        if x_forwarded_for:
-            ip_address = x_forwarded_for.split(",")[0]
-        else:
-            ip_address = request.META.get("HTTP_X_REAL_IP")
-
-        city = None
-        country = None
 
-        # Get city and country from IP using free API (no GDAL required)
-        if ip_address:
-            try:
-                import requests
-                # Using ipapi.co - free tier allows 1000 requests/day
-                response = requests.get(f'https://ipapi.co/{ip_address}/json/', timeout=2)
-                if response.status_code == 200:
-                    data = response.json()
-                    city = data.get('city')
-                    country = data.get('country_name')
-            except Exception as e:
-                # If geolocation fails, continue without it
-                print(f"IP geolocation failed: {e}")
-                pass
-
-        history_scan = HistoryScan.objects.create(
-            history=history,
-            user=request.user if request.user.is_authenticated else None,
-            ip_address=ip_address,
-            city=city,
-            country=country,
-        )
+        # Geolocation and the insert happen in history/scan_ingestion.py after the response
+        history_scan_id = scan_ingestion.record_request(history, request)
         similar_histories = History.objects.filter(
             parcel__establishment__company=history.parcel.establishment.company,
             published=True,
@@ -574,10 +552,47 @@ class HistoryViewSet(viewsets.ModelViewSet):
             'parcel__establishment'
         ).order_by('-id')[:5]
         serializer = PublicHistorySerializer(
-            history, context={"history_scan": history_scan.id, "similar_histories": similar_histories, "request": request}
+            history, context={"history_scan": history_scan_id, "similar_histories": similar_histories, "request": request}
         )
         return Response(serializer.data)
 
+    @action(detail=True, methods=["get"], permission_classes=[AllowAny])
+    def qr_code(self, request, pk=None):
+        """
+        QR code for the production's consumer page: cached SVG, or ?type=png to
+        redirect to the stored PNG (rendered once per URL, see history/qr.py).
+        """
+        history = get_object_or_404(self.get_queryset().only("id", "qr_code", "qr_code_target"), pk=pk)
+        if request.query_params.get("type") == "png":
+            return redirect(history.ensure_qr_code().url)
+
+        response = HttpResponse(render_qr_svg(history.qr_code_target_url), content_type="image/svg+xml")
+        response["Cache-Control"] = "public, max-age=86400"
+        return response
+
+    @action(detail=True, methods=["get"], permission_classes=[AllowAny], url_path="timeline")
+    def public_timeline(self, request, pk=None):
+        """
+        Cursor-paginated public event timeline: ?limit=50&cursor=<next_cursor>
+        """
+        history = get_object_or_404(self.get_queryset(), pk=pk)
+        cursor = request.query_params.get("cursor")
+        try:
+            limit = int(request.query_params.get("limit", 50))
+            if cursor:
+                EventTimeline.decode_cursor(cursor)
+        except (ValueError, InvalidCursor):
+            return Response({"error": "Invalid limit or cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = PublicHistorySerializer(
+            context={"request": request, "events_limit": max(1, limit), "events_cursor": cursor}
+        )
+        events = serializer.get_events(history)
+        return Response({
+            "results": events,
+            "next_cursor": serializer.get_events_next_cursor(history),
+        })
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def my_scans(self, request):
         queryset = self.get_queryset()
@@ -681,7 +696,7 @@ class HistoryViewSet(viewsets.ModelViewSet):
                 "product_name": history.product.name if history.product else None,
                 "establishment_name": history.parcel.establishment.name if history.parcel else None,
                 "company_name": history.parcel.establishment.company.name if history.parcel and history.parcel.establishment else None,
-                "qr_code_url": history.qr_code.url if history.qr_code else None,
+                "qr_code_url": history.get_qr_code_url(request),
                 "redirect_url": f"/scan/production/{history.id}"
             })
             
@@ -696,6 +711,7 @@ class PublicHistoryScanViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["post"])
     @permission_classes([AllowAny])
     def comment(self, request, pk=None):
+        scan_ingestion.ensure_recorded(pk)
         history_scan = get_object_or_404(HistoryScan, pk=pk)
         comment = request.data.get("comment", None)
         if comment is None:
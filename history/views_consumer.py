@@ -8,13 +8,13 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models import Count, Avg, Sum, Q, F, Min, Max
 from django.utils import timezone
-from datetime import timedelta, datetime
+from datetime import datetime
 from decimal import Decimal
 
+from .impact_summary import impact_summaries
 from .models import History, HistoryScan
 from .models_consumer import (
     UserFavorite, 
-    UserImpactSummary, 
     UserProductComparison,
     UserShoppingGoal,
     UserShoppingInsight,
@@ -48,46 +48,32 @@ class ConsumerDashboardViewSet(viewsets.ViewSet):
         """Get comprehensive impact dashboard data"""
         user = request.user
         
-        # Get or create user impact summary
-        impact_summary, created = UserImpactSummary.objects.get_or_create(
-            user=user,
-            defaults={
-                'total_scans': 0,
-                'total_reviews': 0,
-                'total_carbon_offset_kg': 0.0,
-                'sustainable_farms_found': 0,
-                'local_farms_found': 0,
-                'better_choices_made': 0,
-            }
-        )
+        # Maintained from the scan and review ingestion paths (see history/impact_summary.py)
+        impact_summary = impact_summaries.get(user.id)
         
-        # Update impact summary with latest data if needed
-        if created or impact_summary.last_updated < timezone.now() - timedelta(hours=1):
-            self._update_impact_summary(user, impact_summary)
-        
-        # Get recent scans for timeline
-        recent_scans = HistoryScan.objects.filter(
-            user=user
-        ).select_related('history', 'history__parcel__establishment').order_by('-date')[:3]
-        
-        # Prepare response data
-        dashboard_data = {
-            'impact_metrics': UserImpactSummarySerializer(impact_summary).data,
-            'recent_scans': EnhancedHistoryScanSerializer(
-                recent_scans, 
-                many=True, 
-                context={'request': request}
-            ).data,
-            'quick_stats': {
-                'better_choices': impact_summary.better_choices_made,
-                'local_farms': impact_summary.local_farms_found,
-                'favorite_count': UserFavorite.objects.filter(user=user).count(),
-            },
-            'recommendations': self._get_retailer_recommendations(),
-            'achievements': self._get_recent_achievements(user),
-        }
+        def build_dashboard():
+            # Get recent scans for timeline
+            recent_scans = HistoryScan.objects.filter(
+                user=user
+            ).select_related('history', 'history__parcel__establishment').order_by('-date')[:3]
+            
+            return {
+                'impact_metrics': UserImpactSummarySerializer(impact_summary).data,
+                'recent_scans': EnhancedHistoryScanSerializer(
+                    recent_scans, 
+                    many=True, 
+                    context={'request': request}
+                ).data,
+                'quick_stats': {
+                    'better_choices': impact_summary.better_choices_made,
+                    'local_farms': impact_summary.local_farms_found,
+                    'favorite_count': UserFavorite.objects.filter(user=user).count(),
+                },
+                'recommendations': self._get_retailer_recommendations(),
+                'achievements': self._get_recent_achievements(impact_summary),
+            }
         
-        return Response(dashboard_data)
+        return Response(impact_summaries.cached_dashboard(impact_summary, build_dashboard))
     
     @action(detail=False, methods=['get'])
     def shopping_history(self, request):
@@ -248,93 +234,18 @@ class ConsumerDashboardViewSet(viewsets.ViewSet):
             }
         })
     
-    def _update_impact_summary(self, user, impact_summary):
-        """Update user impact summary with latest data"""
-        # Count scans
-        total_scans = HistoryScan.objects.filter(user=user).count()
-        
-        # Count reviews  
-        from reviews.models import Review
-        total_reviews = Review.objects.filter(user=user).count()
-        
-        # Calculate real carbon offset based on actual carbon entries
-        from carbon.models import CarbonEntry
-        
-        total_carbon_offset = 0
-        for scan in HistoryScan.objects.filter(user=user).select_related('history'):
-            if scan.history:
-                try:
-                    # Use the same logic as the serializer fix
-                    carbon_entry = CarbonEntry.objects.filter(production=scan.history).order_by('-created_at').first()
-                    if carbon_entry:
-                        # Use co2e_amount if available and non-zero, otherwise fall back to amount
-                        co2e = carbon_entry.co2e_amount if carbon_entry.co2e_amount and carbon_entry.co2e_amount > 0 else carbon_entry.amount
-                        if co2e and co2e > 0:
-                            total_carbon_offset += float(co2e)
-                except Exception as e:
-                    continue
-        
-        # Convert to awareness metric rather than false "savings"
-        carbon_offset = total_carbon_offset
-        
-        # Count unique establishments (use parcel__establishment relationship)
-        sustainable_farms = HistoryScan.objects.filter(
-            user=user,
-            history__parcel__certified=True  # Use parcel certified field instead
-        ).values('history__parcel__establishment').distinct().count()
-        
-        # Count local farms based on real data (disable for now until location logic is implemented)
-        # For MVP: only count farms with verified local indicators or disable this metric
-        local_farms = 0  # Will implement proper location-based calculation later
-        
-        # Count better choices based on real data
-        # For MVP: Count scans where user chose certified/sustainable options
-        better_choices = HistoryScan.objects.filter(
-            user=user,
-            history__parcel__certified=True
-        ).count()
-        
-        # If no certified data available, count scans with verified carbon entries
-        if better_choices == 0:
-            better_choices = HistoryScan.objects.filter(
-                user=user,
-                history__carbonentry__usda_verified=True
-            ).count()
-        
-        # Update impact summary
-        impact_summary.total_scans = total_scans
-        impact_summary.total_reviews = total_reviews
-        impact_summary.total_carbon_offset_kg = carbon_offset
-        impact_summary.sustainable_farms_found = sustainable_farms
-        impact_summary.local_farms_found = local_farms
-        impact_summary.better_choices_made = better_choices
-        
-        # Calculate US-friendly metrics
-        impact_summary.calculate_us_friendly_metrics()
-        
-        # Update timestamps
-        first_scan = HistoryScan.objects.filter(user=user).order_by('date').first()
-        last_scan = HistoryScan.objects.filter(user=user).order_by('-date').first()
-        
-        if first_scan:
-            impact_summary.first_scan_date = first_scan.date
-        if last_scan:
-            impact_summary.last_scan_date = last_scan.date
-            
-        impact_summary.save()
-    
     def _get_retailer_recommendations(self):
         """Get retailer recommendations based on user's actual scan history"""
         # For MVP: Disable hardcoded recommendations
         # Future: Generate recommendations based on user's scanned establishments
         return []
     
-    def _get_recent_achievements(self, user):
+    def _get_recent_achievements(self, impact_summary):
         """Get recent achievements for the user"""
         achievements = []
         
         # Check for scan milestones using configurable thresholds
-        scan_count = HistoryScan.objects.filter(user=user).count()
+        scan_count = impact_summary.total_scans
         milestones = EngagementMilestones.SCAN_MILESTONES
         
         if scan_count >= milestones['EXPLORER'] and scan_count < milestones['EXPLORER'] + 5:
@@ -69,7 +69,7 @@ class ParcelViewSet(CompanyNestedViewSet, viewsets.ModelViewSet):
             'crop_type'
         ).only(
             'id', 'name', 'start_date', 'finish_date', 'published',
-            'earning', 'reputation', 'qr_code', 'is_outdoor',
+            'earning', 'reputation', 'qr_code', 'qr_code_target', 'is_outdoor',
             'age_of_plants', 'number_of_plants', 'soil_ph', 'extra_data',
             'product__id', 'product__name',
             'parcel__id', 'parcel__name', 
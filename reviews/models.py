@@ -20,3 +20,12 @@ class Review(models.Model):
         on_delete=models.CASCADE,
         null=True,
     )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What this review counts toward in the rating counters (see reviews/signals.py)
+        if "rating" in field_names and "production_id" in field_names:
+            instance._counted_rating = instance.rating
+            instance._counted_production_id = instance.production_id
+        return instance
@@ -1,10 +1,69 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.db.models import Avg
+
+from common.cache_tags import production_tag, tagged_cache
+from company.models import Establishment
+from history.impact_summary import impact_summaries
+from history.models import History
 from .models import Review
 
 
+def apply_review_to_counters(production_id, rating, delta):
+    """
+    Add (``delta=1``) or remove (``delta=-1``) one review from the running counters
+    of its production and establishment, with single atomic UPDATEs.
+    """
+    # SET expressions read the pre-update row, so the new average is computed in SQL
+    reputation = Coalesce(
+        Round(
+            Cast(F("rating_sum") + rating * delta, FloatField())
+            / NullIf(F("review_count") + delta, 0),
+            2,
+        ),
+        0.0,
+    )
+    # The public summaries show the production's reputation
+    tagged_cache.invalidate(production_tag(production_id))
+    with transaction.atomic():
+        History.objects.filter(id=production_id).update(
+            reputation=reputation, **History.counter_updates(rating, delta)
+        )
+        Establishment.objects.filter(parcels__histories__id=production_id).update(
+            **Establishment.counter_updates(rating, delta)
+        )
+
+
+def _counted_as(review):
+    """``(production_id, rating)`` the review currently contributes to the counters."""
+    return (
+        getattr(review, "_counted_production_id", review.production_id),
+        getattr(review, "_counted_rating", review.rating),
+    )
+
+
 @receiver(post_save, sender=Review)
-def update_average_rating(sender, instance, **kwargs):
-    production = instance.production
-    production.update_reputation()
+def update_average_rating(sender, instance, created, **kwargs):
+    if not created:
+        previous = _counted_as(instance)
+        if previous == (instance.production_id, instance.rating):
+            return
+        apply_review_to_counters(*previous, -1)
+
+    apply_review_to_counters(instance.production_id, instance.rating, 1)
+    instance._counted_production_id = instance.production_id
+    instance._counted_rating = instance.rating
+
+
+@receiver(post_save, sender=Review)
+def count_consumer_review(sender, instance, created, **kwargs):
+    if created:
+        impact_summaries.apply_review(instance.user_id, 1)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    apply_review_to_counters(*_counted_as(instance), -1)
+    impact_summaries.apply_review(instance.user_id, -1)
@@ -1,3 +1,64 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
 
-# Create your tests here.
+from company.models import Company, Establishment
+from history.models import History
+from product.models import Parcel, Product
+from .models import Review
+
+
+class RatingCountersTest(TestCase):
+
+    def setUp(self):
+        company = Company.objects.create(name="Farm Co", address="1 Road", city="Fresno", state="CA")
+        self.establishment = Establishment.objects.create(name="North Farm", address="1 Road", state="CA", company=company)
+        parcel = Parcel.objects.create(name="Field 1", establishment=self.establishment, area=10)
+        self.history = History.objects.create(
+            name="Corn 2024",
+            parcel=parcel,
+            product=Product.objects.create(name="Corn"),
+            start_date=timezone.now(),
+        )
+        self.user = get_user_model().objects.create_user("consumer@example.com", "secret")
+
+    def _review(self, rating):
+        return Review.objects.create(
+            headline="Fresh", written_review="Tasty", rating=rating, user=self.user, production=self.history
+        )
+
+    def test_insert_updates_counters_and_reputation(self):
+        self._review(5)
+        self._review(2)
+
+        self.history.refresh_from_db()
+        self.establishment.refresh_from_db()
+        self.assertEqual((self.history.review_count, self.history.rating_sum), (2, 7))
+        self.assertEqual(self.history.reputation, 3.5)
+        self.assertEqual(self.establishment.rating_histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+
+    def test_rating_change_and_delete(self):
+        review = self._review(4)
+        self._review(2)
+
+        review = Review.objects.get(id=review.id)
+        review.rating = 1
+        review.save()
+        review.delete()
+
+        self.history.refresh_from_db()
+        self.establishment.refresh_from_db()
+        self.assertEqual((self.history.review_count, self.history.rating_sum), (1, 2))
+        self.assertEqual(self.history.reputation, 2.0)
+        self.assertEqual(self.establishment.rating_histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 0})
+
+    def test_update_reputation_recounts_from_reviews(self):
+        self._review(3)
+        History.objects.filter(id=self.history.id).update(review_count=0, rating_sum=0, rating_3_count=0)
+
+        self.history.refresh_from_db()
+        self.history.update_reputation()
+
+        self.history.refresh_from_db()
+        self.assertEqual((self.history.review_count, self.history.rating_3_count), (1, 1))
+        self.assertEqual(self.history.reputation, 3.0)
@@ -5,6 +5,8 @@ from django.shortcuts import render
 from rest_framework import generics, permissions, viewsets, filters
 from rest_framework.response import Response
 
+from history.scan_ingestion import scan_ingestion
+
 from .models import Review
 from .serializers import ReviewSerializer, ListReviewSerializer
 
@@ -33,6 +35,8 @@ class ReviewsViewSet(viewsets.ModelViewSet):
             else:
                 # Otherwise, treat it as a real scan ID
                 data["scan"] = data.pop("scan_id", None)
+                # The scan may still be waiting in the ingestion buffer
+                scan_ingestion.ensure_recorded(data["scan"])
         
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
@@ -9,19 +9,16 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings.dev')
 django.setup()
 
 from django.contrib.auth import get_user_model
-from history.views_consumer import ConsumerDashboardViewSet
-from history.models_consumer import UserImpactSummary
+from history.impact_summary import impact_summaries
 
 User = get_user_model()
 
 print('🔄 Updating impact summaries with real data...')
 
-dashboard_view = ConsumerDashboardViewSet()
 users_with_scans = User.objects.filter(historyscan__isnull=False).distinct()
 
 for user in users_with_scans:
     print(f'📊 Updating impact summary for {user.email}')
-    impact_summary, created = UserImpactSummary.objects.get_or_create(user=user)
-    dashboard_view._update_impact_summary(user, impact_summary)
+    impact_summaries.rebuild(user.id)
 
 print('✅ All impact summaries updated with production-ready calculations!')
\ No newline at end of file